@@ -1,7 +1,9 @@
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Usuario, Rol, Region, Comuna, Constructora, ConfiguracionObservacion
+from .models import (
+    Usuario, Rol, Region, Comuna, Constructora, ConfiguracionObservacion, Feriado, KpiSnapshotEjecucion, PuntoControlImportacion,
+)
 
 @admin.register(Usuario)
 class UsuarioAdmin(BaseUserAdmin):
@@ -54,7 +56,9 @@ class ConstructoraAdmin(admin.ModelAdmin):
 
 @admin.register(ConfiguracionObservacion)
 class ConfiguracionObservacionAdmin(admin.ModelAdmin):
-    list_display = ['dias_vencimiento_normal', 'horas_vencimiento_urgente', 'fecha_modificacion', 'modificado_por']
+    list_display = [
+        'dias_vencimiento_normal', 'horas_vencimiento_urgente', 'usar_dias_habiles', 'fecha_modificacion', 'modificado_por',
+    ]
     readonly_fields = ['fecha_modificacion']
     
     def has_add_permission(self, request):
@@ -64,3 +68,31 @@ class ConfiguracionObservacionAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         # No permitir eliminar la configuración
         return False
+
+
+@admin.register(Feriado)
+class FeriadoAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'nombre']
+    list_filter = ['fecha']
+    search_fields = ['nombre']
+    date_hierarchy = 'fecha'
+
+
+@admin.register(KpiSnapshotEjecucion)
+class KpiSnapshotEjecucionAdmin(admin.ModelAdmin):
+    list_display = ['inicio', 'fin', 'completo', 'dias_recalculados']
+    list_filter = ['completo']
+
+    def has_add_permission(self, request):
+        # Las ejecuciones las registra el comando refrescar_kpi_snapshot
+        return False
+
+
+@admin.register(PuntoControlImportacion)
+class PuntoControlImportacionAdmin(admin.ModelAdmin):
+    list_display = ['importador', 'archivo', 'hoja', 'filas_procesadas', 'completado', 'fecha_actualizacion']
+    list_filter = ['importador', 'completado']
+
+    def has_add_permission(self, request):
+        # Los registran los comandos de importación; se pueden eliminar para forzar una carga completa
+        return False
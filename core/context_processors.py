@@ -1,5 +1,5 @@
-from proyectos.models import Proyecto, Vivienda
-from incidencias.models import Observacion
+from django.utils.functional import SimpleLazyObject
+from core.utils.global_stats import ESTADISTICAS_VACIAS, obtener_estadisticas_globales
 from core.permisos import (
     tiene_rol,
     puede_acceder_panel_maestro,
@@ -9,87 +9,15 @@ def global_stats_context(request):
     """
     Context processor para agregar estadísticas globales a todas las plantillas.
     Personalizado según el rol del usuario.
+
+    Los valores son perezosos: solo se consultan (caché o base de datos) si la
+    plantilla los imprime, y una sola vez por request.
     """
     if request.user.is_authenticated:
-        user = request.user
-        
-        # **CASO ESPECIAL PARA FAMILIA**
-        if user.rol and user.rol.nombre == 'FAMILIA':
-            # Solo mostrar estadísticas de SU vivienda
-            try:
-                from django.db.models import Q
-                
-                # Buscar viviendas del beneficiario
-                mis_viviendas = Vivienda.objects.filter(
-                    Q(beneficiario__nombre__icontains=user.nombre) |
-                    Q(beneficiario__apellido_paterno__icontains=user.nombre) |
-                    Q(familia_beneficiaria__icontains=user.nombre)
-                )
-                
-                if mis_viviendas.exists():
-                    mi_vivienda = mis_viviendas.first()
-                    mis_observaciones = Observacion.objects.filter(vivienda=mi_vivienda)
-                    
-                    return {
-                        'total_proyectos': 1,  # Solo su proyecto
-                        'viviendas_total': 1,  # Solo su vivienda
-                        'obs_total': mis_observaciones.count(),
-                    }
-            except:
-                pass
-            
-            # Si no encuentra vivienda, mostrar 0
-            return {
-                'total_proyectos': 0,
-                'viviendas_total': 0,
-                'obs_total': 0,
-            }
-        
-        # **CASO ESPECIAL PARA CONSTRUCTORA**
-        if user.rol and user.rol.nombre == 'CONSTRUCTORA' and getattr(user, 'empresa', None):
-            # Solo mostrar estadísticas de SU constructora
-            try:
-                # Usar el nuevo campo constructora (ForeignKey)
-                if getattr(user, 'constructora', None):
-                    proyectos_constructora = Proyecto.objects.filter(constructora=user.constructora)
-                    observaciones_constructora = Observacion.objects.filter(vivienda__proyecto__constructora=user.constructora)
-                elif getattr(user, 'empresa', None):
-                    # Fallback al campo legacy
-                    empresa_usuario = user.empresa.strip().lower()
-                    proyectos_constructora = Proyecto.objects.filter(constructora__nombre__icontains=empresa_usuario)
-                    observaciones_constructora = Observacion.objects.filter(vivienda__proyecto__constructora__nombre__icontains=empresa_usuario)
-                else:
-                    proyectos_constructora = Proyecto.objects.none()
-                    observaciones_constructora = Observacion.objects.none()
-                
-                # Viviendas de esos proyectos
-                viviendas_constructora = Vivienda.objects.filter(
-                    proyecto__in=proyectos_constructora,
-                    activa=True
-                )
-                return {
-                    'total_proyectos': proyectos_constructora.count(),
-                    'viviendas_total': viviendas_constructora.count(),
-                    'obs_total': observaciones_constructora.count(),
-                }
-            except:
-                pass
-            
-            # Si hay error, mostrar 0
-            return {
-                'total_proyectos': 0,
-                'viviendas_total': 0,
-                'obs_total': 0,
-            }
-        
-        # **PARA OTROS ROLES**: Estadísticas globales
-        total_proyectos = Proyecto.objects.count()
-        viviendas_total = Vivienda.objects.filter(activa=True).count()
-        obs_total = Observacion.objects.count()
+        estadisticas = SimpleLazyObject(lambda: obtener_estadisticas_globales(request.user))
         return {
-            'total_proyectos': total_proyectos,
-            'viviendas_total': viviendas_total,
-            'obs_total': obs_total,
+            clave: SimpleLazyObject(lambda clave=clave: estadisticas[clave])
+            for clave in ESTADISTICAS_VACIAS
         }
     return {}
 
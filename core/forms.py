@@ -208,7 +208,7 @@ class ObservacionForm(forms.ModelForm):
 class ConfiguracionObservacionForm(forms.ModelForm):
     class Meta:
         model = __import__('core.models', fromlist=['ConfiguracionObservacion']).ConfiguracionObservacion
-        fields = ['dias_vencimiento_normal', 'horas_vencimiento_urgente']
+        fields = ['dias_vencimiento_normal', 'horas_vencimiento_urgente', 'usar_dias_habiles']
         widgets = {
             'dias_vencimiento_normal': forms.NumberInput(attrs={
                 'class': 'form-control', 
@@ -220,12 +220,15 @@ class ConfiguracionObservacionForm(forms.ModelForm):
                 'min': '1',
                 'placeholder': '48'
             }),
+            'usar_dias_habiles': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
         labels = {
             'dias_vencimiento_normal': 'Días de vencimiento (Observaciones Normales)',
             'horas_vencimiento_urgente': 'Horas de vencimiento (Observaciones Urgentes)',
+            'usar_dias_habiles': 'Contar solo días hábiles',
         }
         help_texts = {
             'dias_vencimiento_normal': 'Cantidad de días por defecto para observaciones normales',
             'horas_vencimiento_urgente': 'Cantidad de horas por defecto para observaciones urgentes',
+            'usar_dias_habiles': 'Excluye fines de semana y los feriados registrados en el administrador',
         }
\ No newline at end of file
@@ -0,0 +1,118 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _inicializar_proceso():
+    # Con 'spawn' (Windows) el proceso hijo parte sin Django configurado
+    import django
+    django.setup()
+
+
+def _ejecutar(trabajo_id):
+    from core.utils.trabajos_reporte import ejecutar_trabajo
+    try:
+        return ejecutar_trabajo(trabajo_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Genera en un pool de procesos los reportes encolados desde la web (TrabajoReporte)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=settings.REPORTES_PROCESOS,
+            help='Reportes que se generan a la vez (tamaño del pool)',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos entre revisiones de la cola cuando no hay trabajo',
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesa los trabajos pendientes y termina (para cron)',
+        )
+
+    def handle(self, *args, **options):
+        from core.utils.trabajos_reporte import devolver_a_cola, liberar_trabajos_colgados, tomar_trabajos
+
+        procesos = max(1, options['procesos'])
+        self._limpiar_cache()
+        self.stdout.write(f'Procesando reportes con {procesos} proceso(s)...')
+
+        en_curso = {}
+        pool = self._crear_pool(procesos)
+        try:
+            while True:
+                # Trabajos abandonados por un worker caído (este u otro) vuelven a la cola
+                liberados = liberar_trabajos_colgados(excluir=en_curso.values())
+                if liberados:
+                    self.stdout.write(f'{liberados} trabajo(s) abandonado(s) vuelven a la cola')
+
+                roto = False
+                tomados = tomar_trabajos(procesos - len(en_curso))
+                for indice, trabajo_id in enumerate(tomados):
+                    # Los procesos hijos no deben heredar la conexión abierta del padre
+                    connections.close_all()
+                    try:
+                        futuro = pool.submit(_ejecutar, trabajo_id)
+                    except BrokenProcessPool:
+                        devolver_a_cola(tomados[indice:])
+                        roto = True
+                        break
+                    en_curso[futuro] = trabajo_id
+
+                if not en_curso and not roto:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                if not roto:
+                    terminados, _ = wait(en_curso, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+                    roto = any(isinstance(futuro.exception(), BrokenProcessPool) for futuro in terminados)
+                if roto:
+                    # Si un proceso muere (p. ej. sin memoria) el pool queda inutilizable
+                    # y fallan todos sus trabajos en curso
+                    terminados, _ = wait(en_curso)
+                for futuro in terminados:
+                    self._informar(en_curso.pop(futuro), futuro)
+                if terminados:
+                    self._limpiar_cache()
+                if roto:
+                    self.stdout.write(self.style.WARNING('Un proceso del pool terminó inesperadamente; se reinicia el pool'))
+                    pool.shutdown(wait=False)
+                    pool = self._crear_pool(procesos)
+        finally:
+            pool.shutdown()
+
+    def _crear_pool(self, procesos):
+        return ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_proceso)
+
+    def _informar(self, trabajo_id, futuro):
+        from core.utils.trabajos_reporte import marcar_error
+        from reportes.models import TrabajoReporte
+
+        error = futuro.exception()
+        if error:
+            marcar_error(trabajo_id, f'El proceso del worker falló: {error}')
+            self.stdout.write(self.style.ERROR(f'✗ Trabajo {trabajo_id}: {error}'))
+        elif futuro.result() == TrabajoReporte.LISTO:
+            self.stdout.write(self.style.SUCCESS(f'✓ Trabajo {trabajo_id} listo'))
+        else:
+            self.stdout.write(self.style.WARNING(f'✗ Trabajo {trabajo_id} terminó con error'))
+
+    def _limpiar_cache(self):
+        from core.utils.cache_reportes import limpiar_cache_reportes
+        eliminados = limpiar_cache_reportes()
+        if eliminados:
+            self.stdout.write(f'{eliminados} reporte(s) antiguo(s) eliminados de la caché')
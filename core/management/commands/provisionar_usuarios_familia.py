@@ -0,0 +1,59 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.models import Rol
+from core.utils.usuarios_familia import TAMANO_LOTE, encolar_sin_usuario, provisionar_usuarios_familia
+from proyectos.models import Beneficiario, UsuarioFamiliaPendiente
+
+
+class Command(BaseCommand):
+    help = 'Crea en lote los usuarios FAMILIA pendientes de los beneficiarios (cola UsuarioFamiliaPendiente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todos',
+            action='store_true',
+            help='Encola antes a todos los beneficiarios con RUT y email que aún no tienen usuario',
+        )
+        parser.add_argument(
+            '--reintentar',
+            action='store_true',
+            help='Vuelve a intentar los pendientes que quedaron con error',
+        )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=settings.USUARIOS_FAMILIA_PROCESOS,
+            help='Procesos que calculan los hashes de contraseña',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Usuarios por lote (por defecto {TAMANO_LOTE})',
+        )
+
+    def handle(self, *args, **options):
+        if not Rol.objects.filter(nombre='FAMILIA').exists():
+            self.stdout.write(self.style.ERROR('⚠ No existe el rol FAMILIA. Ejecute inicializar_roles_usuarios.'))
+            return
+
+        if options['todos']:
+            encolados = encolar_sin_usuario(Beneficiario.objects.all())
+            self.stdout.write(f'{encolados} beneficiario(s) sin usuario agregado(s) a la cola')
+        if options['reintentar']:
+            reintentos = UsuarioFamiliaPendiente.objects.exclude(error='').update(error='')
+            self.stdout.write(f'{reintentos} pendiente(s) con error vuelven a la cola')
+
+        inicio = time.perf_counter()
+        resumen = provisionar_usuarios_familia(tamano_lote=options['lote'], procesos=options['procesos'])
+        segundos = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {resumen.creados} usuario(s) FAMILIA creado(s), {resumen.existentes} ya existían '
+            f'({segundos:.1f}s)'
+        ))
+        if resumen.errores:
+            self.stdout.write(self.style.WARNING(
+                f'⚠ {resumen.errores} beneficiario(s) no se pudieron procesar; ver UsuarioFamiliaPendiente.error'
+            ))
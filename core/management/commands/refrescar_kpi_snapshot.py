@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from core.utils.kpi_snapshot import refrescar_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Refresca el snapshot diario de KPIs recalculando solo los días modificados desde la última ejecución'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Recalcula todo el histórico en vez de solo los días modificados',
+        )
+
+    def handle(self, *args, **options):
+        ejecucion = refrescar_snapshot(completo=options['completo'])
+        tipo = 'completo' if ejecucion.completo else 'incremental'
+        duracion = (ejecucion.fin - ejecucion.inicio).total_seconds()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Refresco {tipo}: {ejecucion.dias_recalculados} día(s) recalculado(s) en {duracion:.1f}s'
+            )
+        )
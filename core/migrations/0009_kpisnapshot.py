@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0013_tipologiavivienda_metros_cuadrados_and_more'),
+        ('core', '0008_usuario_apellido_materno_usuario_apellido_paterno_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiSnapshotEjecucion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField(verbose_name='Inicio')),
+                ('fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('completo', models.BooleanField(default=False, help_text='Recalculó todo el histórico')),
+                ('dias_recalculados', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ejecución de snapshot KPI',
+                'verbose_name_plural': 'Ejecuciones de snapshot KPI',
+                'ordering': ['-inicio'],
+            },
+        ),
+        migrations.CreateModel(
+            name='KpiSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Día de creación')),
+                ('mes_cierre', models.DateField(blank=True, null=True, verbose_name='Mes de cierre')),
+                ('activo', models.BooleanField(default=True)),
+                ('obs_total', models.PositiveIntegerField(default=0)),
+                ('obs_abiertas', models.PositiveIntegerField(default=0)),
+                ('obs_cerradas', models.PositiveIntegerField(default=0)),
+                ('obs_urgentes', models.PositiveIntegerField(default=0, help_text='Urgentes abiertas')),
+                ('constructora', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.constructora')),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='proyectos.proyecto')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.region')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de KPI',
+                'verbose_name_plural': 'Snapshots de KPI',
+                'ordering': ['fecha'],
+                'indexes': [models.Index(fields=['fecha', 'region'], name='core_kpisna_fecha_4df19b_idx'), models.Index(fields=['proyecto', 'fecha'], name='core_kpisna_proyect_71ead0_idx')],
+            },
+        ),
+    ]
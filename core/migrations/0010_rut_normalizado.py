@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:53
+
+from django.db import migrations, models
+from core.validators import normalizar_rut
+
+
+def poblar_rut_normalizado(apps, schema_editor):
+    for modelo in ('Constructora', 'Usuario'):
+        Modelo = apps.get_model('core', modelo)
+        registros = [
+            Modelo(pk=pk, rut_normalizado=normalizar_rut(rut))
+            for pk, rut in Modelo.objects.exclude(rut__isnull=True).exclude(rut='').values_list('pk', 'rut')
+        ]
+        Modelo.objects.bulk_update(registros, ['rut_normalizado'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_kpisnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='constructora',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(poblar_rut_normalizado, migrations.RunPython.noop),
+    ]
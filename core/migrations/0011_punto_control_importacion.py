@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_rut_normalizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PuntoControlImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('importador', models.CharField(help_text='Comando que importa el archivo', max_length=50)),
+                ('archivo', models.CharField(help_text='Nombre del archivo (referencial)', max_length=255)),
+                ('hash_archivo', models.CharField(help_text='SHA-256 del contenido', max_length=64)),
+                ('hoja', models.CharField(default='0', max_length=100)),
+                ('filas_procesadas', models.PositiveIntegerField(default=0, help_text='Filas de datos confirmadas')),
+                ('completado', models.BooleanField(default=False)),
+                ('fecha_inicio', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Punto de control de importación',
+                'verbose_name_plural': 'Puntos de control de importación',
+                'ordering': ['-fecha_actualizacion'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='puntocontrolimportacion',
+            constraint=models.UniqueConstraint(fields=('importador', 'hash_archivo', 'hoja'), name='uniq_punto_control_importacion'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_punto_control_importacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Feriado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Fecha')),
+                ('nombre', models.CharField(max_length=100, verbose_name='Nombre')),
+            ],
+            options={
+                'verbose_name': 'Feriado',
+                'verbose_name_plural': 'Feriados',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.AddField(
+            model_name='configuracionobservacion',
+            name='usar_dias_habiles',
+            field=models.BooleanField(default=False, help_text='Los plazos no cuentan fines de semana ni los feriados registrados', verbose_name='Contar solo días hábiles'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:05
+
+import datetime
+from django.db import migrations, models
+
+
+def invalidar_snapshot(apps, schema_editor):
+    # Las filas existentes no tienen la duración: sin ejecuciones, las
+    # lecturas van a Observacion hasta que el próximo refresco sea completo
+    apps.get_model('core', 'KpiSnapshot').objects.all().delete()
+    apps.get_model('core', 'KpiSnapshotEjecucion').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_feriado_dias_habiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kpisnapshot',
+            name='obs_duracion_cerradas',
+            field=models.DurationField(default=datetime.timedelta, help_text='Suma de (fecha_cierre - fecha_creacion) de las cerradas con fecha de cierre'),
+        ),
+        migrations.RunPython(invalidar_snapshot, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
 
 from django.db import models
-from .validators import validar_rut
+from .validators import normalizar_rut, validar_rut
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager, Group, Permission
 from datetime import timedelta, datetime
 
@@ -23,6 +23,24 @@ class UsuarioManager(BaseUserManager):
             raise ValueError('Superuser must have is_superuser=True.')
         return self.create_user(email, password, **extra_fields)
 
+class ConRutNormalizado(models.Model):
+    """
+    Agrega `rut_normalizado` (ver core.validators.normalizar_rut), indexado
+    y recalculado en cada save(), para buscar por RUT sin importar el
+    formato guardado en `rut`. Las búsquedas van por core/utils/rut.py.
+    """
+    rut_normalizado = models.CharField(max_length=12, blank=True, default='', editable=False, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.rut_normalizado = normalizar_rut(self.rut)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rut' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'rut_normalizado'}
+        super().save(*args, **kwargs)
+
 class Rol(models.Model):
     id = models.AutoField(primary_key=True)
     ROLES_CHOICES = (
@@ -73,7 +91,7 @@ class Comuna(models.Model):
     def __str__(self):
         return f"{self.nombre}, {self.region.nombre}"
 
-class Usuario(AbstractBaseUser, PermissionsMixin):
+class Usuario(ConRutNormalizado, AbstractBaseUser, PermissionsMixin):
     id = models.AutoField(primary_key=True)
     email = models.EmailField(unique=True, verbose_name="Correo electrónico")
     rut = models.CharField(
@@ -127,7 +145,7 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
         verbose_name = "Usuario"
         verbose_name_plural = "Usuarios"
 
-class Constructora(models.Model):
+class Constructora(ConRutNormalizado):
     nombre = models.CharField(max_length=150, unique=True, verbose_name="Nombre Constructora")
     direccion = models.CharField(max_length=255, blank=True, verbose_name="Dirección")
     rut = models.CharField(max_length=15, blank=True, null=True, verbose_name="RUT", db_index=True, validators=[validar_rut])
@@ -159,6 +177,11 @@ class ConfiguracionObservacion(models.Model):
         verbose_name="Horas de vencimiento (Urgente)",
         help_text="Horas por defecto para observaciones urgentes"
     )
+    usar_dias_habiles = models.BooleanField(
+        default=False,
+        verbose_name="Contar solo días hábiles",
+        help_text="Los plazos no cuentan fines de semana ni los feriados registrados"
+    )
     fecha_modificacion = models.DateTimeField(auto_now=True, verbose_name="Última modificación")
     modificado_por = models.ForeignKey(
         Usuario, 
@@ -182,3 +205,101 @@ class ConfiguracionObservacion(models.Model):
         if not config:
             config = cls.objects.create()
         return config
+
+
+class Feriado(models.Model):
+    """Feriados que no cuentan como días hábiles en los plazos de observaciones"""
+    fecha = models.DateField(unique=True, verbose_name="Fecha")
+    nombre = models.CharField(max_length=100, verbose_name="Nombre")
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y} - {self.nombre}"
+
+    class Meta:
+        verbose_name = "Feriado"
+        verbose_name_plural = "Feriados"
+        ordering = ['fecha']
+
+
+class KpiSnapshot(models.Model):
+    """
+    Agregado diario de observaciones por región, constructora y proyecto.
+
+    Cada fila resume las observaciones creadas en `fecha` (día local) para un
+    proyecto, separadas por mes de cierre y por `activo`, de modo que las
+    tendencias mensuales y los KPIs de observaciones del dashboard y sus
+    reportes se lean sumando filas en vez de recorrer todas las observaciones.
+    Se mantiene con el comando `refrescar_kpi_snapshot`.
+    """
+    fecha = models.DateField(verbose_name="Día de creación")
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='+')
+    constructora = models.ForeignKey(Constructora, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    proyecto = models.ForeignKey('proyectos.Proyecto', on_delete=models.CASCADE, related_name='+')
+    mes_cierre = models.DateField(null=True, blank=True, verbose_name="Mes de cierre")
+    activo = models.BooleanField(default=True)
+
+    obs_total = models.PositiveIntegerField(default=0)
+    obs_abiertas = models.PositiveIntegerField(default=0)
+    obs_cerradas = models.PositiveIntegerField(default=0)
+    obs_urgentes = models.PositiveIntegerField(default=0, help_text="Urgentes abiertas")
+    obs_duracion_cerradas = models.DurationField(
+        default=timedelta, help_text="Suma de (fecha_cierre - fecha_creacion) de las cerradas con fecha de cierre"
+    )
+
+    def __str__(self):
+        return f"{self.fecha} - {self.proyecto_id} ({self.obs_total})"
+
+    class Meta:
+        verbose_name = "Snapshot de KPI"
+        verbose_name_plural = "Snapshots de KPI"
+        ordering = ['fecha']
+        indexes = [
+            models.Index(fields=["fecha", "region"]),
+            models.Index(fields=["proyecto", "fecha"]),
+        ]
+
+
+class KpiSnapshotEjecucion(models.Model):
+    """Registro de cada refresco de KpiSnapshot (marca de agua incremental)."""
+    inicio = models.DateTimeField(verbose_name="Inicio")
+    fin = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    completo = models.BooleanField(default=False, help_text="Recalculó todo el histórico")
+    dias_recalculados = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Refresco KPI {self.inicio:%d/%m/%Y %H:%M} ({self.dias_recalculados} días)"
+
+    class Meta:
+        verbose_name = "Ejecución de snapshot KPI"
+        verbose_name_plural = "Ejecuciones de snapshot KPI"
+        ordering = ['-inicio']
+
+
+class PuntoControlImportacion(models.Model):
+    """
+    Avance de una importación desde Excel: filas ya confirmadas de un archivo
+    (identificado por su hash) para retomar una carga interrumpida.
+    """
+    importador = models.CharField(max_length=50, help_text="Comando que importa el archivo")
+    archivo = models.CharField(max_length=255, help_text="Nombre del archivo (referencial)")
+    hash_archivo = models.CharField(max_length=64, help_text="SHA-256 del contenido")
+    hoja = models.CharField(max_length=100, default='0')
+    filas_procesadas = models.PositiveIntegerField(default=0, help_text="Filas de datos confirmadas")
+    completado = models.BooleanField(default=False)
+    fecha_inicio = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        estado = 'completo' if self.completado else f'{self.filas_procesadas} filas'
+        return f"{self.importador}: {self.archivo} ({estado})"
+
+    class Meta:
+        verbose_name = "Punto de control de importación"
+        verbose_name_plural = "Puntos de control de importación"
+        ordering = ['-fecha_actualizacion']
+        constraints = [
+            models.UniqueConstraint(
+                fields=["importador", "hash_archivo", "hoja"],
+                name="uniq_punto_control_importacion"
+            )
+        ]
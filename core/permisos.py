@@ -1,6 +1,136 @@
 """
 Funciones auxiliares para verificar permisos por rol
+
+Los permisos que dependen de datos (qué proyectos y viviendas ve un usuario
+CONSTRUCTORA o FAMILIA) se resuelven una vez en un `AlcanceUsuario`, que se
+guarda en la caché y en el propio objeto usuario durante el request. Así los
+filtros de listas y las verificaciones por fila se reducen a `id__in` y
+pertenencia a un conjunto, sin joins ni comparaciones de texto.
 """
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from core.utils.rut import filtrar_por_rut
+from core.utils.cache_version import version_cache, incrementar_version_cache
+
+GRUPO_CACHE_ALCANCE = 'alcance_usuario'
+TTL_ALCANCE_POR_DEFECTO = 300
+
+ROLES_VEN_TODO = ['ADMINISTRADOR', 'TECHO', 'SERVIU']
+
+
+class AlcanceUsuario:
+    """
+    Conjunto de proyectos y viviendas visibles para un usuario.
+
+    Si `ve_todo` es True los conjuntos no se usan (acceso completo).
+    """
+
+    def __init__(self, ve_todo=False, proyecto_ids=(), vivienda_ids=()):
+        self.ve_todo = ve_todo
+        self.proyecto_ids = frozenset(proyecto_ids)
+        self.vivienda_ids = frozenset(vivienda_ids)
+
+    def puede_ver_proyecto(self, proyecto_id):
+        return self.ve_todo or proyecto_id in self.proyecto_ids
+
+    def puede_ver_vivienda(self, vivienda_id):
+        return self.ve_todo or vivienda_id in self.vivienda_ids
+
+    @property
+    def firma(self):
+        """Identifica el alcance: usuarios con la misma firma ven los mismos datos."""
+        if self.ve_todo:
+            return 'todo'
+        datos = f'{sorted(self.proyecto_ids)}|{sorted(self.vivienda_ids)}'
+        return hashlib.md5(datos.encode('utf-8')).hexdigest()
+
+
+def _clave_alcance(usuario):
+    # Incluye los campos del usuario que definen el alcance: si cambian su rol,
+    # constructora, empresa o RUT, la clave cambia y el alcance se recalcula.
+    # Se resumen con un hash para que la clave sea válida en cualquier backend.
+    datos = '|'.join(str(parte) for parte in (
+        usuario.is_superuser,
+        usuario.rol_id,
+        usuario.constructora_id,
+        (usuario.empresa or '').strip().lower(),
+        usuario.rut or '',
+        usuario.nombre,
+    ))
+    resumen = hashlib.md5(datos.encode('utf-8')).hexdigest()
+    return f'{GRUPO_CACHE_ALCANCE}:v{version_cache(GRUPO_CACHE_ALCANCE)}:{usuario.pk}:{resumen}'
+
+
+def _viviendas_familia(usuario):
+    from proyectos.models import Vivienda
+    if usuario.rut:
+        # Búsqueda exacta por RUT (más confiable)
+        return filtrar_por_rut(Vivienda.objects.all(), usuario.rut, 'beneficiario__rut_normalizado')
+    # Fallback: buscar por nombre si no tiene RUT (usuarios antiguos)
+    return Vivienda.objects.filter(
+        Q(beneficiario__nombre__icontains=usuario.nombre) |
+        Q(beneficiario__apellido_paterno__icontains=usuario.nombre) |
+        Q(familia_beneficiaria__icontains=usuario.nombre)
+    )
+
+
+def _calcular_alcance(usuario):
+    from proyectos.models import Proyecto, Vivienda
+
+    if usuario.is_superuser or (usuario.rol and usuario.rol.nombre in ROLES_VEN_TODO):
+        return AlcanceUsuario(ve_todo=True)
+    rol = usuario.rol.nombre if usuario.rol else None
+
+    # CONSTRUCTORA solo sus proyectos
+    if rol == 'CONSTRUCTORA':
+        if usuario.constructora_id:
+            proyectos = Proyecto.objects.filter(constructora_id=usuario.constructora_id)
+        elif usuario.empresa:
+            # Fallback al campo empresa legacy
+            proyectos = Proyecto.objects.filter(constructora__nombre__icontains=usuario.empresa.strip())
+        else:
+            return AlcanceUsuario()
+        proyecto_ids = list(proyectos.values_list('id', flat=True))
+        vivienda_ids = Vivienda.objects.filter(proyecto_id__in=proyecto_ids).values_list('id', flat=True)
+        return AlcanceUsuario(proyecto_ids=proyecto_ids, vivienda_ids=vivienda_ids)
+
+    # FAMILIA solo sus viviendas y los proyectos donde las tiene
+    if rol == 'FAMILIA':
+        viviendas = list(_viviendas_familia(usuario).values_list('id', 'proyecto_id'))
+        return AlcanceUsuario(
+            proyecto_ids=[proyecto_id for _, proyecto_id in viviendas],
+            vivienda_ids=[vivienda_id for vivienda_id, _ in viviendas],
+        )
+
+    # Otros roles no ven nada
+    return AlcanceUsuario()
+
+
+def obtener_alcance(usuario):
+    """
+    Alcance de datos del usuario. Se calcula una vez por request (queda
+    guardado en el objeto usuario) y se reutiliza entre requests desde la
+    caché durante `ALCANCE_USUARIO_CACHE_TTL` segundos.
+    """
+    if not usuario.is_authenticated:
+        return AlcanceUsuario()
+    alcance = getattr(usuario, '_alcance_usuario', None)
+    if alcance is None:
+        clave = _clave_alcance(usuario)
+        alcance = cache.get(clave)
+        if alcance is None:
+            alcance = _calcular_alcance(usuario)
+            cache.set(clave, alcance, getattr(settings, 'ALCANCE_USUARIO_CACHE_TTL', TTL_ALCANCE_POR_DEFECTO))
+        usuario._alcance_usuario = alcance
+    return alcance
+
+
+def invalidar_alcances():
+    """Invalida los alcances cacheados de todos los usuarios."""
+    incrementar_version_cache(GRUPO_CACHE_ALCANCE)
+
 
 def tiene_rol(usuario, *roles):
     """
@@ -41,27 +171,9 @@ def puede_ver_proyecto(usuario, proyecto):
     if not usuario.rol:
         return False
     
-    rol = usuario.rol.nombre
-    
-    # ADMIN, TECHO y SERVIU ven todos los proyectos
-    if rol in ['ADMINISTRADOR', 'TECHO', 'SERVIU']:
-        return True
-    
-    # CONSTRUCTORA solo ve sus proyectos
-    if rol == 'CONSTRUCTORA':
-        # Usar el nuevo campo constructora (ForeignKey)
-        if getattr(usuario, 'constructora', None):
-            return proyecto.constructora == usuario.constructora
-        # Fallback al campo empresa legacy
-        elif getattr(usuario, 'empresa', None):
-            return proyecto.constructora.nombre.lower() == usuario.empresa.lower()
-        return False
-    
-    # FAMILIA solo ve proyectos donde tiene vivienda
-    if rol == 'FAMILIA':
-        return proyecto.vivienda_set.filter(beneficiario__icontains=usuario.nombre).exists()
-    
-    return False
+    # ADMIN, TECHO y SERVIU ven todos; CONSTRUCTORA sus proyectos;
+    # FAMILIA los proyectos donde tiene vivienda
+    return obtener_alcance(usuario).puede_ver_proyecto(proyecto.pk)
 
 
 def puede_editar_proyecto(usuario, proyecto):
@@ -99,32 +211,9 @@ def puede_ver_observacion(usuario, observacion):
     # Superusuario tiene acceso completo
     if usuario.is_superuser:
         return True
-    # ADMINISTRADOR, TECHO y SERVIU pueden ver todas
-    if usuario.rol and usuario.rol.nombre in ['ADMINISTRADOR', 'TECHO', 'SERVIU']:
-        return True
-    # CONSTRUCTORA solo ve observaciones de sus proyectos
-    if usuario.rol and usuario.rol.nombre == 'CONSTRUCTORA':
-        # Usar el nuevo campo constructora (ForeignKey)
-        if getattr(usuario, 'constructora', None):
-            return observacion.vivienda.proyecto.constructora == usuario.constructora
-        # Fallback al campo empresa legacy
-        elif getattr(usuario, 'empresa', None):
-            proj_const = observacion.vivienda.proyecto.constructora.nombre.lower()
-            return proj_const == usuario.empresa.lower()
-        return False
-    # FAMILIA solo ve sus propias observaciones
-    is_familia = usuario.rol and usuario.rol.nombre == 'FAMILIA'
-    if is_familia:
-        benef = getattr(observacion.vivienda, 'beneficiario', None)
-        if benef:
-            if usuario.rut and getattr(benef, 'rut', None):
-                return usuario.rut == benef.rut
-            # Fallback: comparar nombres
-            nombre_b = f"{benef.nombre} {benef.apellido_paterno}".strip().lower()
-            return usuario.nombre.lower() in nombre_b
-        return False
-    # Otros no tienen acceso
-    return False
+    # ADMINISTRADOR, TECHO y SERVIU pueden ver todas; CONSTRUCTORA las de sus
+    # proyectos; FAMILIA las de su vivienda; otros no tienen acceso
+    return obtener_alcance(usuario).puede_ver_vivienda(observacion.vivienda_id)
 
 
 def puede_editar_observacion(usuario, observacion):
@@ -155,27 +244,13 @@ def puede_editar_observacion(usuario, observacion):
     
     # CONSTRUCTORA puede agregar soluciones y cerrar (verificar en vista)
     if rol == 'CONSTRUCTORA':
-        # Usar el nuevo campo constructora (ForeignKey)
-        if getattr(usuario, 'constructora', None):
-            return observacion.vivienda.proyecto.constructora == usuario.constructora
-        # Fallback al campo empresa legacy
-        elif getattr(usuario, 'empresa', None):
-            return observacion.vivienda.proyecto.constructora.nombre.lower() == usuario.empresa.lower()
-        return False
+        return obtener_alcance(usuario).puede_ver_vivienda(observacion.vivienda_id)
     
     # FAMILIA puede editar sus propias observaciones si están abiertas
     if rol == 'FAMILIA':
-        if observacion.estado.nombre == 'CERRADA':  # Cambiar a estado.nombre ya que estado es objeto
+        if observacion.estado.nombre.upper() == 'CERRADA':
             return False
-        # Verificar por RUT si existe, sino por nombre
-        if hasattr(observacion.vivienda, 'beneficiario') and observacion.vivienda.beneficiario:
-            if usuario.rut and observacion.vivienda.beneficiario.rut:
-                return usuario.rut == observacion.vivienda.beneficiario.rut
-            else:
-                # Fallback: comparar nombres
-                beneficiario_nombre = f"{observacion.vivienda.beneficiario.nombre} {observacion.vivienda.beneficiario.apellido_paterno}".lower()
-                return usuario.nombre.lower() in beneficiario_nombre
-        return False
+        return obtener_alcance(usuario).puede_ver_vivienda(observacion.vivienda_id)
     
     return False
 
@@ -210,7 +285,7 @@ def puede_crear_observacion(usuario, vivienda=None):
     # FAMILIA solo puede crear en su propia vivienda
     if rol == 'FAMILIA':
         if vivienda:
-            return vivienda.beneficiario and usuario.nombre.lower() in vivienda.beneficiario.lower()
+            return obtener_alcance(usuario).puede_ver_vivienda(vivienda.pk)
         return True  # Si no se especifica vivienda, permitir acceso al formulario
     
     return False
@@ -288,18 +363,17 @@ def puede_ver_reporte(usuario, tipo_reporte, proyecto=None, vivienda=None):
     
     # CONSTRUCTORA ve reportes de sus proyectos
     if rol == 'CONSTRUCTORA':
+        alcance = obtener_alcance(usuario)
         if tipo_reporte == 'postventa' and vivienda:
-            if usuario.empresa:
-                return vivienda.proyecto.constructora.lower() == usuario.empresa.lower()
+            return alcance.puede_ver_vivienda(vivienda.pk)
         elif proyecto:
-            if usuario.empresa:
-                return proyecto.constructora.lower() == usuario.empresa.lower()
+            return alcance.puede_ver_proyecto(proyecto.pk)
         return False
     
     # FAMILIA solo ve ficha de postventa de su vivienda
     if rol == 'FAMILIA':
         if tipo_reporte == 'postventa' and vivienda:
-            return vivienda.beneficiario and usuario.nombre.lower() in vivienda.beneficiario.lower()
+            return obtener_alcance(usuario).puede_ver_vivienda(vivienda.pk)
         # FAMILIA no puede ver otros tipos de reportes
         return False
     
@@ -320,42 +394,12 @@ def filtrar_proyectos_por_rol(usuario, queryset):
     if not usuario.is_authenticated:
         return queryset.none()
     
-    if usuario.is_superuser:
+    # ADMIN, TECHO y SERVIU ven todos; CONSTRUCTORA solo sus proyectos;
+    # FAMILIA solo proyectos donde tiene vivienda
+    alcance = obtener_alcance(usuario)
+    if alcance.ve_todo:
         return queryset
-    
-    if not usuario.rol:
-        return queryset.none()
-    
-    rol = usuario.rol.nombre
-    
-    # ADMIN, TECHO y SERVIU ven todos
-    if rol in ['ADMINISTRADOR', 'TECHO', 'SERVIU']:
-        return queryset
-    
-    # CONSTRUCTORA solo sus proyectos
-    if rol == 'CONSTRUCTORA':
-        # Usar la nueva relación ForeignKey si existe
-        if hasattr(usuario, 'constructora') and usuario.constructora:
-            return queryset.filter(constructora=usuario.constructora)
-        # Fallback al campo empresa legacy
-        elif usuario.empresa:
-            return queryset.filter(constructora__nombre__iexact=usuario.empresa)
-    
-    # FAMILIA solo proyectos donde tiene vivienda - buscar por RUT (más preciso)
-    if rol == 'FAMILIA':
-        if usuario.rut:
-            # Búsqueda exacta por RUT (más confiable)
-            return queryset.filter(viviendas__beneficiario__rut=usuario.rut).distinct()
-        else:
-            # Fallback: buscar por nombre si no tiene RUT (usuarios antiguos)
-            from django.db.models import Q
-            return queryset.filter(
-                Q(viviendas__beneficiario__nombre__icontains=usuario.nombre) |
-                Q(viviendas__beneficiario__apellido_paterno__icontains=usuario.nombre) |
-                Q(viviendas__familia_beneficiaria__icontains=usuario.nombre)
-            ).distinct()
-    
-    return queryset.none()
+    return queryset.filter(id__in=alcance.proyecto_ids)
 
 
 def filtrar_observaciones_por_rol(usuario, queryset):
@@ -372,31 +416,9 @@ def filtrar_observaciones_por_rol(usuario, queryset):
     # No autenticados no ven nada
     if not usuario.is_authenticated:
         return queryset.none()
-    # Superusuario y roles ADMINISTRADOR, TECHO, SERVIU ven todo
-    if usuario.is_superuser or (usuario.rol and usuario.rol.nombre in ['ADMINISTRADOR', 'TECHO', 'SERVIU']):
+    # Superusuario y roles ADMINISTRADOR, TECHO, SERVIU ven todo;
+    # CONSTRUCTORA solo sus proyectos; FAMILIA solo su vivienda
+    alcance = obtener_alcance(usuario)
+    if alcance.ve_todo:
         return queryset
-    # CONSTRUCTORA solo observa sus proyectos
-    if usuario.rol and usuario.rol.nombre == 'CONSTRUCTORA':
-        # Usar el nuevo campo constructora (ForeignKey)
-        if getattr(usuario, 'constructora', None):
-            return queryset.filter(vivienda__proyecto__constructora=usuario.constructora)
-        # Fallback al campo empresa legacy
-        elif getattr(usuario, 'empresa', None):
-            empresa_usuario = usuario.empresa.strip().lower()
-            return queryset.filter(vivienda__proyecto__constructora__nombre__icontains=empresa_usuario)
-        else:
-            return queryset.none()
-    # FAMILIA solo ve sus propias observaciones
-    is_familia = usuario.rol and usuario.rol.nombre == 'FAMILIA'
-    if is_familia:
-        from django.db.models import Q
-        # Combinar filtros por RUT y nombre/familia_beneficiaria
-        filtros = Q()
-        if getattr(usuario, 'rut', None):
-            filtros |= Q(vivienda__beneficiario__rut=usuario.rut)
-        filtros |= Q(vivienda__beneficiario__nombre__icontains=usuario.nombre)
-        filtros |= Q(vivienda__beneficiario__apellido_paterno__icontains=usuario.nombre)
-        filtros |= Q(vivienda__familia_beneficiaria__icontains=usuario.nombre)
-        return queryset.filter(filtros)
-    # Otros roles no ven observaciones
-    return queryset.none()
+    return queryset.filter(vivienda_id__in=alcance.vivienda_ids)
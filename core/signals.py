@@ -0,0 +1,99 @@
+"""
+Signals de core: invalidación de cachés e índices derivados de los datos
+operativos, el plazo de las observaciones nuevas y el registro de adjuntos
+borrados para la sincronización móvil.
+"""
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from proyectos.models import Proyecto, Vivienda, Recinto, Beneficiario, Telefono
+from incidencias.models import Observacion, ArchivoAdjuntoObservacion, ArchivoAdjuntoEliminado
+from reportes.models import ActaRecepcion, FamiliarBeneficiario
+from core.models import Usuario
+from core.utils.busqueda_observaciones import CAMPOS_OBSERVACION_INDEXADOS, reindexar_observaciones
+from core.utils.global_stats import invalidar_estadisticas_globales
+from core.utils.vencimiento import MotorVencimiento
+from core.permisos import invalidar_alcances
+
+
+@receiver([post_save, post_delete], sender=Proyecto)
+@receiver([post_save, post_delete], sender=Vivienda)
+@receiver([post_save, post_delete], sender=Observacion)
+def invalidar_cache_estadisticas(sender, **kwargs):
+    """Invalida las estadísticas globales del encabezado al cambiar datos."""
+    invalidar_estadisticas_globales()
+
+
+@receiver([post_save, post_delete], sender=Proyecto)
+@receiver([post_save, post_delete], sender=Vivienda)
+@receiver([post_save, post_delete], sender=Beneficiario)
+def invalidar_cache_alcances(sender, **kwargs):
+    """Invalida los alcances de usuario al cambiar proyectos, viviendas o beneficiarios."""
+    invalidar_alcances()
+
+
+@receiver([post_save, post_delete], sender=FamiliarBeneficiario)
+@receiver(post_save, sender=Beneficiario)
+@receiver([post_save, post_delete], sender=Telefono)
+def renovar_actas(sender, instance, **kwargs):
+    """
+    Renueva fecha_actualizacion de las actas cuyo PDF muestra el dato
+    modificado, para que se regeneren (core/utils/cache_pdf.py).
+    """
+    if sender is FamiliarBeneficiario:
+        actas = ActaRecepcion.objects.filter(pk=instance.acta_recepcion_id)
+    elif sender is Telefono:
+        actas = ActaRecepcion.objects.filter(beneficiario_id=instance.beneficiario_id)
+    else:
+        actas = ActaRecepcion.objects.filter(beneficiario=instance)
+    actas.update(fecha_actualizacion=timezone.now())
+
+
+@receiver(post_save, sender=Observacion)
+@receiver(post_save, sender=Recinto)
+@receiver(post_save, sender=Vivienda)
+@receiver(post_save, sender=Usuario)
+def reindexar_busqueda(sender, instance, update_fields=None, **kwargs):
+    """
+    Actualiza el índice de búsqueda de las observaciones cuyo texto
+    incluye el dato guardado (core/utils/busqueda_observaciones.py).
+    Se omiten los guardados parciales que no tocan esos campos (p. ej.
+    last_login del usuario o el estado de la observación).
+    """
+    campos = {
+        Observacion: CAMPOS_OBSERVACION_INDEXADOS,
+        Recinto: {'nombre'},
+        Vivienda: {'codigo'},
+        Usuario: {'email'},
+    }[sender]
+    if update_fields is not None and not campos.intersection(update_fields):
+        return
+    if sender is Observacion:
+        observaciones = Observacion.objects.filter(pk=instance.pk)
+    elif sender is Recinto:
+        observaciones = Observacion.objects.filter(recinto=instance)
+    elif sender is Vivienda:
+        observaciones = Observacion.objects.filter(vivienda=instance)
+    else:
+        observaciones = Observacion.objects.filter(creado_por=instance)
+    reindexar_observaciones(observaciones)
+
+
+@receiver(pre_save, sender=Observacion)
+def asignar_fecha_vencimiento(sender, instance, raw=False, **kwargs):
+    """
+    Las observaciones nuevas sin fecha de vencimiento la reciben según
+    ConfiguracionObservacion (core/utils/vencimiento.py).
+    """
+    if raw or not instance._state.adding or instance.fecha_vencimiento:
+        return
+    instance.fecha_vencimiento = MotorVencimiento().para(instance)
+
+
+@receiver(post_delete, sender=ArchivoAdjuntoObservacion)
+def registrar_archivo_eliminado(sender, instance, **kwargs):
+    """
+    Deja constancia del adjunto borrado para que la réplica móvil lo quite
+    (core/utils/sincronizacion_movil.py).
+    """
+    ArchivoAdjuntoEliminado.objects.create(archivo_id=instance.pk, observacion_id=instance.observacion_id)
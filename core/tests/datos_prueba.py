@@ -0,0 +1,58 @@
+"""
+Datos base compartidos por los tests (no es un módulo de tests: el runner
+solo recoge test*.py).
+"""
+from datetime import date
+from core.models import Region, Comuna, Usuario
+from proyectos.models import Proyecto, TipologiaVivienda, Vivienda
+from incidencias.models import EstadoObservacion, Observacion, SeguimientoObservacion, TipoObservacion
+
+
+class DatosPrueba:
+    """
+    Región, comuna y un usuario administrador; con `proyecto` también una
+    tipología, el proyecto P1 con una vivienda, los estados Abierta/Cerrada y
+    un tipo de observación.
+    """
+
+    def __init__(self, proyecto=True, codigo_vivienda='1'):
+        self.region = Region.objects.create(nombre='Valparaíso', codigo='05')
+        self.comuna = Comuna.objects.create(nombre='Quilpué', region=self.region)
+        self.usuario = Usuario.objects.create_user(
+            email='admin@techo.cl', password='x', nombre='Admin', is_superuser=True,
+        )
+        if not proyecto:
+            return
+        self.tipologia = TipologiaVivienda.objects.create(codigo=1, nombre='Tipo A')
+        self.proyecto = self.crear_proyecto('P1', nombre='Proyecto 1')
+        self.vivienda = Vivienda.objects.create(proyecto=self.proyecto, tipologia=self.tipologia, codigo=codigo_vivienda)
+        self.abierta = EstadoObservacion.objects.create(codigo=1, nombre='Abierta')
+        self.cerrada = EstadoObservacion.objects.create(codigo=2, nombre='Cerrada')
+        self.tipo = TipoObservacion.objects.create(nombre='General')
+
+    def crear_proyecto(self, codigo, **campos):
+        datos = {
+            'siglas': codigo, 'nombre': codigo, 'comuna': self.comuna, 'region': self.region,
+            'fecha_entrega': date(2025, 1, 1), 'creado_por': self.usuario,
+        }
+        datos.update(campos)
+        return Proyecto.objects.create(codigo=codigo, **datos)
+
+    def crear_observacion(self, **campos):
+        datos = {
+            'proyecto': self.proyecto, 'vivienda': self.vivienda, 'elemento': 'x', 'detalle': 'x',
+            'tipo': self.tipo, 'estado': self.abierta, 'creado_por': self.usuario,
+        }
+        datos.update(campos)
+        if 'vivienda' in campos and 'proyecto' not in campos:
+            datos['proyecto'] = campos['vivienda'].proyecto
+        return Observacion.objects.create(**datos)
+
+    def crear_observaciones(self, cantidad, comentarios=0):
+        observaciones = []
+        for _ in range(cantidad):
+            obs = self.crear_observacion()
+            for i in range(comentarios):
+                SeguimientoObservacion.objects.create(observacion=obs, usuario=self.usuario, accion=f'Acción {i}')
+            observaciones.append(obs)
+        return observaciones
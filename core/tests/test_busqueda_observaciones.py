@@ -0,0 +1,75 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.tests.datos_prueba import DatosPrueba
+from core.utils.busqueda_observaciones import buscar_observaciones, reindexar_observaciones
+from proyectos.models import Recinto
+from incidencias.models import Observacion
+
+
+class BusquedaObservacionesTests(TestCase):
+    def setUp(self):
+        self.datos = DatosPrueba(codigo_vivienda='A-12')
+        self.vivienda = self.datos.vivienda
+        self.recinto = Recinto.objects.create(tipologia=self.datos.tipologia, codigo='B1', nombre='Baño')
+
+    def _crear(self, elemento, detalle, recinto=None):
+        return self.datos.crear_observacion(elemento=elemento, detalle=detalle, recinto=recinto)
+
+    def _buscar(self, texto):
+        return list(buscar_observaciones(Observacion.objects.all(), texto))
+
+    def test_sin_tildes_prefijos_y_relevancia(self):
+        griferia = self._crear('Grifería', 'Filtración en la grifería, la grifería gotea', self.recinto)
+        puerta = self._crear('Puerta', 'No cierra la puerta de la grifería')
+        self._crear('Ventana', 'Vidrio trizado')
+
+        self.assertEqual(self._buscar('GRIFERIA'), [griferia, puerta])
+        self.assertEqual(self._buscar('grif bano'), [griferia])
+        self.assertEqual(self._buscar('filtración "gotea"'), [griferia])
+        self.assertEqual(self._buscar('a-12 vidrio')[0].elemento, 'Ventana')
+        self.assertEqual(self._buscar('madera'), [])
+
+    def test_mantiene_indice_al_guardar(self):
+        obs = self._crear('Muro', 'Humedad')
+        obs.detalle = 'Fisura vertical'
+        obs.save()
+        self.assertEqual(self._buscar('fisura'), [obs])
+        self.assertEqual(self._buscar('humedad'), [])
+
+        self.vivienda.codigo = 'C-7'
+        self.vivienda.save()
+        self.assertEqual(self._buscar('c 7 fisura'), [obs])
+
+        # update() no emite signals: se reindexa explícitamente
+        Observacion.objects.filter(pk=obs.pk).update(detalle='Moho')
+        self.assertEqual(reindexar_observaciones(Observacion.objects.all()), 1)
+        self.assertEqual(self._buscar('moho'), [obs])
+
+        obs.delete()
+        self.assertEqual(self._buscar('moho'), [])
+
+    @override_settings(BUSQUEDA_BACKEND='core.utils.busqueda_observaciones.BusquedaLike')
+    def test_respaldo_like(self):
+        obs = self._crear('Cerámica', 'Piso suelto')
+        self.assertEqual(self._buscar('ceramica suel'), [obs])
+        self.assertEqual(self._buscar('madera'), [])
+
+    def test_api_movil_ordena_por_relevancia(self):
+        griferia = self._crear('Grifería', 'La grifería de la grifería gotea')
+        puerta = self._crear('Puerta', 'Junto a la grifería')
+        self.client.force_login(self.datos.usuario)
+        # La app siempre envía cursor: al buscar se ignora y se pagina por número
+        respuesta = self.client.get('/incidencias/movil/api/', {'cursor': '', 'q': 'griferia', 'per_page': 1})
+        datos = respuesta.json()
+        self.assertEqual([obs['id'] for obs in datos['observaciones']], [griferia.pk])
+        self.assertTrue(datos['pagination']['has_next'])
+        respuesta = self.client.get('/incidencias/movil/api/', {'page': 2, 'q': 'griferia', 'per_page': 1})
+        self.assertEqual([obs['id'] for obs in respuesta.json()['observaciones']], [puerta.pk])
+
+    def test_lista_con_cursor_ordena_por_relevancia(self):
+        griferia = self._crear('Grifería', 'La grifería de la grifería gotea')
+        puerta = self._crear('Puerta', 'Junto a la grifería')
+        self.client.force_login(self.datos.usuario)
+        respuesta = self.client.get(reverse('incidencias:lista_observaciones'), {'cursor': '', 'buscar': 'griferia'})
+        self.assertIsNone(respuesta.context['pagina_cursor'])
+        self.assertEqual(list(respuesta.context['observaciones']), [griferia, puerta])
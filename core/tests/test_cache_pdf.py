@@ -0,0 +1,55 @@
+import os
+import tempfile
+from django.test import SimpleTestCase, override_settings
+from core.models import Rol, Usuario
+from core.utils.cache_pdf import clave_ficha, guardar_pdf, limpiar_cache_pdf, obtener_pdf
+from ficha_postventa.models import FichaPostventa
+from proyectos.models import Proyecto, Vivienda
+
+
+class CachePdfTests(SimpleTestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajustes = override_settings(PDF_CACHE_DIR=carpeta.name, PDF_CACHE_MAX_MB=1)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.carpeta = carpeta.name
+
+    def test_nueva_version_reemplaza_la_anterior(self):
+        self.assertIsNone(obtener_pdf('acta_1_aaaa'))
+        guardar_pdf('acta_1_aaaa', b'%PDF v1')
+        guardar_pdf('acta_12_aaaa', b'%PDF otra')
+        with open(obtener_pdf('acta_1_aaaa'), 'rb') as archivo:
+            self.assertEqual(archivo.read(), b'%PDF v1')
+
+        guardar_pdf('acta_1_bbbb', b'%PDF v2')
+        self.assertIsNone(obtener_pdf('acta_1_aaaa'))
+        self.assertEqual(sorted(os.listdir(self.carpeta)), ['acta_12_aaaa.pdf', 'acta_1_bbbb.pdf'])
+
+    def test_borra_los_menos_usados(self):
+        for pk in (1, 2, 3):
+            guardar_pdf(f'ficha_{pk}_aaaa', b'%PDF' * 100)
+            os.utime(os.path.join(self.carpeta, f'ficha_{pk}_aaaa.pdf'), (pk, pk))
+        obtener_pdf('ficha_1_aaaa')  # acierto: pasa a ser el más reciente
+
+        self.assertEqual(limpiar_cache_pdf(max_bytes=800), 1)
+        self.assertIsNone(obtener_pdf('ficha_2_aaaa'))
+        self.assertIsNotNone(obtener_pdf('ficha_1_aaaa'))
+        self.assertIsNotNone(obtener_pdf('ficha_3_aaaa'))
+
+    def test_clave_ficha_cambia_con_el_evaluador(self):
+        evaluador = Usuario(pk=5, nombre='Ana', apellido_paterno='Pérez', rol=Rol(pk=1, nombre='Evaluador'))
+        ficha = FichaPostventa(pk=1, vivienda=Vivienda(pk=1, proyecto=Proyecto(pk=1)), evaluador=evaluador)
+        clave = clave_ficha(ficha)
+        self.assertTrue(clave.startswith('ficha_1_'))
+        self.assertEqual(clave_ficha(ficha), clave)
+
+        # El PDF imprime nombre, apellido y rol del evaluador
+        claves = {clave}
+        for campo, valor in (('nombre', 'Ana María'), ('apellido_paterno', 'Soto'), ('rol', Rol(pk=2, nombre='Supervisor'))):
+            setattr(evaluador, campo, valor)
+            claves.add(clave_ficha(ficha))
+        ficha.evaluador = Usuario(pk=6, nombre='Ana María', apellido_paterno='Soto', rol=evaluador.rol)
+        claves.add(clave_ficha(ficha))
+        self.assertEqual(len(claves), 5)
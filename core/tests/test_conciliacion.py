@@ -0,0 +1,49 @@
+from django.test import TestCase
+from core.models import Constructora
+from core.utils.conciliacion import AMBIGUA, EXACTA, NINGUNA, indice_beneficiarios, indice_constructoras
+from core.utils.rut import filtrar_por_rut
+from proyectos.models import Beneficiario, Telefono
+
+
+class IndiceConciliacionTests(TestCase):
+    def setUp(self):
+        self.jose = Beneficiario.objects.create(nombre='José', apellido_paterno='Pérez', rut='12.345.678-5')
+        self.maria = Beneficiario.objects.create(nombre='María', apellido_paterno='Soto')
+        Beneficiario.objects.create(nombre='Maria', apellido_paterno='Rojas')
+        Telefono.objects.create(beneficiario=self.maria, numero='+56 9 8765 4321')
+
+    def test_busquedas(self):
+        indice = indice_beneficiarios()
+        with self.assertNumQueries(0):
+            por_rut = indice.buscar(rut='12345678-5', nombre='María')
+            por_nombre = indice.buscar(nombre='  JOSE  perez ')
+            ambigua = indice.buscar(nombre='maria', telefono='987654321')
+            por_telefono = indice.buscar(rut='1-9', telefono='9 8765 4321')
+            ninguna = indice.buscar(nombre='Pedro')
+
+        self.assertEqual((por_rut.tipo, por_rut.objeto, por_rut.campo), (EXACTA, self.jose, 'rut'))
+        self.assertEqual(por_nombre.objeto, self.jose)
+        # Un nombre ambiguo no sigue buscando por teléfono
+        self.assertEqual((ambigua.tipo, len(ambigua.candidatos), ambigua.objeto), (AMBIGUA, 2, None))
+        self.assertEqual((por_telefono.objeto, por_telefono.campo), (self.maria, 'telefono'))
+        self.assertEqual(ninguna.tipo, NINGUNA)
+
+    def test_actualizar_y_guardar_en_lote(self):
+        indice = indice_beneficiarios()
+        maria = indice.buscar_por_telefono('987654321').objeto
+        self.assertTrue(indice.actualizar(maria, rut='9.876.543-3'))
+        self.assertFalse(indice.actualizar(maria, rut='9.876.543-3'))
+        # El índice ya ve el cambio antes de guardar
+        self.assertEqual(indice.buscar_por_rut('98765433').objeto, maria)
+
+        with self.assertNumQueries(2):
+            # bulk_update + renovación de actas (lo que harían los signals)
+            self.assertEqual(indice.guardar(), 1)
+        self.assertEqual(filtrar_por_rut(Beneficiario.objects.all(), '9876543-3').get(), self.maria)
+        self.assertEqual(indice.guardar(), 0)
+
+    def test_constructoras(self):
+        Constructora.objects.create(nombre='Constructora Ñandú', telefono='(32) 123 4567')
+        indice = indice_constructoras()
+        self.assertEqual(indice.buscar(nombre='constructora nandu').objeto.nombre, 'Constructora Ñandú')
+        self.assertTrue(indice.buscar(telefono='321234567').exacta)
@@ -0,0 +1,63 @@
+import os
+import tempfile
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from core.utils.descargas import servir_archivo
+
+
+def _contenido(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+
+class ServirArchivoTests(SimpleTestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = carpeta.name
+        self.ruta = os.path.join(self.carpeta, 'reporte.pdf')
+        with open(self.ruta, 'wb') as archivo:
+            archivo.write(bytes(range(100)))
+        self.factory = RequestFactory()
+
+    def test_completo_y_revalidacion(self):
+        response = servir_archivo(self.factory.get('/'), self.ruta, 'Reporte final.pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_contenido(response), bytes(range(100)))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertIn('private', response['Cache-Control'])
+
+        response = servir_archivo(self.factory.get('/', HTTP_IF_NONE_MATCH=response['ETag']), self.ruta)
+        self.assertEqual(response.status_code, 304)
+
+    def test_rangos(self):
+        response = servir_archivo(self.factory.get('/', HTTP_RANGE='bytes=10-19'), self.ruta)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(_contenido(response), bytes(range(10, 20)))
+
+        response = servir_archivo(self.factory.get('/', HTTP_RANGE='bytes=-5'), self.ruta)
+        self.assertEqual(_contenido(response), bytes(range(95, 100)))
+
+        response = servir_archivo(self.factory.get('/', HTTP_RANGE='bytes=200-'), self.ruta)
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+        # If-Range de otra versión: se entrega el archivo completo
+        response = servir_archivo(self.factory.get('/', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"viejo"'), self.ruta)
+        self.assertEqual(response.status_code, 200)
+
+    def test_offload(self):
+        with override_settings(DESCARGAS_OFFLOAD='x-accel', DESCARGAS_ACCEL_RUTAS={self.carpeta: '/interno/reportes/'}):
+            response = servir_archivo(self.factory.get('/'), self.ruta)
+        self.assertEqual(response['X-Accel-Redirect'], '/interno/reportes/reporte.pdf')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(DESCARGAS_OFFLOAD='x-accel', DESCARGAS_ACCEL_RUTAS={}):
+            response = servir_archivo(self.factory.get('/'), self.ruta)
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertEqual(_contenido(response), bytes(range(100)))
+
+        with override_settings(DESCARGAS_OFFLOAD='x-sendfile'):
+            response = servir_archivo(self.factory.get('/'), self.ruta)
+        self.assertEqual(response['X-Sendfile'], os.path.realpath(self.ruta))
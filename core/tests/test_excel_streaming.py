@@ -0,0 +1,25 @@
+import io
+import openpyxl
+from django.test import SimpleTestCase
+from core.utils.excel_streaming import exportar_csv, exportar_excel
+
+
+class ExcelStreamingTests(SimpleTestCase):
+    def test_respuesta_en_bloques(self):
+        filas = ([i, f'Fila {i}'] for i in range(5000))
+        response = exportar_excel('prueba.xlsx', 'Hoja', ['ID', 'Nombre'], filas)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=prueba.xlsx')
+        contenido = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(contenido))
+
+        hoja = openpyxl.load_workbook(io.BytesIO(contenido)).active
+        self.assertEqual(hoja.title, 'Hoja')
+        self.assertEqual(hoja.max_row, 5001)
+        self.assertEqual([c.value for c in hoja[5001]], [4999, 'Fila 4999'])
+
+    def test_csv_en_streaming(self):
+        response = exportar_csv('prueba.csv', ['ID', 'Descripción'], ([i, f'Fila, {i}'] for i in range(3)))
+        self.assertTrue(response.streaming)
+        contenido = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(contenido, '﻿ID,Descripción\r\n0,"Fila, 0"\r\n1,"Fila, 1"\r\n2,"Fila, 2"\r\n')
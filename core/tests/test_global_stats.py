@@ -0,0 +1,34 @@
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+from core.context_processors import global_stats_context
+from core.tests.datos_prueba import DatosPrueba
+
+
+class GlobalStatsContextTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.datos = DatosPrueba(proyecto=False)
+
+    def _contexto(self):
+        request = RequestFactory().get('/')
+        request.user = self.datos.usuario
+        return global_stats_context(request)
+
+    def _crear_proyecto(self, codigo):
+        self.datos.crear_proyecto(codigo)
+
+    def test_perezoso_y_cacheado(self):
+        self._crear_proyecto('P1')
+        with self.assertNumQueries(0):
+            contexto = self._contexto()
+        with self.assertNumQueries(3):
+            self.assertEqual(int(str(contexto['total_proyectos'])), 1)
+            self.assertEqual(contexto['obs_total'], 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._contexto()['total_proyectos'], 1)
+
+    def test_invalida_al_guardar_proyecto(self):
+        self._crear_proyecto('P1')
+        self.assertEqual(self._contexto()['total_proyectos'], 1)
+        self._crear_proyecto('P2')
+        self.assertEqual(self._contexto()['total_proyectos'], 2)
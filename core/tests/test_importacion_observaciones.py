@@ -0,0 +1,79 @@
+import pandas as pd
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from core.utils.importacion_observaciones import ImportadorObservaciones
+from proyectos.models import Proyecto, Recinto, TipologiaVivienda, Vivienda
+from incidencias.models import EstadoObservacion, Observacion
+
+
+def _fila(pv_id, **extra):
+    fila = {
+        'PV_ID': pv_id, 'PYTO_COD': 12, 'PYTO_SIGLAS': 'LC', 'PYTO_NOMBRE': 'La Cruz', 'PYTO_S': -32845735.0,
+        'PYTO_W': -71234567.0, 'VDA_CODIGO': 3, 'VDA_TIPOLOGIA': 1, 'VDA_FAMILIA': 'Pérez',
+        'RECINTO_TIPOLOGIA': 1, 'RECINTO_COD': 2, 'RECINTO_NOMBRE': 'Cocina', 'RECINTO_ELEMENTOS': 'Puerta, Grifería',
+        'PV_ELEMENTO': 'Grifería', 'PV_DESCRIPCION': 'Gotea', 'PV_ESTADO': 0, 'PV_ESURGENTE': None,
+        'PV_FECHAREGISTRO': '2020-10-01 09:41:50.0',
+    }
+    fila.update(extra)
+    return fila
+
+
+class ImportacionObservacionesTests(TestCase):
+    def setUp(self):
+        TipologiaVivienda.objects.create(codigo=1, nombre='Tipo 1')
+        for codigo, nombre in [(1, 'Abierta'), (2, 'Cerrada'), (3, 'Rechazada')]:
+            EstadoObservacion.objects.create(codigo=codigo, nombre=nombre)
+        self.df = pd.DataFrame([
+            _fila(10),
+            _fila(11, PV_ELEMENTO='Enchufe', PV_ESTADO=1, PV_ESURGENTE=1.0),
+            _fila(11, PV_DESCRIPCION='Repetida'),
+        ])
+
+    def test_importa_catalogos_y_observaciones(self):
+        resumen = ImportadorObservaciones().importar(self.df)
+        self.assertEqual((resumen.creadas, resumen.duplicadas), (2, 1))
+
+        proyecto = Proyecto.objects.get(codigo='12-LC')
+        self.assertAlmostEqual(float(proyecto.coordenadas_s), -32.845735)
+        self.assertEqual(Vivienda.objects.get().proyecto, proyecto)
+        self.assertEqual(Recinto.objects.get().elementos_disponibles, ['Puerta', 'Grifería'])
+
+        urgente = Observacion.objects.get(id_externo='11')
+        self.assertEqual((urgente.estado.nombre, urgente.tipo.nombre), ('Cerrada', 'Instalaciones'))
+        self.assertEqual(urgente.prioridad, Observacion.Prioridad.ALTA)
+        self.assertEqual(urgente.fecha_creacion.year, 2020)
+
+        # Segunda pasada: nada nuevo; con --actualizar solo cambia lo distinto
+        self.assertEqual(ImportadorObservaciones().importar(self.df).creadas, 0)
+        self.df.loc[0, 'PV_DESCRIPCION'] = 'Gotea mucho'
+        resumen = ImportadorObservaciones(actualizar=True).importar(self.df)
+        self.assertEqual((resumen.existentes, resumen.actualizadas), (2, 1))
+        self.assertEqual(Observacion.objects.get(id_externo='10').detalle, 'Gotea mucho')
+
+    def test_dry_run_no_escribe(self):
+        resumen = ImportadorObservaciones().importar(self.df, dry_run=True)
+        self.assertEqual(resumen.creadas, 2)
+        self.assertFalse(Observacion.objects.exists())
+        self.assertFalse(Proyecto.objects.exists())
+
+    def test_varios_bloques_con_el_mismo_importador(self):
+        importador = ImportadorObservaciones(actualizar=True)
+        # Un dry-run previo no deja referencias a filas revertidas
+        importador.importar(self.df, dry_run=True)
+        importador.importar(self.df.iloc[:2])
+        # El segundo bloque usa el proyecto creado por el primero y solo lee las filas de sus claves
+        siguiente = pd.DataFrame([_fila(10, PV_DESCRIPCION='Gotea mucho'), _fila(12), _fila(13, VDA_CODIGO=4)])
+        with CaptureQueriesContext(connection) as consultas:
+            importador.importar(siguiente)
+        lecturas = [c['sql'] for c in consultas.captured_queries if c['sql'].startswith('SELECT')]
+        for tabla in ('proyectos_proyecto', 'proyectos_vivienda', 'proyectos_recinto', 'incidencias_observacion'):
+            for sql in lecturas:
+                if f'FROM "{tabla}"' in sql:
+                    self.assertIn(' WHERE ', sql)
+        self.assertFalse([sql for sql in lecturas if 'FROM "incidencias_estadoobservacion"' in sql])
+
+        self.assertEqual(Proyecto.objects.count(), 1)
+        self.assertEqual(Observacion.objects.get(id_externo='10').detalle, 'Gotea mucho')
+        self.assertEqual(Observacion.objects.get(id_externo='13').vivienda.codigo, '4')
+        self.assertEqual(Observacion.objects.count(), 4)
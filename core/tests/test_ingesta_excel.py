@@ -0,0 +1,57 @@
+import os
+import tempfile
+import openpyxl
+from django.test import TestCase
+from core.models import PuntoControlImportacion
+from core.utils.ingesta_excel import IngestaExcel, leer_bloques, leer_bloques_en_proceso
+
+
+class IngestaExcelTests(TestCase):
+    def setUp(self):
+        libro = openpyxl.Workbook()
+        hoja = libro.active
+        hoja.append(['ID', 'Nombre', 'ID', None])
+        for i in range(25):
+            hoja.append([i, f'Fila {i}', i * 10, None] if i != 7 else [None] * 4)
+        descriptor, self.ruta = tempfile.mkstemp(suffix='.xlsx')
+        os.close(descriptor)
+        libro.save(self.ruta)
+        self.addCleanup(os.remove, self.ruta)
+
+    def test_bloques(self):
+        bloques = list(leer_bloques(self.ruta, tamano_bloque=10))
+        self.assertEqual([(b.inicio, b.fin, len(b)) for b in bloques], [(0, 10, 9), (10, 20, 10), (20, 25, 5)])
+        df = bloques[1].df
+        self.assertEqual(list(df.columns), ['ID', 'Nombre', 'ID.1', 'Unnamed: 3'])
+        # El índice es la fila de datos en la hoja (la fila vacía 7 no aparece)
+        self.assertEqual(df.loc[12, 'Nombre'], 'Fila 12')
+        self.assertNotIn(7, bloques[0].df.index)
+
+        en_proceso = list(leer_bloques_en_proceso(self.ruta, tamano_bloque=10, desde=10))
+        self.assertTrue(en_proceso[0].df.equals(df))
+        self.assertEqual(en_proceso[-1].fin, 25)
+
+    def test_retoma_desde_punto_de_control(self):
+        procesadas = []
+
+        def fallar_en_tercer_bloque(bloque):
+            if bloque.inicio == 20:
+                raise RuntimeError('corte')
+            procesadas.extend(bloque.df['ID'])
+
+        with self.assertRaises(RuntimeError):
+            IngestaExcel(self.ruta, 'prueba', tamano_bloque=10).procesar(fallar_en_tercer_bloque)
+        punto = PuntoControlImportacion.objects.get()
+        self.assertEqual((punto.filas_procesadas, punto.completado), (20, False))
+
+        procesadas.clear()
+        ingesta = IngestaExcel(self.ruta, 'prueba', tamano_bloque=10)
+        self.assertEqual(ingesta.desde, 20)
+        self.assertEqual(ingesta.procesar(lambda bloque: procesadas.extend(bloque.df['ID'])), 5)
+        self.assertEqual(procesadas, [20, 21, 22, 23, 24])
+        self.assertTrue(PuntoControlImportacion.objects.get().completado)
+
+        # Un archivo ya importado completo, o con --reiniciar, parte desde el inicio
+        self.assertEqual(IngestaExcel(self.ruta, 'prueba').desde, 0)
+        self.assertEqual(IngestaExcel(self.ruta, 'otro', registrar=False).desde, 0)
+        self.assertEqual(PuntoControlImportacion.objects.count(), 1)
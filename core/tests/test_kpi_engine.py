@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from core.tests.datos_prueba import DatosPrueba
+from core.utils.kpi_engine import kpis_observaciones, kpis_observaciones_por, kpis_viviendas
+from core.utils.estadisticas_proyecto import estadisticas_por_proyecto, totales_por_region
+from proyectos.models import Vivienda
+from incidencias.models import Observacion, TipoObservacion
+
+
+class KpiEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        datos = DatosPrueba()
+        Vivienda.objects.filter(pk=datos.vivienda.pk).update(estado='entregada')
+        Vivienda.objects.create(
+            proyecto=datos.proyecto, tipologia=datos.tipologia, codigo='2', activa=False, estado='entregada',
+        )
+        electrico = TipoObservacion.objects.create(nombre='Eléctrico')
+        pintura = TipoObservacion.objects.create(nombre='Pintura')
+
+        datos.crear_observacion(tipo=electrico, es_urgente=True)
+        datos.crear_observacion(tipo=electrico, fecha_vencimiento=timezone.localdate())
+        obs = datos.crear_observacion(tipo=pintura, estado=datos.cerrada)
+        Observacion.objects.filter(pk=obs.pk).update(fecha_cierre=obs.fecha_creacion + timedelta(days=3))
+
+    def test_kpis_observaciones_en_una_consulta(self):
+        mañana = timezone.localdate() + timedelta(days=1)
+        with self.assertNumQueries(1):
+            kpi = kpis_observaciones(Observacion.objects.all(), hoy=mañana)
+        self.assertEqual(kpi['total'], 3)
+        self.assertEqual(kpi['abiertas'], 2)
+        self.assertEqual(kpi['cerradas'], 1)
+        self.assertEqual(kpi['urgentes'], 1)
+        self.assertEqual(kpi['vencidas'], 1)
+        self.assertEqual(kpi['porc_cerradas'], 33.3)
+        self.assertEqual(kpi['dias_promedio_resolucion'], 3)
+
+    def test_kpis_observaciones_vacio(self):
+        kpi = kpis_observaciones(Observacion.objects.none())
+        self.assertEqual(kpi['total'], 0)
+        self.assertEqual(kpi['porc_abiertas'], 0)
+        self.assertIsNone(kpi['dias_promedio_resolucion'])
+
+    def test_kpis_observaciones_por_tipo(self):
+        filas = {f['tipo__nombre']: f for f in kpis_observaciones_por(Observacion.objects.all(), 'tipo__nombre')}
+        self.assertEqual(filas['Eléctrico']['abiertas'], 2)
+        self.assertEqual(filas['Pintura']['cerradas'], 1)
+        self.assertIsNone(filas['Eléctrico']['dias_promedio_resolucion'])
+
+    def test_kpis_viviendas(self):
+        with self.assertNumQueries(1):
+            kpi = kpis_viviendas(Vivienda.objects.all())
+        self.assertEqual(kpi, {'total': 2, 'activas': 1, 'entregadas': 2, 'asignadas': 0})
+
+    def test_estadisticas_por_proyecto_y_region(self):
+        with self.assertNumQueries(3):
+            (proyecto,) = estadisticas_por_proyecto()
+        self.assertEqual(proyecto['total_viviendas'], 2)
+        self.assertEqual(proyecto['viviendas_entregadas'], 2)
+        self.assertEqual(proyecto['casas_con_observaciones'], 1)
+        self.assertEqual((proyecto['abiertas'], proyecto['urgentes'], proyecto['cerradas']), (2, 1, 1))
+        self.assertEqual(proyecto['porc_cerradas'], 33.3)
+        (region,) = totales_por_region([proyecto, proyecto])
+        self.assertEqual(region['proyectos'], 2)
+        self.assertEqual(region['total_observaciones'], 6)
+        self.assertEqual(region['porc_abiertas'], 66.7)
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from core.models import KpiSnapshot, KpiSnapshotEjecucion
+from core.tests.datos_prueba import DatosPrueba
+from core.utils.kpi_engine import kpis_observaciones
+from core.utils.kpi_snapshot import refrescar_snapshot, tendencia_mensual, cerradas_por_mes, kpis_snapshot
+from proyectos.models import Proyecto
+from incidencias.models import Observacion
+
+
+class KpiSnapshotTests(TestCase):
+    def setUp(self):
+        self.datos = datos = DatosPrueba()
+        self.abierta, self.cerrada = datos.abierta, datos.cerrada
+        self.hace_dos_meses = timezone.now() - timedelta(days=60)
+        self.obs = []
+        for estado in (self.abierta, self.cerrada, self.cerrada):
+            obs = datos.crear_observacion(estado=estado)
+            fecha_cierre = self.hace_dos_meses + timedelta(days=5) if estado == self.cerrada else None
+            Observacion.objects.filter(pk=obs.pk).update(fecha_creacion=self.hace_dos_meses, fecha_cierre=fecha_cierre)
+            self.obs.append(obs)
+
+    def _retroceder_ultima_ejecucion(self):
+        # Simula que el último refresco ocurrió ayer, para que el snapshot cubra los días previos
+        ayer = timezone.now() - timedelta(days=1)
+        KpiSnapshotEjecucion.objects.update(inicio=ayer, fin=ayer)
+
+    def test_refresco_completo_y_lectura(self):
+        ejecucion = refrescar_snapshot()
+        self.assertTrue(ejecucion.completo)
+        self.assertEqual(ejecucion.dias_recalculados, 1)
+        self._retroceder_ultima_ejecucion()
+
+        mes = timezone.localtime(self.hace_dos_meses).date().replace(day=1)
+        self.assertEqual(tendencia_mensual(), [{'mes': mes, 'abiertos': 1, 'cerrados': 2}])
+        total_cerradas = sum(fila['total'] for fila in cerradas_por_mes(proyectos=Proyecto.objects.all()))
+        self.assertEqual(total_cerradas, 2)
+
+    def test_refresco_incremental_solo_dias_tocados(self):
+        refrescar_snapshot()
+        self.assertEqual(refrescar_snapshot().dias_recalculados, 0)
+
+        obs = Observacion.objects.get(pk=self.obs[0].pk)
+        obs.estado = self.cerrada
+        obs.fecha_cierre = timezone.now()
+        obs.save()
+        ejecucion = refrescar_snapshot()
+        self.assertFalse(ejecucion.completo)
+        self.assertEqual(ejecucion.dias_recalculados, 1)
+        self.assertEqual(sum(KpiSnapshot.objects.values_list('obs_cerradas', flat=True)), 3)
+
+    def test_lectura_usa_snapshot_hasta_el_siguiente_refresco(self):
+        refrescar_snapshot()
+        self._retroceder_ultima_ejecucion()
+        obs = Observacion.objects.get(pk=self.obs[0].pk)
+        obs.estado = self.cerrada
+        obs.fecha_cierre = self.hace_dos_meses + timedelta(days=5)
+        obs.save()
+
+        # La lectura no busca cambios: el día cubierto sigue saliendo del snapshot
+        mes = timezone.localtime(self.hace_dos_meses).date().replace(day=1)
+        self.assertEqual(tendencia_mensual(), [{'mes': mes, 'abiertos': 1, 'cerrados': 2}])
+        self.assertEqual(kpis_snapshot()['cerradas'], 2)
+
+        # El refresco detecta el día modificado y lo recalcula
+        self.assertEqual(refrescar_snapshot().dias_recalculados, 1)
+        self._retroceder_ultima_ejecucion()
+        self.assertEqual(tendencia_mensual(), [{'mes': mes, 'abiertos': 0, 'cerrados': 3}])
+        self.assertEqual(sum(fila['total'] for fila in cerradas_por_mes()), 3)
+        self.assertEqual(kpis_snapshot()['cerradas'], 3)
+
+    def test_kpis_snapshot_igual_a_kpis_observaciones(self):
+        vencimiento = timezone.localtime(self.hace_dos_meses).date() + timedelta(days=10)
+        Observacion.objects.filter(pk=self.obs[0].pk).update(fecha_vencimiento=vencimiento, es_urgente=True)
+        refrescar_snapshot()
+        self._retroceder_ultima_ejecucion()
+        # Tramo sin cubrir (hoy): se completa desde Observacion
+        self.datos.crear_observacion(estado=self.cerrada)
+        self.datos.crear_observacion(activo=False)
+
+        esperado = kpis_observaciones(Observacion.objects.filter(activo=True))
+        with self.assertNumQueries(4):
+            obtenido = kpis_snapshot()
+        self.assertEqual(obtenido, esperado)
+        self.assertEqual((obtenido['total'], obtenido['vencidas'], obtenido['urgentes']), (4, 1, 1))
+        self.assertEqual(obtenido['dias_promedio_resolucion'], 5)
+
+        hoy = timezone.localdate()
+        self.assertEqual(
+            kpis_snapshot(fecha_inicio=hoy, solo_activas=False),
+            kpis_observaciones(Observacion.objects.filter(fecha_creacion__date__gte=hoy)),
+        )
+        self.assertEqual(
+            kpis_snapshot(proyectos=Proyecto.objects.all(), solo_activas=False),
+            kpis_observaciones(Observacion.objects.all()),
+        )
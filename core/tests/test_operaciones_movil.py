@@ -0,0 +1,32 @@
+from django.test import TestCase
+from core.tests.datos_prueba import DatosPrueba
+from core.utils.operaciones_movil import aplicar_lote
+from incidencias.models import Observacion, SeguimientoObservacion
+
+
+class LoteOperacionesMovilTests(TestCase):
+    def setUp(self):
+        self.datos = DatosPrueba()
+        self.usuario = self.datos.usuario
+
+    def test_aplica_en_orden_e_idempotente(self):
+        self.datos.crear_observaciones(2, comentarios=0)
+        cerrada = self.datos.cerrada
+        primera, segunda = Observacion.objects.order_by('id')
+        operaciones = [
+            {'clave': 'a', 'tipo': 'cambiar_estado', 'observacion_id': primera.pk, 'estado_id': cerrada.pk},
+            {'clave': 'b', 'tipo': 'comentario', 'observacion_id': segunda.pk, 'comentario': 'Revisado'},
+            {'clave': 'c', 'tipo': 'comentario', 'observacion_id': segunda.pk, 'comentario': ''},
+        ]
+        resultados = aplicar_lote(self.usuario, operaciones)
+        self.assertEqual([r['ok'] for r in resultados], [True, True, False])
+        primera.refresh_from_db()
+        self.assertEqual(primera.estado, cerrada)
+        self.assertIsNotNone(primera.fecha_cierre)
+        self.assertEqual(SeguimientoObservacion.objects.count(), 2)
+
+        # Reintento del mismo lote: no se vuelve a aplicar
+        reintento = aplicar_lote(self.usuario, operaciones[:2])
+        self.assertTrue(all(r['duplicada'] for r in reintento))
+        self.assertEqual(reintento[0]['nuevo_estado']['id'], cerrada.pk)
+        self.assertEqual(SeguimientoObservacion.objects.count(), 2)
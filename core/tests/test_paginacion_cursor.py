@@ -0,0 +1,26 @@
+from django.test import TestCase
+from core.tests.datos_prueba import DatosPrueba
+from core.utils.paginacion_cursor import CursorInvalido, paginar_por_cursor
+from incidencias.models import Observacion
+
+
+class PaginacionCursorTests(TestCase):
+    def setUp(self):
+        self.datos = DatosPrueba()
+
+    def test_recorre_todas_sin_repetir(self):
+        self.datos.crear_observaciones(7)
+        # Fechas repetidas: el desempate por id mantiene el orden estable
+        Observacion.objects.update(fecha_creacion=Observacion.objects.first().fecha_creacion)
+        vistos, cursor = [], None
+        while True:
+            pagina = paginar_por_cursor(Observacion.objects.all(), cursor, por_pagina=3)
+            vistos += [obs.pk for obs in pagina]
+            if not pagina.has_next:
+                break
+            cursor = pagina.siguiente_cursor
+        self.assertEqual(vistos, sorted(Observacion.objects.values_list('pk', flat=True), reverse=True))
+
+    def test_cursor_invalido(self):
+        with self.assertRaises(CursorInvalido):
+            paginar_por_cursor(Observacion.objects.all(), 'no-es-un-cursor')
@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Rol, Usuario, Constructora
+from core.permisos import obtener_alcance, filtrar_proyectos_por_rol, puede_ver_proyecto
+from core.tests.datos_prueba import DatosPrueba
+from proyectos.models import Proyecto
+
+
+class AlcanceUsuarioTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.datos = DatosPrueba(proyecto=False)
+        self.constructora = Constructora.objects.create(nombre='Constructora Sur')
+        self.usuario = Usuario.objects.create_user(
+            email='obra@sur.cl', password='x', nombre='Obra',
+            rol=Rol.objects.create(nombre='CONSTRUCTORA'), constructora=self.constructora,
+        )
+        self.propio = self._crear_proyecto('P1', self.constructora)
+        self.ajeno = self._crear_proyecto('P2', Constructora.objects.create(nombre='Otra'))
+
+    def _crear_proyecto(self, codigo, constructora):
+        return self.datos.crear_proyecto(codigo, constructora=constructora)
+
+    def test_constructora_ve_solo_sus_proyectos(self):
+        self.assertEqual(list(filtrar_proyectos_por_rol(self.usuario, Proyecto.objects.all())), [self.propio])
+        with self.assertNumQueries(0):
+            self.assertTrue(puede_ver_proyecto(self.usuario, self.propio))
+            self.assertFalse(puede_ver_proyecto(self.usuario, self.ajeno))
+
+    def test_invalida_al_crear_proyecto(self):
+        obtener_alcance(self.usuario)
+        nuevo = self._crear_proyecto('P3', self.constructora)
+        usuario = Usuario.objects.get(pk=self.usuario.pk)
+        self.assertTrue(puede_ver_proyecto(usuario, nuevo))
+
+    def test_constructora_no_exporta_fichas_en_zip(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('ficha_postventa:exportar_zip'))
+        self.assertRedirects(respuesta, reverse('dashboard'), fetch_redirect_response=False)
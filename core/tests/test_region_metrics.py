@@ -0,0 +1,90 @@
+from datetime import timedelta
+from django.db.models import Avg
+from django.test import TestCase
+from core.models import Comuna, Region
+from core.tests.datos_prueba import DatosPrueba
+from core.utils.kpi_engine import duracion_resolucion, filtrar_rango_fechas
+from core.utils.region_metrics import get_region_metrics
+from incidencias.models import Observacion
+from proyectos.models import Proyecto, Vivienda
+
+
+def _metricas_region_por_region(region_id=None, estado=None, fecha_inicio=None, fecha_fin=None):
+    """Cálculo anterior, con consultas por cada región, como referencia."""
+    regiones = Region.objects.filter(activo=True).order_by('nombre')
+    if region_id:
+        regiones = regiones.filter(id=region_id)
+    metricas = []
+    for region in regiones:
+        proyectos = filtrar_rango_fechas(Proyecto.objects.filter(region=region, activo=True), fecha_inicio, fecha_fin)
+        viviendas = Vivienda.objects.filter(proyecto__in=proyectos, activa=True)
+        es_estado_observacion = str(estado).isdigit()
+        if estado and not es_estado_observacion:
+            viviendas = viviendas.filter(estado=estado)
+        if not viviendas.exists():
+            continue
+        obs = filtrar_rango_fechas(Observacion.objects.filter(vivienda__in=viviendas, activo=True), fecha_inicio, fecha_fin)
+        if es_estado_observacion:
+            obs = obs.filter(estado_id=estado)
+        promedio = obs.filter(estado__nombre='Cerrada', fecha_cierre__isnull=False).aggregate(
+            promedio=Avg(duracion_resolucion()),
+        )['promedio']
+        metricas.append({
+            'region_id': region.id,
+            'region': region.nombre,
+            'total_viviendas': viviendas.count(),
+            'entregadas': viviendas.filter(estado='entregada').count(),
+            'casos_postventa': obs.count(),
+            'promedio_dias': int(promedio.total_seconds() // 86400) if promedio is not None else '-',
+        })
+    return metricas
+
+
+class RegionMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = DatosPrueba()
+        datos = cls.datos
+        cls.biobio = Region.objects.create(nombre='Biobío', codigo='08')
+        comuna = Comuna.objects.create(nombre='Concepción', region=cls.biobio)
+        Region.objects.create(nombre='Atacama', codigo='03')  # sin viviendas: no aparece
+
+        # Valparaíso: P1 (fixture) con una vivienda entregada más y una inactiva
+        entregada = Vivienda.objects.create(proyecto=datos.proyecto, tipologia=datos.tipologia, codigo='2', estado='entregada')
+        Vivienda.objects.create(proyecto=datos.proyecto, tipologia=datos.tipologia, codigo='3', activa=False)
+        # Biobío: un proyecto activo con dos viviendas y uno inactivo
+        p2 = datos.crear_proyecto('P2', comuna=comuna, region=cls.biobio)
+        inactivo = datos.crear_proyecto('P3', comuna=comuna, region=cls.biobio, activo=False)
+        v2a = Vivienda.objects.create(proyecto=p2, tipologia=datos.tipologia, codigo='1', estado='entregada')
+        v2b = Vivienda.objects.create(proyecto=p2, tipologia=datos.tipologia, codigo='2')
+        v3 = Vivienda.objects.create(proyecto=inactivo, tipologia=datos.tipologia, codigo='1')
+
+        datos.crear_observacion()
+        datos.crear_observacion(vivienda=entregada, activo=False)
+        for vivienda, dias in ((entregada, 3), (v2a, 5), (v2b, 10)):
+            cerrada = datos.crear_observacion(vivienda=vivienda, estado=datos.cerrada)
+            Observacion.objects.filter(pk=cerrada.pk).update(fecha_cierre=cerrada.fecha_creacion + timedelta(days=dias))
+        datos.crear_observacion(vivienda=v2b)
+        datos.crear_observacion(vivienda=v3)
+
+    def _comparar(self, **filtros):
+        esperado = _metricas_region_por_region(**filtros)
+        with self.assertNumQueries(3):
+            obtenido = get_region_metrics(**filtros)
+        self.assertEqual(obtenido, esperado)
+        return obtenido
+
+    def test_igual_al_calculo_por_region(self):
+        metricas = self._comparar()
+        self.assertEqual(
+            [(m['region'], m['total_viviendas'], m['entregadas'], m['casos_postventa'], m['promedio_dias']) for m in metricas],
+            [('Biobío', 2, 1, 3, 7), ('Valparaíso', 2, 1, 2, 3)],
+        )
+
+    def test_igual_al_calculo_por_region_con_filtros(self):
+        self._comparar(region_id=self.biobio.id)
+        self._comparar(estado='entregada')
+        self._comparar(estado=str(self.datos.cerrada.id))
+        hoy = self.datos.proyecto.fecha_creacion.date()
+        self._comparar(fecha_inicio=hoy, fecha_fin=hoy)
+        self.assertEqual(self._comparar(fecha_inicio=hoy + timedelta(days=1)), [])
@@ -0,0 +1,44 @@
+import io
+import zipfile
+from django.test import SimpleTestCase, override_settings
+from core.utils.paquete_pdf import zip_en_streaming
+from core.utils.renderizador_pdf import (
+    ErrorRenderPdf, estadisticas_motores, renderizar, renderizar_story, renderizar_texto,
+)
+
+
+@override_settings(PDF_PROCESOS=0)
+class RenderizadorPdfTests(SimpleTestCase):
+    def test_story_y_texto(self):
+        story = renderizar_story([
+            ('titulo', 'Acta de Entrega'),
+            ('seccion', 'Datos'),
+            ('tabla', [['Campo', 'Valor'], ['Proyecto', 'P-1']], [4, 8], 'grilla'),
+            ('espacio', 12),
+            ('parrafo', 'Sin observaciones'),
+        ])
+        self.assertEqual(story.motor, 'reportlab')
+        self.assertTrue(story.contenido.startswith(b'%PDF'))
+
+        texto = renderizar_texto(['Acta 1', 'Proyecto: P-1'])
+        self.assertTrue(texto.contenido.startswith(b'%PDF'))
+        self.assertGreaterEqual(estadisticas_motores()['reportlab-min']['cantidad'], 1)
+
+    def test_error_del_motor(self):
+        with self.assertRaises(ErrorRenderPdf):
+            renderizar('reportlab', [('tabla', [['a']], [2], 'inexistente')])
+        self.assertGreaterEqual(estadisticas_motores()['reportlab']['errores'], 1)
+
+    def test_zip_en_streaming(self):
+        documentos = [
+            ('actas/a.pdf', ('reportlab-min', ['A']), None),
+            ('actas/b.pdf', ('reportlab', [('tabla', [['b']], [2], 'inexistente')]), lambda: ('reportlab-min', ['B'])),
+            ('actas/c.pdf', ('reportlab', [('tabla', [['c']], [2], 'inexistente')]), None),
+        ]
+        partes = list(zip_en_streaming(iter(documentos)))
+        self.assertGreater(len(partes), 1)
+
+        archivo = zipfile.ZipFile(io.BytesIO(b''.join(partes)))
+        self.assertEqual(archivo.namelist(), ['actas/a.pdf', 'actas/b.pdf', 'ERRORES.txt'])
+        self.assertTrue(archivo.read('actas/b.pdf').startswith(b'%PDF'))
+        self.assertIn('actas/c.pdf', archivo.read('ERRORES.txt').decode())
@@ -0,0 +1,31 @@
+from django.test import TestCase
+from core.models import Usuario
+from core.utils.rut import buscar_beneficiario, filtrar_por_inicio_rut, filtrar_por_rut, parece_rut
+from core.validators import normalizar_rut
+from proyectos.models import Beneficiario
+
+
+class RutNormalizadoTests(TestCase):
+    def test_normalizar(self):
+        self.assertEqual(normalizar_rut('12.345.678-k'), '12345678K')
+        self.assertEqual(normalizar_rut(' 012345678-5 '), '123456785')
+        self.assertEqual(normalizar_rut(None), '')
+        self.assertTrue(parece_rut('12.345'))
+        self.assertFalse(parece_rut('Juan Pérez'))
+
+    def test_busqueda_en_cualquier_formato(self):
+        con_puntos = Beneficiario.objects.create(nombre='Ana', rut='10.801.718-k')
+        sin_puntos = Beneficiario.objects.create(nombre='Luis', rut='12345678-5')
+        Beneficiario.objects.create(nombre='Inactiva', rut='7645123-0', activo=False)
+
+        self.assertEqual(buscar_beneficiario('10801718K'), con_puntos)
+        self.assertEqual(buscar_beneficiario('12.345.678-5'), sin_puntos)
+        self.assertIsNone(buscar_beneficiario('7.645.123-0'))
+        self.assertEqual(list(filtrar_por_inicio_rut(Beneficiario.objects.all(), '10.801')), [con_puntos])
+        self.assertFalse(filtrar_por_rut(Beneficiario.objects.all(), '').exists())
+
+    def test_se_actualiza_al_guardar(self):
+        usuario = Usuario.objects.create_user(email='familia@techo.cl', password='x', nombre='Familia', rut='1-9')
+        usuario.rut = '12.345.678-5'
+        usuario.save(update_fields=['rut'])
+        self.assertEqual(Usuario.objects.get(pk=usuario.pk).rut_normalizado, '123456785')
@@ -0,0 +1,24 @@
+from django.test import TestCase
+from core.tests.datos_prueba import DatosPrueba
+from core.utils.serializador_movil import preparar_observaciones_movil, serializar_observaciones_movil
+from incidencias.models import Observacion
+
+
+class SerializadorMovilTests(TestCase):
+    def setUp(self):
+        self.datos = DatosPrueba()
+        self.usuario = self.datos.usuario
+
+    def _serializar(self):
+        return serializar_observaciones_movil(preparar_observaciones_movil(Observacion.objects.all()), self.usuario)
+
+    def test_consultas_constantes(self):
+        self.datos.crear_observaciones(5, comentarios=4)
+        with self.assertNumQueries(3):
+            datos = self._serializar()
+        self.assertEqual(len(datos), 5)
+        for fila in datos:
+            self.assertEqual(fila['total_comentarios'], 4)
+            self.assertEqual(len(fila['comentarios']), 3)
+            self.assertEqual(fila['total_archivos'], 0)
+            self.assertEqual(fila['archivos'], [])
@@ -0,0 +1,50 @@
+from django.test import TestCase
+from django.utils import timezone
+from core.tests.datos_prueba import DatosPrueba
+from core.utils.sincronizacion_movil import cambios_desde, interpretar_marca
+from incidencias.models import ArchivoAdjuntoObservacion, Observacion, SeguimientoObservacion
+
+
+class SincronizacionMovilTests(TestCase):
+    def setUp(self):
+        self.datos = DatosPrueba()
+        self.usuario = self.datos.usuario
+
+    def test_delta_y_tombstones(self):
+        self.datos.crear_observaciones(3, comentarios=1)
+        completa = cambios_desde(self.usuario)
+        self.assertEqual(len(completa['observaciones']), 3)
+        self.assertEqual(len(completa['seguimientos']), 3)
+
+        marca = timezone.now()
+        baja = Observacion.objects.first()
+        baja.activo = False
+        baja.save()
+        delta = cambios_desde(self.usuario, marca)
+        self.assertEqual(delta['observaciones'], [])
+        self.assertEqual(delta['observaciones_eliminadas'], [baja.pk])
+        self.assertEqual(delta['seguimientos'], [])
+
+    def test_seguimiento_desactivado_despues_de_crearse(self):
+        obs = self.datos.crear_observaciones(1, comentarios=1)[0]
+        seguimiento = SeguimientoObservacion.objects.get(observacion=obs)
+        marca = timezone.now()
+        seguimiento.activo = False
+        seguimiento.save()
+        delta = cambios_desde(self.usuario, marca)
+        self.assertEqual(delta['seguimientos'], [])
+        self.assertEqual(delta['seguimientos_eliminados'], [seguimiento.pk])
+
+    def test_archivo_eliminado(self):
+        obs = self.datos.crear_observacion()
+        archivo = ArchivoAdjuntoObservacion.objects.create(
+            observacion=obs, archivo='observaciones/plano.pdf', subido_por=self.usuario,
+        )
+        marca = timezone.now()
+        archivo_id = archivo.pk
+        archivo.delete()
+        delta = cambios_desde(self.usuario, marca)
+        self.assertEqual(delta['archivos'], [])
+        self.assertEqual(delta['archivos_eliminados'], [archivo_id])
+        # Fuera del intervalo ya no se informa
+        self.assertEqual(cambios_desde(self.usuario, interpretar_marca(delta['marca']))['archivos_eliminados'], [])
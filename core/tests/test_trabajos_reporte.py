@@ -0,0 +1,131 @@
+import os
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core.models import Usuario
+from core.utils.cache_reportes import limpiar_cache_reportes
+from core.utils.reporte_dashboard import generar_reporte_dashboard
+from core.utils.trabajos_reporte import GENERADORES, encolar_reporte, ejecutar_trabajo, estado_trabajo, tomar_trabajos
+from reportes.models import ReporteGenerado, TrabajoReporte
+
+
+def _generador_prueba(usuario, filtros, avance):
+    avance(50, 'Mitad')
+    reporte = ReporteGenerado.objects.create(usuario=usuario, nombre_archivo='r.pdf', ruta_archivo='r.pdf')
+    with open(os.path.join(settings.BASE_DIR, f'{reporte.pk}.pdf'), 'wb') as f:
+        f.write(b'%PDF' * 100)
+    reporte.ruta_archivo = f'{reporte.pk}.pdf'
+    reporte.save()
+    return reporte
+
+
+def _generador_con_error(usuario, filtros, avance):
+    raise RuntimeError('Sin datos')
+
+
+class _PoolPrueba:
+    """Ejecuta en el mismo proceso; el primer pool creado está roto (un proceso murió)."""
+    creados = 0
+
+    def __init__(self, max_workers, initializer):
+        _PoolPrueba.creados += 1
+        self.roto = _PoolPrueba.creados == 1
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        if self.roto:
+            futuro.set_exception(BrokenProcessPool('Un proceso terminó abruptamente'))
+        else:
+            futuro.set_result(funcion(*args))
+        return futuro
+
+    def shutdown(self, wait=True):
+        pass
+
+
+@mock.patch.dict(GENERADORES, {
+    'prueba': f'{__name__}._generador_prueba',
+    'con_error': f'{__name__}._generador_con_error',
+})
+class TrabajosReporteTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(email='admin@techo.cl', password='x', nombre='Admin')
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajustes = override_settings(BASE_DIR=carpeta.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_encolar_tomar_y_ejecutar(self):
+        trabajo = encolar_reporte(self.usuario, 'prueba', {'region': '1'})
+        # Mismo usuario y filtros mientras no termina: no se duplica
+        self.assertEqual(encolar_reporte(self.usuario, 'prueba', {'region': '1'}), trabajo)
+
+        self.assertEqual(tomar_trabajos(5), [trabajo.pk])
+        self.assertEqual(tomar_trabajos(5), [])
+        self.assertEqual(ejecutar_trabajo(trabajo.pk), TrabajoReporte.LISTO)
+
+        trabajo.refresh_from_db()
+        datos = estado_trabajo(trabajo)
+        self.assertTrue(datos['terminado'])
+        self.assertEqual(datos['progreso'], 100)
+        self.assertIn(f'/{trabajo.reporte_id}/descargar/', datos['url_descarga'])
+
+    def test_error_queda_registrado(self):
+        trabajo = encolar_reporte(self.usuario, 'con_error', {})
+        tomar_trabajos(1)
+        self.assertEqual(ejecutar_trabajo(trabajo.pk), TrabajoReporte.ERROR)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.mensaje, 'Sin datos')
+        self.assertIsNone(estado_trabajo(trabajo)['url_descarga'])
+
+    def test_cache_compartida_entre_usuarios(self):
+        otro = Usuario.objects.create_user(email='otro@techo.cl', password='x', nombre='Otro')
+        primero = encolar_reporte(self.usuario, 'prueba', {'region': '1'})
+        segundo = encolar_reporte(otro, 'prueba', {'region': '1'})
+        self.assertEqual(primero.clave, segundo.clave)
+
+        # Con la misma clave generándose, el segundo espera y luego reutiliza el archivo
+        self.assertEqual(tomar_trabajos(5), [primero.pk])
+        ejecutar_trabajo(primero.pk)
+        self.assertEqual(tomar_trabajos(5), [segundo.pk])
+        ejecutar_trabajo(segundo.pk)
+        self.assertEqual(ReporteGenerado.objects.count(), 1)
+
+        tercero = encolar_reporte(otro, 'prueba', {'region': '1'})
+        self.assertEqual(tercero.estado, TrabajoReporte.LISTO)
+        self.assertEqual(tercero.reporte_id, ReporteGenerado.objects.get().pk)
+
+        # Por tamaño: con cero bytes permitidos se elimina el archivo y su fila
+        self.assertEqual(limpiar_cache_reportes(max_bytes=0), 1)
+        self.assertFalse(ReporteGenerado.objects.exists())
+
+    @mock.patch('core.management.commands.procesar_reportes.ProcessPoolExecutor', _PoolPrueba)
+    def test_pool_roto_se_reinicia(self):
+        _PoolPrueba.creados = 0
+        perdido = encolar_reporte(self.usuario, 'prueba', {'region': '1'})
+        siguiente = encolar_reporte(self.usuario, 'prueba', {'region': '2'})
+        call_command('procesar_reportes', procesos=1, intervalo=0, una_vez=True, stdout=StringIO())
+
+        perdido.refresh_from_db()
+        siguiente.refresh_from_db()
+        self.assertEqual(perdido.estado, TrabajoReporte.ERROR)
+        self.assertEqual(siguiente.estado, TrabajoReporte.LISTO)
+        self.assertEqual(_PoolPrueba.creados, 2)
+
+    @mock.patch('core.utils.reporte_dashboard.renderizar_html')
+    @mock.patch('core.utils.reporte_dashboard.render_to_string', return_value='<html></html>')
+    @mock.patch('core.utils.reporte_dashboard.contexto_reporte_dashboard', return_value={})
+    def test_reportes_del_mismo_segundo_no_se_pisan(self, _contexto, _plantilla, renderizar):
+        renderizar.return_value.contenido = b'%PDF'
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now()):
+            primero = generar_reporte_dashboard(self.usuario, {})
+            segundo = generar_reporte_dashboard(self.usuario, {})
+        self.assertNotEqual(primero.ruta_archivo, segundo.ruta_archivo)
+        self.assertTrue(os.path.exists(os.path.join(settings.BASE_DIR, primero.ruta_archivo)))
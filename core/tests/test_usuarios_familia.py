@@ -0,0 +1,53 @@
+from django.test import TestCase, override_settings
+from core.models import Rol, Usuario
+from core.utils.usuarios_familia import diferir_usuarios_familia, encolar_sin_usuario, provisionar_usuarios_familia
+from proyectos.models import Beneficiario, UsuarioFamiliaPendiente
+
+
+@override_settings(USUARIOS_FAMILIA_PROCESOS=2)
+class UsuariosFamiliaTests(TestCase):
+    def setUp(self):
+        self.rol = Rol.objects.create(nombre='FAMILIA')
+
+    def _beneficiario(self, rut, email, nombre='Ana'):
+        return Beneficiario.objects.create(nombre=nombre, apellido_paterno='Díaz', rut=rut, email=email)
+
+    def test_se_crea_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._beneficiario('12.345.678-5', 'ana@correo.cl')
+            # Dentro de la transacción solo queda encolado
+            self.assertFalse(Usuario.objects.exists())
+        usuario = Usuario.objects.get(rut_normalizado='123456785')
+        self.assertEqual((usuario.email, usuario.nombre, usuario.rol), ('ana@correo.cl', 'Ana Díaz', self.rol))
+        self.assertTrue(usuario.check_password('456785'))
+        self.assertFalse(UsuarioFamiliaPendiente.objects.exists())
+
+    def test_importacion_diferida_en_lote(self):
+        Usuario.objects.create_user(email='ocupado@correo.cl', password='x', nombre='Otro')
+        Usuario.objects.create_user(email='ya@correo.cl', password='x', nombre='Ya', rut='11.111.111-1')
+        with self.captureOnCommitCallbacks() as callbacks:
+            with diferir_usuarios_familia():
+                for i in range(5):
+                    self._beneficiario(f'2000000{i}-{i}', f'familia{i}@correo.cl', nombre=f'Familia {i}')
+                self._beneficiario('11111111-1', 'ya2@correo.cl')
+                self._beneficiario('33333333-3', 'ocupado@correo.cl')
+                # Sin crear nada hasta el final del bloque
+                self.assertFalse(UsuarioFamiliaPendiente.objects.exists())
+        self.assertEqual(callbacks, [])
+
+        self.assertEqual(Usuario.objects.filter(rol=self.rol).count(), 5)
+        self.assertTrue(Usuario.objects.get(email='familia3@correo.cl').check_password('000033'))
+        pendiente = UsuarioFamiliaPendiente.objects.get()
+        self.assertEqual(pendiente.beneficiario.rut, '33333333-3')
+        self.assertIn('ocupado@correo.cl', pendiente.error)
+
+    def test_encolar_sin_usuario(self):
+        with diferir_usuarios_familia(provisionar=False):
+            self._beneficiario('12.345.678-5', 'ana@correo.cl')
+        Beneficiario.objects.create(nombre='Sin email', rut='11.111.111-1')
+        UsuarioFamiliaPendiente.objects.all().delete()
+
+        self.assertEqual(encolar_sin_usuario(Beneficiario.objects.all()), 1)
+        self.assertEqual(encolar_sin_usuario(Beneficiario.objects.all()), 0)
+        self.assertEqual(provisionar_usuarios_familia().creados, 1)
+        self.assertEqual(encolar_sin_usuario(Beneficiario.objects.all()), 0)
@@ -0,0 +1,79 @@
+from datetime import date, datetime, timedelta
+from django.test import TestCase
+from django.utils import timezone
+from core.models import ConfiguracionObservacion, Feriado
+from core.tests.datos_prueba import DatosPrueba
+from core.utils.cache_reportes import version_datos
+from core.utils.sincronizacion_movil import cambios_desde, interpretar_marca
+from core.utils.vencimiento import MotorVencimiento
+from incidencias.models import Observacion
+
+
+class MotorVencimientoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = DatosPrueba()
+        cls.config = ConfiguracionObservacion.objects.create(dias_vencimiento_normal=10, horas_vencimiento_urgente=30)
+        # Viernes 18 y lunes 21 de septiembre de 2026 son feriados
+        Feriado.objects.create(fecha=date(2026, 9, 18), nombre='Independencia Nacional')
+        Feriado.objects.create(fecha=date(2026, 9, 21), nombre='Feriado adicional')
+
+    def _crear(self, **kwargs):
+        return self.datos.crear_observacion(**kwargs)
+
+    def _sin_fecha(self, creada, es_urgente=False):
+        obs = self._crear(es_urgente=es_urgente)
+        fecha = timezone.make_aware(datetime(creada.year, creada.month, creada.day, 12))
+        Observacion.objects.filter(pk=obs.pk).update(fecha_creacion=fecha, fecha_vencimiento=None)
+        return obs
+
+    def test_se_asigna_al_crear(self):
+        hoy = timezone.localdate()
+        self.assertEqual(self._crear().fecha_vencimiento, hoy + timedelta(days=10))
+        # 30 horas se redondean a 2 días
+        self.assertEqual(self._crear(es_urgente=True).fecha_vencimiento, hoy + timedelta(days=2))
+        manual = hoy + timedelta(days=5)
+        self.assertEqual(self._crear(fecha_vencimiento=manual).fecha_vencimiento, manual)
+
+    def test_dias_habiles(self):
+        self.config.usar_dias_habiles = True
+        motor = MotorVencimiento(self.config)
+        jueves = date(2026, 9, 17)
+        # Salta viernes y lunes feriados y el fin de semana
+        self.assertEqual(motor.calcular(jueves, es_urgente=True), date(2026, 9, 23))
+        self.assertEqual(motor.calcular(jueves, es_urgente=False), date(2026, 10, 5))
+
+    def test_asignar_en_un_update(self):
+        normal = self._sin_fecha(date(2026, 9, 17))
+        urgente = self._sin_fecha(date(2026, 9, 17), es_urgente=True)
+        motor = MotorVencimiento(self.config)
+        with self.assertNumQueries(1):
+            self.assertEqual(motor.asignar(Observacion.objects.all()), 2)
+        normal.refresh_from_db()
+        urgente.refresh_from_db()
+        self.assertEqual((normal.fecha_vencimiento, urgente.fecha_vencimiento), (date(2026, 9, 27), date(2026, 9, 19)))
+        self.assertEqual(motor.asignar(Observacion.objects.all()), 0)
+
+    def test_recalcular_en_dias_habiles(self):
+        normal = self._sin_fecha(date(2026, 9, 17))
+        urgente = self._sin_fecha(date(2026, 9, 17), es_urgente=True)
+        self._crear()
+        self.config.usar_dias_habiles = True
+        self.assertEqual(MotorVencimiento(self.config).asignar(Observacion.objects.all(), recalcular=True), 3)
+        normal.refresh_from_db()
+        urgente.refresh_from_db()
+        self.assertEqual((normal.fecha_vencimiento, urgente.fecha_vencimiento), (date(2026, 10, 5), date(2026, 9, 23)))
+
+    def test_recalcular_marca_la_observacion_como_modificada(self):
+        admin = self.datos.usuario
+        obs = self._crear()
+        version = version_datos()
+        marca = interpretar_marca(cambios_desde(admin)['marca'])
+        self.config.dias_vencimiento_normal = 20
+        self.assertEqual(MotorVencimiento(self.config).asignar(Observacion.objects.all(), recalcular=True), 1)
+
+        # La réplica móvil y la caché de reportes ven el nuevo vencimiento
+        cambios = cambios_desde(admin, marca)['observaciones']
+        self.assertEqual([(o['id'], o['fecha_vencimiento']) for o in cambios],
+                         [(obs.pk, (timezone.localdate() + timedelta(days=20)).isoformat())])
+        self.assertNotEqual(version_datos(), version)
@@ -0,0 +1,144 @@
+"""
+Búsqueda de texto completo sobre observaciones.
+
+Cada observación tiene una fila en IndiceBusquedaObservacion con el texto
+de los campos buscables (elemento, detalle, recinto, código de vivienda y
+correo del creador) en minúsculas y sin tildes. Sobre esa tabla el motor
+de base de datos mantiene su índice de texto completo:
+
+- SQLite: tabla FTS5 (tokenizador unicode61 sin diacríticos) sincronizada
+  por triggers, ranking bm25.
+- PostgreSQL: índice GIN sobre `to_tsvector('spanish', texto)`, ranking
+  ts_rank.
+- Otros motores: `LIKE` por término sobre la tabla del índice (sin joins).
+
+El backend se elige por el motor de la conexión (BACKENDS_BUSQUEDA) o con
+BUSQUEDA_BACKEND. Cada término se busca como prefijo y todos deben estar
+presentes, así "griferia baño" encuentra "Grifería del baño principal".
+
+El índice se actualiza por observación desde core/signals.py (al guardar
+una observación, o al cambiar el nombre del recinto, el código de la
+vivienda o el correo del usuario). Los cambios masivos que no emiten
+signals (`update()`, `bulk_create()`) deben llamar a
+`reindexar_observaciones`; `manage.py reindexar_busqueda` lo reconstruye
+completo.
+"""
+import re
+import unicodedata
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from incidencias.models import IndiceBusquedaObservacion, TextoBusquedaFts
+
+CAMPOS_INDICE = ('elemento', 'detalle', 'recinto__nombre', 'vivienda__codigo', 'creado_por__email')
+# Campos de Observacion que cambian el texto indexado (para saltar guardados que no lo tocan)
+CAMPOS_OBSERVACION_INDEXADOS = {'elemento', 'detalle', 'recinto', 'vivienda', 'creado_por'}
+TAMANO_LOTE = 1000
+
+BACKENDS_BUSQUEDA = {
+    'sqlite': 'core.utils.busqueda_observaciones.BusquedaSqliteFts5',
+    'postgresql': 'core.utils.busqueda_observaciones.BusquedaPostgres',
+}
+BACKEND_POR_DEFECTO = 'core.utils.busqueda_observaciones.BusquedaLike'
+
+_TABLA_INDICE = IndiceBusquedaObservacion._meta.db_table
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes ni espacios repetidos ("Grifería  Baño" -> "griferia bano")."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', sin_tildes.lower()).strip()
+
+
+def terminos_busqueda(texto):
+    """Términos alfanuméricos del texto buscado, normalizados."""
+    return re.findall(r'\w+', normalizar_texto(texto))
+
+
+class BusquedaLike:
+    """Respaldo portable: cada término con LIKE sobre la tabla del índice."""
+
+    def filtrar(self, queryset, terminos):
+        for termino in terminos:
+            queryset = queryset.filter(indice_busqueda__texto__contains=termino)
+        return queryset.annotate(rango_busqueda=Value(0.0, output_field=FloatField()))
+
+
+class BusquedaSqliteFts5:
+    def filtrar(self, queryset, terminos):
+        # Cada término entre comillas (sin operadores FTS) y como prefijo.
+        # Se une la tabla FTS (TextoBusquedaFts) en vez de un subquery por
+        # fila: rank (bm25, menor = mejor) sale del mismo MATCH.
+        consulta = ' '.join(f'"{termino}"*' for termino in terminos)
+        return queryset.filter(texto_fts__texto__coincide=consulta).annotate(
+            rango_busqueda=-F('texto_fts__rank'),
+        )
+
+    def reconstruir(self):
+        tabla = TextoBusquedaFts._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {tabla}({tabla}) VALUES ('rebuild')")
+
+
+class BusquedaPostgres:
+    vector = "to_tsvector('spanish', texto)"
+
+    def filtrar(self, queryset, terminos):
+        consulta = ' & '.join(f'{termino}:*' for termino in terminos)
+        observaciones = queryset.model._meta.db_table
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT observacion_id FROM {_TABLA_INDICE} WHERE {self.vector} @@ to_tsquery('spanish', %s)",
+            [consulta],
+        )).annotate(rango_busqueda=RawSQL(
+            f"(SELECT ts_rank({self.vector}, to_tsquery('spanish', %s)) FROM {_TABLA_INDICE} "
+            f'WHERE observacion_id = "{observaciones}"."id")',
+            [consulta], output_field=FloatField(),
+        ))
+
+
+def obtener_backend():
+    return import_string(settings.BUSQUEDA_BACKEND or BACKENDS_BUSQUEDA.get(connection.vendor, BACKEND_POR_DEFECTO))()
+
+
+def buscar_observaciones(queryset, texto, ordenar=True):
+    """
+    Filtra `queryset` (de Observacion) por `texto`, anotando
+    `rango_busqueda` (mayor = más relevante). Con `ordenar`, los resultados
+    quedan por relevancia y luego por fecha. Sin términos, devuelve el
+    queryset sin cambios.
+    """
+    terminos = terminos_busqueda(texto)
+    if not terminos:
+        return queryset
+    queryset = obtener_backend().filtrar(queryset, terminos)
+    if ordenar:
+        queryset = queryset.order_by('-rango_busqueda', '-fecha_creacion', '-id')
+    return queryset
+
+
+def _guardar(lote):
+    IndiceBusquedaObservacion.objects.bulk_create(
+        lote, update_conflicts=True, unique_fields=['observacion'], update_fields=['texto'],
+    )
+
+
+def reindexar_observaciones(observaciones):
+    """Recalcula el texto indexado de las observaciones del queryset, por lotes. Devuelve cuántas."""
+    cantidad = 0
+    lote = []
+    filas = observaciones.order_by().values_list('pk', *CAMPOS_INDICE)
+    for pk, *valores in filas.iterator(chunk_size=TAMANO_LOTE):
+        lote.append(IndiceBusquedaObservacion(
+            observacion_id=pk, texto=normalizar_texto(' '.join(valor for valor in valores if valor)),
+        ))
+        if len(lote) == TAMANO_LOTE:
+            _guardar(lote)
+            cantidad += len(lote)
+            lote = []
+    if lote:
+        _guardar(lote)
+        cantidad += len(lote)
+    return cantidad
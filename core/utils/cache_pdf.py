@@ -0,0 +1,114 @@
+"""
+Caché en disco de los PDFs individuales de actas y fichas de postventa.
+
+Cada archivo se llama `<tipo>_<pk>_<versión>.pdf`, donde la versión es un
+hash de `fecha_actualizacion` del documento y de lo que se imprime de sus
+relaciones (vivienda y proyecto; del evaluador de la ficha, que no tiene
+fecha de actualización, se usan directamente los datos impresos). Al editar el acta, sus familiares o su
+beneficiario (core/signals.py renueva `fecha_actualizacion`), o la ficha,
+cambia el nombre y el PDF se vuelve a generar; la versión anterior se
+borra al guardar la nueva. Mientras nada cambie, la descarga es servir un
+archivo estático.
+
+El directorio se limita a PDF_CACHE_MAX_MB: cada acierto renueva la fecha
+de modificación del archivo y al guardar se borran los de uso menos
+reciente (LRU).
+"""
+import glob
+import hashlib
+import os
+import tempfile
+from django.conf import settings
+
+# Subirla al cambiar las plantillas de los PDFs invalida todo lo guardado
+VERSION_PLANTILLAS = 1
+
+
+def _clave(tipo, objeto, *relacionados, datos=()):
+    fechas = [VERSION_PLANTILLAS] + [
+        getattr(relacionado, 'fecha_actualizacion', None) for relacionado in (objeto, *relacionados)
+    ]
+    version = hashlib.sha1(repr(fechas + list(datos)).encode('utf-8')).hexdigest()[:16]
+    return f'{tipo}_{objeto.pk}_{version}'
+
+
+def clave_acta(acta):
+    vivienda = acta.vivienda if acta.vivienda_id else None
+    proyecto = acta.proyecto if acta.proyecto_id else None
+    return _clave('acta', acta, vivienda, proyecto)
+
+
+def clave_ficha(ficha):
+    evaluador = ficha.evaluador
+    rol = evaluador.rol.nombre if evaluador.rol_id else None
+    return _clave(
+        'ficha', ficha, ficha.vivienda, ficha.vivienda.proyecto,
+        datos=(evaluador.pk, evaluador.nombre, evaluador.apellido_paterno, rol),
+    )
+
+
+def _ruta(clave):
+    return os.path.join(settings.PDF_CACHE_DIR, f'{clave}.pdf')
+
+
+def obtener_pdf(clave):
+    """Ruta del PDF guardado con `clave` (y lo marca como recién usado), o None."""
+    ruta = _ruta(clave)
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        return None
+    return ruta
+
+
+def guardar_pdf(clave, contenido):
+    """Guarda el PDF, borra las versiones anteriores del mismo documento y aplica el límite de tamaño."""
+    os.makedirs(settings.PDF_CACHE_DIR, exist_ok=True)
+    ruta = _ruta(clave)
+    # Escritura atómica: una descarga simultánea nunca ve un PDF a medias
+    descriptor, temporal = tempfile.mkstemp(dir=settings.PDF_CACHE_DIR, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+    tipo, pk, _ = clave.split('_')
+    for anterior in glob.glob(os.path.join(settings.PDF_CACHE_DIR, f'{tipo}_{pk}_*.pdf')):
+        if anterior != ruta:
+            _borrar(anterior)
+    limpiar_cache_pdf()
+    return ruta
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def limpiar_cache_pdf(max_bytes=None):
+    """
+    Borra los PDFs de uso menos reciente hasta que el directorio no supere
+    `max_bytes` (por defecto PDF_CACHE_MAX_MB). Devuelve cuántos borró.
+    """
+    max_bytes = settings.PDF_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    try:
+        archivos = [entrada for entrada in os.scandir(settings.PDF_CACHE_DIR) if entrada.name.endswith('.pdf')]
+    except FileNotFoundError:
+        return 0
+    datos = []
+    for entrada in archivos:
+        try:
+            datos.append((entrada.stat(), entrada.path))
+        except FileNotFoundError:
+            # Reemplazado o borrado por otra petición mientras se recorría
+            pass
+    total = sum(stat.st_size for stat, _ in datos)
+    borrados = 0
+    for stat, ruta in sorted(datos, key=lambda dato: dato[0].st_mtime):
+        if total <= max_bytes:
+            break
+        _borrar(ruta)
+        total -= stat.st_size
+        borrados += 1
+    return borrados
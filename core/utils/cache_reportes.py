@@ -0,0 +1,118 @@
+"""
+Caché de reportes generados, direccionada por contenido.
+
+Cada archivo se guarda con una clave sha256 de (tipo de reporte, filtros
+normalizados, alcance y perfil del usuario, versión de los datos, día).
+Dos pedidos con la misma clave producen el mismo documento, así que el
+segundo reutiliza el archivo sin importar quién lo pidió.
+
+La versión de los datos se obtiene de la base de datos (cantidad de filas y
+última modificación de observaciones, viviendas y proyectos, y el último
+refresco del snapshot de KPIs). Cualquier alta, edición o baja la cambia,
+y como no depende de la caché de Django sirve igual para la web y para
+el worker, que corren en procesos distintos. El día se incluye porque hay
+indicadores relativos a hoy (vencidas, período por defecto).
+
+`limpiar_cache_reportes` borra archivos y filas de ReporteGenerado por
+antigüedad y, después, los menos usados hasta respetar el tamaño máximo.
+"""
+import hashlib
+import json
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from core.models import KpiSnapshotEjecucion
+from core.permisos import obtener_alcance
+from proyectos.models import Proyecto, Vivienda
+from incidencias.models import Observacion
+from reportes.models import ReporteGenerado
+
+
+def version_datos():
+    """Firma de los datos que alimentan los reportes (cuatro consultas agregadas)."""
+    partes = [
+        Observacion.objects.aggregate(n=Count('id'), ultima=Max('fecha_ultima_actualizacion')),
+        Vivienda.objects.aggregate(n=Count('id'), ultima=Max('fecha_actualizacion')),
+        Proyecto.objects.aggregate(n=Count('id'), ultima=Max('fecha_actualizacion')),
+        KpiSnapshotEjecucion.objects.aggregate(ultima=Max('id')),
+    ]
+    return json.dumps(partes, default=str, sort_keys=True)
+
+
+def clave_reporte(tipo, filtros, usuario):
+    """Clave de contenido del reporte `tipo` con `filtros` para `usuario`."""
+    contenido = {
+        'tipo': tipo,
+        'filtros': {clave: valor for clave, valor in filtros.items() if valor not in (None, '')},
+        'alcance': obtener_alcance(usuario).firma,
+        'perfil': 'superusuario' if usuario.is_superuser else usuario.rol_id,
+        'datos': version_datos(),
+        'dia': timezone.localdate().isoformat(),
+    }
+    return hashlib.sha256(json.dumps(contenido, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def ruta_absoluta(reporte):
+    return os.path.join(settings.BASE_DIR, reporte.ruta_archivo)
+
+
+def buscar_reporte(clave):
+    """ReporteGenerado vigente con `clave` (registra el acceso), o None."""
+    for reporte in ReporteGenerado.objects.filter(clave=clave).order_by('-fecha_generacion'):
+        if os.path.exists(ruta_absoluta(reporte)):
+            ReporteGenerado.objects.filter(pk=reporte.pk).update(ultimo_acceso=timezone.now())
+            return reporte
+        # El archivo ya no está (limpieza manual): la fila no sirve
+        reporte.delete()
+    return None
+
+
+def registrar_en_cache(reporte, clave):
+    """Asocia el reporte recién generado a su clave y guarda su tamaño."""
+    ruta = ruta_absoluta(reporte)
+    reporte.clave = clave
+    reporte.tamano = os.path.getsize(ruta) if os.path.exists(ruta) else None
+    reporte.ultimo_acceso = timezone.now()
+    reporte.save(update_fields=['clave', 'tamano', 'ultimo_acceso'])
+    return reporte
+
+
+def _eliminar(reportes):
+    cantidad = 0
+    for reporte in reportes:
+        try:
+            os.remove(ruta_absoluta(reporte))
+        except FileNotFoundError:
+            pass
+        reporte.delete()
+        cantidad += 1
+    return cantidad
+
+
+def limpiar_cache_reportes(max_dias=None, max_bytes=None):
+    """
+    Elimina reportes más antiguos que `max_dias` y luego los de acceso menos
+    reciente hasta que el total no supere `max_bytes`.
+
+    Returns:
+        Cantidad de reportes eliminados.
+    """
+    max_dias = settings.REPORTES_CACHE_MAX_DIAS if max_dias is None else max_dias
+    max_bytes = settings.REPORTES_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+
+    limite = timezone.now() - timedelta(days=max_dias)
+    eliminados = _eliminar(ReporteGenerado.objects.filter(fecha_generacion__lt=limite))
+
+    total = ReporteGenerado.objects.aggregate(total=Sum('tamano'))['total'] or 0
+    if total > max_bytes:
+        sobrantes = []
+        # Desde el de acceso más antiguo; los anteriores a la caché (sin acceso registrado) van primero
+        for reporte in ReporteGenerado.objects.order_by('ultimo_acceso', 'fecha_generacion'):
+            if total <= max_bytes:
+                break
+            sobrantes.append(reporte)
+            total -= reporte.tamano or 0
+        eliminados += _eliminar(sobrantes)
+    return eliminados
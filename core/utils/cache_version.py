@@ -0,0 +1,21 @@
+"""
+Versionado de claves de caché para invalidar grupos completos de entradas.
+
+Cada grupo (ej: 'global_stats') tiene un contador; las claves incluyen su
+valor actual, de modo que incrementarlo deja obsoletas todas las entradas
+anteriores sin tener que conocerlas ni borrarlas una a una.
+"""
+from django.core.cache import cache
+
+
+def version_cache(grupo):
+    """Versión vigente del grupo de claves `grupo`."""
+    return cache.get_or_set(f'{grupo}:version', 1, timeout=None)
+
+
+def incrementar_version_cache(grupo):
+    """Invalida todas las entradas del grupo `grupo`."""
+    try:
+        cache.incr(f'{grupo}:version')
+    except ValueError:
+        cache.set(f'{grupo}:version', 1, timeout=None)
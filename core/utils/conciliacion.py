@@ -0,0 +1,192 @@
+"""
+Índice en memoria para conciliar filas de planillas con beneficiarios o
+constructoras existentes.
+
+Los comandos de regularización buscaban cada fila con filter(rut=...) y
+filter(nombre__iexact=...): dos o tres consultas por fila. El índice carga
+la tabla una vez y la reparte en mapas por RUT normalizado, por nombre sin
+tildes ni mayúsculas (nombre y nombre completo) y por teléfono (solo
+dígitos, sin código de país). Cada búsqueda devuelve una Coincidencia
+exacta, ambigua o sin resultado.
+
+Los cambios se registran con `actualizar` (que mantiene los mapas al día,
+así una fila posterior ve lo que cambió una anterior) y se escriben con
+`guardar` en lotes de bulk_update. bulk_update no emite signals: para
+beneficiarios se repite aquí lo que hacen los de core/signals.py.
+"""
+from collections import defaultdict
+from django.utils import timezone
+from unidecode import unidecode
+from core.validators import normalizar_rut
+
+# Filas por UPDATE de bulk_update (el CASE por fila se vuelve cuadrático en lotes grandes)
+TAMANO_LOTE = 100
+# Teléfonos chilenos: 9 dígitos sin el código de país (56)
+DIGITOS_TELEFONO = 9
+
+EXACTA = 'exacta'
+AMBIGUA = 'ambigua'
+NINGUNA = 'ninguna'
+
+
+def normalizar_nombre(texto):
+    """'  José  PÉREZ ' -> 'jose perez'."""
+    if not isinstance(texto, str):
+        return ''
+    return ' '.join(unidecode(texto).lower().split())
+
+
+def normalizar_telefono(numero):
+    """'+56 9 1234 5678' -> '912345678'; vacío si no parece un teléfono."""
+    digitos = ''.join(c for c in str(numero or '') if c.isdigit())
+    return digitos[-DIGITOS_TELEFONO:] if len(digitos) >= 8 else ''
+
+
+class Coincidencia:
+    """Resultado de una búsqueda: `objeto` solo cuando es exacta."""
+
+    def __init__(self, tipo, candidatos=(), campo=None):
+        self.tipo = tipo
+        self.candidatos = list(candidatos)
+        self.campo = campo
+        self.objeto = self.candidatos[0] if tipo == EXACTA else None
+
+    @property
+    def exacta(self):
+        return self.tipo == EXACTA
+
+    @property
+    def ambigua(self):
+        return self.tipo == AMBIGUA
+
+    def __repr__(self):
+        return f'<Coincidencia {self.tipo} por {self.campo}: {len(self.candidatos)}>'
+
+
+def _coincidencia(candidatos, campo):
+    if not candidatos:
+        return Coincidencia(NINGUNA)
+    return Coincidencia(EXACTA if len(candidatos) == 1 else AMBIGUA, candidatos, campo)
+
+
+class IndiceConciliacion:
+    """
+    `nombres(objeto)` da los nombres por los que se puede encontrar cada
+    objeto; `telefonos` son pares (pk, número).
+    """
+
+    def __init__(self, objetos, nombres, telefonos=(), al_guardar=None):
+        self._nombres = nombres
+        self._al_guardar = al_guardar
+        self.por_pk = {}
+        self.por_rut = defaultdict(list)
+        self.por_nombre = defaultdict(list)
+        self.por_telefono = defaultdict(list)
+        self.pendientes = {}
+        self.campos_pendientes = set()
+        for objeto in objetos:
+            self.agregar(objeto)
+        for pk, numero in telefonos:
+            clave = normalizar_telefono(numero)
+            if clave and pk in self.por_pk and self.por_pk[pk] not in self.por_telefono[clave]:
+                self.por_telefono[clave].append(self.por_pk[pk])
+
+    def _claves(self, objeto):
+        yield self.por_rut, normalizar_rut(objeto.rut)
+        for nombre in {normalizar_nombre(nombre) for nombre in self._nombres(objeto)}:
+            yield self.por_nombre, nombre
+
+    def agregar(self, objeto):
+        """Incluye un objeto (p. ej. recién creado) en el índice."""
+        self.por_pk[objeto.pk] = objeto
+        for mapa, clave in self._claves(objeto):
+            if clave:
+                mapa[clave].append(objeto)
+
+    # --- Búsqueda ---
+
+    def buscar_por_rut(self, rut):
+        return _coincidencia(self.por_rut.get(normalizar_rut(rut), []), 'rut')
+
+    def buscar_por_nombre(self, nombre):
+        return _coincidencia(self.por_nombre.get(normalizar_nombre(nombre), []), 'nombre')
+
+    def buscar_por_telefono(self, telefono):
+        return _coincidencia(self.por_telefono.get(normalizar_telefono(telefono), []), 'telefono')
+
+    def buscar(self, rut='', nombre='', telefono=''):
+        """
+        Busca por RUT; si no hay resultado, por nombre y luego por teléfono.
+        Una coincidencia ambigua detiene la búsqueda (no se adivina).
+        """
+        for campo, valor, buscar in (
+            ('rut', rut, self.buscar_por_rut),
+            ('nombre', nombre, self.buscar_por_nombre),
+            ('telefono', telefono, self.buscar_por_telefono),
+        ):
+            if valor:
+                coincidencia = buscar(valor)
+                if coincidencia.tipo != NINGUNA:
+                    return coincidencia
+        return Coincidencia(NINGUNA)
+
+    # --- Escritura ---
+
+    def actualizar(self, objeto, **valores):
+        """Asigna `valores` al objeto y lo deja pendiente de guardar. True si algo cambió."""
+        cambios = {campo: valor for campo, valor in valores.items() if getattr(objeto, campo) != valor}
+        if not cambios:
+            return False
+        for mapa, clave in self._claves(objeto):
+            if objeto in mapa.get(clave, []):
+                mapa[clave].remove(objeto)
+        for campo, valor in cambios.items():
+            setattr(objeto, campo, valor)
+        if 'rut' in cambios:
+            # save() lo recalcula, bulk_update no
+            objeto.rut_normalizado = normalizar_rut(objeto.rut)
+            cambios['rut_normalizado'] = objeto.rut_normalizado
+        self.agregar(objeto)
+        self.pendientes[objeto.pk] = objeto
+        self.campos_pendientes.update(cambios)
+        return True
+
+    def guardar(self, batch_size=TAMANO_LOTE):
+        """Escribe los cambios pendientes con bulk_update. Devuelve cuántos objetos se guardaron."""
+        if not self.pendientes:
+            return 0
+        objetos = list(self.pendientes.values())
+        type(objetos[0]).objects.bulk_update(objetos, sorted(self.campos_pendientes), batch_size=batch_size)
+        if self._al_guardar:
+            self._al_guardar(objetos)
+        self.pendientes = {}
+        self.campos_pendientes = set()
+        return len(objetos)
+
+
+def _beneficiarios_guardados(beneficiarios):
+    # Lo que harían los signals post_save de Beneficiario (core/signals.py)
+    from core.permisos import invalidar_alcances
+    from reportes.models import ActaRecepcion
+    invalidar_alcances()
+    ActaRecepcion.objects.filter(beneficiario__in=beneficiarios).update(fecha_actualizacion=timezone.now())
+
+
+def indice_beneficiarios(queryset=None):
+    """Índice de beneficiarios por RUT, nombre, nombre completo y teléfonos activos."""
+    from proyectos.models import Beneficiario, Telefono
+    beneficiarios = list(queryset if queryset is not None else Beneficiario.objects.all())
+    telefonos = Telefono.objects.filter(activo=True).values_list('beneficiario_id', 'numero')
+    return IndiceConciliacion(
+        beneficiarios, lambda b: (b.nombre, b.nombre_completo), telefonos=telefonos.iterator(),
+        al_guardar=_beneficiarios_guardados,
+    )
+
+
+def indice_constructoras(queryset=None):
+    """Índice de constructoras por RUT, nombre y teléfono."""
+    from core.models import Constructora
+    constructoras = list(queryset if queryset is not None else Constructora.objects.all())
+    return IndiceConciliacion(
+        constructoras, lambda c: (c.nombre,), telefonos=((c.pk, c.telefono) for c in constructoras),
+    )
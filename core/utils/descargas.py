@@ -0,0 +1,138 @@
+"""
+Entrega de archivos del disco: reportes generados, PDFs en caché y adjuntos.
+
+Las vistas verifican los permisos y llaman a `servir_archivo`, que:
+
+- responde 304 si el navegador ya tiene la versión vigente (ETag y
+  Last-Modified a partir del tamaño y la fecha de modificación, sin leer
+  el archivo);
+- atiende pedidos `Range: bytes=...` con 206 (reanudar descargas, visores
+  de PDF y video en el celular);
+- con DESCARGAS_OFFLOAD = 'x-accel' (nginx) o 'x-sendfile' (Apache,
+  lighttpd) solo entrega la cabecera y el servidor web envía el archivo,
+  así una descarga lenta no ocupa un worker de Python. En nginx cada
+  carpeta de DESCARGAS_ACCEL_RUTAS debe tener su `location` `internal`.
+
+Las respuestas llevan `Cache-Control: private, no-cache`: el navegador
+guarda el archivo pero revalida (y pasa de nuevo por los permisos) en
+cada uso.
+"""
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+TAMANO_BLOQUE = 64 * 1024
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag(estado):
+    return f'"{estado.st_mtime_ns:x}-{estado.st_size:x}"'
+
+
+def _rango(request, tamano, etag, modificado):
+    """
+    (inicio, fin) pedido en la cabecera Range, None si no hay que atenderlo
+    (sin Range, varios rangos o If-Range desactualizado) o 'invalido'.
+    """
+    cabecera = request.META.get('HTTP_RANGE', '').strip()
+    if not cabecera or request.method not in ('GET', 'HEAD'):
+        return None
+    condicion = request.META.get('HTTP_IF_RANGE', '').strip()
+    if condicion and condicion != etag and parse_http_date_safe(condicion) != modificado:
+        return None
+    coincidencia = _RANGO.match(cabecera)
+    if not coincidencia:
+        # Varios rangos u otra unidad: se entrega el archivo completo
+        return None
+    desde, hasta = coincidencia.groups()
+    if not desde and not hasta:
+        return 'invalido'
+    if not desde:
+        # bytes=-N: los últimos N bytes
+        inicio, fin = max(0, tamano - int(hasta)), tamano - 1
+    else:
+        inicio = int(desde)
+        fin = min(int(hasta), tamano - 1) if hasta else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return 'invalido'
+    return inicio, fin
+
+
+def _leer(ruta, inicio, largo):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        while largo > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, largo))
+            if not bloque:
+                break
+            largo -= len(bloque)
+            yield bloque
+
+
+def _ruta_interna(ruta):
+    """URL interna de nginx para `ruta`, o None si su carpeta no está publicada."""
+    for carpeta, prefijo in settings.DESCARGAS_ACCEL_RUTAS.items():
+        carpeta = os.path.realpath(carpeta)
+        if ruta.startswith(carpeta + os.sep):
+            relativa = os.path.relpath(ruta, carpeta).replace(os.sep, '/')
+            return prefijo.rstrip('/') + '/' + relativa
+    return None
+
+
+def servir_archivo(request, ruta, nombre=None, adjunto=True, content_type=None):
+    """
+    Respuesta para descargar (o ver, con `adjunto=False`) el archivo `ruta`.
+    Los permisos ya deben estar verificados.
+
+    Raises:
+        FileNotFoundError: si el archivo no existe.
+    """
+    ruta = os.path.realpath(ruta)
+    estado = os.stat(ruta)
+    nombre = nombre or os.path.basename(ruta)
+    content_type = content_type or mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+    etag = _etag(estado)
+    modificado = int(estado.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if response is None:
+        response = _respuesta(request, ruta, estado.st_size, content_type, etag, modificado)
+        response['Content-Disposition'] = content_disposition_header(adjunto, nombre)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modificado)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _respuesta(request, ruta, tamano, content_type, etag, modificado):
+    modo = settings.DESCARGAS_OFFLOAD
+    if modo == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = ruta
+        return response
+    if modo == 'x-accel':
+        interna = _ruta_interna(ruta)
+        if interna:
+            # nginx atiende Range y condicionales por su cuenta
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = interna
+            return response
+
+    rango = _rango(request, tamano, etag, modificado)
+    if rango == 'invalido':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{tamano}'
+        return response
+    if rango is None:
+        response = FileResponse(open(ruta, 'rb'), content_type=content_type)
+    else:
+        inicio, fin = rango
+        response = StreamingHttpResponse(_leer(ruta, inicio, fin - inicio + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+        response['Content-Length'] = str(fin - inicio + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
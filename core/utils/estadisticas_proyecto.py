@@ -0,0 +1,109 @@
+"""
+Estadísticas por proyecto (y su consolidado por región).
+
+Todas las cifras salen de tres consultas, sin importar cuántos proyectos
+haya: los datos del proyecto (`values()` con sus joins), los conteos de
+viviendas agrupados por proyecto y los de observaciones agrupados por
+proyecto con agregación condicional. Lo usan los reportes Excel de
+estadísticas y scripts/valparaiso_report.py.
+"""
+from django.db.models import Count, Q
+from core.utils.kpi_engine import ESTADO_ABIERTA, ESTADO_CERRADA, porcentaje
+from proyectos.models import Proyecto, Vivienda
+from incidencias.models import Observacion
+
+CAMPOS_PROYECTO = (
+    'id', 'codigo', 'nombre', 'region_id', 'region__nombre', 'comuna__nombre',
+    'constructora__nombre', 'constructora_legacy', 'fecha_entrega',
+)
+CONTEOS = (
+    'total_viviendas', 'viviendas_entregadas', 'casas_con_observaciones',
+    'total_observaciones', 'abiertas', 'urgentes', 'cerradas',
+)
+
+
+def _completar_porcentajes(datos):
+    total = datos['total_observaciones']
+    datos['porc_abiertas'] = porcentaje(datos['abiertas'], total)
+    datos['porc_urgentes'] = porcentaje(datos['urgentes'], total)
+    datos['porc_cerradas'] = porcentaje(datos['cerradas'], total)
+    return datos
+
+
+def estadisticas_por_proyecto(proyectos=None):
+    """
+    Cifras de cada proyecto de `proyectos` (queryset; por defecto todos),
+    respetando su orden.
+
+    Returns:
+        Lista de dicts con los datos del proyecto (id, codigo, nombre,
+        region_id, region, comuna, constructora, constructora_legacy,
+        fecha_entrega), los conteos de CONTEOS y los porcentajes de
+        abiertas/urgentes/cerradas sobre el total de observaciones.
+    """
+    if proyectos is None:
+        proyectos = Proyecto.objects.all()
+    ids = proyectos.order_by().values('id')
+
+    viviendas = {
+        fila['proyecto_id']: fila
+        for fila in Vivienda.objects.filter(proyecto_id__in=ids).order_by().values('proyecto_id').annotate(
+            total=Count('id'),
+            entregadas=Count('id', filter=Q(estado='entregada')),
+        )
+    }
+    abierta = Q(estado__nombre=ESTADO_ABIERTA)
+    observaciones = {
+        fila['vivienda__proyecto_id']: fila
+        for fila in Observacion.objects.filter(vivienda__proyecto_id__in=ids).order_by()
+        .values('vivienda__proyecto_id').annotate(
+            total=Count('id'),
+            casas=Count('vivienda_id', distinct=True),
+            abiertas=Count('id', filter=abierta),
+            urgentes=Count('id', filter=abierta & Q(es_urgente=True)),
+            cerradas=Count('id', filter=Q(estado__nombre=ESTADO_CERRADA)),
+        )
+    }
+
+    estadisticas = []
+    for proyecto in proyectos.values(*CAMPOS_PROYECTO):
+        viv = viviendas.get(proyecto['id'], {})
+        obs = observaciones.get(proyecto['id'], {})
+        estadisticas.append(_completar_porcentajes({
+            'id': proyecto['id'],
+            'codigo': proyecto['codigo'],
+            'nombre': proyecto['nombre'],
+            'region_id': proyecto['region_id'],
+            'region': proyecto['region__nombre'],
+            'comuna': proyecto['comuna__nombre'],
+            'constructora': proyecto['constructora__nombre'],
+            'constructora_legacy': proyecto['constructora_legacy'],
+            'fecha_entrega': proyecto['fecha_entrega'],
+            'total_viviendas': viv.get('total', 0),
+            'viviendas_entregadas': viv.get('entregadas', 0),
+            'casas_con_observaciones': obs.get('casas', 0),
+            'total_observaciones': obs.get('total', 0),
+            'abiertas': obs.get('abiertas', 0),
+            'urgentes': obs.get('urgentes', 0),
+            'cerradas': obs.get('cerradas', 0),
+        }))
+    return estadisticas
+
+
+def totales_por_region(estadisticas):
+    """
+    Suma las cifras de `estadisticas_por_proyecto` por región, en el orden
+    en que aparece cada región. No hace consultas.
+    """
+    regiones = {}
+    for proyecto in estadisticas:
+        region = regiones.setdefault(proyecto['region_id'], {
+            'region_id': proyecto['region_id'],
+            'region': proyecto['region'],
+            'proyectos': 0,
+            **{campo: 0 for campo in CONTEOS},
+        })
+        region['proyectos'] += 1
+        for campo in CONTEOS:
+            region[campo] += proyecto[campo]
+    return [_completar_porcentajes(region) for region in regiones.values()]
@@ -0,0 +1,105 @@
+"""
+Exportación de reportes Excel (y CSV) con memoria constante.
+
+Los libros se crean en modo write-only de openpyxl (las filas se escriben a
+disco a medida que se agregan, sin mantener celdas en memoria), las filas
+vienen de `values_list().iterator(chunk_size=...)` en lugar de instancias de
+modelo, y el archivo resultante se envía en bloques con
+`StreamingHttpResponse` desde un archivo temporal. El CSV no necesita
+archivo intermedio: cada fila se envía apenas se lee.
+"""
+import csv
+import tempfile
+from wsgiref.util import FileWrapper
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from django.http import StreamingHttpResponse
+
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Filas por lote al iterar querysets
+TAMANO_LOTE = 2000
+# Bytes por bloque de la respuesta
+TAMANO_BLOQUE = 64 * 1024
+
+
+def filas_queryset(queryset, *campos, chunk_size=TAMANO_LOTE):
+    """Tuplas de `campos` del queryset, leídas por lotes desde la base de datos."""
+    return queryset.values_list(*campos).iterator(chunk_size=chunk_size)
+
+
+def nuevo_libro():
+    """Libro write-only (sin hoja inicial)."""
+    return openpyxl.Workbook(write_only=True)
+
+
+def agregar_hoja(libro, titulo, encabezados, filas, anchos=None, encabezado_negrita=False):
+    """
+    Agrega una hoja con `encabezados` y las `filas` (cualquier iterable de
+    secuencias), que se consumen una vez sin materializarse.
+
+    Returns:
+        (hoja, cantidad de filas de datos escritas)
+    """
+    hoja = libro.create_sheet(title=titulo)
+    # En modo write-only los anchos deben definirse antes de escribir filas
+    for i, ancho in enumerate(anchos or [], 1):
+        hoja.column_dimensions[get_column_letter(i)].width = ancho
+
+    if encabezado_negrita:
+        celdas = []
+        for encabezado in encabezados:
+            celda = WriteOnlyCell(hoja, value=encabezado)
+            celda.font = Font(bold=True)
+            celdas.append(celda)
+        hoja.append(celdas)
+    else:
+        hoja.append(encabezados)
+
+    cantidad = 0
+    for fila in filas:
+        hoja.append(fila)
+        cantidad += 1
+    return hoja, cantidad
+
+
+def respuesta_excel(libro, nombre_archivo):
+    """Guarda el libro en un archivo temporal y lo envía en bloques."""
+    archivo = tempfile.TemporaryFile()
+    libro.save(archivo)
+    tamano = archivo.tell()
+    archivo.seek(0)
+    # FileWrapper cierra (y elimina) el temporal al terminar la respuesta
+    response = StreamingHttpResponse(FileWrapper(archivo, TAMANO_BLOQUE), content_type=TIPO_XLSX)
+    response['Content-Disposition'] = f'attachment; filename={nombre_archivo}'
+    response['Content-Length'] = tamano
+    return response
+
+
+def exportar_excel(nombre_archivo, titulo, encabezados, filas, anchos=None):
+    """Respuesta con un libro de una sola hoja."""
+    libro = nuevo_libro()
+    agregar_hoja(libro, titulo, encabezados, filas, anchos=anchos)
+    return respuesta_excel(libro, nombre_archivo)
+
+
+class _Eco:
+    """Pseudo-archivo que devuelve lo escrito, para generar CSV fila a fila."""
+
+    def write(self, valor):
+        return valor
+
+
+def exportar_csv(nombre_archivo, encabezados, filas):
+    """Respuesta CSV (UTF-8 con BOM, para que Excel respete los acentos) generada en streaming."""
+    escritor = csv.writer(_Eco())
+
+    def contenido():
+        yield '\ufeff' + escritor.writerow(encabezados)
+        for fila in filas:
+            yield escritor.writerow(fila)
+
+    response = StreamingHttpResponse(contenido(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename={nombre_archivo}'
+    return response
@@ -0,0 +1,88 @@
+"""
+Estadísticas globales del encabezado (total de proyectos, viviendas y
+observaciones) con caché por alcance de rol.
+
+El alcance depende del rol: FAMILIA se cachea por usuario, CONSTRUCTORA por
+constructora y el resto comparte una sola entrada global. Las entradas viven
+`GLOBAL_STATS_CACHE_TTL` segundos y se invalidan al guardar o eliminar un
+Proyecto, Vivienda u Observacion (ver core/signals.py), incrementando una
+versión incluida en la clave.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from core.permisos import obtener_alcance
+from core.utils.cache_version import version_cache, incrementar_version_cache
+from proyectos.models import Proyecto, Vivienda
+from incidencias.models import Observacion
+
+GRUPO_CACHE = 'global_stats'
+TTL_POR_DEFECTO = 60
+
+ESTADISTICAS_VACIAS = {
+    'total_proyectos': 0,
+    'viviendas_total': 0,
+    'obs_total': 0,
+}
+
+
+def invalidar_estadisticas_globales():
+    """Invalida todas las entradas cacheadas (cambia la versión de la clave)."""
+    incrementar_version_cache(GRUPO_CACHE)
+
+
+def alcance_estadisticas(user):
+    """Identificador del conjunto de datos que ve el usuario en el encabezado."""
+    rol = user.rol.nombre if user.rol else None
+    if rol == 'FAMILIA':
+        return f'familia:{user.pk}'
+    if rol == 'CONSTRUCTORA':
+        if user.constructora_id:
+            return f'constructora:{user.constructora_id}'
+        if user.empresa:
+            return f'empresa:{user.empresa.strip().lower()}'
+        return 'ninguno'
+    return 'global'
+
+
+def _calcular(user, alcance):
+    if alcance == 'ninguno':
+        return dict(ESTADISTICAS_VACIAS)
+
+    if alcance.startswith('familia:'):
+        # Solo estadísticas de SUS viviendas
+        alcance_usuario = obtener_alcance(user)
+        if not alcance_usuario.vivienda_ids:
+            return dict(ESTADISTICAS_VACIAS)
+        return {
+            'total_proyectos': len(alcance_usuario.proyecto_ids),
+            'viviendas_total': len(alcance_usuario.vivienda_ids),
+            'obs_total': Observacion.objects.filter(vivienda_id__in=alcance_usuario.vivienda_ids).count(),
+        }
+
+    if alcance.startswith('constructora:'):
+        proyectos = Proyecto.objects.filter(constructora_id=user.constructora_id)
+        observaciones = Observacion.objects.filter(vivienda__proyecto__constructora_id=user.constructora_id)
+    elif alcance.startswith('empresa:'):
+        # Fallback al campo legacy
+        empresa_usuario = user.empresa.strip().lower()
+        proyectos = Proyecto.objects.filter(constructora__nombre__icontains=empresa_usuario)
+        observaciones = Observacion.objects.filter(vivienda__proyecto__constructora__nombre__icontains=empresa_usuario)
+    else:
+        proyectos = Proyecto.objects.all()
+        observaciones = Observacion.objects.all()
+    return {
+        'total_proyectos': proyectos.count(),
+        'viviendas_total': Vivienda.objects.filter(proyecto__in=proyectos, activa=True).count(),
+        'obs_total': observaciones.count(),
+    }
+
+
+def obtener_estadisticas_globales(user):
+    """Estadísticas del encabezado para `user`, desde caché si están vigentes."""
+    alcance = alcance_estadisticas(user)
+    clave = f'{GRUPO_CACHE}:v{version_cache(GRUPO_CACHE)}:{alcance}'
+    estadisticas = cache.get(clave)
+    if estadisticas is None:
+        estadisticas = _calcular(user, alcance)
+        cache.set(clave, estadisticas, getattr(settings, 'GLOBAL_STATS_CACHE_TTL', TTL_POR_DEFECTO))
+    return estadisticas
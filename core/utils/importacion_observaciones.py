@@ -0,0 +1,411 @@
+"""
+Importación por lotes de la base central de observaciones de postventa
+(Excel `Base-central-de-observaciones-de-postventa-sin-filtro.xlsx`).
+
+En vez de consultar la base por cada fila, trabaja por fases:
+
+1. Preparar: columnas derivadas (códigos, estado, tipo, urgencia, fecha)
+   calculadas con operaciones de pandas sobre todo el DataFrame.
+2. Catálogos: proyectos, viviendas y recintos que faltan se crean con un
+   bulk_create por tabla.
+3. Resolver: las referencias se cruzan con las filas mediante `map`/`merge`.
+   Las tablas pequeñas (tipologías, tipos, estados) se leen una vez por
+   importador; de las grandes (proyectos, viviendas, recintos y
+   observaciones ya importadas) solo se leen las filas con las claves del
+   bloque, así cada bloque cuesta lo mismo aunque las tablas crezcan.
+4. Escribir: bulk_create de las observaciones nuevas (y bulk_update de
+   las existentes con `actualizar`), en lotes de `tamano_lote` con una
+   transacción por lote. bulk_create no emite signals: cada lote recibe su
+   fecha de vencimiento (core.utils.vencimiento) y se reindexa para la
+   búsqueda, y al final se invalidan las estadísticas.
+
+Con `dry_run` todo corre dentro de una transacción que se revierte, así
+los conteos son los reales sin escribir nada. El comando lee el Excel por
+bloques (core.utils.ingesta_excel) y llama a `importar` con cada uno.
+"""
+import time
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from core.models import Comuna, Constructora, Region
+from core.utils.busqueda_observaciones import reindexar_observaciones
+from core.utils.global_stats import invalidar_estadisticas_globales
+from core.utils.vencimiento import MotorVencimiento
+from incidencias.models import EstadoObservacion, Observacion, TipoObservacion
+from proyectos.models import Proyecto, Recinto, TipologiaVivienda, Vivienda
+
+TAMANO_LOTE = 1000
+# bulk_update arma un CASE con una rama por fila y el motor lo evalúa fila a
+# fila: por encima de ~100 filas por UPDATE el costo crece cuadráticamente
+TAMANO_UPDATE = 100
+# Claves por consulta `IN` (bajo el límite de variables de SQLite)
+TAMANO_CONSULTA = 2000
+EMAIL_IMPORTADOR = 'import@techo.org'
+
+# Estado según PV_ESTADO (cualquier otro valor: Abierta)
+ESTADOS_PV = {1: 'Cerrada', 99: 'Rechazada'}
+# Tipo según palabras del elemento, en orden de prioridad (si ninguna: General)
+TIPOS_POR_ELEMENTO = [
+    ('Carpintería', ('puerta', 'ventana')),
+    ('Sanitario', ('wc', 'tina', 'lavamanos')),
+    ('Instalaciones', ('luz', 'enchufe')),
+    ('Terminaciones', ('pintura', 'piso', 'cielo')),
+]
+TIPO_POR_DEFECTO = 'General'
+CAMPOS_COMPARADOS = [
+    'vivienda_id', 'recinto_id', 'elemento', 'detalle', 'tipo_id', 'estado_id', 'es_urgente', 'prioridad',
+]
+CAMPOS_ACTUALIZABLES = [
+    'vivienda', 'recinto', 'elemento', 'detalle', 'tipo', 'estado', 'es_urgente', 'prioridad',
+    'fecha_ultima_actualizacion',
+]
+
+
+class ErrorImportacion(Exception):
+    """Faltan datos de referencia para importar (p. ej. estados de observación)."""
+
+
+class ResumenImportacion:
+    def __init__(self):
+        self.filas = 0
+        self.creadas = 0
+        self.actualizadas = 0
+        self.existentes = 0
+        self.duplicadas = 0
+        self.sin_proyecto = 0
+        self.sin_vivienda = 0
+        self.proyectos_creados = 0
+        self.viviendas_creadas = 0
+        self.recintos_creados = 0
+        self.tiempos = {}
+
+    @property
+    def segundos(self):
+        return sum(self.tiempos.values())
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas / self.segundos if self.segundos else 0.0
+
+
+def _entero_texto(serie):
+    """Códigos numéricos del Excel (int o float) como texto: 758.0 -> '758'; vacío -> NA."""
+    return pd.to_numeric(serie, errors='coerce').astype('Int64').astype('string')
+
+
+def _texto(serie):
+    return serie.astype('string').fillna('').str.strip()
+
+
+def _coordenada(valor):
+    # La base trae grados multiplicados por 10^6 (-32845735 -> -32.845735)
+    if pd.isna(valor):
+        return None
+    valor = float(valor)
+    return round(valor / 1_000_000 if abs(valor) > 180 else valor, 8)
+
+
+def _por_claves(queryset, campo, claves, *columnas):
+    """Tuplas `columnas` de las filas cuyo `campo` está en `claves`, con un IN por cada TAMANO_CONSULTA claves."""
+    claves = list(claves)
+    filas = []
+    for inicio in range(0, len(claves), TAMANO_CONSULTA):
+        filas += queryset.filter(**{f'{campo}__in': claves[inicio:inicio + TAMANO_CONSULTA]}).values_list(*columnas)
+    return filas
+
+
+def _unicos(serie):
+    return serie.dropna().unique().tolist()
+
+
+def preparar_filas(df):
+    """DataFrame con una fila por observación a importar y sus columnas ya normalizadas."""
+    df = df[df['PV_ID'].notna() & df['PYTO_COD'].notna() & df['VDA_CODIGO'].notna()]
+    elemento = _texto(df['PV_ELEMENTO'])
+    elemento_min = elemento.str.lower()
+    urgente = (pd.to_numeric(df['PV_ESURGENTE'], errors='coerce') == 1).to_numpy()
+    fechas = pd.to_datetime(df['PV_FECHAREGISTRO'], errors='coerce', format='mixed')
+    fechas = fechas.dt.tz_localize(timezone.get_current_timezone(), ambiguous='NaT', nonexistent='shift_forward')
+
+    filas = pd.DataFrame({
+        'id_externo': _entero_texto(df['PV_ID']),
+        'codigo_proyecto': _entero_texto(df['PYTO_COD']) + '-' + _texto(df['PYTO_SIGLAS']),
+        'codigo_vivienda': _entero_texto(df['VDA_CODIGO']),
+        'tipologia_recinto': _entero_texto(df['RECINTO_TIPOLOGIA']),
+        'codigo_recinto': _entero_texto(df['RECINTO_COD']),
+        'elemento': elemento.str[:Observacion._meta.get_field('elemento').max_length],
+        'detalle': _texto(df['PV_DESCRIPCION']),
+        'estado': pd.to_numeric(df['PV_ESTADO'], errors='coerce').map(ESTADOS_PV).fillna('Abierta'),
+        'tipo': np.select(
+            [elemento_min.str.contains('|'.join(palabras), regex=True) for _, palabras in TIPOS_POR_ELEMENTO],
+            [nombre for nombre, _ in TIPOS_POR_ELEMENTO],
+            default=TIPO_POR_DEFECTO,
+        ),
+        'es_urgente': urgente,
+        'prioridad': np.where(urgente, Observacion.Prioridad.ALTA, Observacion.Prioridad.MEDIA),
+        'fecha_creacion': fechas.fillna(timezone.now()),
+    })
+    return filas.dropna(subset=['id_externo', 'codigo_vivienda']).reset_index(drop=True)
+
+
+class ImportadorObservaciones:
+    """
+    Importa un DataFrame de la base central. `salida` recibe los mensajes de
+    avance (p. ej. self.stdout.write de un comando). `importar` puede
+    llamarse una vez por bloque del archivo: el resumen se acumula.
+    """
+
+    def __init__(self, actualizar=False, tamano_lote=TAMANO_LOTE, salida=None):
+        self.actualizar = actualizar
+        self.tamano_lote = tamano_lote
+        self.salida = salida or (lambda mensaje: None)
+        self.resumen = ResumenImportacion()
+        self.referencias = None
+
+    def importar(self, df, dry_run=False):
+        with transaction.atomic():
+            self._fase('preparar', lambda: self._preparar(df))
+            self._fase('catalogos', self._crear_catalogos)
+            self._fase('resolver', self._resolver)
+            self._fase('escribir', self._escribir)
+            if dry_run:
+                transaction.set_rollback(True)
+                # Lo creado en esta llamada (p. ej. el usuario importador) se revirtió
+                self.referencias = None
+        if not dry_run and (self.resumen.creadas or self.resumen.actualizadas):
+            invalidar_estadisticas_globales()
+        return self.resumen
+
+    def _fase(self, nombre, funcion):
+        inicio = time.perf_counter()
+        funcion()
+        segundos = time.perf_counter() - inicio
+        self.resumen.tiempos[nombre] = self.resumen.tiempos.get(nombre, 0.0) + segundos
+        self.salida(f'  {nombre}: {segundos:.2f}s')
+
+    # --- Fase 1 ---
+
+    def _preparar(self, df):
+        filas = preparar_filas(df)
+        self.resumen.filas += len(filas)
+        unicas = filas.drop_duplicates('id_externo', keep='first')
+        self.resumen.duplicadas += len(filas) - len(unicas)
+        self.filas = unicas
+        self.df = df
+
+    # --- Fase 2 ---
+
+    def _cargar_referencias(self):
+        """Datos base y tablas pequeñas, leídos en el primer bloque y reutilizados en los siguientes."""
+        if self.referencias is not None:
+            return
+        region, _ = Region.objects.get_or_create(codigo='05', defaults={'nombre': 'Valparaíso'})
+        comuna, _ = Comuna.objects.get_or_create(codigo='05401', defaults={'nombre': 'La Cruz', 'region': region})
+        constructora, _ = Constructora.objects.get_or_create(
+            nombre='DYR', defaults={'direccion': '', 'activo': True, 'region': region, 'comuna': comuna},
+        )
+        self.usuario, _ = get_user_model().objects.get_or_create(
+            email=EMAIL_IMPORTADOR, defaults={'nombre': 'Importador Techo'},
+        )
+        estados = dict(EstadoObservacion.objects.values_list('nombre', 'id'))
+        faltantes = {'Abierta', *ESTADOS_PV.values()} - estados.keys()
+        if faltantes:
+            raise ErrorImportacion(f'Faltan estados de observación: {", ".join(sorted(faltantes))}')
+        self.referencias = {
+            'comuna': comuna,
+            'constructora': constructora,
+            'tipologias': {str(codigo): pk for codigo, pk in TipologiaVivienda.objects.values_list('codigo', 'id')},
+            'estados': estados,
+            'tipos': {
+                nombre: TipoObservacion.objects.get_or_create(nombre=nombre)[0].pk
+                for nombre in [TIPO_POR_DEFECTO, *(nombre for nombre, _ in TIPOS_POR_ELEMENTO)]
+            },
+        }
+
+    def _crear_catalogos(self):
+        self._cargar_referencias()
+        comuna, constructora = self.referencias['comuna'], self.referencias['constructora']
+        tipologias = self.referencias['tipologias']
+        df = self.df[self.df['PYTO_COD'].notna()]
+        codigos_proyecto = _entero_texto(df['PYTO_COD']) + '-' + _texto(df['PYTO_SIGLAS'])
+
+        # Proyectos
+        codigos = _unicos(codigos_proyecto)
+        existentes = {codigo for codigo, in _por_claves(Proyecto.objects, 'codigo', codigos, 'codigo')}
+        hoy = timezone.localdate()
+        nuevos = df.assign(codigo=codigos_proyecto).drop_duplicates('codigo')
+        nuevos = nuevos[~nuevos['codigo'].isin(existentes)]
+        Proyecto.objects.bulk_create([
+            Proyecto(
+                codigo=fila.codigo, nombre=fila.PYTO_NOMBRE if pd.notna(fila.PYTO_NOMBRE) else 'Proyecto Techo Chile',
+                siglas=fila.PYTO_SIGLAS if pd.notna(fila.PYTO_SIGLAS) else '',
+                region=comuna.region, comuna=comuna, constructora=constructora,
+                coordenadas_s=_coordenada(fila.PYTO_S), coordenadas_w=_coordenada(fila.PYTO_W),
+                # bulk_create no pasa por Proyecto.save()
+                fecha_entrega=hoy, fecha_termino_postventa=hoy + timedelta(days=120),
+                creado_por=self.usuario,
+            )
+            for fila in nuevos.itertuples()
+        ], batch_size=self.tamano_lote)
+        self.resumen.proyectos_creados += len(nuevos)
+        self.proyectos = dict(_por_claves(Proyecto.objects, 'codigo', codigos, 'codigo', 'id'))
+
+        # Viviendas (requieren tipología)
+        viviendas = pd.DataFrame({
+            'proyecto_id': codigos_proyecto.map(self.proyectos),
+            'codigo': _entero_texto(df['VDA_CODIGO']),
+            'tipologia_id': _entero_texto(df['VDA_TIPOLOGIA']).map(tipologias),
+            'familia': _texto(df['VDA_FAMILIA']),
+        }).dropna(subset=['proyecto_id', 'codigo', 'tipologia_id']).drop_duplicates(['proyecto_id', 'codigo'])
+        existentes = set(self._viviendas(viviendas['proyecto_id'], viviendas['codigo'], 'proyecto_id', 'codigo'))
+        nuevas = [
+            Vivienda(
+                proyecto_id=int(fila.proyecto_id), codigo=fila.codigo, tipologia_id=int(fila.tipologia_id),
+                familia_beneficiaria=fila.familia or 'Sin especificar', estado='construccion',
+            )
+            for fila in viviendas.itertuples() if (int(fila.proyecto_id), fila.codigo) not in existentes
+        ]
+        Vivienda.objects.bulk_create(nuevas, batch_size=self.tamano_lote)
+        self.resumen.viviendas_creadas += len(nuevas)
+
+        # Recintos (únicos por tipología y código)
+        recintos = df.assign(
+            tipologia_id=_entero_texto(df['RECINTO_TIPOLOGIA']).map(tipologias),
+            codigo=_entero_texto(df['RECINTO_COD']),
+        ).dropna(subset=['tipologia_id', 'codigo', 'RECINTO_NOMBRE']).drop_duplicates(['tipologia_id', 'codigo'])
+        existentes = set(self._recintos(recintos['tipologia_id'], recintos['codigo'], 'tipologia_id', 'codigo'))
+        nuevos = [
+            Recinto(
+                tipologia_id=int(fila.tipologia_id), codigo=fila.codigo, nombre=fila.RECINTO_NOMBRE,
+                elementos_disponibles=[
+                    elemento.strip() for elemento in str(fila.RECINTO_ELEMENTOS).split(',') if elemento.strip()
+                ] if pd.notna(fila.RECINTO_ELEMENTOS) else [],
+            )
+            for fila in recintos.itertuples() if (int(fila.tipologia_id), fila.codigo) not in existentes
+        ]
+        Recinto.objects.bulk_create(nuevos, batch_size=self.tamano_lote)
+        self.resumen.recintos_creados += len(nuevos)
+
+    def _viviendas(self, proyecto_ids, codigos, *columnas):
+        # Se acota por proyecto y por código; el cruce exacto (proyecto, código) lo hace quien llama
+        viviendas = Vivienda.objects.filter(proyecto_id__in=[int(pk) for pk in _unicos(proyecto_ids)])
+        return _por_claves(viviendas, 'codigo', _unicos(codigos), *columnas)
+
+    def _recintos(self, tipologia_ids, codigos, *columnas):
+        recintos = Recinto.objects.filter(tipologia_id__in=[int(pk) for pk in _unicos(tipologia_ids)])
+        return _por_claves(recintos, 'codigo', _unicos(codigos), *columnas)
+
+    # --- Fase 3 ---
+
+    def _resolver(self):
+        filas = self.filas.assign(
+            proyecto_id=self.filas['codigo_proyecto'].map(self.proyectos),
+            estado_id=self.filas['estado'].map(self.referencias['estados']),
+            tipo_id=self.filas['tipo'].map(self.referencias['tipos']),
+        )
+        self.resumen.sin_proyecto += int(filas['proyecto_id'].isna().sum())
+        filas = filas.dropna(subset=['proyecto_id'])
+
+        viviendas = pd.DataFrame(
+            self._viviendas(filas['proyecto_id'], filas['codigo_vivienda'], 'id', 'proyecto_id', 'codigo'),
+            columns=['vivienda_id', 'proyecto_id', 'codigo_vivienda'],
+        )
+        recintos = pd.DataFrame(
+            [(pk, str(tipologia), codigo) for pk, tipologia, codigo in self._recintos(
+                filas['tipologia_recinto'].map(self.referencias['tipologias']), filas['codigo_recinto'],
+                'id', 'tipologia__codigo', 'codigo',
+            )],
+            columns=['recinto_id', 'tipologia_recinto', 'codigo_recinto'],
+        )
+        filas = filas.astype({'proyecto_id': 'int64', 'codigo_vivienda': object, 'tipologia_recinto': object,
+                              'codigo_recinto': object})
+        filas = filas.merge(viviendas, how='left', on=['proyecto_id', 'codigo_vivienda'])
+        filas = filas.merge(recintos, how='left', on=['tipologia_recinto', 'codigo_recinto'])
+        self.resumen.sin_vivienda += int(filas['vivienda_id'].isna().sum())
+        filas = filas.dropna(subset=['vivienda_id'])
+
+        existentes = dict(_por_claves(Observacion.objects, 'id_externo', _unicos(filas['id_externo']), 'id_externo', 'id'))
+        filas['observacion_id'] = filas['id_externo'].map(existentes)
+        self.nuevas = filas[filas['observacion_id'].isna()]
+        self.existentes = filas[filas['observacion_id'].notna()]
+        self.resumen.existentes += len(self.existentes)
+        if self.actualizar:
+            self.existentes = self._con_cambios(self.existentes)
+
+    def _con_cambios(self, filas):
+        """Solo las filas cuyos datos difieren de la observación guardada (evita UPDATE inútiles)."""
+        if filas.empty:
+            return filas
+        actuales = pd.DataFrame(
+            _por_claves(Observacion.objects, 'pk', [int(pk) for pk in _unicos(filas['observacion_id'])],
+                        'id', *CAMPOS_COMPARADOS),
+            columns=['observacion_id', *CAMPOS_COMPARADOS],
+        )
+        cruce = filas.merge(actuales, how='left', on='observacion_id', suffixes=('', '_actual'))
+        distinto = np.zeros(len(cruce), dtype=bool)
+        for campo in CAMPOS_COMPARADOS:
+            # -1 en vez de nulo: NaN nunca es igual a NaN
+            nuevo = cruce[campo].astype(object).fillna(-1)
+            actual = cruce[f'{campo}_actual'].astype(object).fillna(-1)
+            distinto |= (nuevo != actual).to_numpy()
+        return filas[distinto]
+
+    # --- Fase 4 ---
+
+    def _observacion(self, fila):
+        return Observacion(
+            pk=None if pd.isna(fila.observacion_id) else int(fila.observacion_id),
+            id_externo=fila.id_externo, proyecto_id=int(fila.proyecto_id), vivienda_id=int(fila.vivienda_id),
+            recinto_id=None if pd.isna(fila.recinto_id) else int(fila.recinto_id),
+            elemento=fila.elemento, detalle=fila.detalle, tipo_id=int(fila.tipo_id), estado_id=int(fila.estado_id),
+            es_urgente=bool(fila.es_urgente), prioridad=fila.prioridad,
+            fecha_creacion=fila.fecha_creacion.to_pydatetime(), creado_por=self.usuario,
+        )
+
+    def _lotes(self, filas):
+        for inicio in range(0, len(filas), self.tamano_lote):
+            yield filas.iloc[inicio:inicio + self.tamano_lote]
+
+    def _escribir(self):
+        creadas = actualizadas = 0
+        vencimiento = MotorVencimiento()
+        for lote in self._lotes(self.nuevas):
+            with transaction.atomic():
+                observaciones = [self._observacion(fila) for fila in lote.itertuples()]
+                fechas = [observacion.fecha_creacion for observacion in observaciones]
+                Observacion.objects.bulk_create(observaciones)
+                if observaciones and observaciones[0].pk is None:
+                    # Motores sin RETURNING en inserciones masivas
+                    ids = dict(Observacion.objects.filter(id_externo__in=lote['id_externo'].tolist())
+                               .values_list('id_externo', 'id'))
+                    for observacion in observaciones:
+                        observacion.pk = ids[observacion.id_externo]
+                # auto_now_add reemplaza la fecha al insertar: se restaura la del Excel
+                for observacion, fecha in zip(observaciones, fechas):
+                    observacion.fecha_creacion = fecha
+                Observacion.objects.bulk_update(observaciones, ['fecha_creacion'], batch_size=TAMANO_UPDATE)
+                insertadas = Observacion.objects.filter(pk__in=[obs.pk for obs in observaciones])
+                # Plazo desde la fecha del Excel (bulk_create no pasa por el signal pre_save)
+                vencimiento.asignar(insertadas)
+                reindexar_observaciones(insertadas)
+            self.resumen.creadas += len(observaciones)
+            creadas += len(observaciones)
+            self.salida(f'  Observaciones creadas: {creadas}/{len(self.nuevas)}')
+
+        if not self.actualizar:
+            return
+        ahora = timezone.now()
+        for lote in self._lotes(self.existentes):
+            with transaction.atomic():
+                observaciones = [self._observacion(fila) for fila in lote.itertuples()]
+                for observacion in observaciones:
+                    # bulk_update no aplica auto_now
+                    observacion.fecha_ultima_actualizacion = ahora
+                Observacion.objects.bulk_update(observaciones, CAMPOS_ACTUALIZABLES, batch_size=TAMANO_UPDATE)
+                reindexar_observaciones(Observacion.objects.filter(pk__in=[obs.pk for obs in observaciones]))
+            self.resumen.actualizadas += len(observaciones)
+            actualizadas += len(observaciones)
+            self.salida(f'  Observaciones actualizadas: {actualizadas}/{len(self.existentes)}')
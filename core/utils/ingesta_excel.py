@@ -0,0 +1,228 @@
+"""
+Lectura de planillas Excel por bloques, con punto de control para retomar.
+
+La hoja se recorre en modo read-only de openpyxl (las filas se leen del
+XML a medida que se piden, sin cargar el libro en memoria) y se entrega en
+bloques de `tamano_bloque` filas como DataFrames cuyo índice es el número
+de fila de datos en la hoja (fila Excel = índice + 2).
+
+Cada bloque se procesa en su propia transacción, y en esa misma transacción
+se guarda en PuntoControlImportacion cuántas filas quedaron confirmadas,
+con el archivo identificado por su SHA-256. Si la importación se
+interrumpe, la siguiente ejecución con el mismo archivo parte desde la
+primera fila no confirmada; un archivo ya importado completo (o uno
+modificado) se procesa desde el inicio.
+
+Con `en_proceso` la lectura corre en un proceso aparte que va dejando
+bloques en una cola (como máximo BLOQUES_EN_COLA por delante), así el
+análisis del XML del bloque siguiente se superpone con la escritura del
+actual.
+"""
+import hashlib
+import multiprocessing
+import os
+from itertools import islice
+import openpyxl
+import pandas as pd
+from django.db import transaction
+
+TAMANO_BLOQUE = 5000
+BLOQUES_EN_COLA = 2
+# Bytes leídos por vez al calcular el hash
+TAMANO_LECTURA = 1024 * 1024
+
+
+class Bloque:
+    """Filas [inicio, fin) de datos de la hoja (sin contar el encabezado)."""
+
+    def __init__(self, inicio, fin, df):
+        self.inicio = inicio
+        self.fin = fin
+        self.df = df
+
+    def __len__(self):
+        return len(self.df)
+
+
+def hash_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for parte in iter(lambda: archivo.read(TAMANO_LECTURA), b''):
+            sha.update(parte)
+    return sha.hexdigest()
+
+
+def _hoja(libro, hoja):
+    if isinstance(hoja, str) and hoja.isdigit():
+        hoja = int(hoja)
+    return libro.worksheets[hoja] if isinstance(hoja, int) else libro[hoja]
+
+
+def _columnas(encabezado):
+    # Igual que pandas.read_excel: vacíos como "Unnamed: n" y repetidos como "X.1", "X.2"...
+    columnas, vistas = [], {}
+    for i, valor in enumerate(encabezado):
+        nombre = str(valor).strip() if valor is not None else f'Unnamed: {i}'
+        if nombre in vistas:
+            vistas[nombre] += 1
+            nombre = f'{nombre}.{vistas[nombre]}'
+        else:
+            vistas[nombre] = 0
+        columnas.append(nombre)
+    return columnas
+
+
+def leer_bloques(ruta, hoja=0, tamano_bloque=TAMANO_BLOQUE, desde=0):
+    """Bloques de la hoja a partir de la fila de datos `desde`. Las filas vacías se omiten."""
+    libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = _hoja(libro, hoja).iter_rows(values_only=True)
+        columnas = _columnas(next(filas, ()))
+        inicio = desde
+        filas = islice(filas, desde, None)
+        while True:
+            valores = list(islice(filas, tamano_bloque))
+            if not valores:
+                break
+            indice, datos = [], []
+            for i, fila in enumerate(valores, inicio):
+                if any(valor is not None for valor in fila):
+                    indice.append(i)
+                    datos.append(tuple(fila[:len(columnas)]) + (None,) * (len(columnas) - len(fila)))
+            df = pd.DataFrame.from_records(datos, columns=columnas, index=pd.Index(indice, dtype='int64'))
+            # Las filas vacías también cuentan como avance
+            yield Bloque(inicio, inicio + len(valores), df)
+            inicio += len(valores)
+    finally:
+        libro.close()
+
+
+def _leer_en_cola(ruta, hoja, tamano_bloque, desde, cola):
+    try:
+        for bloque in leer_bloques(ruta, hoja, tamano_bloque, desde):
+            cola.put(bloque)
+        cola.put(None)
+    except Exception as error:
+        cola.put(error)
+
+
+def leer_bloques_en_proceso(ruta, hoja=0, tamano_bloque=TAMANO_BLOQUE, desde=0):
+    """Como `leer_bloques`, pero la lectura corre en un proceso aparte."""
+    contexto = multiprocessing.get_context()
+    cola = contexto.Queue(maxsize=BLOQUES_EN_COLA)
+    lector = contexto.Process(target=_leer_en_cola, args=(ruta, hoja, tamano_bloque, desde, cola), daemon=True)
+    lector.start()
+    try:
+        while True:
+            bloque = cola.get()
+            if bloque is None:
+                break
+            if isinstance(bloque, Exception):
+                raise bloque
+            yield bloque
+    finally:
+        if lector.is_alive():
+            lector.terminate()
+        lector.join()
+
+
+def agregar_argumentos(parser, punto_control=True):
+    """Opciones comunes de los comandos que importan desde Excel."""
+    parser.add_argument(
+        '--bloque', type=int, default=TAMANO_BLOQUE,
+        help=f'Filas leídas y confirmadas por bloque (por defecto {TAMANO_BLOQUE})'
+    )
+    if punto_control:
+        parser.add_argument(
+            '--reiniciar', action='store_true',
+            help='Ignora el punto de control y procesa el archivo desde la primera fila'
+        )
+    parser.add_argument(
+        '--en-proceso', action='store_true',
+        help='Lee el Excel en un proceso aparte mientras se escribe el bloque anterior'
+    )
+
+
+class IngestaExcel:
+    """
+    Recorre una hoja por bloques llevando el punto de control de `importador`.
+
+    Con `registrar=False` (p. ej. en dry-run) no se lee ni se guarda el punto
+    de control y siempre se parte desde la primera fila.
+    """
+
+    def __init__(self, ruta, importador, hoja=0, tamano_bloque=TAMANO_BLOQUE, reiniciar=False,
+                 en_proceso=False, registrar=True):
+        self.ruta = ruta
+        self.importador = importador
+        self.hoja = hoja
+        self.tamano_bloque = tamano_bloque
+        self.en_proceso = en_proceso
+        self.registrar = registrar
+        self.punto_control = self._punto_control(reiniciar) if registrar else None
+
+    @classmethod
+    def desde_opciones(cls, ruta, importador, options, hoja=0, registrar=True):
+        """Instancia con las opciones de `agregar_argumentos`."""
+        return cls(
+            ruta, importador, hoja=hoja, tamano_bloque=options['bloque'], reiniciar=options.get('reiniciar', False),
+            en_proceso=options['en_proceso'], registrar=registrar,
+        )
+
+    def _punto_control(self, reiniciar):
+        from core.models import PuntoControlImportacion
+        punto, _ = PuntoControlImportacion.objects.get_or_create(
+            importador=self.importador, hash_archivo=hash_archivo(self.ruta), hoja=str(self.hoja),
+            defaults={'archivo': os.path.basename(self.ruta)[:255]},
+        )
+        if reiniciar or punto.completado:
+            punto.filas_procesadas = 0
+            punto.completado = False
+            punto.save(update_fields=['filas_procesadas', 'completado', 'fecha_actualizacion'])
+        return punto
+
+    @property
+    def desde(self):
+        """Primera fila de datos pendiente."""
+        return self.punto_control.filas_procesadas if self.punto_control else 0
+
+    @property
+    def columnas(self):
+        """Encabezados de la hoja (lee solo la primera fila)."""
+        libro = openpyxl.load_workbook(self.ruta, read_only=True, data_only=True)
+        try:
+            return _columnas(next(_hoja(libro, self.hoja).iter_rows(max_row=1, values_only=True), ()))
+        finally:
+            libro.close()
+
+    def bloques(self):
+        leer = leer_bloques_en_proceso if self.en_proceso else leer_bloques
+        return leer(self.ruta, self.hoja, self.tamano_bloque, self.desde)
+
+    def confirmar(self, bloque):
+        """Marca el bloque como procesado; llamar dentro de la transacción que lo escribe."""
+        if self.punto_control:
+            self.punto_control.filas_procesadas = bloque.fin
+            self.punto_control.save(update_fields=['filas_procesadas', 'fecha_actualizacion'])
+
+    def finalizar(self):
+        if self.punto_control:
+            self.punto_control.completado = True
+            self.punto_control.save(update_fields=['completado', 'fecha_actualizacion'])
+
+    def procesar(self, funcion):
+        """
+        Llama a `funcion(bloque)` con cada bloque pendiente, cada uno en una
+        transacción junto con su punto de control.
+
+        Returns:
+            cantidad de filas de datos procesadas en esta ejecución
+        """
+        filas = 0
+        for bloque in self.bloques():
+            with transaction.atomic():
+                funcion(bloque)
+                self.confirmar(bloque)
+            filas += len(bloque)
+        self.finalizar()
+        return filas
@@ -0,0 +1,126 @@
+"""
+Motor de KPIs del dashboard.
+
+Calcula los indicadores de observaciones y viviendas con una sola consulta de
+agregación condicional por modelo (COUNT ... FILTER), en lugar de un COUNT
+separado por indicador. Lo usan el dashboard y sus reportes PDF/Excel.
+"""
+from django.db.models import Count, Q, F, Avg, ExpressionWrapper, DurationField
+from django.utils import timezone
+from proyectos.models import Proyecto
+
+ESTADO_ABIERTA = 'Abierta'
+ESTADO_CERRADA = 'Cerrada'
+
+
+def filtrar_rango_fechas(queryset, fecha_inicio=None, fecha_fin=None, campo='fecha_creacion'):
+    """Aplica el filtro de fechas del dashboard sobre `campo` (por día)."""
+    if fecha_inicio:
+        queryset = queryset.filter(**{f'{campo}__date__gte': fecha_inicio})
+    if fecha_fin:
+        queryset = queryset.filter(**{f'{campo}__date__lte': fecha_fin})
+    return queryset
+
+
+def proyectos_del_usuario(user, region_id=None, fecha_inicio=None, fecha_fin=None):
+    """
+    Proyectos visibles en el dashboard para un usuario no FAMILIA,
+    aplicando los filtros de región y fechas.
+    """
+    proyectos_qs = Proyecto.objects.all()
+    if region_id:
+        proyectos_qs = proyectos_qs.filter(region_id=region_id)
+    proyectos_qs = filtrar_rango_fechas(proyectos_qs, fecha_inicio, fecha_fin)
+
+    if user.is_superuser or (user.rol and user.rol.nombre == 'ADMINISTRADOR'):
+        return proyectos_qs
+    if user.rol and user.rol.nombre == 'CONSTRUCTORA':
+        if getattr(user, 'constructora', None):
+            return proyectos_qs.filter(constructora=user.constructora)
+        if getattr(user, 'empresa', None):
+            empresa_usuario = user.empresa.strip().lower()
+            return proyectos_qs.filter(constructora__nombre__icontains=empresa_usuario)
+        return Proyecto.objects.none()
+    return proyectos_qs.filter(
+        Q(creado_por=user) |
+        Q(region=user.region) if user.region else Q()
+    ).distinct()
+
+
+def duracion_resolucion():
+    """Expresión fecha_cierre - fecha_creacion de una observación."""
+    return ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
+
+
+def porcentaje(parte, total):
+    return round((parte / total) * 100, 1) if total else 0
+
+
+def _agregados_observaciones(hoy):
+    abierta = Q(estado__nombre=ESTADO_ABIERTA)
+    cerrada = Q(estado__nombre=ESTADO_CERRADA)
+    return {
+        'total': Count('id'),
+        'abiertas': Count('id', filter=abierta),
+        'cerradas': Count('id', filter=cerrada),
+        'urgentes': Count('id', filter=abierta & Q(es_urgente=True)),
+        'vencidas': Count('id', filter=abierta & Q(fecha_vencimiento__lt=hoy)),
+        'duracion_promedio': Avg(
+            duracion_resolucion(),
+            filter=cerrada & Q(fecha_cierre__isnull=False, fecha_creacion__isnull=False),
+        ),
+    }
+
+
+def _completar_observaciones(datos):
+    total = datos['total']
+    datos['porc_abiertas'] = porcentaje(datos['abiertas'], total)
+    datos['porc_cerradas'] = porcentaje(datos['cerradas'], total)
+    datos['porc_vencidas'] = porcentaje(datos['vencidas'], total)
+    promedio = datos.pop('duracion_promedio')
+    datos['dias_promedio_resolucion'] = int(promedio.total_seconds() // 86400) if promedio else None
+    return datos
+
+
+def kpis_observaciones(obs_qs, hoy=None):
+    """
+    Indicadores de un queryset de Observacion en una sola consulta.
+
+    Returns:
+        dict con total, abiertas, cerradas, urgentes (abiertas), vencidas
+        (abiertas), sus porcentajes y dias_promedio_resolucion (None si no
+        hay observaciones cerradas).
+    """
+    hoy = hoy or timezone.localdate()
+    return _completar_observaciones(obs_qs.aggregate(**_agregados_observaciones(hoy)))
+
+
+def kpis_observaciones_por(obs_qs, *campos, hoy=None):
+    """
+    Mismos indicadores que `kpis_observaciones`, agrupados por `campos`
+    (ej: 'tipo__nombre', 'asignado_a') en una sola consulta GROUP BY.
+    """
+    hoy = hoy or timezone.localdate()
+    filas = (
+        obs_qs.order_by()
+        .values(*campos)
+        .annotate(**_agregados_observaciones(hoy))
+        .order_by('-total')
+    )
+    return [_completar_observaciones(fila) for fila in filas]
+
+
+def kpis_viviendas(viviendas_qs):
+    """
+    Indicadores de un queryset de Vivienda en una sola consulta.
+
+    Returns:
+        dict con total (todas), activas, entregadas (todas) y asignadas
+        (activas con beneficiario).
+    """
+    return viviendas_qs.aggregate(
+        total=Count('id'),
+        activas=Count('id', filter=Q(activa=True)),
+        entregadas=Count('id', filter=Q(estado='entregada')),
+        asignadas=Count('id', filter=Q(activa=True, beneficiario__isnull=False)),
+    )
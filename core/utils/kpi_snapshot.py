@@ -0,0 +1,296 @@
+"""
+Snapshot diario de KPIs (core.models.KpiSnapshot).
+
+`refrescar_snapshot` recalcula solo los días tocados desde la última
+ejecución, detectados por `Observacion.fecha_ultima_actualizacion`,
+`Vivienda.fecha_actualizacion` y `Proyecto.fecha_actualizacion`. Esa
+detección se hace solo al refrescar: las lecturas no vuelven a buscar
+cambios, por lo que un día ya cubierto refleja las modificaciones
+posteriores recién en el siguiente refresco programado.
+
+`kpis_snapshot`, `tendencia_mensual` y `cerradas_por_mes` leen del snapshot
+los días que éste cubre (hasta el día anterior al último refresco) y
+completan el tramo restante con una consulta directa sobre Observacion, por
+lo que su costo depende de la cantidad de días sin cubrir y de meses, y no
+de la de observaciones.
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, DateField
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from core.models import KpiSnapshot, KpiSnapshotEjecucion
+from core.utils.kpi_engine import ESTADO_ABIERTA, ESTADO_CERRADA, duracion_resolucion, porcentaje
+from incidencias.models import Observacion
+from proyectos.models import Proyecto, Vivienda
+
+# Días por lote al borrar/recalcular (límite de parámetros de SQLite)
+TAMANO_LOTE_DIAS = 500
+
+
+def _dias_tocados(desde):
+    """
+    Días de creación de las observaciones modificadas desde `desde` (por sí
+    mismas o por su vivienda o proyecto). Una consulta por marca de tiempo:
+    un OR entre tablas obligaría a recorrer todas las observaciones.
+    """
+    condiciones = (
+        Q(fecha_ultima_actualizacion__gte=desde),
+        Q(vivienda__in=Vivienda.objects.filter(fecha_actualizacion__gte=desde)),
+        Q(vivienda__proyecto__in=Proyecto.objects.filter(fecha_actualizacion__gte=desde)),
+    )
+    dias = set()
+    for condicion in condiciones:
+        dias.update(
+            Observacion.objects.filter(condicion).order_by()
+            .annotate(dia=TruncDate('fecha_creacion'))
+            .values_list('dia', flat=True)
+            .distinct()
+        )
+    return dias
+
+
+def _filas_snapshot(observaciones):
+    filas = (
+        observaciones.order_by()
+        .annotate(
+            dia=TruncDate('fecha_creacion'),
+            mes=TruncMonth('fecha_cierre', output_field=DateField()),
+        )
+        .values(
+            'dia', 'mes', 'activo',
+            'vivienda__proyecto_id',
+            'vivienda__proyecto__region_id',
+            'vivienda__proyecto__constructora_id',
+        )
+        .annotate(
+            total=Count('id'),
+            abiertas=Count('id', filter=Q(estado__nombre='Abierta')),
+            cerradas=Count('id', filter=Q(estado__nombre='Cerrada')),
+            urgentes=Count('id', filter=Q(estado__nombre='Abierta', es_urgente=True)),
+            duracion=Sum(
+                duracion_resolucion(),
+                filter=Q(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False),
+            ),
+        )
+    )
+    return [
+        KpiSnapshot(
+            fecha=f['dia'],
+            mes_cierre=f['mes'],
+            activo=f['activo'],
+            proyecto_id=f['vivienda__proyecto_id'],
+            region_id=f['vivienda__proyecto__region_id'],
+            constructora_id=f['vivienda__proyecto__constructora_id'],
+            obs_total=f['total'],
+            obs_abiertas=f['abiertas'],
+            obs_cerradas=f['cerradas'],
+            obs_urgentes=f['urgentes'],
+            obs_duracion_cerradas=f['duracion'] or timedelta(),
+        )
+        for f in filas
+    ]
+
+
+def refrescar_snapshot(completo=False):
+    """
+    Recalcula las particiones (días) del snapshot tocadas desde el último
+    refresco, o todo el histórico si `completo` o si nunca se ha ejecutado.
+
+    Las observaciones eliminadas físicamente o modificadas con
+    `QuerySet.update()` no actualizan sus marcas de tiempo; para esos casos
+    conviene un refresco completo periódico.
+
+    Returns:
+        KpiSnapshotEjecucion registrada.
+    """
+    ultima = _ultima_ejecucion()
+    completo = completo or ultima is None
+    ejecucion = KpiSnapshotEjecucion.objects.create(inicio=timezone.now(), completo=completo)
+
+    with transaction.atomic():
+        if completo:
+            KpiSnapshot.objects.all().delete()
+            nuevas = _filas_snapshot(Observacion.objects.all())
+            dias = {fila.fecha for fila in nuevas}
+            KpiSnapshot.objects.bulk_create(nuevas, batch_size=1000)
+        else:
+            dias = _dias_tocados(ultima.inicio)
+            lista_dias = sorted(dias)
+            for i in range(0, len(lista_dias), TAMANO_LOTE_DIAS):
+                lote = lista_dias[i:i + TAMANO_LOTE_DIAS]
+                KpiSnapshot.objects.filter(fecha__in=lote).delete()
+                KpiSnapshot.objects.bulk_create(
+                    _filas_snapshot(Observacion.objects.filter(fecha_creacion__date__in=lote)),
+                    batch_size=1000,
+                )
+
+    ejecucion.fin = timezone.now()
+    ejecucion.dias_recalculados = len(dias)
+    ejecucion.save(update_fields=['fin', 'dias_recalculados'])
+    return ejecucion
+
+
+def _ultima_ejecucion():
+    return KpiSnapshotEjecucion.objects.filter(fin__isnull=False).first()
+
+
+def snapshot_cubierto_hasta():
+    """
+    Último día completo reflejado en el snapshot (el anterior al último
+    refresco terminado), o None si nunca se ha refrescado.
+    """
+    ultima = _ultima_ejecucion()
+    if ultima is None:
+        return None
+    return timezone.localdate(ultima.inicio) - timedelta(days=1)
+
+
+def _filtrar(fecha_inicio=None, fecha_fin=None, region_id=None, proyectos=None, solo_activas=True):
+    """Aplica los mismos filtros a KpiSnapshot y a Observacion."""
+    snapshot = KpiSnapshot.objects.all()
+    obs = Observacion.objects.all()
+    if solo_activas:
+        snapshot = snapshot.filter(activo=True)
+        obs = obs.filter(activo=True)
+    if region_id:
+        snapshot = snapshot.filter(region_id=region_id)
+        obs = obs.filter(vivienda__proyecto__region_id=region_id)
+    if proyectos is not None:
+        snapshot = snapshot.filter(proyecto__in=proyectos)
+        obs = obs.filter(vivienda__proyecto__in=proyectos)
+    if fecha_inicio:
+        snapshot = snapshot.filter(fecha__gte=fecha_inicio)
+        obs = obs.filter(fecha_creacion__date__gte=fecha_inicio)
+    if fecha_fin:
+        snapshot = snapshot.filter(fecha__lte=fecha_fin)
+        obs = obs.filter(fecha_creacion__date__lte=fecha_fin)
+    return snapshot, obs
+
+
+def _tramos(**filtros):
+    """
+    Divide la consulta en un queryset de KpiSnapshot (días cubiertos) y uno
+    de Observacion (días posteriores), con los mismos filtros aplicados.
+    Cada día sale de uno solo de los dos.
+    """
+    snapshot, obs = _filtrar(**filtros)
+    cubierto_hasta = snapshot_cubierto_hasta()
+    if cubierto_hasta is None:
+        return snapshot.none(), obs
+    return snapshot.filter(fecha__lte=cubierto_hasta), obs.filter(fecha_creacion__date__gt=cubierto_hasta)
+
+
+def kpis_snapshot(hoy=None, **filtros):
+    """
+    Mismos indicadores que `kpi_engine.kpis_observaciones`, leídos del
+    snapshot en los días cubiertos. Acepta los filtros de `tendencia_mensual`.
+
+    Las vencidas dependen de `hoy` y no se guardan por día: salen de una
+    consulta sobre las abiertas con vencimiento pasado (índice estado,
+    fecha_vencimiento).
+    """
+    hoy = hoy or timezone.localdate()
+    snapshot, obs = _tramos(**filtros)
+    datos = snapshot.aggregate(
+        total=Sum('obs_total'),
+        abiertas=Sum('obs_abiertas'),
+        cerradas=Sum('obs_cerradas'),
+        urgentes=Sum('obs_urgentes'),
+        cerradas_con_fecha=Sum('obs_cerradas', filter=Q(mes_cierre__isnull=False)),
+        duracion=Sum('obs_duracion_cerradas'),
+    )
+    cerrada = Q(estado__nombre=ESTADO_CERRADA)
+    resto = obs.aggregate(
+        total=Count('id'),
+        abiertas=Count('id', filter=Q(estado__nombre=ESTADO_ABIERTA)),
+        cerradas=Count('id', filter=cerrada),
+        urgentes=Count('id', filter=Q(estado__nombre=ESTADO_ABIERTA, es_urgente=True)),
+        cerradas_con_fecha=Count('id', filter=cerrada & Q(fecha_cierre__isnull=False)),
+        duracion=Sum(
+            duracion_resolucion(),
+            filter=cerrada & Q(fecha_cierre__isnull=False, fecha_creacion__isnull=False),
+        ),
+    )
+    duracion = (datos.pop('duracion') or timedelta()) + (resto.pop('duracion') or timedelta())
+    for campo, valor in resto.items():
+        datos[campo] = (datos[campo] or 0) + valor
+    datos['vencidas'] = (
+        _filtrar(**filtros)[1].filter(estado__nombre=ESTADO_ABIERTA, fecha_vencimiento__lt=hoy).count()
+    )
+
+    total = datos['total']
+    cerradas_con_fecha = datos.pop('cerradas_con_fecha')
+    promedio = duracion / cerradas_con_fecha if cerradas_con_fecha else None
+    datos['porc_abiertas'] = porcentaje(datos['abiertas'], total)
+    datos['porc_cerradas'] = porcentaje(datos['cerradas'], total)
+    datos['porc_vencidas'] = porcentaje(datos['vencidas'], total)
+    datos['dias_promedio_resolucion'] = int(promedio.total_seconds() // 86400) if promedio else None
+    return datos
+
+
+def _sumar_por_mes(acumulado, filas, *campos):
+    for fila in filas:
+        mes = fila['mes']
+        totales = acumulado.setdefault(mes, dict.fromkeys(campos, 0))
+        for campo in campos:
+            totales[campo] += fila[campo] or 0
+
+
+def _ordenar_meses(acumulado):
+    # Los meses sin fecha (None) van al final
+    return [
+        {'mes': mes, **totales}
+        for mes, totales in sorted(acumulado.items(), key=lambda item: (item[0] is None, item[0] or 0))
+    ]
+
+
+def tendencia_mensual(**filtros):
+    """
+    Observaciones abiertas y cerradas agrupadas por mes de creación.
+
+    Acepta fecha_inicio, fecha_fin, region_id, proyectos (queryset) y
+    solo_activas. Returns: [{'mes': date, 'abiertos': int, 'cerrados': int}]
+    """
+    snapshot, obs = _tramos(**filtros)
+    acumulado = {}
+    _sumar_por_mes(
+        acumulado,
+        snapshot.annotate(mes=TruncMonth('fecha')).values('mes').annotate(
+            abiertos=Sum('obs_abiertas'), cerrados=Sum('obs_cerradas'),
+        ).order_by('mes'),
+        'abiertos', 'cerrados',
+    )
+    _sumar_por_mes(
+        acumulado,
+        obs.annotate(mes=TruncMonth('fecha_creacion', output_field=DateField())).values('mes').annotate(
+            abiertos=Count('id', filter=Q(estado__nombre='Abierta')),
+            cerrados=Count('id', filter=Q(estado__nombre='Cerrada')),
+        ).order_by('mes'),
+        'abiertos', 'cerrados',
+    )
+    return _ordenar_meses(acumulado)
+
+
+def cerradas_por_mes(**filtros):
+    """
+    Observaciones cerradas agrupadas por mes de cierre (None si no tienen
+    fecha de cierre), con los mismos filtros que `tendencia_mensual`.
+
+    Returns: [{'mes': date | None, 'total': int}]
+    """
+    snapshot, obs = _tramos(**filtros)
+    acumulado = {}
+    _sumar_por_mes(
+        acumulado,
+        snapshot.filter(obs_cerradas__gt=0).values(mes=F('mes_cierre')).annotate(total=Sum('obs_cerradas')).order_by('mes'),
+        'total',
+    )
+    _sumar_por_mes(
+        acumulado,
+        obs.filter(estado__nombre='Cerrada')
+        .annotate(mes=TruncMonth('fecha_cierre', output_field=DateField()))
+        .values('mes').annotate(total=Count('id')).order_by('mes'),
+        'total',
+    )
+    return _ordenar_meses(acumulado)
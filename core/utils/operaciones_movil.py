@@ -0,0 +1,191 @@
+"""
+Aplicación por lotes de la cola de operaciones offline de la app móvil.
+
+El cliente acumula operaciones (cambio de estado, comentario, descripción,
+archivo) mientras no tiene conexión y las envía juntas, en orden, cada una
+con una clave de idempotencia propia. `aplicar_lote` las aplica en una sola
+transacción: carga observaciones y estados con una consulta cada uno, guarda
+las observaciones modificadas con `bulk_update` y crea todos los
+seguimientos con un `bulk_create`. Las claves ya aplicadas (reintentos) no se
+vuelven a ejecutar; se devuelve el resultado registrado la primera vez.
+"""
+import os
+from django.db import transaction
+from django.utils import timezone
+from core.permisos import puede_editar_observacion
+from core.utils.busqueda_observaciones import reindexar_observaciones
+from incidencias.models import (
+    Observacion, EstadoObservacion, SeguimientoObservacion, ArchivoAdjuntoObservacion, OperacionMovil,
+)
+
+TIPOS_OPERACION = ('cambiar_estado', 'comentario', 'descripcion', 'archivo')
+MAX_OPERACIONES_POR_LOTE = 200
+TAMANO_MAXIMO_ARCHIVO = 10 * 1024 * 1024
+EXTENSIONES_PERMITIDAS = ['jpg', 'jpeg', 'png', 'pdf', 'doc', 'docx', 'txt']
+
+
+class OperacionRechazada(Exception):
+    """La operación no se puede aplicar; el mensaje se devuelve al cliente."""
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _validar_formato(operacion):
+    if not isinstance(operacion, dict):
+        raise OperacionRechazada('Operación inválida')
+    clave = operacion.get('clave')
+    if not isinstance(clave, str) or not clave or len(clave) > 64:
+        raise OperacionRechazada('Clave de idempotencia inválida')
+    if operacion.get('tipo') not in TIPOS_OPERACION:
+        raise OperacionRechazada('Tipo de operación no soportado')
+    if _entero(operacion.get('observacion_id')) is None:
+        raise OperacionRechazada('Observación requerida')
+
+
+class _Lote:
+    """Estado acumulado mientras se recorren las operaciones de un lote."""
+
+    def __init__(self, usuario, operaciones, archivos):
+        self.usuario = usuario
+        self.archivos = archivos or {}
+        self.ahora = timezone.now()
+        ids_obs = {_entero(op.get('observacion_id')) for op in operaciones if isinstance(op, dict)}
+        ids_estado = {
+            _entero(op.get('estado_id')) for op in operaciones
+            if isinstance(op, dict) and op.get('tipo') == 'cambiar_estado'
+        }
+        self.observaciones = Observacion.objects.select_related('estado').in_bulk(ids_obs - {None})
+        self.estados = EstadoObservacion.objects.in_bulk(ids_estado - {None})
+        self.modificadas = {}
+        self.seguimientos = []
+
+    def seguimiento(self, observacion, accion, comentario='', **campos):
+        self.seguimientos.append(SeguimientoObservacion(
+            observacion=observacion, usuario=self.usuario, accion=accion, comentario=comentario, **campos
+        ))
+
+    def aplicar(self, operacion):
+        observacion = self.observaciones.get(_entero(operacion['observacion_id']))
+        if observacion is None:
+            raise OperacionRechazada('Observación no encontrada')
+        if not puede_editar_observacion(self.usuario, observacion):
+            raise OperacionRechazada('Sin permisos')
+        return getattr(self, f"_{operacion['tipo']}")(observacion, operacion)
+
+    def _cambiar_estado(self, observacion, operacion):
+        nuevo_estado = self.estados.get(_entero(operacion.get('estado_id')))
+        if nuevo_estado is None:
+            raise OperacionRechazada('Estado requerido')
+        self.seguimiento(
+            observacion, 'Cambio de estado (móvil)', (operacion.get('comentario') or '').strip(),
+            estado_anterior=observacion.estado, estado_nuevo=nuevo_estado,
+        )
+        observacion.estado = nuevo_estado
+        if nuevo_estado.nombre == 'Cerrada':
+            observacion.fecha_cierre = self.ahora
+        self.modificadas[observacion.pk] = observacion
+        return {'nuevo_estado': {'id': nuevo_estado.id, 'nombre': nuevo_estado.nombre, 'codigo': nuevo_estado.codigo}}
+
+    def _comentario(self, observacion, operacion):
+        comentario = (operacion.get('comentario') or '').strip()
+        if not comentario:
+            raise OperacionRechazada('El comentario no puede estar vacío')
+        self.seguimiento(observacion, 'Comentario (móvil)', comentario)
+        return {}
+
+    def _descripcion(self, observacion, operacion):
+        nueva_descripcion = (operacion.get('descripcion') or '').strip()
+        if not nueva_descripcion:
+            raise OperacionRechazada('Descripción requerida')
+        anterior = observacion.detalle
+        self.seguimiento(
+            observacion, 'Descripción actualizada (móvil)',
+            f'Descripción anterior: {anterior[:100]}...' if len(anterior) > 100 else f'Descripción anterior: {anterior}',
+        )
+        observacion.detalle = nueva_descripcion
+        self.modificadas[observacion.pk] = observacion
+        return {}
+
+    def _archivo(self, observacion, operacion):
+        archivo = self.archivos.get(operacion.get('archivo') or '')
+        if archivo is None:
+            raise OperacionRechazada('No se encontró archivo')
+        if archivo.size > TAMANO_MAXIMO_ARCHIVO:
+            raise OperacionRechazada('Archivo muy grande (máximo 10MB)')
+        extension = os.path.splitext(archivo.name)[1].lstrip('.').lower()
+        if extension not in EXTENSIONES_PERMITIDAS:
+            raise OperacionRechazada('Tipo de archivo no permitido')
+        descripcion = (operacion.get('descripcion') or '').strip()
+        adjunto = ArchivoAdjuntoObservacion.objects.create(
+            observacion=observacion, archivo=archivo, nombre_original=archivo.name,
+            descripcion=descripcion, subido_por=self.usuario,
+        )
+        self.seguimiento(
+            observacion, 'Archivo agregado (móvil)',
+            f'Archivo: {archivo.name}' + (f' - {descripcion}' if descripcion else ''),
+        )
+        return {'archivo': {'id': adjunto.id, 'nombre': adjunto.nombre_original, 'url': adjunto.archivo.url}}
+
+    def guardar(self):
+        modificadas = list(self.modificadas.values())
+        for observacion in modificadas:
+            # bulk_update no aplica auto_now; la sincronización delta depende de esta fecha
+            observacion.fecha_ultima_actualizacion = self.ahora
+        Observacion.objects.bulk_update(
+            modificadas, ['estado', 'fecha_cierre', 'detalle', 'fecha_ultima_actualizacion'], batch_size=200,
+        )
+        SeguimientoObservacion.objects.bulk_create(self.seguimientos, batch_size=500)
+        # bulk_update no emite signals: el detalle editado se reindexa aquí
+        reindexar_observaciones(Observacion.objects.filter(pk__in=[obs.pk for obs in modificadas]))
+
+
+def aplicar_lote(usuario, operaciones, archivos=None):
+    """
+    Aplica en orden y en una transacción las operaciones de la cola offline.
+
+    Args:
+        usuario: Usuario que sincroniza.
+        operaciones: lista de dicts con clave, tipo, observacion_id y los
+            datos del tipo (estado_id, comentario, descripcion, archivo).
+        archivos: archivos subidos (request.FILES) referenciados por nombre
+            de campo en las operaciones de tipo 'archivo'.
+
+    Returns:
+        Lista de resultados por operación, en el mismo orden:
+        {'clave', 'ok', 'error'?, 'duplicada'?, ...datos del resultado}.
+    """
+    claves = [op.get('clave') for op in operaciones if isinstance(op, dict)]
+    aplicadas = dict(
+        OperacionMovil.objects.filter(usuario=usuario, clave__in=[c for c in claves if isinstance(c, str)])
+        .values_list('clave', 'resultado')
+    )
+    resultados = []
+    registros = []
+    with transaction.atomic():
+        lote = _Lote(usuario, operaciones, archivos)
+        for operacion in operaciones:
+            try:
+                _validar_formato(operacion)
+                clave = operacion['clave']
+                if clave in aplicadas:
+                    resultados.append({'clave': clave, 'ok': True, 'duplicada': True, **aplicadas[clave]})
+                    continue
+                resultado = lote.aplicar(operacion)
+            except OperacionRechazada as e:
+                clave = operacion.get('clave') if isinstance(operacion, dict) else None
+                resultados.append({'clave': clave, 'ok': False, 'error': str(e)})
+                continue
+            aplicadas[clave] = resultado
+            registros.append(OperacionMovil(
+                usuario=usuario, clave=clave, tipo=operacion['tipo'],
+                observacion_id=_entero(operacion['observacion_id']), resultado=resultado,
+            ))
+            resultados.append({'clave': clave, 'ok': True, **resultado})
+        lote.guardar()
+        OperacionMovil.objects.bulk_create(registros)
+    return resultados
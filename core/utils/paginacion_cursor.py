@@ -0,0 +1,80 @@
+"""
+Paginación por cursor (keyset) para listados ordenados por fecha.
+
+En vez de `OFFSET` y `COUNT(*)`, cada página se pide con un cursor opaco que
+codifica la clave `(fecha, id)` de la última fila entregada; la siguiente
+página es `WHERE (fecha, id) < cursor ORDER BY fecha DESC, id DESC LIMIT n`,
+que usa el índice y cuesta lo mismo en la página 1 que en la 500.
+"""
+import base64
+from datetime import datetime
+from django.db.models import Q
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no es válido (manipulado o de otra versión)."""
+
+
+def codificar_cursor(fecha, pk):
+    """Token opaco (base64 url-safe) para la clave `(fecha, pk)`."""
+    crudo = f'{fecha.isoformat()}|{pk}'.encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token):
+    """
+    Devuelve la clave `(fecha, pk)` de un cursor.
+
+    Raises:
+        CursorInvalido: si el token no se puede interpretar.
+    """
+    try:
+        relleno = '=' * (-len(token) % 4)
+        crudo = base64.urlsafe_b64decode(token + relleno).decode('utf-8')
+        fecha, pk = crudo.split('|')
+        return datetime.fromisoformat(fecha), int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise CursorInvalido('Cursor inválido') from exc
+
+
+class PaginaCursor:
+    """Página de resultados y cursor para pedir la siguiente."""
+
+    def __init__(self, object_list, siguiente_cursor):
+        self.object_list = object_list
+        self.siguiente_cursor = siguiente_cursor
+
+    @property
+    def has_next(self):
+        return self.siguiente_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginar_por_cursor(queryset, cursor=None, por_pagina=20, campo='fecha_creacion'):
+    """
+    Página de `queryset` ordenada por `campo` y `id` descendentes, a partir
+    de `cursor` (None o '' para la primera página).
+
+    Raises:
+        CursorInvalido: si `cursor` no es un token válido.
+    """
+    queryset = queryset.order_by(f'-{campo}', '-pk')
+    if cursor:
+        fecha, pk = decodificar_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{campo}__lt': fecha}) | Q(**{campo: fecha, 'pk__lt': pk})
+        )
+
+    # Se pide una fila extra solo para saber si hay página siguiente
+    filas = list(queryset[:por_pagina + 1])
+    siguiente = None
+    if len(filas) > por_pagina:
+        filas = filas[:por_pagina]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(getattr(ultima, campo), ultima.pk)
+    return PaginaCursor(filas, siguiente)
@@ -0,0 +1,220 @@
+"""
+Exportación masiva de actas de recepción y fichas de postventa en un ZIP.
+
+Los documentos se describen con `documentos_actas` / `documentos_fichas`
+(HTML ya renderizado con la plantilla de la vista individual) y
+`zip_en_streaming` los convierte con `renderizar_varios`, repartidos entre
+los procesos del pool de PDF, escribiendo cada PDF al ZIP apenas está
+listo. El ZIP se entrega por partes (StreamingHttpResponse) o se escribe a
+un archivo con `escribir_zip`; en ningún caso se arma completo en memoria.
+
+Si el HTML de un acta no se puede convertir se usa su versión ReportLab;
+los documentos que no se pudieron generar se listan en ERRORES.txt dentro
+del ZIP.
+"""
+import zipfile
+from collections import deque
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from core.utils.renderizador_pdf import ErrorRenderPdf, renderizar, renderizar_varios
+
+
+def contexto_acta_pdf(acta, **extra):
+    """Contexto de reportes/acta_template.html para un acta."""
+    return {
+        'acta': acta,
+        'proyecto': acta.proyecto,
+        'beneficiario': acta.beneficiario,
+        'vivienda': acta.vivienda,
+        'familiares': acta.familiares.all(),
+        'fecha_generacion': timezone.now(),
+        **extra,
+    }
+
+
+def bloques_acta(acta):
+    """Acta como bloques de renderizar_story (respaldo cuando falla el HTML)."""
+    bloques = [
+        ('titulo', "ACTA DE RECEPCIÓN DE VIVIENDA"),
+        ('subtitulo', "TECHO CHILE"),
+        ('parrafo', f"<b>Acta N°:</b> {acta.numero_acta} | <b>Generada:</b> {timezone.now().strftime('%d/%m/%Y %H:%M')}"),
+        ('espacio', 20),
+    ]
+
+    def datos(filas):
+        bloques.extend(('parrafo', f"<b>{label}</b> {value}") for label, value in filas)
+
+    # === INFORMACIÓN DEL PROYECTO ===
+    bloques.append(('seccion', "INFORMACIÓN DEL PROYECTO"))
+    datos([
+        ['Proyecto:', acta.proyecto.nombre if acta.proyecto else 'N/A'],
+        ['Comuna:', acta.proyecto.comuna.nombre if (acta.proyecto and acta.proyecto.comuna) else 'N/A'],
+        ['Región:', acta.proyecto.region.nombre if (acta.proyecto and acta.proyecto.region) else 'N/A'],
+    ])
+    bloques.append(('espacio', 12))
+
+    # === INFORMACIÓN DEL BENEFICIARIO ===
+    bloques.append(('seccion', "INFORMACIÓN DEL BENEFICIARIO"))
+    if acta.beneficiario:
+        # Construir string de teléfonos activos
+        telefonos_activos = list(acta.beneficiario.telefonos.filter(activo=True).values_list('numero', flat=True))
+        if not telefonos_activos:
+            telefonos_activos = list(acta.beneficiario.telefonos.values_list('numero', flat=True)[:1])
+        telefonos_str = ', '.join(telefonos_activos) if telefonos_activos else 'N/A'
+        datos([
+            ['Nombre Completo:', f"{acta.beneficiario.nombre} {acta.beneficiario.apellido_paterno} {acta.beneficiario.apellido_materno or ''}".strip()],
+            ['RUT:', acta.beneficiario.rut or 'N/A'],
+            ['Teléfonos:', telefonos_str],
+            ['Email:', acta.beneficiario.email or 'N/A'],
+        ])
+    else:
+        bloques.append(('parrafo', "<b>Beneficiario:</b> No asignado"))
+    bloques.append(('espacio', 12))
+
+    # === INFORMACIÓN DE LA VIVIENDA ===
+    bloques.append(('seccion', "INFORMACIÓN DE LA VIVIENDA"))
+    if acta.vivienda:
+        datos([
+            ['Código de Vivienda:', acta.vivienda.codigo],
+            ['Tipología:', acta.vivienda.tipologia.nombre if acta.vivienda.tipologia else 'N/A'],
+            ['Estado:', acta.vivienda.get_estado_display()],
+            ['Familia Beneficiaria:', acta.vivienda.familia_beneficiaria or 'N/A'],
+        ])
+    else:
+        bloques.append(('parrafo', "<b>Vivienda:</b> No asignada"))
+    bloques.append(('espacio', 12))
+
+    # === DETALLES DEL ACTA ===
+    bloques.append(('seccion', "DETALLES DEL ACTA"))
+    datos([
+        ['Fecha de Entrega:', acta.fecha_entrega.strftime("%d/%m/%Y") if acta.fecha_entrega else 'N/A'],
+        ['Entrega Conforme:', 'Sí' if acta.entregado_beneficiario else 'No'],
+        ['Estructura:', 'Conforme' if getattr(acta, 'estado_estructura', True) else 'Con observaciones'],
+        ['Instalaciones:', 'Conforme' if getattr(acta, 'estado_instalaciones', True) else 'Con observaciones'],
+    ])
+    bloques.append(('espacio', 15))
+
+    # === FAMILIARES (si los hay) ===
+    familiares = acta.familiares.all()
+    if familiares:
+        bloques.append(('seccion', "FAMILIARES REGISTRADOS"))
+        filas = [['Nombre Completo', 'Parentesco', 'RUT', 'Edad']] + [
+            [familiar.nombre_completo, familiar.parentesco, familiar.rut or 'N/A', str(familiar.edad) if familiar.edad else 'N/A']
+            for familiar in familiares
+        ]
+        bloques += [('tabla', filas, [8, 3, 3, 2], 'grilla'), ('espacio', 15)]
+
+    # === OBSERVACIONES ===
+    if acta.observaciones:
+        bloques += [('seccion', "OBSERVACIONES"), ('parrafo', acta.observaciones), ('espacio', 20)]
+
+    # === FIRMAS ===
+    firmas = [
+        ['', '', ''],
+        ['_________________________', '_________________________', '_________________________'],
+        ['Beneficiario', 'Representante TECHO', 'Supervisor'],
+        ['', '', ''],
+        ['Fecha: _______________', 'Fecha: _______________', 'Fecha: _______________']
+    ]
+    bloques += [('espacio', 30), ('seccion', "FIRMAS Y CONFORMIDAD"), ('tabla', firmas, [5.5, 5.5, 5.5], 'firmas')]
+    return bloques
+
+
+def _nombre(*partes):
+    return get_valid_filename('_'.join(str(parte) for parte in partes if parte)) + '.pdf'
+
+
+def documentos_actas(actas):
+    """
+    Un documento `(ruta_en_zip, (motor, entrada), respaldo)` por acta.
+    `respaldo` arma el pedido alternativo solo si hace falta.
+    """
+    actas = actas.select_related(
+        'vivienda', 'proyecto__comuna', 'proyecto__region', 'proyecto__constructora', 'beneficiario',
+    ).prefetch_related('familiares')
+    for acta in actas.iterator(chunk_size=100):
+        html = render_to_string('reportes/acta_template.html', contexto_acta_pdf(acta, es_descarga=True, para_pdf=True))
+        codigo = acta.vivienda.codigo if acta.vivienda else ''
+        yield (
+            f'actas/{_nombre("Acta", acta.numero_acta, codigo)}',
+            ('xhtml2pdf', html),
+            lambda acta=acta: ('reportlab', bloques_acta(acta)),
+        )
+
+
+def documentos_fichas(fichas):
+    """Un documento `(ruta_en_zip, (motor, entrada), None)` por ficha de postventa."""
+    fichas = fichas.select_related('vivienda__proyecto', 'evaluador__rol')
+    for ficha in fichas.iterator(chunk_size=100):
+        html = render_to_string('ficha_postventa/pdf_template.html', {'ficha': ficha})
+        yield (f'fichas/{_nombre("Ficha", ficha.vivienda.codigo, ficha.pk)}', ('xhtml2pdf', html), None)
+
+
+def _agregar_documentos(archivo, documentos):
+    """Escribe los PDFs en `archivo` (ZipFile) y entrega el nombre de cada uno al terminarlo."""
+    pendientes = deque()
+    errores = []
+
+    def pedidos():
+        for documento in documentos:
+            pendientes.append(documento)
+            yield documento[1]
+
+    for resultado in renderizar_varios(pedidos()):
+        nombre, _, respaldo = pendientes.popleft()
+        if isinstance(resultado, ErrorRenderPdf) and respaldo is not None:
+            try:
+                resultado = renderizar(*respaldo())
+            except ErrorRenderPdf as e:
+                resultado = e
+        if isinstance(resultado, ErrorRenderPdf):
+            errores.append(f'{nombre}: {resultado}')
+            continue
+        archivo.writestr(nombre, resultado.contenido)
+        yield nombre
+
+    if errores:
+        archivo.writestr('ERRORES.txt', 'No se pudieron generar:\n' + '\n'.join(errores) + '\n')
+
+
+class _Salida:
+    """Destino de ZipFile que retiene lo escrito hasta que se entrega."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def zip_en_streaming(documentos):
+    """Genera el ZIP por partes: un bloque de bytes por documento terminado."""
+    salida = _Salida()
+    # Sin seek(): zipfile escribe cada entrada con data descriptor, sin volver atrás
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as archivo:
+        for _ in _agregar_documentos(archivo, documentos):
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+def escribir_zip(documentos, destino):
+    """Escribe el ZIP en `destino` (ruta o archivo) y devuelve los nombres agregados."""
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as archivo:
+        return list(_agregar_documentos(archivo, documentos))
+
+
+def respuesta_zip(documentos, nombre_archivo):
+    response = StreamingHttpResponse(zip_en_streaming(documentos), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
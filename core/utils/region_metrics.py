@@ -1,54 +1,84 @@
-from django.db.models import Count, Q, Avg, F, ExpressionWrapper, DurationField
+from django.db.models import Count, Q, Avg
 from core.models import Region
-from proyectos.models import Proyecto, Vivienda
+from core.utils.kpi_engine import duracion_resolucion, filtrar_rango_fechas
+from proyectos.models import Vivienda
 from incidencias.models import Observacion
 
+
+def _estado_observacion_id(estado):
+    """Devuelve el id de EstadoObservacion si `estado` es numérico, o None."""
+    try:
+        return int(estado)
+    except (ValueError, TypeError):
+        return None
+
+
 def get_region_metrics(region_id=None, estado=None, fecha_inicio=None, fecha_fin=None):
+    """
+    Métricas por región: total de viviendas, entregadas, casos de postventa y
+    promedio de días de resolución.
+
+    Se calculan con una consulta GROUP BY región por modelo (regiones,
+    viviendas y observaciones), sin importar cuántas regiones existan.
+    `estado` puede ser un id de EstadoObservacion (filtra observaciones) o un
+    estado de Vivienda (filtra viviendas).
+    """
     regiones_qs = Region.objects.filter(activo=True)
     if region_id:
         regiones_qs = regiones_qs.filter(id=region_id)
-    regiones = regiones_qs.order_by('nombre')
+    regiones = list(regiones_qs.order_by('nombre').values('id', 'nombre'))
+
+    # Solo viviendas activas de proyectos activos de las regiones consultadas
+    viviendas_qs = filtrar_rango_fechas(
+        Vivienda.objects.filter(
+            activa=True,
+            proyecto__activo=True,
+            proyecto__region_id__in=[r['id'] for r in regiones],
+        ),
+        fecha_inicio, fecha_fin, campo='proyecto__fecha_creacion',
+    )
+    estado_obs_id = _estado_observacion_id(estado)
+    if estado and estado_obs_id is None:
+        viviendas_qs = viviendas_qs.filter(estado=estado)
+
+    viviendas_por_region = {
+        fila['proyecto__region_id']: fila
+        for fila in viviendas_qs.order_by().values('proyecto__region_id').annotate(
+            total_viviendas=Count('id'),
+            entregadas=Count('id', filter=Q(estado='entregada')),
+        )
+    }
+
+    obs_qs = filtrar_rango_fechas(
+        Observacion.objects.filter(vivienda__in=viviendas_qs, activo=True),
+        fecha_inicio, fecha_fin,
+    )
+    if estado_obs_id is not None:
+        obs_qs = obs_qs.filter(estado_id=estado_obs_id)
+    obs_por_region = {
+        fila['vivienda__proyecto__region_id']: fila
+        for fila in obs_qs.order_by().values('vivienda__proyecto__region_id').annotate(
+            casos_postventa=Count('id'),
+            promedio=Avg(
+                duracion_resolucion(),
+                filter=Q(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False),
+            ),
+        )
+    }
+
     metrics = []
     for region in regiones:
-        # Solo proyectos activos de la región actual
-        proyectos_objs = Proyecto.objects.filter(region=region, activo=True)
-        if fecha_inicio:
-            proyectos_objs = proyectos_objs.filter(fecha_creacion__date__gte=fecha_inicio)
-        if fecha_fin:
-            proyectos_objs = proyectos_objs.filter(fecha_creacion__date__lte=fecha_fin)
-        viviendas_qs = Vivienda.objects.filter(proyecto__in=proyectos_objs, activa=True)
-        if estado:
-            # Si estado es numérico (id de EstadoObservacion), no filtrar viviendas
-            try:
-                int_estado = int(estado)
-                # Si es un id, no filtrar viviendas por estado
-            except (ValueError, TypeError):
-                viviendas_qs = viviendas_qs.filter(estado=estado)
-        viviendas_ids = viviendas_qs.values_list('id', flat=True)
-        total_viviendas = viviendas_qs.count()
-        entregadas = viviendas_qs.filter(estado='entregada').count()
-        if total_viviendas == 0:
+        viviendas = viviendas_por_region.get(region['id'])
+        if not viviendas:
             continue
-        obs_region = Observacion.objects.filter(vivienda_id__in=viviendas_ids, activo=True)
-        if estado:
-            obs_region = obs_region.filter(estado_id=estado)
-        if fecha_inicio:
-            obs_region = obs_region.filter(fecha_creacion__date__gte=fecha_inicio)
-        if fecha_fin:
-            obs_region = obs_region.filter(fecha_creacion__date__lte=fecha_fin)
-        total_obs = obs_region.count()
-        obs_cerradas = obs_region.filter(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False)
-        tiempo_promedio = None
-        if obs_cerradas.exists():
-            expr = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
-            promedio = obs_cerradas.annotate(duracion=expr).aggregate(prom=Avg('duracion'))['prom']
-            if promedio is not None:
-                tiempo_promedio = int(promedio.total_seconds() // 86400)
+        obs = obs_por_region.get(region['id'], {})
+        promedio = obs.get('promedio')
         metrics.append({
-            'region': region.nombre,
-            'total_viviendas': total_viviendas,
-            'entregadas': entregadas,
-            'casos_postventa': total_obs,
-            'promedio_dias': tiempo_promedio if tiempo_promedio is not None else '-',
+            'region_id': region['id'],
+            'region': region['nombre'],
+            'total_viviendas': viviendas['total_viviendas'],
+            'entregadas': viviendas['entregadas'],
+            'casos_postventa': obs.get('casos_postventa', 0),
+            'promedio_dias': int(promedio.total_seconds() // 86400) if promedio is not None else '-',
         })
     return metrics
@@ -0,0 +1,315 @@
+"""
+Generación de PDFs con motores intercambiables y un pool de procesos tibios.
+
+Todos los PDFs del sistema pasan por aquí, con una interfaz común:
+
+- `renderizar_html(html)`: HTML → PDF (xhtml2pdf).
+- `renderizar_story(bloques)`: documento ReportLab descrito como lista de
+  bloques simples (título, sección, párrafo, tabla, espacio), que el motor
+  convierte en flowables con estilos ya construidos.
+- `renderizar_texto(lineas)`: PDF mínimo de respaldo (canvas de ReportLab).
+
+Cada llamada devuelve un `ResultadoPdf` (bytes, motor usado y segundos) y
+queda medida por motor en `estadisticas_motores()`. `renderizar_varios`
+reparte muchos documentos entre los procesos del pool (exportación masiva).
+
+La conversión corre en un pool de `PDF_PROCESOS` procesos que se
+precalientan al iniciar (importan los motores, construyen hojas de estilo,
+cargan fuentes y renderizan un documento de prueba), así cada PDF se ahorra
+ese costo y la CPU del render no compite con el proceso web. Los procesos
+no usan Django: reciben HTML o bloques ya armados. Con `PDF_PROCESOS = 0`,
+o si ya se está dentro de un proceso hijo (p. ej. el worker de
+`procesar_reportes`), se renderiza en el mismo proceso con los mismos
+estilos en caché.
+
+Para agregar un motor basta con sumarlo a MOTORES_PDF (ruta a una función
+`entrada -> bytes`).
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from io import BytesIO
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+MOTORES_PDF = {
+    'xhtml2pdf': 'core.utils.renderizador_pdf.html_a_pdf',
+    'reportlab': 'core.utils.renderizador_pdf.story_a_pdf',
+    'reportlab-min': 'core.utils.renderizador_pdf.texto_a_pdf',
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+_estadisticas = {}
+
+
+class ErrorRenderPdf(Exception):
+    """El motor no pudo generar el PDF."""
+
+
+class ResultadoPdf:
+    def __init__(self, contenido, motor, segundos):
+        self.contenido = contenido
+        self.motor = motor
+        self.segundos = segundos
+
+
+# --- Motores (corren en los procesos del pool) ---
+
+@lru_cache(maxsize=None)
+def _estilos_story():
+    """Estilos de párrafo y tabla, construidos una vez por proceso."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    base = getSampleStyleSheet()
+    parrafos = {
+        'titulo': ParagraphStyle(
+            'CustomHeader', parent=base['Title'], fontSize=18, spaceAfter=10, alignment=1,
+            textColor=colors.black, fontName='Helvetica-Bold',
+        ),
+        'subtitulo': ParagraphStyle(
+            'CustomSubtitle', parent=base['Heading2'], fontSize=14, spaceAfter=20, alignment=1,
+            textColor=colors.black, fontName='Helvetica-Bold',
+        ),
+        'seccion': ParagraphStyle(
+            'SectionHeader', parent=base['Heading3'], fontSize=12, spaceBefore=15, spaceAfter=10,
+            textColor=colors.black, fontName='Helvetica-Bold',
+        ),
+        'parrafo': ParagraphStyle(
+            'CustomNormal', parent=base['Normal'], fontSize=10, spaceAfter=4, fontName='Helvetica',
+        ),
+    }
+    tablas = {
+        'grilla': [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ],
+        'firmas': [
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 1), (-1, 1), 'Helvetica'),
+            ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ],
+    }
+    return parrafos, tablas
+
+
+def html_a_pdf(html):
+    from xhtml2pdf import pisa
+    buffer = BytesIO()
+    estado = pisa.CreatePDF(html, dest=buffer)
+    if estado.err:
+        raise ErrorRenderPdf('xhtml2pdf no pudo convertir el HTML')
+    return buffer.getvalue()
+
+
+def story_a_pdf(bloques):
+    """
+    Bloques: ('titulo'|'subtitulo'|'seccion'|'parrafo', texto),
+    ('espacio', puntos) y ('tabla', filas, anchos_en_cm, estilo).
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    parrafos, tablas = _estilos_story()
+    story = []
+    for tipo, *datos in bloques:
+        if tipo == 'espacio':
+            story.append(Spacer(1, datos[0]))
+        elif tipo == 'tabla':
+            filas, anchos, estilo = datos
+            tabla = Table(filas, colWidths=[ancho * cm for ancho in anchos])
+            tabla.setStyle(TableStyle(tablas[estilo]))
+            story.append(tabla)
+        else:
+            story.append(Paragraph(datos[0], parrafos[tipo]))
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2 * cm, leftMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm)
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def texto_a_pdf(lineas):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    lienzo = canvas.Canvas(buffer, pagesize=A4)
+    lienzo.setFont('Helvetica', 12)
+    for i, linea in enumerate(lineas):
+        lienzo.drawString(72, 800 - 20 * i, linea)
+    lienzo.showPage()
+    lienzo.save()
+    return buffer.getvalue()
+
+
+def _ejecutar_motor(motor, entrada):
+    inicio = time.perf_counter()
+    contenido = import_string(MOTORES_PDF[motor])(entrada)
+    return contenido, time.perf_counter() - inicio
+
+
+def _precalentar():
+    """Inicializador de cada proceso del pool: deja motores, fuentes y estilos cargados."""
+    try:
+        html_a_pdf('<html><body><p>PDF</p></body></html>')
+        story_a_pdf([('titulo', 'PDF'), ('parrafo', 'PDF'), ('tabla', [['a', 'b']], [2, 2], 'grilla')])
+    except Exception:
+        # Un motor roto no debe impedir que el pool atienda a los demás
+        logger.exception('No se pudo precalentar el proceso de PDF')
+
+
+# --- Pool y medición (proceso web) ---
+
+def _en_proceso_hijo():
+    return multiprocessing.parent_process() is not None
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn': los procesos no heredan conexiones ni hilos del servidor web
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_PROCESOS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_precalentar,
+            )
+        return _pool
+
+
+def _descartar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _registrar(motor, segundos, ok):
+    datos = _estadisticas.setdefault(motor, {'cantidad': 0, 'errores': 0, 'segundos_total': 0.0, 'segundos_max': 0.0})
+    datos['cantidad'] += 1
+    datos['errores'] += 0 if ok else 1
+    datos['segundos_total'] += segundos
+    datos['segundos_max'] = max(datos['segundos_max'], segundos)
+
+
+def estadisticas_motores():
+    """Cantidad, errores y tiempos (total/promedio/máximo) por motor en este proceso."""
+    return {
+        motor: {**datos, 'segundos_promedio': datos['segundos_total'] / datos['cantidad']}
+        for motor, datos in _estadisticas.items()
+    }
+
+
+def _enviar(motor, entrada):
+    """Encola el render en el pool; None si corresponde hacerlo en este proceso."""
+    if settings.PDF_PROCESOS <= 0 or _en_proceso_hijo():
+        return None
+    try:
+        return _obtener_pool().submit(_ejecutar_motor, motor, entrada)
+    except (BrokenProcessPool, RuntimeError):
+        # El pool no se pudo iniciar: se renderiza aquí y se recrea en la próxima llamada
+        logger.exception('Pool de PDF no disponible, se renderiza en el proceso web')
+        _descartar_pool()
+        return None
+
+
+def _esperar(motor, entrada, futuro):
+    if futuro is None:
+        return _ejecutar_motor(motor, entrada)
+    try:
+        return futuro.result(timeout=settings.PDF_TIMEOUT_SEGUNDOS)
+    except BrokenProcessPool:
+        # Un proceso murió (p. ej. por memoria): se recrea el pool en la próxima llamada
+        logger.exception('Pool de PDF caído, se renderiza en el proceso web')
+        _descartar_pool()
+        return _ejecutar_motor(motor, entrada)
+
+
+def _resultado(motor, entrada, futuro, inicio):
+    try:
+        contenido, segundos_motor = _esperar(motor, entrada, futuro)
+    except Exception as e:
+        _registrar(motor, time.perf_counter() - inicio, ok=False)
+        if isinstance(e, ErrorRenderPdf):
+            raise
+        raise ErrorRenderPdf(f'{motor}: {e}') from e
+
+    segundos = time.perf_counter() - inicio
+    _registrar(motor, segundos, ok=True)
+    logger.info('PDF %s: %.2fs (motor %.2fs, %d bytes)', motor, segundos, segundos_motor, len(contenido))
+    return ResultadoPdf(contenido, motor, segundos)
+
+
+def renderizar(motor, entrada):
+    """
+    Genera un PDF con `motor` (clave de MOTORES_PDF).
+
+    Raises:
+        ErrorRenderPdf: si el motor falla o excede PDF_TIMEOUT_SEGUNDOS.
+    """
+    return _resultado(motor, entrada, _enviar(motor, entrada), time.perf_counter())
+
+
+def renderizar_varios(pedidos):
+    """
+    Renderiza una secuencia de `(motor, entrada)` repartida entre los
+    procesos del pool y entrega, en el mismo orden, un ResultadoPdf o la
+    ErrorRenderPdf de cada pedido.
+
+    Se mantienen a lo más 2 × PDF_PROCESOS pedidos en vuelo: `pedidos` se
+    consume a medida que avanza (puede ser un generador que arma el HTML
+    mientras el pool trabaja) y la memoria no crece con el total.
+    """
+    ventana = max(1, 2 * settings.PDF_PROCESOS)
+    en_vuelo = deque()
+
+    def siguiente():
+        try:
+            return _resultado(*en_vuelo.popleft())
+        except ErrorRenderPdf as e:
+            return e
+
+    try:
+        for motor, entrada in pedidos:
+            en_vuelo.append((motor, entrada, _enviar(motor, entrada), time.perf_counter()))
+            if len(en_vuelo) >= ventana:
+                yield siguiente()
+        while en_vuelo:
+            yield siguiente()
+    finally:
+        # Consumidor que abandona (p. ej. descarga cancelada): no seguir renderizando
+        for _, _, futuro, _ in en_vuelo:
+            if futuro is not None:
+                futuro.cancel()
+
+
+def renderizar_html(html):
+    return renderizar('xhtml2pdf', html)
+
+
+def renderizar_story(bloques):
+    return renderizar('reportlab', bloques)
+
+
+def renderizar_texto(lineas):
+    return renderizar('reportlab-min', lineas)
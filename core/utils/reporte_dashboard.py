@@ -0,0 +1,349 @@
+"""
+Reporte PDF ejecutivo del dashboard.
+
+Separado de la vista para poder generarlo fuera del request: lo ejecuta el
+worker de `manage.py procesar_reportes` (ver core/utils/trabajos_reporte.py).
+`contexto_reporte_dashboard` arma los datos y `generar_reporte_dashboard`
+renderiza el PDF (core/utils/renderizador_pdf.py) y lo registra como ReporteGenerado. El
+contenido depende solo de los filtros, el perfil del usuario y los datos,
+así que el mismo archivo sirve a todos los usuarios con igual alcance (ver
+core/utils/cache_reportes.py).
+"""
+import os
+import uuid
+from datetime import datetime
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.template.loader import render_to_string
+from django.utils import timezone
+from core.utils.region_metrics import get_region_metrics
+from core.utils.cumplimiento_constructora import get_cumplimiento_plazos_por_constructora
+from core.utils.kpi_engine import (
+    filtrar_rango_fechas, kpis_observaciones_por, kpis_viviendas, porcentaje,
+)
+from core.utils.kpi_snapshot import kpis_snapshot, tendencia_mensual
+from core.utils.renderizador_pdf import renderizar_html
+from core.models import Region
+from proyectos.models import Proyecto, Vivienda
+from incidencias.models import Observacion
+from reportes.models import ReporteGenerado
+
+CARPETA_REPORTES = 'reportes_generados'
+PARAMETROS_REPORTE = ('region', 'estado', 'fecha_inicio', 'fecha_fin', 'periodo')
+
+
+def filtros_reporte_dashboard(parametros):
+    """
+    Filtros del reporte tomados de los parámetros GET del dashboard. Los
+    vacíos se omiten: `?region=` y la ausencia de región son el mismo reporte.
+    """
+    return {clave: parametros.get(clave).strip() for clave in PARAMETROS_REPORTE if (parametros.get(clave) or '').strip()}
+
+
+def _filtros_registro(filtros):
+    # Filtros que muestra el listado de reportes generados
+    return {clave: filtros[clave] for clave in ('region', 'estado', 'fecha_inicio', 'fecha_fin') if filtros.get(clave)}
+
+
+def perfil_reporte_usuario(usuario):
+    """Perfil que se imprime en la portada (y que distingue reportes en la caché)."""
+    if usuario.is_superuser:
+        return 'Administrador'
+    return usuario.rol.nombre.capitalize() if usuario.rol_id else 'Sin rol'
+
+
+def contexto_reporte_dashboard(usuario, filtros):
+    """Contexto de dashboard/reporte_pdf.html para `usuario` con los filtros del dashboard."""
+    region_id = filtros.get('region')
+    estado_id = filtros.get('estado')
+    fecha_inicio = filtros.get('fecha_inicio')
+    fecha_fin = filtros.get('fecha_fin')
+
+    metrics_region = get_region_metrics(region_id=region_id, estado=estado_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    cumplimiento_constructoras = get_cumplimiento_plazos_por_constructora(region_id=region_id, estado=estado_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+
+    # --- Datos para portada ---
+    # El reporte se comparte entre usuarios con el mismo alcance: la portada muestra el perfil, no la persona
+    perfil_reporte = perfil_reporte_usuario(usuario)
+    periodo_reporte = filtros.get('periodo') or datetime.now().strftime('%B %Y')
+    region_nombre = Region.objects.get(id=region_id).nombre if region_id else 'Todas'
+
+    # Filtrar por región si corresponde
+    proyectos_qs = Proyecto.objects.filter(activo=True)
+    viviendas_qs = Vivienda.objects.filter(activa=True)
+    obs_qs = Observacion.objects.filter(activo=True)
+    if region_id:
+        proyectos_qs = proyectos_qs.filter(region_id=region_id)
+        viviendas_qs = viviendas_qs.filter(proyecto__region_id=region_id)
+        obs_qs = obs_qs.filter(vivienda__proyecto__region_id=region_id)
+    proyectos_qs = filtrar_rango_fechas(proyectos_qs, fecha_inicio, fecha_fin)
+    viviendas_qs = filtrar_rango_fechas(viviendas_qs, fecha_inicio, fecha_fin, campo='proyecto__fecha_creacion')
+    obs_qs = filtrar_rango_fechas(obs_qs, fecha_inicio, fecha_fin)
+
+    # KPIs principales: una consulta agregada por modelo
+    kpi_viv = kpis_viviendas(viviendas_qs)
+    kpi_obs = kpis_snapshot(region_id=region_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    proyectos_total = proyectos_qs.count()
+    viviendas_total = kpi_viv['total']
+    obs_total = kpi_obs['total']
+    fecha_reporte = datetime.now().strftime('%d/%m/%Y %H:%M')
+
+    viviendas_entregadas = kpi_viv['entregadas']
+    porc_viviendas_entregadas = porcentaje(viviendas_entregadas, viviendas_total)
+    casos_postventa_abiertos = kpi_obs['abiertas']
+    # Tiempo promedio de resolución (en días)
+    tiempo_promedio_resolucion = kpi_obs['dias_promedio_resolucion'] or 0
+    # Familias acompañadas: viviendas con beneficiario
+    familias_acompañadas = kpi_viv['asignadas']
+    porc_familias_acompañadas = porcentaje(familias_acompañadas, viviendas_total)
+    tasa_cumplimiento = cumplimiento_constructoras['global']
+    kpi = {
+        'total_viviendas': viviendas_total,
+        'viviendas_entregadas': viviendas_entregadas,
+        'porc_viviendas_entregadas': porc_viviendas_entregadas,
+        'casos_postventa_abiertos': casos_postventa_abiertos,
+        'tiempo_promedio_resolucion': tiempo_promedio_resolucion,
+        'familias_acompañadas': familias_acompañadas,
+        'porc_familias_acompañadas': porc_familias_acompañadas,
+        'tasa_cumplimiento': tasa_cumplimiento,
+    }
+
+    # Estados de vivienda
+    estados_vivienda = viviendas_qs.values('estado').annotate(cantidad=Count('id')).order_by('-cantidad')
+    total_viv = viviendas_total
+    tabla_estado_vivienda = []
+    for ev in estados_vivienda:
+        nombre = ev['estado'].capitalize() if ev['estado'] else 'Sin estado'
+        cantidad = ev['cantidad']
+        tabla_estado_vivienda.append({'nombre': nombre, 'cantidad': cantidad, 'porcentaje': porcentaje(cantidad, total_viv)})
+    grafico_estado_vivienda = ''  # Puedes generar imagen si lo deseas
+
+    # Diagnóstico técnico - Observaciones por tipo
+    tabla_observaciones = []
+    for t in kpis_observaciones_por(obs_qs, 'tipo__nombre'):
+        dias = t['dias_promedio_resolucion']
+        tabla_observaciones.append({
+            'tipo': t['tipo__nombre'] or 'Sin tipo',
+            'totales': t['total'],
+            'cerrados': t['cerradas'],
+            'pendientes': t['abiertas'],
+            'tiempo_promedio': f"{dias} días" if dias is not None else '-',
+        })
+    grafico_observaciones_tipo = ''
+
+    # Tendencias temporales (casos abiertos/cerrados por mes)
+    obs_mes = tendencia_mensual(region_id=region_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    tabla_tendencia_mensual = []
+    prev_cerrados = 0
+    for m in obs_mes:
+        nombre = m['mes'].strftime('%B') if m['mes'] else 'Sin mes'
+        abiertos = m['abiertos']
+        cerrados = m['cerrados']
+        variacion = cerrados - prev_cerrados
+        tabla_tendencia_mensual.append({'nombre': nombre, 'abiertos': abiertos, 'cerrados': cerrados, 'variacion': f"{variacion:+d}"})
+        prev_cerrados = cerrados
+    grafico_tendencia_mensual = ''
+
+    # Desempeño regional
+    tabla_regional = []
+    # Si hay filtro de región, solo mostrar esa región en la tabla regional
+    for r in metrics_region:
+        if not region_id or (region_id and str(r.get('region_id', '')) == str(region_id)):
+            tabla_regional.append({
+                'region': r['region'],
+                'total': r['total_viviendas'],
+                'entregadas': r['entregadas'],
+                'casos': r['casos_postventa'],
+                'tiempo': f"{r['promedio_dias']} días" if r['promedio_dias'] != '-' else '-',
+                'satisfaccion': '-',  # Puedes calcular si tienes encuestas
+                'estado': '-',        # Se puede calcular con reglas abajo
+            })
+    grafico_mapa_calor = ''
+
+    # Desempeño del equipo (por técnico/coordinador)
+    User = get_user_model()
+    tecnicos = User.objects.filter(is_active=True, rol__nombre__in=['TECNICO', 'COORDINADOR'])
+    kpi_equipo = {
+        fila['asignado_a']: fila
+        for fila in kpis_observaciones_por(obs_qs.filter(asignado_a__in=tecnicos), 'asignado_a')
+    }
+    tabla_equipo = []
+    for t in tecnicos:
+        fila = kpi_equipo.get(t.pk)
+        asignados = fila['total'] if fila else 0
+        cerrados = fila['cerradas'] if fila else 0
+        tasa_cierre = porcentaje(cerrados, asignados)
+        dias = fila['dias_promedio_resolucion'] if fila else None
+        tabla_equipo.append({
+            'nombre': t.get_full_name() if hasattr(t, 'get_full_name') else (t.first_name + ' ' + t.last_name).strip() or t.username,
+            'asignados': asignados,
+            'cerrados': cerrados,
+            'tasa_cierre': f"{tasa_cierre}%",
+            'tiempo_promedio': f"{dias} días" if dias is not None else '-',
+        })
+
+    # Satisfacción (si tienes encuestas, aquí solo placeholder)
+    satisfaccion_promedio = '-'
+    encuestas_recibidas = '-'
+    encuestas_esperadas = '-'
+    motivos_insatisfaccion = '-'
+
+    # --- Reglas automáticas para conclusiones, alertas, áreas de mejora, fortalezas y recomendaciones ---
+    alertas = []
+    areas_mejora = []
+    fortalezas = []
+    recomendaciones = []
+    conclusiones = []
+
+    # Alertas críticas
+    if casos_postventa_abiertos > 50:
+        alertas.append(f"Casos de postventa abiertos superan 50: {casos_postventa_abiertos}")
+        recomendaciones.append("Reforzar gestión de cierre de casos y priorizar recursos en postventa.")
+    if tiempo_promedio_resolucion > 15:
+        alertas.append(f"Tiempo promedio de resolución excede 15 días: {tiempo_promedio_resolucion} días")
+        recomendaciones.append("Implementar seguimiento semanal a casos abiertos y capacitación en resolución rápida.")
+    if len(tabla_equipo) < 10:
+        alertas.append(f"Menos de 10 técnicos activos: {len(tabla_equipo)}")
+        recomendaciones.append("Revisar dotación y considerar contratación/refuerzo de técnicos.")
+    for reg in tabla_regional:
+        if reg['casos'] > 20:
+            alertas.append(f"Región {reg['region']} supera 20 casos abiertos: {reg['casos']}")
+            recomendaciones.append(f"Priorizar recursos y visitas en la región {reg['region']} para reducir backlog.")
+    if tasa_cumplimiento < 80:
+        alertas.append(f"Tasa de cumplimiento de plazos crítica: {tasa_cumplimiento}%")
+        recomendaciones.append("Revisar procesos y causas de retraso en cierre de observaciones.")
+
+    # Áreas de mejora
+    for obs in tabla_observaciones:
+        if obs['totales'] > 0 and obs['pendientes'] / obs['totales'] > 0.3:
+            areas_mejora.append(f"Alto porcentaje de pendientes en {obs['tipo']}: {obs['pendientes']} de {obs['totales']}")
+            recomendaciones.append(f"Revisar causas de demora en cierre de observaciones tipo {obs['tipo']}.")
+    if tasa_cumplimiento < 90:
+        areas_mejora.append(f"Tasa de cumplimiento de plazos baja: {tasa_cumplimiento}% (meta: 90%)")
+        recomendaciones.append("Aumentar seguimiento y control de plazos en postventa.")
+    if porc_viviendas_entregadas < 60:
+        areas_mejora.append(f"Porcentaje de viviendas entregadas bajo lo esperado: {porc_viviendas_entregadas}%")
+        recomendaciones.append("Acelerar procesos de entrega y resolver bloqueos administrativos.")
+    if porc_familias_acompañadas < 70:
+        areas_mejora.append(f"Porcentaje de familias acompañadas bajo lo esperado: {porc_familias_acompañadas}%")
+        recomendaciones.append("Reforzar acompañamiento y seguimiento a familias beneficiarias.")
+
+    # Fortalezas
+    if porc_viviendas_entregadas > 70:
+        fortalezas.append(f"Más del 70% de viviendas entregadas: {porc_viviendas_entregadas}%")
+    for reg in tabla_regional:
+        if reg['casos'] < 5:
+            fortalezas.append(f"Región {reg['region']} con menos de 5 casos abiertos")
+    if porc_familias_acompañadas > 80:
+        fortalezas.append(f"Más del 80% de familias acompañadas: {porc_familias_acompañadas}%")
+    if tasa_cumplimiento > 95:
+        fortalezas.append(f"Tasa de cumplimiento de plazos sobresaliente: {tasa_cumplimiento}%")
+
+    # Conclusiones ejecutivas
+    if not alertas:
+        conclusiones.append("El sistema de postventa se encuentra bajo control, sin alertas críticas.")
+    else:
+        conclusiones.append("Existen alertas críticas que requieren atención prioritaria del equipo ejecutivo.")
+    if fortalezas:
+        conclusiones.append("Se observan fortalezas importantes en la gestión y acompañamiento.")
+    if areas_mejora:
+        conclusiones.append("Se identifican áreas de mejora que deben ser abordadas para optimizar resultados.")
+
+    # Proyecciones y metas (más detalladas)
+    proyeccion_casos = max(0, casos_postventa_abiertos - int(0.1 * casos_postventa_abiertos))  # Proyección: reducción del 10%
+    metas_trimestre = (
+        "Reducir casos abiertos a menos de 30, aumentar cumplimiento a 90%, "
+        "elevar porcentaje de viviendas entregadas sobre 75% y familias acompañadas sobre 85%."
+    )
+    recursos_estimados = f"Dotación mínima recomendada: {max(10, len(tabla_equipo))} técnicos, presupuesto adicional para capacitación y seguimiento."
+
+    # Anexos técnicos (casos críticos y datos complementarios)
+    anexos_casos_criticos = '\n'.join([
+        f"Caso #{o.id}: {o.detalle[:40]}..." for o in obs_qs.filter(estado__nombre='Abierta').order_by('-fecha_creacion')[:10]
+    ]) or 'Sin casos críticos destacados.'
+    anexos_datos_complementarios = f"Total de observaciones: {obs_total}. Total de proyectos activos: {proyectos_total}. Total de viviendas activas: {viviendas_total}."
+    anexos_metodologia = (
+        'Indicadores calculados según reglas automáticas del sistema. '
+        'Alertas y recomendaciones generadas en base a umbrales definidos por la dirección ejecutiva y mejores prácticas del sector.'
+    )
+
+    alertas_criticas = '\n'.join(alertas) if alertas else 'Sin alertas críticas.'
+    areas_mejora_str = '\n'.join(areas_mejora) if areas_mejora else 'Sin áreas de mejora detectadas.'
+    fortalezas_str = '\n'.join(fortalezas) if fortalezas else 'Sin fortalezas destacadas.'
+    recomendaciones_list = recomendaciones if recomendaciones else ['Sin recomendaciones adicionales.']
+    conclusiones_list = conclusiones if conclusiones else ['Sin conclusiones ejecutivas.']
+
+    context = {
+        'perfil_reporte': perfil_reporte,
+        'periodo_reporte': periodo_reporte,
+        'fecha_reporte': fecha_reporte,
+        'region_nombre': region_nombre,
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'kpi': kpi,
+        'metrics_region': metrics_region,
+        'cumplimiento_constructoras': cumplimiento_constructoras,
+        'proyectos_total': proyectos_total,
+        'viviendas_total': viviendas_total,
+        'obs_total': obs_total,
+        'tabla_estado_vivienda': tabla_estado_vivienda,
+        'grafico_estado_vivienda': grafico_estado_vivienda,
+        'tabla_observaciones': tabla_observaciones,
+        'grafico_observaciones_tipo': grafico_observaciones_tipo,
+        'tabla_tendencia_mensual': tabla_tendencia_mensual,
+        'grafico_tendencia_mensual': grafico_tendencia_mensual,
+        'tabla_regional': tabla_regional,
+        'grafico_mapa_calor': grafico_mapa_calor,
+        'tabla_equipo': tabla_equipo,
+        'satisfaccion_promedio': satisfaccion_promedio,
+        'encuestas_recibidas': encuestas_recibidas,
+        'encuestas_esperadas': encuestas_esperadas,
+        'motivos_insatisfaccion': motivos_insatisfaccion,
+        'alertas_criticas': alertas_criticas,
+        'areas_mejora': areas_mejora_str,
+        'fortalezas': fortalezas_str,
+        'proyeccion_casos': proyeccion_casos,
+        'metas_trimestre': metas_trimestre,
+        'recursos_estimados': recursos_estimados,
+        'anexos_casos_criticos': anexos_casos_criticos,
+        'anexos_datos_complementarios': anexos_datos_complementarios,
+        'anexos_metodologia': anexos_metodologia,
+        'recomendaciones': recomendaciones_list,
+        'conclusiones': conclusiones_list,
+    }
+    return context
+
+
+def generar_reporte_dashboard(usuario, filtros, avance=None):
+    """
+    Genera el PDF y lo registra como ReporteGenerado.
+
+    Args:
+        avance: callable opcional (porcentaje, mensaje) para informar progreso.
+
+    Returns:
+        ReporteGenerado creado.
+    """
+    avance = avance or (lambda porcentaje, mensaje: None)
+
+    avance(10, 'Calculando indicadores')
+    html_string = render_to_string('dashboard/reporte_pdf.html', contexto_reporte_dashboard(usuario, filtros))
+
+    avance(50, 'Generando PDF')
+    pdf = renderizar_html(html_string).contenido
+
+    avance(90, 'Guardando reporte')
+    ahora = timezone.localtime()
+    # Sufijo único: varios procesos del pool pueden terminar reportes en el mismo segundo
+    filename = f"reporte_techoChile_{ahora:%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}.pdf"
+    ruta_reporte = os.path.join(CARPETA_REPORTES, filename)
+    os.makedirs(os.path.join(settings.BASE_DIR, CARPETA_REPORTES), exist_ok=True)
+    with open(os.path.join(settings.BASE_DIR, ruta_reporte), 'wb') as f:
+        f.write(pdf)
+    return ReporteGenerado.objects.create(
+        usuario=usuario,
+        nombre_archivo=filename,
+        ruta_archivo=ruta_reporte,
+        filtros=_filtros_registro(filtros),
+    )
@@ -0,0 +1,50 @@
+"""
+Búsqueda por RUT sobre la columna indexada `rut_normalizado`.
+
+Beneficiario, Usuario y Constructora guardan junto al RUT su forma
+canónica (core.validators.normalizar_rut), así "12.345.678-k",
+"12345678-K" y "12345678k" encuentran el mismo registro con una búsqueda
+en el índice, sin REPLACE() sobre la columna ni normalizar en Python.
+
+`campo` es la ruta hasta la columna desde el queryset, p. ej.
+'vivienda__beneficiario__rut_normalizado' para observaciones.
+"""
+import re
+from core.validators import normalizar_rut
+
+# Texto que parece (parte de) un RUT: dígitos con puntos, guion, espacios y DV
+_PARECE_RUT = re.compile(r'^[\d.\s]+(-?\s*[\dkK])?$')
+
+
+def parece_rut(texto):
+    """True si `texto` es un RUT o parte de uno (y no, p. ej., un nombre)."""
+    return bool(_PARECE_RUT.match((texto or '').strip()))
+
+
+def filtrar_por_rut(queryset, rut, campo='rut_normalizado'):
+    """Registros cuyo RUT es `rut` (en cualquier formato). Vacío si no es un RUT."""
+    normalizado = normalizar_rut(rut)
+    if not normalizado:
+        return queryset.none()
+    return queryset.filter(**{campo: normalizado})
+
+
+def filtrar_por_inicio_rut(queryset, rut, campo='rut_normalizado'):
+    """
+    Registros cuyo RUT comienza con `rut` (búsqueda mientras se escribe).
+    Se expresa como rango para que use el índice: los RUT normalizados solo
+    tienen dígitos y 'K', que ordenan antes de 'Z'.
+    """
+    normalizado = normalizar_rut(rut)
+    if not normalizado:
+        return queryset.none()
+    return queryset.filter(**{f'{campo}__gte': normalizado, f'{campo}__lt': normalizado + 'Z'})
+
+
+def buscar_beneficiario(rut, activo=True):
+    """Beneficiario con ese RUT (solo activos por defecto), o None."""
+    from proyectos.models import Beneficiario
+    beneficiarios = Beneficiario.objects.all()
+    if activo is not None:
+        beneficiarios = beneficiarios.filter(activo=activo)
+    return filtrar_por_rut(beneficiarios, rut).first()
@@ -0,0 +1,103 @@
+"""
+Serialización por lotes de observaciones para la API móvil.
+
+`preparar_observaciones_movil` anota los totales de archivos y comentarios
+con subconsultas y precarga los 3 más recientes de cada uno con un único
+prefetch por relación (slicing de Prefetch, resuelto con ROW_NUMBER()), de
+modo que una página cuesta un número fijo de consultas sin importar su
+tamaño. El tamaño de los archivos se lee de `ArchivoAdjuntoObservacion.tamano`
+en lugar de consultar el disco.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from core.permisos import puede_editar_observacion
+from incidencias.models import ArchivoAdjuntoObservacion, SeguimientoObservacion
+
+# Cantidad de archivos y comentarios recientes incluidos por observación
+RECIENTES_POR_OBSERVACION = 3
+
+
+def _contar(modelo):
+    """Subconsulta con la cantidad de filas de `modelo` por observación."""
+    return Subquery(
+        modelo.objects.filter(observacion=OuterRef('pk'))
+        .order_by()
+        .values('observacion')
+        .annotate(total=Count('id'))
+        .values('total'),
+        output_field=IntegerField(),
+    )
+
+
+def preparar_observaciones_movil(observaciones):
+    """
+    Agrega al queryset las relaciones, totales y precargas que usa
+    `serializar_observacion_movil`.
+    """
+    return observaciones.select_related(
+        'vivienda__proyecto', 'estado', 'creado_por'
+    ).annotate(
+        total_archivos=_contar(ArchivoAdjuntoObservacion),
+        total_comentarios=_contar(SeguimientoObservacion),
+    ).prefetch_related(
+        Prefetch(
+            'archivos_adjuntos',
+            queryset=ArchivoAdjuntoObservacion.objects.order_by('-fecha_subida')[:RECIENTES_POR_OBSERVACION],
+            to_attr='archivos_recientes',
+        ),
+        Prefetch(
+            'seguimientos',
+            queryset=SeguimientoObservacion.objects.select_related('usuario').order_by('-fecha')[:RECIENTES_POR_OBSERVACION],
+            to_attr='comentarios_recientes',
+        ),
+    )
+
+
+def _serializar_archivo(archivo):
+    return {
+        'id': archivo.id,
+        'nombre': archivo.nombre_original,
+        'url': archivo.archivo.url if archivo.archivo else None,
+        'tipo': archivo.archivo.name.split('.')[-1].lower() if archivo.archivo else 'unknown',
+        'tamaño': archivo.tamano or 0,
+    }
+
+
+def _serializar_comentario(seg):
+    return {
+        'id': seg.id,
+        'accion': seg.accion,
+        'comentario': seg.comentario,
+        'fecha': seg.fecha.strftime('%d/%m/%Y %H:%M'),
+        'usuario': seg.usuario.nombre if seg.usuario else 'Sistema',
+    }
+
+
+def serializar_observacion_movil(obs, usuario):
+    """Diccionario JSON de una observación obtenida con `preparar_observaciones_movil`."""
+    return {
+        'id': obs.id,
+        'elemento': obs.elemento,
+        'detalle': obs.detalle[:100] + '...' if len(obs.detalle) > 100 else obs.detalle,
+        'vivienda_codigo': obs.vivienda.codigo,
+        'proyecto_codigo': obs.vivienda.proyecto.codigo,
+        'estado': {
+            'id': obs.estado.id,
+            'nombre': obs.estado.nombre,
+            'codigo': obs.estado.codigo
+        },
+        'prioridad': obs.prioridad,
+        'es_urgente': obs.es_urgente,
+        'fecha_creacion': obs.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
+        'creado_por': obs.creado_por.nombre if obs.creado_por else 'Sistema',
+        'puede_editar': puede_editar_observacion(usuario, obs),
+        'esta_vencida': obs.esta_vencida,
+        'total_archivos': obs.total_archivos or 0,
+        'archivos': [_serializar_archivo(archivo) for archivo in obs.archivos_recientes],
+        'total_comentarios': obs.total_comentarios or 0,
+        'comentarios': [_serializar_comentario(seg) for seg in obs.comentarios_recientes],
+    }
+
+
+def serializar_observaciones_movil(observaciones, usuario):
+    """Serializa una página (iterable) de observaciones preparadas."""
+    return [serializar_observacion_movil(obs, usuario) for obs in observaciones]
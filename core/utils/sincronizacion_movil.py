@@ -0,0 +1,139 @@
+"""
+Sincronización incremental (delta) para la réplica offline de la app móvil.
+
+El cliente guarda la `marca` devuelta por cada sincronización y la envía en
+la siguiente; el servidor responde solo lo que cambió en el intervalo
+`[marca anterior, marca nueva)`:
+
+- observaciones con `fecha_ultima_actualizacion` en el intervalo, y sus ids
+  en `observaciones_eliminadas` si quedaron con `activo=False` (tombstones);
+- seguimientos con `fecha_actualizacion` en el intervalo, y sus ids en
+  `seguimientos_eliminados` si quedaron inactivos;
+- archivos subidos en el intervalo (no se editan), y en `archivos_eliminados`
+  los borrados en el intervalo según ArchivoAdjuntoEliminado (lo llena un
+  signal de core/signals.py).
+
+Sin marca se entrega la réplica completa (solo filas activas). Las
+observaciones que salen del alcance del usuario no generan tombstone; el
+cliente puede forzar una sincronización completa omitiendo la marca.
+"""
+from datetime import datetime
+from django.utils import timezone
+from core.permisos import filtrar_observaciones_por_rol, puede_editar_observacion
+from incidencias.models import (
+    Observacion, SeguimientoObservacion, ArchivoAdjuntoObservacion, ArchivoAdjuntoEliminado,
+)
+
+
+class MarcaInvalida(ValueError):
+    """La marca de sincronización recibida no es una fecha ISO válida."""
+
+
+def interpretar_marca(marca):
+    """Convierte la marca (ISO 8601) en datetime aware, o None si viene vacía."""
+    if not marca:
+        return None
+    try:
+        fecha = datetime.fromisoformat(marca)
+    except ValueError as exc:
+        raise MarcaInvalida('Marca de sincronización inválida') from exc
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def _iso(fecha):
+    return fecha.isoformat() if fecha else None
+
+
+def _serializar_observacion(obs, usuario):
+    return {
+        'id': obs.id,
+        'proyecto_id': obs.vivienda.proyecto_id,
+        'proyecto_codigo': obs.vivienda.proyecto.codigo,
+        'vivienda_id': obs.vivienda_id,
+        'vivienda_codigo': obs.vivienda.codigo,
+        'elemento': obs.elemento,
+        'detalle': obs.detalle,
+        'estado': {
+            'id': obs.estado.id,
+            'nombre': obs.estado.nombre,
+            'codigo': obs.estado.codigo
+        },
+        'prioridad': obs.prioridad,
+        'es_urgente': obs.es_urgente,
+        'fecha_creacion': _iso(obs.fecha_creacion),
+        'fecha_vencimiento': _iso(obs.fecha_vencimiento),
+        'fecha_cierre': _iso(obs.fecha_cierre),
+        'actualizada': _iso(obs.fecha_ultima_actualizacion),
+        'creado_por': obs.creado_por.nombre if obs.creado_por else 'Sistema',
+        'puede_editar': puede_editar_observacion(usuario, obs),
+    }
+
+
+def _serializar_seguimiento(seg):
+    return {
+        'id': seg.id,
+        'observacion_id': seg.observacion_id,
+        'accion': seg.accion,
+        'comentario': seg.comentario,
+        'fecha': _iso(seg.fecha),
+        'usuario': seg.usuario.nombre if seg.usuario else 'Sistema',
+    }
+
+
+def _serializar_archivo(archivo):
+    return {
+        'id': archivo.id,
+        'observacion_id': archivo.observacion_id,
+        'nombre': archivo.nombre_original,
+        'url': archivo.archivo.url if archivo.archivo else None,
+        'tipo': archivo.archivo.name.split('.')[-1].lower() if archivo.archivo else 'unknown',
+        'tamaño': archivo.tamano or 0,
+        'fecha_subida': _iso(archivo.fecha_subida),
+    }
+
+
+def cambios_desde(usuario, desde=None):
+    """
+    Cambios visibles para `usuario` desde la marca `desde` (datetime o None).
+
+    Returns:
+        dict con la nueva `marca` y las listas de altas/modificaciones y
+        tombstones de observaciones, seguimientos y archivos.
+    """
+    hasta = timezone.now()
+    visibles = filtrar_observaciones_por_rol(usuario, Observacion.objects.all())
+
+    observaciones = visibles.filter(fecha_ultima_actualizacion__lt=hasta)
+    seguimientos = SeguimientoObservacion.objects.filter(
+        observacion__in=visibles.values('id'), fecha_actualizacion__lt=hasta,
+    )
+    archivos = ArchivoAdjuntoObservacion.objects.filter(observacion__in=visibles.values('id'), fecha_subida__lt=hasta)
+    if desde is None:
+        observaciones = observaciones.filter(activo=True)
+        seguimientos = seguimientos.filter(activo=True, observacion__activo=True)
+        archivos = archivos.filter(observacion__activo=True)
+        archivos_eliminados = ArchivoAdjuntoEliminado.objects.none()
+    else:
+        observaciones = observaciones.filter(fecha_ultima_actualizacion__gte=desde)
+        seguimientos = seguimientos.filter(fecha_actualizacion__gte=desde)
+        archivos = archivos.filter(fecha_subida__gte=desde)
+        archivos_eliminados = ArchivoAdjuntoEliminado.objects.filter(
+            observacion_id__in=visibles.values('id'), fecha__gte=desde, fecha__lt=hasta,
+        )
+
+    activas = observaciones.filter(activo=True).select_related('vivienda__proyecto', 'estado', 'creado_por')
+    return {
+        'marca': _iso(hasta),
+        'completa': desde is None,
+        'observaciones': [_serializar_observacion(obs, usuario) for obs in activas.order_by('fecha_ultima_actualizacion', 'id')],
+        'observaciones_eliminadas': list(observaciones.filter(activo=False).values_list('id', flat=True)),
+        'seguimientos': [
+            _serializar_seguimiento(seg)
+            for seg in seguimientos.filter(activo=True).select_related('usuario').order_by('fecha_actualizacion', 'id')
+        ],
+        'seguimientos_eliminados': list(seguimientos.filter(activo=False).values_list('id', flat=True)),
+        'archivos': [_serializar_archivo(archivo) for archivo in archivos.order_by('fecha_subida', 'id')],
+        'archivos_eliminados': list(archivos_eliminados.values_list('archivo_id', flat=True)),
+    }
@@ -0,0 +1,158 @@
+"""
+Cola de reportes generados en segundo plano.
+
+La web solo encola un TrabajoReporte y consulta su estado; el comando
+`manage.py procesar_reportes` toma los pendientes y los ejecuta en un pool
+de procesos de tamaño fijo, así una ráfaga de reportes no ocupa workers
+WSGI y a lo más corren `REPORTES_PROCESOS` a la vez. Los reportes con el
+mismo contenido se generan una vez (core/utils/cache_reportes.py).
+
+Cada tipo de trabajo se asocia en GENERADORES a una función
+`(usuario, filtros, avance) -> ReporteGenerado`.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from core.utils.cache_reportes import buscar_reporte, clave_reporte, registrar_en_cache
+from reportes.models import TrabajoReporte
+
+logger = logging.getLogger(__name__)
+
+GENERADORES = {
+    'dashboard_pdf': 'core.utils.reporte_dashboard.generar_reporte_dashboard',
+}
+
+
+def encolar_reporte(usuario, tipo, filtros):
+    """
+    Crea el trabajo del reporte. Si la caché ya tiene un reporte con el mismo
+    contenido (de cualquier usuario) el trabajo nace listo; si el usuario ya
+    tiene uno igual sin terminar, se devuelve ese (recargar la pantalla de
+    espera no duplica trabajo).
+    """
+    if tipo not in GENERADORES:
+        raise ValueError(f'Tipo de reporte desconocido: {tipo}')
+    clave = clave_reporte(tipo, filtros, usuario)
+    reporte = buscar_reporte(clave)
+    if reporte:
+        ahora = timezone.now()
+        return TrabajoReporte.objects.create(
+            usuario=usuario, tipo=tipo, filtros=filtros, clave=clave, estado=TrabajoReporte.LISTO,
+            progreso=100, reporte=reporte, mensaje='Reporte reutilizado', fecha_inicio=ahora, fecha_fin=ahora,
+        )
+    en_curso = TrabajoReporte.objects.filter(
+        usuario=usuario, clave=clave, estado__in=[TrabajoReporte.PENDIENTE, TrabajoReporte.PROCESANDO],
+    ).first()
+    if en_curso:
+        return en_curso
+    return TrabajoReporte.objects.create(usuario=usuario, tipo=tipo, filtros=filtros, clave=clave)
+
+
+def tomar_trabajos(cantidad):
+    """
+    Marca como PROCESANDO hasta `cantidad` trabajos pendientes (los más
+    antiguos) y devuelve sus ids. El UPDATE condicionado al estado evita que
+    dos workers tomen el mismo trabajo.
+
+    Un trabajo cuya clave ya se está generando espera en la cola: al
+    terminar el primero, el segundo encuentra el archivo en la caché y el
+    reporte se genera una sola vez.
+    """
+    tomados = []
+    if cantidad <= 0:
+        return tomados
+    ocupadas = set(
+        TrabajoReporte.objects.filter(estado=TrabajoReporte.PROCESANDO).exclude(clave='')
+        .values_list('clave', flat=True)
+    )
+    pendientes = TrabajoReporte.objects.filter(estado=TrabajoReporte.PENDIENTE)\
+        .order_by('fecha_creacion', 'id').values_list('id', 'clave')
+    for trabajo_id, clave in pendientes:
+        if len(tomados) == cantidad:
+            break
+        if clave and clave in ocupadas:
+            continue
+        actualizados = TrabajoReporte.objects.filter(pk=trabajo_id, estado=TrabajoReporte.PENDIENTE).update(
+            estado=TrabajoReporte.PROCESANDO, fecha_inicio=timezone.now(), mensaje='En cola del worker',
+        )
+        if actualizados:
+            tomados.append(trabajo_id)
+            ocupadas.add(clave)
+    return tomados
+
+
+def liberar_trabajos_colgados(excluir=()):
+    """
+    Devuelve a PENDIENTE los trabajos PROCESANDO hace más de
+    REPORTES_TIMEOUT_SEGUNDOS (worker caído a mitad de un reporte), salvo
+    los ids de `excluir` (los que el propio worker sigue ejecutando).
+    """
+    limite = timezone.now() - timedelta(seconds=settings.REPORTES_TIMEOUT_SEGUNDOS)
+    colgados = TrabajoReporte.objects.filter(estado=TrabajoReporte.PROCESANDO, fecha_inicio__lt=limite)
+    return colgados.exclude(pk__in=list(excluir)).update(
+        estado=TrabajoReporte.PENDIENTE, progreso=0, mensaje='Reintentando',
+    )
+
+
+def devolver_a_cola(trabajo_ids):
+    """Devuelve a PENDIENTE trabajos tomados que no alcanzaron a ejecutarse."""
+    return TrabajoReporte.objects.filter(pk__in=trabajo_ids, estado=TrabajoReporte.PROCESANDO).update(
+        estado=TrabajoReporte.PENDIENTE, progreso=0, mensaje='Reintentando',
+    )
+
+
+def marcar_error(trabajo_id, mensaje):
+    TrabajoReporte.objects.filter(pk=trabajo_id).update(
+        estado=TrabajoReporte.ERROR, mensaje=mensaje[:200], fecha_fin=timezone.now(),
+    )
+
+
+def ejecutar_trabajo(trabajo_id):
+    """
+    Genera el reporte de un trabajo ya tomado. Los errores quedan
+    registrados en el trabajo; devuelve el estado final.
+    """
+    trabajo = TrabajoReporte.objects.select_related('usuario').get(pk=trabajo_id)
+
+    def avance(progreso, mensaje):
+        TrabajoReporte.objects.filter(pk=trabajo_id).update(progreso=progreso, mensaje=mensaje)
+
+    try:
+        # Los datos pueden haber cambiado desde que se encoló: la clave se recalcula
+        clave = clave_reporte(trabajo.tipo, trabajo.filtros, trabajo.usuario)
+        reporte = buscar_reporte(clave)
+        if reporte is None:
+            generador = import_string(GENERADORES[trabajo.tipo])
+            reporte = registrar_en_cache(generador(trabajo.usuario, trabajo.filtros, avance=avance), clave)
+    except Exception as e:
+        logger.exception('Error generando reporte %s', trabajo_id)
+        marcar_error(trabajo_id, str(e) or e.__class__.__name__)
+        return TrabajoReporte.ERROR
+
+    TrabajoReporte.objects.filter(pk=trabajo_id).update(
+        estado=TrabajoReporte.LISTO, progreso=100, mensaje='Reporte listo', reporte=reporte,
+        fecha_fin=timezone.now(),
+    )
+    return TrabajoReporte.LISTO
+
+
+def estado_trabajo(trabajo):
+    """Datos para el polling de la pantalla de espera."""
+    datos = {
+        'id': trabajo.pk,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'mensaje': trabajo.mensaje,
+        'terminado': trabajo.terminado,
+        'url_descarga': None,
+    }
+    if trabajo.estado == TrabajoReporte.PENDIENTE:
+        datos['en_cola'] = TrabajoReporte.objects.filter(
+            estado=TrabajoReporte.PENDIENTE, fecha_creacion__lt=trabajo.fecha_creacion,
+        ).count()
+    if trabajo.estado == TrabajoReporte.LISTO and trabajo.reporte_id:
+        datos['url_descarga'] = reverse('reportes:descargar_reporte_generado', args=[trabajo.reporte_id])
+    return datos
@@ -0,0 +1,199 @@
+"""
+Creación en lote de los usuarios FAMILIA de los beneficiarios.
+
+El signal crear_usuario_familia (proyectos/models.py) ya no crea el usuario
+en el save(): encola el beneficiario en UsuarioFamiliaPendiente y, con
+USUARIOS_FAMILIA_AL_CONFIRMAR, programa su creación para cuando se confirme
+la transacción. `provisionar_usuarios_familia` procesa la cola por lotes:
+lee de una vez los RUT y emails ya usados, calcula los hashes PBKDF2 (lo
+caro de crear un usuario) en un pool de USUARIOS_FAMILIA_PROCESOS procesos
+y crea los usuarios con un bulk_create por lote.
+
+Las importaciones masivas envuelven la carga en `diferir_usuarios_familia()`:
+dentro del bloque el signal solo junta los ids, y al salir se encolan con
+un bulk_create y se crean todos los usuarios en una pasada.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from core.models import Rol, Usuario
+from core.validators import normalizar_rut
+from proyectos.models import UsuarioFamiliaPendiente
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 500
+# Con menos contraseñas que esto no conviene levantar el pool
+MINIMO_PARA_POOL = 4
+
+_estado = threading.local()
+
+
+class ResumenProvision:
+    def __init__(self):
+        self.creados = 0
+        self.existentes = 0
+        self.errores = 0
+
+
+def contrasena_inicial(rut):
+    """6 últimos dígitos del RUT (sin puntos ni guion)."""
+    rut_limpio = rut.replace('.', '').replace('-', '')
+    return rut_limpio[-6:]
+
+
+def _inicializar_proceso():
+    # Con 'spawn' (Windows) el proceso hijo parte sin Django configurado
+    import django
+    django.setup()
+
+
+def hashear_contrasenas(contrasenas, procesos=None):
+    """make_password de cada contraseña, repartido en un pool de procesos."""
+    procesos = settings.USUARIOS_FAMILIA_PROCESOS if procesos is None else procesos
+    # Más procesos que núcleos no acelera un cálculo que es solo CPU
+    procesos = min(procesos, len(contrasenas), os.cpu_count() or 1)
+    if procesos <= 1 or len(contrasenas) < MINIMO_PARA_POOL:
+        return [make_password(contrasena) for contrasena in contrasenas]
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_proceso) as pool:
+        return list(pool.map(make_password, contrasenas, chunksize=max(1, len(contrasenas) // (procesos * 4))))
+
+
+# --- Cola ---
+
+def encolar_usuario_familia(beneficiario):
+    """Lo llama el signal al crear un beneficiario con RUT y email."""
+    diferidos = getattr(_estado, 'diferidos', None)
+    if diferidos is not None:
+        diferidos.append(beneficiario.pk)
+        return
+    UsuarioFamiliaPendiente.objects.get_or_create(beneficiario=beneficiario)
+    if settings.USUARIOS_FAMILIA_AL_CONFIRMAR:
+        transaction.on_commit(lambda: provisionar_usuarios_familia([beneficiario.pk]))
+
+
+def encolar_sin_usuario(beneficiarios):
+    """Encola los beneficiarios (con RUT y email) que aún no tienen usuario. Devuelve cuántos."""
+    con_usuario = set(Usuario.objects.exclude(rut_normalizado='').values_list('rut_normalizado', flat=True))
+    encolados = set(UsuarioFamiliaPendiente.objects.values_list('beneficiario_id', flat=True))
+    nuevos = [
+        UsuarioFamiliaPendiente(beneficiario_id=pk)
+        for pk, rut_normalizado in beneficiarios.exclude(rut=None).exclude(rut='').exclude(email=None)
+        .exclude(email='').values_list('pk', 'rut_normalizado')
+        if rut_normalizado not in con_usuario and pk not in encolados
+    ]
+    UsuarioFamiliaPendiente.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE)
+    return len(nuevos)
+
+
+@contextmanager
+def diferir_usuarios_familia(provisionar=True):
+    """
+    Dentro del bloque los beneficiarios creados no se encolan uno a uno. Al
+    salir sin error se encolan juntos y, con `provisionar`, se crean sus
+    usuarios en una pasada (si no, quedan para el comando).
+    """
+    anterior = getattr(_estado, 'diferidos', None)
+    _estado.diferidos = diferidos = []
+    try:
+        yield diferidos
+    finally:
+        _estado.diferidos = anterior
+    if anterior is not None:
+        # Bloque anidado: los procesa el bloque exterior
+        anterior.extend(diferidos)
+        return
+    if diferidos:
+        UsuarioFamiliaPendiente.objects.bulk_create(
+            [UsuarioFamiliaPendiente(beneficiario_id=pk) for pk in diferidos],
+            batch_size=TAMANO_LOTE, ignore_conflicts=True,
+        )
+        if provisionar:
+            provisionar_usuarios_familia(diferidos)
+
+
+# --- Procesamiento ---
+
+def provisionar_usuarios_familia(beneficiario_ids=None, tamano_lote=TAMANO_LOTE, procesos=None):
+    """
+    Crea los usuarios FAMILIA pendientes (solo los de `beneficiario_ids` si
+    se indica). Los beneficiarios que ya tienen usuario con su RUT salen de
+    la cola; los que no se pueden crear (email ya usado) quedan con `error`.
+    Sin el rol FAMILIA no se procesa nada.
+    """
+    resumen = ResumenProvision()
+    pendientes = UsuarioFamiliaPendiente.objects.filter(error='')
+    if beneficiario_ids is not None:
+        pendientes = pendientes.filter(beneficiario_id__in=list(beneficiario_ids))
+    if not pendientes.exists():
+        return resumen
+    rol = Rol.objects.filter(nombre='FAMILIA').first()
+    if rol is None:
+        logger.error('No existe el rol FAMILIA: los usuarios pendientes quedan en cola')
+        return resumen
+
+    ultimo_id = 0
+    while True:
+        lote = list(
+            pendientes.filter(id__gt=ultimo_id).select_related('beneficiario').order_by('id')[:tamano_lote]
+        )
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+        _provisionar_lote(lote, rol, procesos, resumen)
+    return resumen
+
+
+def _provisionar_lote(lote, rol, procesos, resumen):
+    beneficiarios = [pendiente.beneficiario for pendiente in lote]
+    ruts = {normalizar_rut(b.rut) for b in beneficiarios}
+    ruts_usados = set(Usuario.objects.filter(rut_normalizado__in=ruts).values_list('rut_normalizado', flat=True))
+    emails_usados = set(Usuario.objects.filter(
+        email__in=[Usuario.objects.normalize_email(b.email) for b in beneficiarios],
+    ).values_list('email', flat=True))
+
+    listos, errores, nuevos = [], {}, []
+    for pendiente, beneficiario in zip(lote, beneficiarios):
+        rut_normalizado = normalizar_rut(beneficiario.rut)
+        email = Usuario.objects.normalize_email(beneficiario.email)
+        if rut_normalizado in ruts_usados:
+            # Ya tiene usuario (o se creó antes en este lote)
+            listos.append(pendiente.pk)
+            resumen.existentes += 1
+        elif email in emails_usados:
+            errores[pendiente.pk] = f'El email {email} ya pertenece a otro usuario'
+        else:
+            ruts_usados.add(rut_normalizado)
+            emails_usados.add(email)
+            nuevos.append((pendiente, Usuario(
+                email=email, nombre=beneficiario.nombre_completo, rut=beneficiario.rut,
+                rut_normalizado=rut_normalizado, rol=rol,
+            )))
+
+    # Los hashes se calculan fuera de la transacción (son lo lento)
+    hashes = hashear_contrasenas([contrasena_inicial(usuario.rut) for _, usuario in nuevos], procesos)
+    for (_, usuario), password in zip(nuevos, hashes):
+        usuario.password = password
+    with transaction.atomic():
+        # ignore_conflicts: otro proceso pudo crear el mismo usuario entre la lectura y la escritura
+        Usuario.objects.bulk_create([usuario for _, usuario in nuevos], batch_size=TAMANO_LOTE, ignore_conflicts=True)
+        creados = set(Usuario.objects.filter(
+            rut_normalizado__in=[usuario.rut_normalizado for _, usuario in nuevos], email__in=emails_usados,
+        ).values_list('rut_normalizado', flat=True))
+        for pendiente, usuario in nuevos:
+            if usuario.rut_normalizado in creados:
+                listos.append(pendiente.pk)
+                resumen.creados += 1
+                logger.info('Usuario FAMILIA creado: %s (RUT: %s)', usuario.email, usuario.rut)
+            else:
+                errores[pendiente.pk] = 'No se pudo crear el usuario (RUT o email en conflicto)'
+
+        UsuarioFamiliaPendiente.objects.filter(pk__in=listos).delete()
+        for pk, error in errores.items():
+            UsuarioFamiliaPendiente.objects.filter(pk=pk).update(error=error[:200])
+    resumen.errores += len(errores)
@@ -0,0 +1,130 @@
+"""
+Plazos (SLA) de las observaciones.
+
+La fecha de vencimiento se cuenta desde el día de creación (hora local)
+según ConfiguracionObservacion: las urgentes suman sus horas redondeadas
+hacia arriba a días (48 h = 2 días) y las normales sus días. Con
+`usar_dias_habiles` solo cuentan los días de lunes a viernes que no están
+en la tabla Feriado.
+
+`MotorVencimiento.para` da la fecha de una observación nueva (la asigna el
+signal pre_save de core/signals.py). `asignar` fija las fechas de un
+queryset con UPDATE: en días corridos es una sola sentencia y la suma la
+hace el motor de base de datos; los días hábiles no se pueden contar en
+SQL, así que se calculan en Python para cada día de creación distinto
+(pocos frente a las observaciones) y se aplican con un CASE por lote de
+días, comparando fecha_creacion con los límites de cada día.
+"""
+from datetime import datetime, time, timedelta
+from django.db.models import Case, DateField, Value, When
+from django.db.models.functions import Cast, TruncDate
+from django.utils import timezone
+from core.models import ConfiguracionObservacion, Feriado
+
+# Días de creación distintos por UPDATE en modo días hábiles
+DIAS_POR_UPDATE = 200
+SABADO = 5
+
+
+def limites_dia(dia):
+    """Inicio y fin (exclusivo) del día local, para comparar fecha_creacion sin convertirla."""
+    return (
+        timezone.make_aware(datetime.combine(dia, time.min)),
+        timezone.make_aware(datetime.combine(dia + timedelta(days=1), time.min)),
+    )
+
+
+def dias_plazo(config, es_urgente):
+    """Días del plazo: horas urgentes redondeadas hacia arriba, o días normales."""
+    if es_urgente:
+        return (config.horas_vencimiento_urgente + 23) // 24
+    return config.dias_vencimiento_normal
+
+
+class MotorVencimiento:
+    """Lee la configuración (y los feriados, si se usan) una sola vez."""
+
+    def __init__(self, config=None):
+        self.config = config or ConfiguracionObservacion.get_configuracion()
+        self._feriados = None
+
+    @property
+    def feriados(self):
+        if self._feriados is None:
+            self._feriados = set(Feriado.objects.values_list('fecha', flat=True))
+        return self._feriados
+
+    def es_habil(self, fecha):
+        return fecha.weekday() < SABADO and fecha not in self.feriados
+
+    def calcular(self, fecha_base, es_urgente):
+        dias = dias_plazo(self.config, es_urgente)
+        if not self.config.usar_dias_habiles:
+            return fecha_base + timedelta(days=dias)
+        fecha = fecha_base
+        while dias > 0:
+            fecha += timedelta(days=1)
+            if self.es_habil(fecha):
+                dias -= 1
+        return fecha
+
+    def para(self, observacion):
+        """Vencimiento según el día de creación (hoy si aún no se guarda)."""
+        if observacion.fecha_creacion:
+            fecha_base = timezone.localdate(observacion.fecha_creacion)
+        else:
+            fecha_base = timezone.localdate()
+        return self.calcular(fecha_base, observacion.es_urgente)
+
+    # --- Actualización en base de datos ---
+
+    def asignar(self, observaciones, recalcular=False):
+        """
+        Fija el vencimiento de las observaciones que no lo tienen (todas con
+        `recalcular`). Devuelve cuántas se actualizaron.
+
+        update() no aplica auto_now: fecha_ultima_actualizacion se fija en la
+        misma sentencia para que la sincronización móvil y la caché de
+        reportes vean el cambio.
+        """
+        if not recalcular:
+            observaciones = observaciones.filter(fecha_vencimiento__isnull=True)
+        ahora = timezone.now()
+        if not self.config.usar_dias_habiles:
+            return observaciones.update(
+                fecha_vencimiento=self._expresion_dias_corridos(), fecha_ultima_actualizacion=ahora,
+            )
+        return self._asignar_dias_habiles(observaciones, ahora)
+
+    def _expresion_dias_corridos(self):
+        dia_creacion = TruncDate('fecha_creacion')
+
+        def sumar(dias):
+            return Cast(dia_creacion + Value(timedelta(days=dias)), DateField())
+
+        return Case(
+            When(es_urgente=True, then=sumar(dias_plazo(self.config, True))),
+            default=sumar(dias_plazo(self.config, False)),
+            output_field=DateField(),
+        )
+
+    def _asignar_dias_habiles(self, observaciones, ahora):
+        dias = sorted(
+            observaciones.order_by().annotate(dia=TruncDate('fecha_creacion')).values_list('dia', flat=True).distinct()
+        )
+        actualizadas = 0
+        for inicio in range(0, len(dias), DIAS_POR_UPDATE):
+            lote = dias[inicio:inicio + DIAS_POR_UPDATE]
+            casos = []
+            for dia in lote:
+                desde, hasta = limites_dia(dia)
+                for urgente in (True, False):
+                    casos.append(When(
+                        fecha_creacion__gte=desde, fecha_creacion__lt=hasta, es_urgente=urgente,
+                        then=Value(self.calcular(dia, urgente)),
+                    ))
+            # Los días del queryset entre el primero y el último del lote están todos en el lote
+            actualizadas += observaciones.filter(
+                fecha_creacion__gte=limites_dia(lote[0])[0], fecha_creacion__lt=limites_dia(lote[-1])[1],
+            ).update(fecha_vencimiento=Case(*casos, output_field=DateField()), fecha_ultima_actualizacion=ahora)
+        return actualizadas
@@ -11,6 +11,16 @@ def clean_rut(value: str) -> str:
     return v
 
 
+def normalizar_rut(value) -> str:
+    """
+    Forma canónica para buscar y comparar RUTs: solo dígitos y dígito
+    verificador en mayúscula, sin ceros a la izquierda
+    ("12.345.678-k" -> "12345678K"). '' si no hay nada que normalizar.
+    """
+    v = re.sub(r'[^0-9K]', '', str(value or '').upper())
+    return v.lstrip('0')
+
+
 def validar_rut(value: str):
     if not value:
         return
@@ -12,6 +12,10 @@ from django.db.models import Count, Q, F, Func
 from django.contrib import messages
 from .models import Comuna, Region, Rol
 from .decorators import rol_requerido, RolRequiredMixin
+from .utils.kpi_engine import filtrar_rango_fechas, kpis_observaciones, kpis_viviendas, proyectos_del_usuario
+from .utils.busqueda_observaciones import buscar_observaciones
+from .utils.rut import buscar_beneficiario, filtrar_por_inicio_rut, filtrar_por_rut, parece_rut
+from .utils.kpi_snapshot import cerradas_por_mes as snapshot_cerradas_por_mes, kpis_snapshot
 from proyectos.models import Proyecto, Vivienda
 from incidencias.models import ArchivoAdjuntoObservacion, Observacion
 from datetime import datetime, timedelta
@@ -57,11 +61,12 @@ def dashboard(request):
     comuna_objs = []
     try:
         region_valpo = Region.objects.get(nombre__icontains='valparaiso')
-        comunas_valpo = region_valpo.comunas.all()
-        for comuna in comunas_valpo:
-            total_viv = Vivienda.objects.filter(proyecto__comuna=comuna).count()
-            if total_viv > 0:
-                comuna_objs.append({'nombre': comuna.nombre, 'total_viviendas': total_viv})
+        comunas_valpo = (
+            region_valpo.comunas
+            .annotate(total_viviendas=Count('proyecto__viviendas'))
+            .filter(total_viviendas__gt=0)
+        )
+        comuna_objs = [{'nombre': c.nombre, 'total_viviendas': c.total_viviendas} for c in comunas_valpo]
     except Region.DoesNotExist:
         comuna_objs = []
 
@@ -83,26 +88,16 @@ def dashboard(request):
     # **CASO ESPECIAL PARA FAMILIA**
     if es_familia:
         # Buscar el beneficiario asociado al usuario por RUT
-        beneficiario = Beneficiario.objects.filter(rut=user.rut).first() if user.rut else None
+        beneficiario = filtrar_por_rut(Beneficiario.objects.all(), user.rut).first()
         mi_vivienda = Vivienda.objects.filter(beneficiario=beneficiario, activa=True).first() if beneficiario else None
         # Observaciones SOLO de su vivienda
         if mi_vivienda:
             mis_observaciones = Observacion.objects.filter(vivienda=mi_vivienda)
-            obs_total = mis_observaciones.count()
-            obs_abiertas = mis_observaciones.filter(estado__nombre='Abierta').count()
-            obs_cerradas = mis_observaciones.filter(estado__nombre='Cerrada').count()
-            obs_urgentes = mis_observaciones.filter(es_urgente=True, estado__nombre='Abierta').count()
-            obs_vencidas = mis_observaciones.filter(fecha_vencimiento__lt=datetime.now().date(), estado__nombre='Abierta').count()
+            kpi_obs = kpis_observaciones(mis_observaciones)
             ultimas_observaciones = mis_observaciones.select_related('vivienda__proyecto', 'vivienda', 'estado').order_by('-fecha_creacion')[:5]
         else:
-            obs_total = obs_abiertas = obs_cerradas = obs_urgentes = obs_vencidas = 0
+            kpi_obs = kpis_observaciones(Observacion.objects.none())
             ultimas_observaciones = []
-        if obs_total > 0:
-            porc_cerradas = round((obs_cerradas / obs_total) * 100, 1)
-            porc_abiertas = round((obs_abiertas / obs_total) * 100, 1)
-            porc_vencidas = round((obs_vencidas / obs_total) * 100, 1)
-        else:
-            porc_cerradas = porc_abiertas = porc_vencidas = 0
         viviendas_asignadas = 1 if mi_vivienda and mi_vivienda.beneficiario else 0
         total_proyectos = 1
         viviendas_total = 1
@@ -110,66 +105,25 @@ def dashboard(request):
         is_admin = False
         sin_vivienda = mi_vivienda is None
     else:
-
-        proyectos_qs = Proyecto.objects.all()
-        if region_id:
-            proyectos_qs = proyectos_qs.filter(region_id=region_id)
-        # El modelo Proyecto no tiene campo 'estado', el filtro de estado debe aplicarse sobre Vivienda o Observacion
-        # Solo filtrar por fechas en proyectos
-        if fecha_inicio:
-            proyectos_qs = proyectos_qs.filter(fecha_creacion__date__gte=fecha_inicio)
-        if fecha_fin:
-            proyectos_qs = proyectos_qs.filter(fecha_creacion__date__lte=fecha_fin)
-        # Nunca filtrar proyectos por estado
-
-        if user.is_superuser or (user.rol and user.rol.nombre == 'ADMINISTRADOR'):
-            proyectos_user = proyectos_qs
-        elif user.rol and user.rol.nombre == 'CONSTRUCTORA':
-            if getattr(user, 'constructora', None):
-                proyectos_user = proyectos_qs.filter(constructora=user.constructora)
-            elif getattr(user, 'empresa', None):
-                empresa_usuario = user.empresa.strip().lower()
-                proyectos_user = proyectos_qs.filter(constructora__nombre__icontains=empresa_usuario)
-            else:
-                proyectos_user = Proyecto.objects.none()
-        else:
-            proyectos_user = proyectos_qs.filter(
-                Q(creado_por=user) | 
-                Q(region=user.region) if user.region else Q()
-            ).distinct()
-        if proyectos_user is not None:
-            total_proyectos = proyectos_user.count()
-            viviendas_total = Vivienda.objects.filter(proyecto__in=proyectos_user, activa=True).count()
-            viviendas_entregadas = Vivienda.objects.filter(
-                proyecto__in=proyectos_user, 
-                estado='entregada'
-            ).count()
-            obs_qs = Observacion.objects.filter(vivienda__proyecto__in=proyectos_user)
-            # if estado_id:
-            #     obs_qs = obs_qs.filter(estado_id=estado_id)
-            if fecha_inicio:
-                obs_qs = obs_qs.filter(fecha_creacion__date__gte=fecha_inicio)
-            if fecha_fin:
-                obs_qs = obs_qs.filter(fecha_creacion__date__lte=fecha_fin)
-            obs_total = obs_qs.count()
-            obs_abiertas = obs_qs.filter(estado__nombre='Abierta').count()
-            obs_cerradas = obs_qs.filter(estado__nombre='Cerrada').count()
-            obs_urgentes = obs_qs.filter(es_urgente=True, estado__nombre='Abierta').count()
-            obs_vencidas = obs_qs.filter(fecha_vencimiento__lt=datetime.now().date(), estado__nombre='Abierta').count()
-            if obs_total > 0:
-                porc_cerradas = round((obs_cerradas / obs_total) * 100, 1)
-                porc_abiertas = round((obs_abiertas / obs_total) * 100, 1)
-                porc_vencidas = round((obs_vencidas / obs_total) * 100, 1)
-            else:
-                porc_cerradas = porc_abiertas = porc_vencidas = 0
-            ultimas_observaciones = obs_qs.select_related('vivienda__proyecto', 'vivienda', 'estado').order_by('-fecha_creacion')[:5]
-            viviendas_asignadas = Vivienda.objects.filter(proyecto__in=proyectos_user, activa=True).exclude(beneficiario__isnull=True).count()
-            is_admin = user.rol and user.rol.nombre == 'ADMINISTRADOR'
-        else:
-            total_proyectos = viviendas_total = viviendas_entregadas = obs_total = obs_abiertas = obs_cerradas = obs_urgentes = obs_vencidas = porc_cerradas = porc_abiertas = porc_vencidas = 0
-            ultimas_observaciones = []
-            viviendas_asignadas = 0
-            is_admin = False
+        proyectos_user = proyectos_del_usuario(user, region_id=region_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+        total_proyectos = proyectos_user.count()
+        kpi_viv = kpis_viviendas(Vivienda.objects.filter(proyecto__in=proyectos_user))
+        viviendas_total = kpi_viv['activas']
+        viviendas_entregadas = kpi_viv['entregadas']
+        viviendas_asignadas = kpi_viv['asignadas']
+        obs_qs = filtrar_rango_fechas(
+            Observacion.objects.filter(vivienda__proyecto__in=proyectos_user),
+            fecha_inicio, fecha_fin,
+        )
+        # KPIs de observaciones desde el snapshot diario (mismo alcance que obs_qs)
+        kpi_obs = kpis_snapshot(
+            proyectos=proyectos_user,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            solo_activas=False,
+        )
+        ultimas_observaciones = obs_qs.select_related('vivienda__proyecto', 'vivienda', 'estado').order_by('-fecha_creacion')[:5]
+        is_admin = user.rol and user.rol.nombre == 'ADMINISTRADOR'
 
     # Datos para gráfico de observaciones por tipo
     if es_familia and mi_vivienda:
@@ -181,15 +135,8 @@ def dashboard(request):
         )
     else:
         if proyectos_user is not None:
-            obs_tipo_qs = Observacion.objects.filter(vivienda__proyecto__in=proyectos_user)
-            # if estado_id:
-            #     obs_tipo_qs = obs_tipo_qs.filter(estado_id=estado_id)
-            if fecha_inicio:
-                obs_tipo_qs = obs_tipo_qs.filter(fecha_creacion__date__gte=fecha_inicio)
-            if fecha_fin:
-                obs_tipo_qs = obs_tipo_qs.filter(fecha_creacion__date__lte=fecha_fin)
             datos_tipo = (
-                obs_tipo_qs
+                obs_qs
                 .values('tipo__nombre')
                 .annotate(total=Count('id'))
                 .order_by('-total')
@@ -200,27 +147,25 @@ def dashboard(request):
     values = [d['total'] for d in datos_tipo]
 
     # --- Agregación de casos cerrados por mes ---
-    from django.db.models.functions import TruncMonth
     if es_familia and mi_vivienda:
-        cerradas_qs = Observacion.objects.filter(vivienda=mi_vivienda, estado__nombre='Cerrada')
+        from django.db.models.functions import TruncMonth
+        cerradas_por_mes = (
+            Observacion.objects.filter(vivienda=mi_vivienda, estado__nombre='Cerrada')
+            .annotate(mes=TruncMonth('fecha_cierre'))
+            .values('mes')
+            .annotate(total=Count('id'))
+            .order_by('mes')
+        )
     elif proyectos_user is not None:
-        cerradas_qs = Observacion.objects.filter(vivienda__proyecto__in=proyectos_user, estado__nombre='Cerrada')
-        # if estado_id:
-        #     cerradas_qs = cerradas_qs.filter(estado_id=estado_id)
-        if fecha_inicio:
-            cerradas_qs = cerradas_qs.filter(fecha_creacion__date__gte=fecha_inicio)
-        if fecha_fin:
-            cerradas_qs = cerradas_qs.filter(fecha_creacion__date__lte=fecha_fin)
+        # Lee del snapshot diario los días ya consolidados
+        cerradas_por_mes = snapshot_cerradas_por_mes(
+            proyectos=proyectos_user,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            solo_activas=False,
+        )
     else:
-        cerradas_qs = Observacion.objects.none()
-
-    cerradas_por_mes = (
-        cerradas_qs
-        .annotate(mes=TruncMonth('fecha_cierre'))
-        .values('mes')
-        .annotate(total=Count('id'))
-        .order_by('mes')
-    )
+        cerradas_por_mes = []
     meses_cerrados = [d['mes'].strftime('%b %Y') if d['mes'] else 'Sin fecha' for d in cerradas_por_mes]
     valores_cerrados = [d['total'] for d in cerradas_por_mes]
 
@@ -228,14 +173,14 @@ def dashboard(request):
         'total_proyectos': total_proyectos,
         'viviendas_total': viviendas_total,
         'viviendas_entregadas': viviendas_entregadas,
-        'obs_total': obs_total,
-        'obs_abiertas': obs_abiertas,
-        'obs_cerradas': obs_cerradas,
-        'obs_vencidas': obs_vencidas,
-        'obs_urgentes': obs_urgentes,
-        'porc_cerradas': porc_cerradas,
-        'porc_abiertas': porc_abiertas,
-        'porc_vencidas': porc_vencidas,
+        'obs_total': kpi_obs['total'],
+        'obs_abiertas': kpi_obs['abiertas'],
+        'obs_cerradas': kpi_obs['cerradas'],
+        'obs_vencidas': kpi_obs['vencidas'],
+        'obs_urgentes': kpi_obs['urgentes'],
+        'porc_cerradas': kpi_obs['porc_cerradas'],
+        'porc_abiertas': kpi_obs['porc_abiertas'],
+        'porc_vencidas': kpi_obs['porc_vencidas'],
         'ultimas_observaciones': ultimas_observaciones,
         'viviendas_asignadas': viviendas_asignadas,
         'es_familia': es_familia,
@@ -463,10 +408,11 @@ class ConstructoraList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, Vi
         rut = request.GET.get('rut', '').strip()
         constructoras = Constructora.objects.filter(activo=True).select_related('region', 'comuna')
         if rut:
-            from django.db.models import Q
-            constructoras = constructoras.filter(
-                Q(rut__icontains=rut) | Q(nombre__icontains=rut)
-            )
+            # Por RUT (índice de rut_normalizado) o por nombre
+            if parece_rut(rut):
+                constructoras = filtrar_por_inicio_rut(constructoras, rut)
+            else:
+                constructoras = constructoras.filter(nombre__icontains=rut)
         return render(request, 'maestro/constructora_list.html', {
             'constructoras': constructoras,
             'titulo': 'Constructoras',
@@ -523,7 +469,7 @@ class BeneficiarioList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, Vi
         rut = request.GET.get('rut', '').strip()
         beneficiarios = Beneficiario.objects.filter(activo=True)
         if rut:
-            beneficiarios = beneficiarios.filter(rut__icontains=rut)
+            beneficiarios = filtrar_por_inicio_rut(beneficiarios, rut)
         return render(request, 'maestro/beneficiario_list.html', {
             'beneficiarios': beneficiarios,
             'titulo': 'Beneficiarios',
@@ -581,7 +527,7 @@ class UsuarioList(LoginRequiredMixin, RolRequiredMixin, View):
         empresa = request.GET.get('empresa', '').strip()
         usuarios = Usuario.objects.filter(is_active=True)
         if rut:
-            usuarios = usuarios.filter(rut__icontains=rut)
+            usuarios = filtrar_por_inicio_rut(usuarios, rut)
         if correo:
             usuarios = usuarios.filter(email__icontains=correo)
         if rol:
@@ -661,7 +607,6 @@ class ProyectoList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, View):
             )
         
         if estado:
-            from datetime import datetime, timedelta
             hoy = datetime.now().date()
             dentro_30 = hoy + timedelta(days=30)
             if estado == 'vigente':
@@ -730,20 +675,11 @@ class ViviendaList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, View):
         codigo = request.GET.get('codigo', '').strip()
         viviendas = Vivienda.objects.filter(activa=True).select_related('proyecto', 'tipologia', 'beneficiario')
         if beneficiario:
-            # Normalizar rut buscado (eliminar puntos y guion)
-            import re
-            rut_normalizado = re.sub(r'[^\dKk]', '', beneficiario)
-            from django.db import models
-            viviendas = viviendas.annotate(
-                rut_normalizado=models.Func(
-                    models.F('beneficiario__rut'),
-                    function='REPLACE',
-                    template="REPLACE(REPLACE(REPLACE(%(expressions)s, '.', ''), '-', ''), ' ', '')"
-                )
-            ).filter(
-                Q(rut_normalizado__icontains=rut_normalizado) |
-                Q(beneficiario__nombre__icontains=beneficiario)
-            )
+            # Por RUT (índice de rut_normalizado, con o sin puntos/guion) o por nombre
+            if parece_rut(beneficiario):
+                viviendas = filtrar_por_inicio_rut(viviendas, beneficiario, 'beneficiario__rut_normalizado')
+            else:
+                viviendas = viviendas.filter(beneficiario__nombre__icontains=beneficiario)
         if codigo:
             viviendas = viviendas.filter(codigo__icontains=codigo)
         return render(request, 'maestro/vivienda_list.html', {'viviendas': viviendas, 'titulo': 'Viviendas'})
@@ -816,20 +752,13 @@ class ObservacionList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, Vie
         
         # Aplicar filtros
         if buscar_rut:
-            # Permitir búsqueda por RUT con o sin formato (puntos/guion)
-            import re
-            from django.db import models
-            rut_normalizado = re.sub(r'[^\dKk]', '', buscar_rut)
-            observaciones_list = observaciones_list.annotate(
-                rut_normalizado=models.Func(
-                    models.F('vivienda__beneficiario__rut'),
-                    function='REPLACE',
-                    template="REPLACE(REPLACE(REPLACE(%(expressions)s, '.', ''), '-', ''), ' ', '')"
+            # Por RUT (índice de rut_normalizado, con o sin puntos/guion) o por nombre
+            if parece_rut(buscar_rut):
+                observaciones_list = filtrar_por_inicio_rut(
+                    observaciones_list, buscar_rut, 'vivienda__beneficiario__rut_normalizado'
                 )
-            ).filter(
-                Q(rut_normalizado__icontains=rut_normalizado) |
-                Q(vivienda__beneficiario__nombre__icontains=buscar_rut)
-            )
+            else:
+                observaciones_list = observaciones_list.filter(vivienda__beneficiario__nombre__icontains=buscar_rut)
         
         if buscar_vivienda:
             observaciones_list = observaciones_list.filter(
@@ -844,14 +773,10 @@ class ObservacionList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, Vie
         if filtro_prioridad:
             observaciones_list = observaciones_list.filter(prioridad=filtro_prioridad)
         
-        if buscar_texto:
-            observaciones_list = observaciones_list.filter(
-                Q(elemento__icontains=buscar_texto) |
-                Q(detalle__icontains=buscar_texto) |
-                Q(creado_por__email__icontains=buscar_texto)
-            )
-        
         observaciones_list = observaciones_list.order_by('-fecha_creacion')
+        if buscar_texto:
+            # Índice de texto completo, resultados por relevancia
+            observaciones_list = buscar_observaciones(observaciones_list, buscar_texto)
         
         # Paginación - 15 observaciones por página
         paginator = Paginator(observaciones_list, 15)
@@ -1044,9 +969,6 @@ class ConfiguracionObservacionView(LoginRequiredMixin, RolRequiredMixin, View):
 @login_required
 def buscar_beneficiario_por_rut(request):
     """Vista AJAX para buscar un beneficiario por RUT"""
-    from proyectos.models import Beneficiario
-    from django.db.models import Q
-    
     if request.method == 'GET' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         rut_original = request.GET.get('rut', '').strip()
         
@@ -1056,21 +978,9 @@ def buscar_beneficiario_por_rut(request):
                 'error': 'RUT requerido'
             })
         
-        # Limpiar RUT para la búsqueda: remover puntos, espacios y guiones
-        def normalizar_rut(rut):
-            return rut.replace('.', '').replace(' ', '').replace('-', '').lower()
-
-        rut_normalizado = normalizar_rut(rut_original)
-
         try:
-            # Buscar todos los beneficiarios activos
-            beneficiarios = Beneficiario.objects.filter(activo=True)
-            beneficiario = None
-            for b in beneficiarios:
-                if b.rut:
-                    if normalizar_rut(b.rut) == rut_normalizado:
-                        beneficiario = b
-                        break
+            # Con o sin puntos/guion: búsqueda en el índice de rut_normalizado
+            beneficiario = buscar_beneficiario(rut_original)
 
             if beneficiario:
                 return JsonResponse({
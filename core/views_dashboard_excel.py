@@ -5,11 +5,14 @@ from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from core.utils.region_metrics import get_region_metrics
 from core.utils.cumplimiento_constructora import get_cumplimiento_plazos_por_constructora
+from core.utils.kpi_snapshot import kpis_snapshot, tendencia_mensual
+from core.utils.kpi_engine import (
+    filtrar_rango_fechas, kpis_observaciones_por, kpis_viviendas, porcentaje,
+)
 from proyectos.models import Proyecto, Vivienda
 from incidencias.models import Observacion
 from core.models import Region
-from django.db.models import Count, Q, F, ExpressionWrapper, DurationField, Avg
-from django.db.models.functions import TruncMonth
+from django.db.models import Count
 from django.contrib.auth import get_user_model
 from datetime import datetime
 
@@ -30,14 +33,9 @@ def dashboard_excel_report(request):
         proyectos_qs = proyectos_qs.filter(region_id=region_id)
         viviendas_qs = viviendas_qs.filter(proyecto__region_id=region_id)
         obs_qs = obs_qs.filter(vivienda__proyecto__region_id=region_id)
-    if fecha_inicio:
-        proyectos_qs = proyectos_qs.filter(fecha_creacion__date__gte=fecha_inicio)
-        viviendas_qs = viviendas_qs.filter(proyecto__fecha_creacion__date__gte=fecha_inicio)
-        obs_qs = obs_qs.filter(fecha_creacion__date__gte=fecha_inicio)
-    if fecha_fin:
-        proyectos_qs = proyectos_qs.filter(fecha_creacion__date__lte=fecha_fin)
-        viviendas_qs = viviendas_qs.filter(proyecto__fecha_creacion__date__lte=fecha_fin)
-        obs_qs = obs_qs.filter(fecha_creacion__date__lte=fecha_fin)
+    proyectos_qs = filtrar_rango_fechas(proyectos_qs, fecha_inicio, fecha_fin)
+    viviendas_qs = filtrar_rango_fechas(viviendas_qs, fecha_inicio, fecha_fin, campo='proyecto__fecha_creacion')
+    obs_qs = filtrar_rango_fechas(obs_qs, fecha_inicio, fecha_fin)
 
     # 1. KPIs principales
     wb = openpyxl.Workbook()
@@ -45,19 +43,15 @@ def dashboard_excel_report(request):
     ws_kpi.title = "KPIs"
     kpi_headers = ["Total Viviendas", "Viviendas Entregadas", "% Viviendas Entregadas", "Casos Postventa Abiertos", "Tiempo Promedio Resolución (días)", "Familias Acompañadas", "% Familias Acompañadas", "Tasa Cumplimiento"]
     ws_kpi.append(kpi_headers)
-    viviendas_total = viviendas_qs.count()
-    viviendas_entregadas = viviendas_qs.filter(estado='entregada').count()
-    porc_viviendas_entregadas = round((viviendas_entregadas / viviendas_total) * 100, 1) if viviendas_total else 0
-    casos_postventa_abiertos = obs_qs.filter(estado__nombre='Abierta').count()
-    obs_cerradas = obs_qs.filter(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False)
-    if obs_cerradas.exists():
-        expr = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
-        promedio = obs_cerradas.annotate(duracion=expr).aggregate(prom=Avg('duracion'))['prom']
-        tiempo_promedio_resolucion = int(promedio.total_seconds() // 86400) if promedio else 0
-    else:
-        tiempo_promedio_resolucion = 0
-    familias_acompañadas = viviendas_qs.exclude(beneficiario__isnull=True).count()
-    porc_familias_acompañadas = round((familias_acompañadas / viviendas_total) * 100, 1) if viviendas_total else 0
+    kpi_viv = kpis_viviendas(viviendas_qs)
+    kpi_obs = kpis_snapshot(region_id=region_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    viviendas_total = kpi_viv['total']
+    viviendas_entregadas = kpi_viv['entregadas']
+    porc_viviendas_entregadas = porcentaje(viviendas_entregadas, viviendas_total)
+    casos_postventa_abiertos = kpi_obs['abiertas']
+    tiempo_promedio_resolucion = kpi_obs['dias_promedio_resolucion'] or 0
+    familias_acompañadas = kpi_viv['asignadas']
+    porc_familias_acompañadas = porcentaje(familias_acompañadas, viviendas_total)
     tasa_cumplimiento = cumplimiento_constructoras['global']
     ws_kpi.append([
         viviendas_total, viviendas_entregadas, porc_viviendas_entregadas, casos_postventa_abiertos,
@@ -75,27 +69,18 @@ def dashboard_excel_report(request):
     for ev in estados_vivienda:
         nombre = ev['estado'].capitalize() if ev['estado'] else 'Sin estado'
         cantidad = ev['cantidad']
-        porcentaje = round((cantidad / viviendas_total) * 100, 1) if viviendas_total else 0
-        ws_estado.append([nombre, cantidad, porcentaje])
+        ws_estado.append([nombre, cantidad, porcentaje(cantidad, viviendas_total)])
     for cell in ws_estado[1]:
         cell.font = Font(bold=True)
 
     # 3. Observaciones por tipo
     ws_obs = wb.create_sheet("Observaciones")
     ws_obs.append(["Tipo de Observación", "Totales", "Cerrados", "Pendientes", "Tiempo Promedio (días)"])
-    tipos_obs = obs_qs.values('tipo__nombre').annotate(
-        totales=Count('id'),
-        cerrados=Count('id', filter=Q(estado__nombre='Cerrada')),
-        pendientes=Count('id', filter=Q(estado__nombre='Abierta')),
-        tiempo_promedio=Avg(ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField()), filter=Q(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False))
-    ).order_by('-totales')
-    for t in tipos_obs:
-        if t['tiempo_promedio']:
-            dias = int(t['tiempo_promedio'].total_seconds() // 86400)
-        else:
-            dias = '-'
+    for t in kpis_observaciones_por(obs_qs, 'tipo__nombre'):
+        dias = t['dias_promedio_resolucion']
         ws_obs.append([
-            t['tipo__nombre'] or 'Sin tipo', t['totales'], t['cerrados'], t['pendientes'], dias
+            t['tipo__nombre'] or 'Sin tipo', t['total'], t['cerradas'], t['abiertas'],
+            dias if dias is not None else '-'
         ])
     for cell in ws_obs[1]:
         cell.font = Font(bold=True)
@@ -103,10 +88,7 @@ def dashboard_excel_report(request):
     # 4. Tendencias temporales
     ws_tend = wb.create_sheet("Tendencias")
     ws_tend.append(["Mes", "Abiertos", "Cerrados", "Variación"])
-    obs_mes = obs_qs.annotate(mes=TruncMonth('fecha_creacion')).values('mes').annotate(
-        abiertos=Count('id', filter=Q(estado__nombre='Abierta')),
-        cerrados=Count('id', filter=Q(estado__nombre='Cerrada'))
-    ).order_by('mes')
+    obs_mes = tendencia_mensual(region_id=region_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     prev_cerrados = 0
     for m in obs_mes:
         nombre = m['mes'].strftime('%B') if m['mes'] else 'Sin mes'
@@ -134,20 +116,19 @@ def dashboard_excel_report(request):
     ws_eq.append(["Técnico", "Asignados", "Cerrados", "Tasa Cierre", "Tiempo Promedio"])
     User = get_user_model()
     tecnicos = User.objects.filter(is_active=True, rol__nombre__in=['TECNICO', 'COORDINADOR'])
+    kpi_equipo = {
+        fila['asignado_a']: fila
+        for fila in kpis_observaciones_por(obs_qs.filter(asignado_a__in=tecnicos), 'asignado_a')
+    }
     for t in tecnicos:
-        asignados = obs_qs.filter(asignado_a=t).count()
-        cerrados = obs_qs.filter(asignado_a=t, estado__nombre='Cerrada').count()
-        tasa_cierre = round((cerrados / asignados) * 100, 1) if asignados else 0
-        tiempo_promedio = '-'
-        obs_cerradas = obs_qs.filter(asignado_a=t, estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False)
-        if obs_cerradas.exists():
-            expr = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
-            promedio = obs_cerradas.annotate(duracion=expr).aggregate(prom=Avg('duracion'))['prom']
-            if promedio:
-                tiempo_promedio = int(promedio.total_seconds() // 86400)
+        fila = kpi_equipo.get(t.pk)
+        asignados = fila['total'] if fila else 0
+        cerrados = fila['cerradas'] if fila else 0
+        tasa_cierre = porcentaje(cerrados, asignados)
+        dias = fila['dias_promedio_resolucion'] if fila else None
         ws_eq.append([
             t.get_full_name() if hasattr(t, 'get_full_name') else (t.first_name + ' ' + t.last_name).strip() or t.username,
-            asignados, cerrados, tasa_cierre, tiempo_promedio
+            asignados, cerrados, tasa_cierre, dias if dias is not None else '-'
         ])
     for cell in ws_eq[1]:
         cell.font = Font(bold=True)
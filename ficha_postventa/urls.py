@@ -16,7 +16,9 @@ urlpatterns = [
     
     # Archivos y documentos
     path('<int:ficha_pk>/subir-archivo/', views.subir_archivo, name='subir_archivo'),
+    path('archivo/<int:pk>/', views.descargar_archivo, name='descargar_archivo'),
     path('<int:pk>/pdf/', views.generar_pdf, name='generar_pdf'),
+    path('exportar-zip/', views.exportar_pdfs_zip, name='exportar_zip'),
     
     # Estadísticas
     path('proyecto/<int:proyecto_pk>/estadisticas/', views.estadisticas_proyecto, name='estadisticas_proyecto'),
@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Avg, Count
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from django.urls import reverse
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
@@ -14,8 +14,12 @@ from .forms import FichaPostventaForm, FiltroFichasForm, ArchivoFichaForm, Busqu
 from proyectos.models import Vivienda, Proyecto
 from core.decorators import rol_requerido
 from core.models import Usuario
+from core.permisos import obtener_alcance
+from core.utils.renderizador_pdf import ErrorRenderPdf, renderizar_html
+from core.utils.cache_pdf import clave_ficha, guardar_pdf, obtener_pdf
+from core.utils.descargas import servir_archivo
+from core.utils.paquete_pdf import documentos_fichas, respuesta_zip
 import json
-from io import BytesIO
 
 
 @login_required
@@ -68,15 +72,11 @@ def dashboard_fichas(request):
     return render(request, 'ficha_postventa/dashboard.html', context)
 
 
-@login_required
-def listar_fichas(request):
+def _filtrar_fichas(request):
     """
-    Lista todas las fichas con filtros y búsqueda
+    Fichas activas según los filtros y la búsqueda del listado
     """
-    fichas = FichaPostventa.objects.filter(activa=True).select_related(
-        'vivienda__proyecto',
-        'evaluador'
-    ).order_by('-fecha_creacion')
+    fichas = FichaPostventa.objects.filter(activa=True).order_by('-fecha_creacion')
     
     # Aplicar filtros
     form_filtro = FiltroFichasForm(request.GET)
@@ -112,6 +112,19 @@ def listar_fichas(request):
                 Q(vivienda__familia_beneficiaria__icontains=termino) |
                 Q(evaluador__nombre__icontains=termino)
             )
+    return fichas, form_filtro, form_busqueda
+
+
+@login_required
+def listar_fichas(request):
+    """
+    Lista todas las fichas con filtros y búsqueda
+    """
+    fichas, form_filtro, form_busqueda = _filtrar_fichas(request)
+    fichas = fichas.select_related(
+        'vivienda__proyecto',
+        'evaluador'
+    )
     
     # Paginación
     paginator = Paginator(fichas, 20)  # 20 fichas por página
@@ -329,38 +342,69 @@ def subir_archivo(request, ficha_pk):
     return render(request, 'ficha_postventa/subir_archivo.html', context)
 
 
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def descargar_archivo(request, pk):
+    """
+    Entrega un archivo de ficha si el usuario puede ver la vivienda
+    """
+    archivo = get_object_or_404(ArchivoFicha.objects.select_related('ficha'), pk=pk, ficha__activa=True)
+    if not obtener_alcance(request.user).puede_ver_vivienda(archivo.ficha.vivienda_id):
+        return HttpResponse('No tienes permisos para ver este archivo.', status=403)
+    try:
+        return servir_archivo(request, archivo.archivo.path, adjunto=bool(request.GET.get('download')))
+    except FileNotFoundError:
+        raise Http404('Archivo no encontrado')
+
+
 @login_required
 @require_http_methods(["GET"])
 def generar_pdf(request, pk):
     """
-    Generar PDF de la ficha de postventa usando xhtml2pdf
+    Generar PDF de la ficha de postventa (HTML → PDF con el renderizador común)
     """
-    ficha = get_object_or_404(FichaPostventa, pk=pk, activa=True)
+    ficha = get_object_or_404(FichaPostventa.objects.select_related('vivienda__proyecto', 'evaluador__rol'), pk=pk, activa=True)
+    filename = f'ficha_postventa_{ficha.pk}.pdf'
+    descarga = bool(request.GET.get('download'))
+    # PDF ya generado para esta versión de la ficha: se sirve el archivo
+    clave = clave_ficha(ficha)
+    ruta = obtener_pdf(clave)
+    if ruta:
+        try:
+            return servir_archivo(request, ruta, filename, adjunto=descarga)
+        except FileNotFoundError:
+            pass  # Borrado por la limpieza de la caché entre medio: se vuelve a generar
+
     # Renderizar el template HTML para PDF
     html_string = render_to_string('ficha_postventa/pdf_template.html', {'ficha': ficha})
-    # Generar PDF con xhtml2pdf
-    from xhtml2pdf import pisa
-    pdf_buffer = BytesIO()
-    pisa_status = pisa.CreatePDF(html_string, dest=pdf_buffer)
-    
-    if pisa_status.err:
+    try:
+        pdf = renderizar_html(html_string)
+    except ErrorRenderPdf:
         return HttpResponse('Error al generar el PDF', status=500)
-    
-    pdf_file = pdf_buffer.getvalue()
-    pdf_buffer.close()
+    guardar_pdf(clave, pdf.contenido)
     
     # Crear respuesta con PDF
-    response = HttpResponse(pdf_file, content_type='application/pdf')
+    response = HttpResponse(pdf.contenido, content_type='application/pdf')
     # Establecer Content-Disposition
-    if request.GET.get('download'):
-        dispo = 'attachment'
-    else:
-        dispo = 'inline'
-    filename = f'ficha_postventa_{ficha.pk}.pdf'
+    dispo = 'attachment' if descarga else 'inline'
     response['Content-Disposition'] = f'{dispo}; filename="{filename}"'
     return response
 
 
+@login_required
+@rol_requerido('ADMINISTRADOR', 'TECHO')
+def exportar_pdfs_zip(request):
+    """
+    ZIP con el PDF de cada ficha del listado filtrado (p. ej. un proyecto completo)
+    """
+    fichas, _, _ = _filtrar_fichas(request)
+    if not fichas.exists():
+        messages.warning(request, 'No hay fichas que exportar con esos filtros.')
+        return redirect('ficha_postventa:listar')
+    nombre = f"fichas_postventa_{timezone.now().strftime('%Y%m%d_%H%M')}.zip"
+    return respuesta_zip(documentos_fichas(fichas), nombre)
+
+
 @login_required
 def estadisticas_proyecto(request, proyecto_pk):
     """
@@ -412,10 +456,10 @@ def ajax_buscar_beneficiario(request):
         return JsonResponse({'error': 'RUT no proporcionado'}, status=400)
     
     try:
-        from proyectos.models import Beneficiario
+        from core.utils.rut import buscar_beneficiario
         
-        # Buscar beneficiario por RUT
-        beneficiario = Beneficiario.objects.filter(rut=rut, activo=True).first()
+        # Buscar beneficiario por RUT (con o sin puntos)
+        beneficiario = buscar_beneficiario(rut)
         
         if not beneficiario:
             return JsonResponse({
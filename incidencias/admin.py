@@ -1,6 +1,6 @@
 
 from django.contrib import admin
-from .models import TipoObservacion, EstadoObservacion, Observacion, SeguimientoObservacion, ArchivoAdjuntoObservacion
+from .models import TipoObservacion, EstadoObservacion, Observacion, SeguimientoObservacion, ArchivoAdjuntoObservacion, ArchivoAdjuntoEliminado
 
 @admin.register(TipoObservacion)
 class TipoObservacionAdmin(admin.ModelAdmin):
@@ -52,3 +52,8 @@ class ArchivoAdjuntoObservacionAdmin(admin.ModelAdmin):
     search_fields = ['nombre_original', 'descripcion', 'observacion__elemento']
     date_hierarchy = 'fecha_subida'
     readonly_fields = ['fecha_subida']
+
+@admin.register(ArchivoAdjuntoEliminado)
+class ArchivoAdjuntoEliminadoAdmin(admin.ModelAdmin):
+    list_display = ['archivo_id', 'observacion_id', 'fecha']
+    date_hierarchy = 'fecha'
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from incidencias.models import Observacion
+from core.utils.busqueda_observaciones import obtener_backend, reindexar_observaciones
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de texto completo de las observaciones'
+
+    def handle(self, *args, **options):
+        cantidad = reindexar_observaciones(Observacion.objects.all())
+        backend = obtener_backend()
+        if hasattr(backend, 'reconstruir'):
+            backend.reconstruir()
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Índice de búsqueda reconstruido: {cantidad} observación(es) ({type(backend).__name__})')
+        )
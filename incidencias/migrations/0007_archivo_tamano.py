@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:18
+
+from django.db import migrations, models
+
+
+def calcular_tamanos(apps, schema_editor):
+    """Guardar el tamaño de los archivos ya subidos"""
+    ArchivoAdjuntoObservacion = apps.get_model('incidencias', 'ArchivoAdjuntoObservacion')
+
+    for adjunto in ArchivoAdjuntoObservacion.objects.filter(tamano__isnull=True).exclude(archivo=''):
+        try:
+            tamano = adjunto.archivo.size
+        except (OSError, ValueError):
+            continue  # Archivo no disponible en el almacenamiento
+        ArchivoAdjuntoObservacion.objects.filter(pk=adjunto.pk).update(tamano=tamano)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0006_mejoras_seguridad_finales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivoadjuntoobservacion',
+            name='tamano',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, help_text='Tamaño del archivo en bytes (evita consultar el disco)', null=True),
+        ),
+        migrations.RunPython(calcular_tamanos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0007_archivo_tamano'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='observacion',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='obs_fecha_id_desc_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('incidencias', '0008_observacion_indice_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperacionMovil',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(help_text='Clave de idempotencia generada por el cliente', max_length=64)),
+                ('tipo', models.CharField(max_length=30)),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('observacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='operaciones_movil', to='incidencias.observacion')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='operaciones_movil', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Operación Móvil',
+                'verbose_name_plural': 'Operaciones Móviles',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='operacionmovil',
+            constraint=models.UniqueConstraint(fields=('usuario', 'clave'), name='uniq_operacion_movil_usuario_clave'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:47
+
+import re
+import unicodedata
+from django.db import migrations, models
+import django.db.models.deletion
+import incidencias.models
+
+TABLA = 'incidencias_indicebusquedaobservacion'
+
+# SQLite: tabla FTS5 de contenido externo, sincronizada con triggers
+SQLITE = [
+    f"""CREATE VIRTUAL TABLE incidencias_busqueda_fts USING fts5(
+        texto, content='{TABLA}', content_rowid='observacion_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER incidencias_busqueda_ai AFTER INSERT ON {TABLA} BEGIN
+        INSERT INTO incidencias_busqueda_fts(rowid, texto) VALUES (new.observacion_id, new.texto);
+    END""",
+    f"""CREATE TRIGGER incidencias_busqueda_ad AFTER DELETE ON {TABLA} BEGIN
+        INSERT INTO incidencias_busqueda_fts(incidencias_busqueda_fts, rowid, texto) VALUES ('delete', old.observacion_id, old.texto);
+    END""",
+    f"""CREATE TRIGGER incidencias_busqueda_au AFTER UPDATE ON {TABLA} BEGIN
+        INSERT INTO incidencias_busqueda_fts(incidencias_busqueda_fts, rowid, texto) VALUES ('delete', old.observacion_id, old.texto);
+        INSERT INTO incidencias_busqueda_fts(rowid, texto) VALUES (new.observacion_id, new.texto);
+    END""",
+]
+SQLITE_REVERSA = [
+    'DROP TRIGGER IF EXISTS incidencias_busqueda_au',
+    'DROP TRIGGER IF EXISTS incidencias_busqueda_ad',
+    'DROP TRIGGER IF EXISTS incidencias_busqueda_ai',
+    'DROP TABLE IF EXISTS incidencias_busqueda_fts',
+]
+# PostgreSQL: índice GIN sobre el tsvector en español
+POSTGRES = [f"CREATE INDEX incidencias_busqueda_gin ON {TABLA} USING GIN (to_tsvector('spanish', texto))"]
+POSTGRES_REVERSA = ['DROP INDEX IF EXISTS incidencias_busqueda_gin']
+
+
+def _ejecutar(schema_editor, sentencias):
+    for sentencia in sentencias.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sentencia)
+
+
+def crear_indice_texto(apps, schema_editor):
+    _ejecutar(schema_editor, {'sqlite': SQLITE, 'postgresql': POSTGRES})
+
+
+def borrar_indice_texto(apps, schema_editor):
+    _ejecutar(schema_editor, {'sqlite': SQLITE_REVERSA, 'postgresql': POSTGRES_REVERSA})
+
+
+def _normalizar(texto):
+    # Igual que core.utils.busqueda_observaciones.normalizar_texto
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', sin_tildes.lower()).strip()
+
+
+def poblar_indice(apps, schema_editor):
+    Observacion = apps.get_model('incidencias', 'Observacion')
+    Indice = apps.get_model('incidencias', 'IndiceBusquedaObservacion')
+    campos = ('elemento', 'detalle', 'recinto__nombre', 'vivienda__codigo', 'creado_por__email')
+    lote = []
+    for pk, *valores in Observacion.objects.order_by().values_list('pk', *campos).iterator(chunk_size=1000):
+        lote.append(Indice(observacion_id=pk, texto=_normalizar(' '.join(v for v in valores if v))))
+        if len(lote) == 1000:
+            Indice.objects.bulk_create(lote)
+            lote = []
+    Indice.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0009_operacionmovil'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceBusquedaObservacion',
+            fields=[
+                ('observacion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='indice_busqueda', serialize=False, to='incidencias.observacion')),
+                ('texto', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Índice de Búsqueda',
+                'verbose_name_plural': 'Índice de Búsqueda',
+            },
+        ),
+        migrations.RunPython(crear_indice_texto, borrar_indice_texto),
+        migrations.CreateModel(
+            name='TextoBusquedaFts',
+            fields=[
+                ('observacion', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='texto_fts', serialize=False, to='incidencias.observacion')),
+                ('texto', incidencias.models.CampoTextoCompleto()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'incidencias_busqueda_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(poblar_indice, migrations.RunPython.noop),
+    ]
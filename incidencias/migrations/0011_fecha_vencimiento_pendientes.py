@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:18
+
+from datetime import timedelta
+from django.db import migrations
+from django.db.models import Case, DateField, Value, When
+from django.db.models.functions import Cast, TruncDate
+
+
+def asignar_fechas_vencimiento(apps, schema_editor):
+    # Las observaciones sin fecha se mostraban con un plazo calculado al
+    # renderizar; ahora la fecha se guarda (días corridos, como entonces)
+    ConfiguracionObservacion = apps.get_model('core', 'ConfiguracionObservacion')
+    Observacion = apps.get_model('incidencias', 'Observacion')
+    config = ConfiguracionObservacion.objects.first()
+    horas_urgente = config.horas_vencimiento_urgente if config else 48
+    dias_normal = config.dias_vencimiento_normal if config else 120
+
+    def sumar(dias):
+        return Cast(TruncDate('fecha_creacion') + Value(timedelta(days=dias)), DateField())
+
+    Observacion.objects.filter(fecha_vencimiento__isnull=True).update(fecha_vencimiento=Case(
+        When(es_urgente=True, then=sumar((horas_urgente + 23) // 24)),
+        default=sumar(dias_normal),
+        output_field=DateField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_feriado_dias_habiles'),
+        ('incidencias', '0010_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(asignar_fechas_vencimiento, migrations.RunPython.noop),
+    ]
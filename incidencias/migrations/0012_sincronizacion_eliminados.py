@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:34
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copiar_fecha(apps, schema_editor):
+    # Los seguimientos existentes toman su fecha de creación: con la del
+    # despliegue, la siguiente sincronización móvil los reenviaría todos
+    SeguimientoObservacion = apps.get_model('incidencias', 'SeguimientoObservacion')
+    SeguimientoObservacion.objects.update(fecha_actualizacion=F('fecha'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0011_fecha_vencimiento_pendientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoAdjuntoEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo_id', models.PositiveBigIntegerField()),
+                ('observacion_id', models.PositiveBigIntegerField()),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Archivo Adjunto Eliminado',
+                'verbose_name_plural': 'Archivos Adjuntos Eliminados',
+            },
+        ),
+        migrations.AddField(
+            model_name='seguimientoobservacion',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, db_index=True, help_text='Último cambio (p. ej. al desactivarlo); lo usa la sincronización móvil'),
+        ),
+        migrations.RunPython(copiar_fecha, migrations.RunPython.noop),
+    ]
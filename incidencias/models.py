@@ -133,6 +133,7 @@ class Observacion(models.Model):
             models.Index(fields=["fecha_ultima_actualizacion"]),   # Ordenamiento temporal
             models.Index(fields=["prioridad", "es_urgente"]),      # Filtros de prioridad
             models.Index(fields=["creado_por", "fecha_creacion"]), # Historiales por usuario
+            models.Index(fields=["-fecha_creacion", "-id"], name="obs_fecha_id_desc_idx"),  # Paginación por cursor
         ]
         # Validaciones de integridad
         constraints = [
@@ -157,6 +158,8 @@ class ArchivoAdjuntoObservacion(models.Model):
         help_text="Archivo adjunto (PDF, DOC, DOCX, JPG, PNG, GIF - máx. 10MB)"
     )
     nombre_original = models.CharField(max_length=255, blank=True)
+    tamano = models.PositiveBigIntegerField(null=True, blank=True, editable=False,
+                                            help_text="Tamaño del archivo en bytes (evita consultar el disco)")
     descripcion = models.CharField(max_length=255, blank=True, help_text="Descripción opcional del archivo")
     fecha_subida = models.DateTimeField(auto_now_add=True)
     subido_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
@@ -164,6 +167,11 @@ class ArchivoAdjuntoObservacion(models.Model):
     def save(self, *args, **kwargs):
         if not self.nombre_original and self.archivo:
             self.nombre_original = self.archivo.name
+        if self.tamano is None and self.archivo:
+            try:
+                self.tamano = self.archivo.size
+            except (OSError, ValueError):
+                pass  # Archivo no disponible en el almacenamiento
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -177,6 +185,8 @@ class ArchivoAdjuntoObservacion(models.Model):
 class SeguimientoObservacion(models.Model):
     observacion = models.ForeignKey(Observacion, on_delete=models.CASCADE, related_name='seguimientos')
     fecha = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True,
+                                               help_text="Último cambio (p. ej. al desactivarlo); lo usa la sincronización móvil")
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL)
     accion = models.CharField(max_length=100)
     comentario = models.TextField(blank=True)
@@ -199,3 +209,94 @@ class SeguimientoObservacion(models.Model):
             models.Index(fields=["usuario", "fecha"]),
         ]
         # Sin restricciones de estado por ahora para permitir flexibilidad
+
+
+class ArchivoAdjuntoEliminado(models.Model):
+    """
+    Registro de un archivo adjunto borrado, para que la sincronización móvil
+    lo quite de la réplica offline. Guarda los ids sin clave foránea porque
+    la fila original (y a veces su observación) ya no existe.
+    """
+    archivo_id = models.PositiveBigIntegerField()
+    observacion_id = models.PositiveBigIntegerField()
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.observacion_id} - {self.archivo_id}"
+
+    class Meta:
+        verbose_name = "Archivo Adjunto Eliminado"
+        verbose_name_plural = "Archivos Adjuntos Eliminados"
+
+
+class OperacionMovil(models.Model):
+    """
+    Operación offline aplicada desde la cola de la app móvil. Guarda la clave
+    de idempotencia generada por el cliente para que un reintento del mismo
+    lote no vuelva a aplicar la operación.
+    """
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='operaciones_movil')
+    clave = models.CharField(max_length=64, help_text="Clave de idempotencia generada por el cliente")
+    tipo = models.CharField(max_length=30)
+    observacion = models.ForeignKey(Observacion, on_delete=models.CASCADE, related_name='operaciones_movil')
+    resultado = models.JSONField(default=dict, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.usuario_id} - {self.tipo} - {self.clave}"
+
+    class Meta:
+        verbose_name = "Operación Móvil"
+        verbose_name_plural = "Operaciones Móviles"
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "clave"], name="uniq_operacion_movil_usuario_clave"),
+        ]
+
+
+class IndiceBusquedaObservacion(models.Model):
+    """
+    Texto buscable de una observación, ya normalizado (minúsculas, sin
+    tildes). Lo mantiene core/utils/busqueda_observaciones.py y sobre esta
+    tabla se construye el índice de texto completo (FTS5 en SQLite, GIN en
+    PostgreSQL; ver migración 0010).
+    """
+    observacion = models.OneToOneField(
+        Observacion, on_delete=models.CASCADE, primary_key=True, related_name='indice_busqueda'
+    )
+    texto = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Índice de Búsqueda"
+        verbose_name_plural = "Índice de Búsqueda"
+
+
+class CampoTextoCompleto(models.TextField):
+    """Columna de una tabla FTS5; admite el lookup `coincide` (MATCH)."""
+
+
+@CampoTextoCompleto.register_lookup
+class Coincide(models.Lookup):
+    lookup_name = 'coincide'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class TextoBusquedaFts(models.Model):
+    """
+    Tabla virtual FTS5 sobre IndiceBusquedaObservacion (solo SQLite, la
+    crean la migración 0010 y sus triggers). Permite unir la búsqueda y su
+    ranking (`rank`, bm25) a la consulta de observaciones.
+    """
+    observacion = models.OneToOneField(
+        Observacion, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='texto_fts',
+    )
+    texto = CampoTextoCompleto()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'incidencias_busqueda_fts'
@@ -8,6 +8,8 @@ urlpatterns = [
     path('crear/', views.crear_observacion, name='crear_observacion'),
     path('<int:pk>/', views.detalle_observacion, name='detalle_observacion'),
     path('<int:pk>/cambiar-estado/', views.cambiar_estado_observacion, name='cambiar_estado'),
+    path('<int:pk>/archivo/', views.descargar_archivo_principal, name='descargar_archivo_principal'),
+    path('archivo/<int:pk>/', views.descargar_archivo_observacion, name='descargar_archivo'),
     path('archivo/<int:pk>/eliminar/', views.eliminar_archivo_observacion, name='eliminar_archivo'),
     path('ajax/viviendas/', views.ajax_viviendas_por_proyecto, name='ajax_viviendas'),
     path('ajax/recintos/', views.ajax_recintos_por_proyecto, name='ajax_recintos'),
@@ -18,6 +20,8 @@ urlpatterns = [
     # URLs móviles
     path('movil/', views_movil.observaciones_movil, name='observaciones_movil'),
     path('movil/api/', views_movil.observaciones_api_movil, name='observaciones_api_movil'),
+    path('movil/sincronizar/', views_movil.sincronizar_movil, name='sincronizar_movil'),
+    path('movil/lote/', views_movil.lote_operaciones_movil, name='lote_operaciones_movil'),
     path('movil/cambiar-estado/<int:observacion_id>/', views_movil.cambiar_estado_movil, name='cambiar_estado_movil'),
     path('movil/actualizar-descripcion/<int:observacion_id>/', views_movil.actualizar_descripcion_movil, name='actualizar_descripcion_movil'),
     path('movil/descripcion-completa/<int:observacion_id>/', views_movil.obtener_descripcion_completa, name='obtener_descripcion_completa'),
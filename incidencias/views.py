@@ -1,6 +1,5 @@
 from django.views.generic import View
 from django.shortcuts import get_object_or_404, render
-from .models import Observacion, ArchivoAdjuntoObservacion
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 # Vista para mostrar archivos adjuntos de una observación en incidencias
@@ -23,9 +22,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Count
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseForbidden, JsonResponse
 from django.utils import timezone
 from django import forms
+import os
 from .models import Observacion, EstadoObservacion, SeguimientoObservacion, ArchivoAdjuntoObservacion
 from .forms import FiltroObservacionForm, ObservacionForm, CambioEstadoForm, ArchivoAdjuntoForm
 from proyectos.models import Vivienda, Recinto, Proyecto
@@ -36,6 +36,10 @@ from core.permisos import (
     puede_editar_observacion as puede_editar_obs_func,
     puede_crear_observacion as puede_crear_obs_func,
 )
+from core.utils.busqueda_observaciones import buscar_observaciones
+from core.utils.descargas import servir_archivo
+from core.utils.paginacion_cursor import CursorInvalido, paginar_por_cursor
+from core.utils.rut import filtrar_por_rut
 
 @login_required
 def lista_observaciones(request):
@@ -55,7 +59,7 @@ def lista_observaciones(request):
     if es_familia:
         # Obtener vivienda del beneficiario por RUT o nombre
         if getattr(request.user, 'rut', None):
-            mi_vivienda = Vivienda.objects.filter(beneficiario__rut=request.user.rut).first()
+            mi_vivienda = filtrar_por_rut(Vivienda.objects.all(), request.user.rut, 'beneficiario__rut_normalizado').first()
         else:
             mi_vivienda = Vivienda.objects.filter(
                 Q(beneficiario__nombre__icontains=request.user.nombre) |
@@ -93,31 +97,29 @@ def lista_observaciones(request):
             observaciones = observaciones.filter(tipo=form.cleaned_data['tipo'])
 
         if form.cleaned_data.get('buscar'):
-            buscar = form.cleaned_data['buscar']
-            observaciones = observaciones.filter(
-                Q(elemento__icontains=buscar) |
-                Q(descripcion__icontains=buscar) |
-                Q(recinto__nombre__icontains=buscar)
-            )
-
-    # Paginación
-    paginator = Paginator(observaciones, 15)
-    page_number = request.GET.get('page')
-    observaciones_pagina = paginator.get_page(page_number)
+            # Índice de texto completo, resultados por relevancia
+            observaciones = buscar_observaciones(observaciones, form.cleaned_data['buscar'])
+
+    # Paginación: por cursor si se pide (?cursor=), evitando OFFSET y COUNT(*).
+    # El cursor ordena por fecha, así que una búsqueda pagina por número para conservar la relevancia
+    buscando = form.is_valid() and bool(form.cleaned_data.get('buscar'))
+    pagina_cursor = None
+    if 'cursor' in request.GET and not buscando:
+        try:
+            pagina_cursor = paginar_por_cursor(observaciones, request.GET.get('cursor'), 15)
+        except CursorInvalido:
+            pagina_cursor = paginar_por_cursor(observaciones, None, 15)
+        observaciones_pagina = pagina_cursor
+    else:
+        paginator = Paginator(observaciones, 15)
+        page_number = request.GET.get('page')
+        observaciones_pagina = paginator.get_page(page_number)
 
     # Agregar atributos calculados por elemento SOLO en la página actual (evitar iterar todo el queryset)
-    from datetime import timedelta
     for obs in observaciones_pagina:
         # Total de archivos adjuntos (archivos adicionales + archivo principal si existe)
         total_adjuntos = obs.archivos_adjuntos.count()
         obs.total_archivos = total_adjuntos + (1 if obs.archivo_adjunto else 0)
-        # Fallback de fecha de vencimiento si no existiera (para visualización)
-        if not obs.fecha_vencimiento and obs.fecha_creacion:
-            base_date = obs.fecha_creacion.date()
-            if obs.es_urgente or obs.prioridad == 'URGENTE':
-                obs.fecha_vencimiento = base_date + timedelta(days=2)  # 48 horas ≈ 2 días
-            else:
-                obs.fecha_vencimiento = base_date + timedelta(days=120)
 
     # Permiso para cambiar estado (solo no familias pueden cambiar)
     puede_cambiar = not es_familia
@@ -130,7 +132,8 @@ def lista_observaciones(request):
         from datetime import date
         obs_vencidas = observaciones.filter(fecha_vencimiento__lt=date.today(), estado__nombre='Abierta').count()
     else:
-        obs_total = observaciones.count()
+        # En modo cursor el total no se calcula (evita el COUNT(*) en cada página)
+        obs_total = observaciones.count() if pagina_cursor is None else None
         obs_abiertas = obs_cerradas = obs_urgentes = obs_vencidas = None
 
     # Estados permitidos para el cambio (solo si puede cambiar estado)
@@ -142,6 +145,7 @@ def lista_observaciones(request):
     context = {
         'form': form,
         'observaciones': observaciones_pagina,
+        'pagina_cursor': pagina_cursor,
         'titulo': 'Mis Observaciones' if es_familia else 'Observaciones',
         # Familias siempre pueden crear en su vivienda asignada
         'puede_crear': True if es_familia else puede_crear_obs_func(request.user),
@@ -183,7 +187,7 @@ def crear_observacion(request):
         # Buscar vivienda por RUT (más preciso) o por nombre (fallback)
         if request.user.rut:
             # Búsqueda exacta por RUT (más confiable)
-            mi_vivienda = Vivienda.objects.filter(beneficiario__rut=request.user.rut).first()
+            mi_vivienda = filtrar_por_rut(Vivienda.objects.all(), request.user.rut, 'beneficiario__rut_normalizado').first()
         else:
             # Fallback: buscar por nombre si no tiene RUT (usuarios antiguos)
             mi_vivienda = Vivienda.objects.filter(
@@ -245,23 +249,6 @@ def crear_observacion(request):
                 messages.error(request, 'No se puede crear la observación: no hay estados configurados. Contacte al administrador.')
                 return redirect('incidencias:lista_observaciones')
             
-            # Asignar fecha de vencimiento automática
-            from datetime import timedelta, date
-            try:
-                from core.models import ConfiguracionObservacion
-                config = ConfiguracionObservacion.get_configuracion()
-                if observacion.es_urgente:
-                    dias_urgente = (config.horas_vencimiento_urgente + 23) // 24
-                    observacion.fecha_vencimiento = date.today() + timedelta(days=dias_urgente)
-                else:
-                    observacion.fecha_vencimiento = date.today() + timedelta(days=config.dias_vencimiento_normal)
-            except:
-                # Valores por defecto si no hay configuración
-                if observacion.es_urgente:
-                    observacion.fecha_vencimiento = date.today() + timedelta(days=2)
-                else:
-                    observacion.fecha_vencimiento = date.today() + timedelta(days=120)
-            
             observacion.save()
             
             # Procesar archivos adjuntos
@@ -368,20 +355,6 @@ def crear_observacion(request):
                 messages.error(request, 'No se puede crear la observación: no hay estados configurados. Contacte al administrador.')
                 return redirect('incidencias:lista_observaciones')
             
-            # Asignar fecha de vencimiento automática según configuración
-            from core.models import ConfiguracionObservacion
-            from datetime import timedelta, date
-            
-            config = ConfiguracionObservacion.get_configuracion()
-            if observacion.es_urgente:
-                # Urgente: sumar horas configuradas (por defecto 48 horas)
-                # Convertir horas a días (redondeando hacia arriba)
-                dias_urgente = (config.horas_vencimiento_urgente + 23) // 24  # 48h = 2 días
-                observacion.fecha_vencimiento = date.today() + timedelta(days=dias_urgente)
-            else:
-                # Normal: sumar días configurados (por defecto 120 días)
-                observacion.fecha_vencimiento = date.today() + timedelta(days=config.dias_vencimiento_normal)
-            
             observacion.save()
 
             # Procesar archivos adjuntos
@@ -490,20 +463,6 @@ def crear_observacion(request):
                 messages.error(request, 'No se puede crear la observación: no hay estados configurados. Contacte al administrador.')
                 return redirect('incidencias:lista_observaciones')
             
-            # Asignar fecha de vencimiento automática según configuración
-            from core.models import ConfiguracionObservacion
-            from datetime import timedelta, date
-            
-            config = ConfiguracionObservacion.get_configuracion()
-            if observacion.es_urgente:
-                # Urgente: sumar horas configuradas (por defecto 48 horas)
-                # Convertir horas a días (redondeando hacia arriba)
-                dias_urgente = (config.horas_vencimiento_urgente + 23) // 24  # 48h = 2 días
-                observacion.fecha_vencimiento = date.today() + timedelta(days=dias_urgente)
-            else:
-                # Normal: sumar días configurados (por defecto 120 días)
-                observacion.fecha_vencimiento = date.today() + timedelta(days=config.dias_vencimiento_normal)
-            
             observacion.save()
 
             # Procesar archivos adjuntos
@@ -793,6 +752,31 @@ def ajax_elementos_por_recinto(request):
             pass
     return JsonResponse({'elementos': elementos})
 
+def _servir_adjunto(request, observacion, archivo, nombre):
+    if not puede_ver_observacion(request.user, observacion):
+        return HttpResponseForbidden('No tienes permisos para ver este archivo.')
+    if not archivo:
+        raise Http404('La observación no tiene archivo')
+    try:
+        return servir_archivo(request, archivo.path, os.path.basename(nombre or archivo.name), adjunto=False)
+    except FileNotFoundError:
+        raise Http404('Archivo no encontrado')
+
+
+@login_required
+def descargar_archivo_observacion(request, pk):
+    """Entrega un archivo adjunto si el usuario puede ver su observación"""
+    adjunto = get_object_or_404(ArchivoAdjuntoObservacion.objects.select_related('observacion'), pk=pk)
+    return _servir_adjunto(request, adjunto.observacion, adjunto.archivo, adjunto.nombre_original)
+
+
+@login_required
+def descargar_archivo_principal(request, pk):
+    """Entrega el archivo principal (archivo_adjunto) de una observación"""
+    observacion = get_object_or_404(Observacion, pk=pk)
+    return _servir_adjunto(request, observacion, observacion.archivo_adjunto, None)
+
+
 @login_required
 def eliminar_archivo_observacion(request, pk):
     """Elimina un archivo adjunto de una observación"""
@@ -819,7 +803,6 @@ def eliminar_archivo_observacion(request, pk):
     return redirect('incidencias:detalle_observacion', pk=observacion_pk)
 
 from django.db.models import Count
-from incidencias.models import Observacion, TipoObservacion
 from django.contrib.auth.decorators import login_required
 
 @login_required
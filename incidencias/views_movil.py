@@ -13,6 +13,12 @@ import json
 from .models import Observacion, EstadoObservacion, SeguimientoObservacion, TipoObservacion
 from proyectos.models import Proyecto, Vivienda
 from core.permisos import filtrar_observaciones_por_rol, puede_ver_observacion, puede_editar_observacion
+from core.utils.busqueda_observaciones import buscar_observaciones
+from core.utils.operaciones_movil import MAX_OPERACIONES_POR_LOTE, aplicar_lote
+from core.utils.paginacion_cursor import paginar_por_cursor
+from core.utils.rut import filtrar_por_rut
+from core.utils.sincronizacion_movil import MarcaInvalida, cambios_desde, interpretar_marca
+from core.utils.serializador_movil import preparar_observaciones_movil, serializar_observaciones_movil
 
 @login_required
 def observaciones_movil(request):
@@ -49,10 +55,8 @@ def observaciones_api_movil(request):
         buscar = request.GET.get('q', '').strip()
         urgente = request.GET.get('urgente')
         
-        # Query base optimizado - solo campos necesarios
-        observaciones = Observacion.objects.select_related(
-            'vivienda__proyecto', 'estado', 'creado_por'
-        ).filter(activo=True)
+        # Query base optimizado: relaciones, totales y recientes en consultas fijas
+        observaciones = preparar_observaciones_movil(Observacion.objects.filter(activo=True))
         
         # Aplicar permisos por rol
         observaciones = filtrar_observaciones_por_rol(request.user, observaciones)
@@ -65,68 +69,34 @@ def observaciones_api_movil(request):
         if urgente == 'true':
             observaciones = observaciones.filter(es_urgente=True)
         if buscar:
-            observaciones = observaciones.filter(
-                Q(elemento__icontains=buscar) |
-                Q(detalle__icontains=buscar) |
-                Q(vivienda__codigo__icontains=buscar)
-            )
+            # Índice de texto completo: por relevancia
+            observaciones = buscar_observaciones(observaciones.order_by('-fecha_creacion'), buscar)
+        
+        # Paginación por cursor: sin OFFSET ni COUNT(*) (total solo si se pide con contar=1).
+        # El cursor ordena por fecha, así que la búsqueda pagina por número para conservar la relevancia
+        if 'cursor' in request.GET and not buscar:
+            pagina = paginar_por_cursor(observaciones, request.GET.get('cursor'), per_page)
+            paginacion = {
+                'next_cursor': pagina.siguiente_cursor,
+                'has_next': pagina.has_next,
+            }
+            if request.GET.get('contar') == '1':
+                paginacion['total_items'] = observaciones.count()
+            return JsonResponse({
+                'observaciones': serializar_observaciones_movil(pagina, request.user),
+                'pagination': paginacion,
+            })
         
-        # Ordenar por fecha más reciente
-        observaciones = observaciones.order_by('-fecha_creacion')
+        # Ordenar por fecha más reciente (al buscar ya quedan por relevancia)
+        if not buscar:
+            observaciones = observaciones.order_by('-fecha_creacion')
         
         # Paginación
         paginator = Paginator(observaciones, per_page)
         page_obj = paginator.get_page(page)
         
         # Serializar datos mínimos
-        observaciones_data = []
-        for obs in page_obj:
-            # Obtener archivos adjuntos
-            archivos = obs.archivos_adjuntos.all()[:3]  # Solo primeros 3 archivos para performance
-            archivos_data = []
-            for archivo in archivos:
-                archivos_data.append({
-                    'id': archivo.id,
-                    'nombre': archivo.nombre_original,
-                    'url': archivo.archivo.url if archivo.archivo else None,
-                    'tipo': archivo.archivo.name.split('.')[-1].lower() if archivo.archivo else 'unknown',
-                    'tamaño': archivo.archivo.size if archivo.archivo else 0
-                })
-            
-            # Obtener seguimientos/comentarios recientes (últimos 3 para móvil)
-            seguimientos = obs.seguimientos.select_related('usuario').order_by('-fecha')[:3]
-            comentarios_data = []
-            for seg in seguimientos:
-                comentarios_data.append({
-                    'id': seg.id,
-                    'accion': seg.accion,
-                    'comentario': seg.comentario,
-                    'fecha': seg.fecha.strftime('%d/%m/%Y %H:%M'),
-                    'usuario': seg.usuario.nombre if seg.usuario else 'Sistema'
-                })
-            
-            observaciones_data.append({
-                'id': obs.id,
-                'elemento': obs.elemento,
-                'detalle': obs.detalle[:100] + '...' if len(obs.detalle) > 100 else obs.detalle,
-                'vivienda_codigo': obs.vivienda.codigo,
-                'proyecto_codigo': obs.vivienda.proyecto.codigo,
-                'estado': {
-                    'id': obs.estado.id,
-                    'nombre': obs.estado.nombre,
-                    'codigo': obs.estado.codigo
-                },
-                'prioridad': obs.prioridad,
-                'es_urgente': obs.es_urgente,
-                'fecha_creacion': obs.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
-                'creado_por': obs.creado_por.nombre if obs.creado_por else 'Sistema',
-                'puede_editar': puede_editar_observacion(request.user, obs),
-                'esta_vencida': obs.esta_vencida if hasattr(obs, 'esta_vencida') else False,
-                'total_archivos': obs.archivos_adjuntos.count(),
-                'archivos': archivos_data,
-                'total_comentarios': obs.seguimientos.count(),
-                'comentarios': comentarios_data
-            })
+        observaciones_data = serializar_observaciones_movil(page_obj, request.user)
         
         return JsonResponse({
             'observaciones': observaciones_data,
@@ -142,6 +112,41 @@ def observaciones_api_movil(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+@login_required
+def sincronizar_movil(request):
+    """Cambios desde la última sincronización para la réplica offline (IndexedDB)"""
+    try:
+        desde = interpretar_marca(request.GET.get('desde', '').strip())
+    except MarcaInvalida as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(cambios_desde(request.user, desde))
+
+@login_required
+@require_http_methods(["POST"])
+def lote_operaciones_movil(request):
+    """Aplicar en un solo request la cola de operaciones offline (JSON o multipart con archivos)"""
+    try:
+        if request.content_type == 'multipart/form-data':
+            data = json.loads(request.POST.get('operaciones', '[]'))
+        else:
+            data = json.loads(request.body).get('operaciones', [])
+        
+        if not isinstance(data, list) or not data:
+            return JsonResponse({'error': 'Operaciones requeridas'}, status=400)
+        if len(data) > MAX_OPERACIONES_POR_LOTE:
+            return JsonResponse({'error': f'Máximo {MAX_OPERACIONES_POR_LOTE} operaciones por lote'}, status=400)
+        
+        resultados = aplicar_lote(request.user, data, request.FILES)
+        return JsonResponse({
+            'success': True,
+            'resultados': resultados
+        })
+        
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
 @login_required
 @require_http_methods(["POST"])
 def cambiar_estado_movil(request, observacion_id):
@@ -408,7 +413,6 @@ def crear_observacion_movil(request):
     from core.permisos import puede_crear_observacion as puede_crear_obs_func
     from django.contrib import messages
     from django.shortcuts import redirect
-    from datetime import timedelta, date
     
     # Los administradores y TECHO siempre pueden seleccionar proyecto y vivienda
     es_admin_o_techo = (
@@ -429,7 +433,7 @@ def crear_observacion_movil(request):
     if es_familia and not es_admin_o_techo:
         # Buscar vivienda por RUT (más preciso) o por nombre (fallback)
         if request.user.rut:
-            mi_vivienda = Vivienda.objects.filter(beneficiario__rut=request.user.rut).first()
+            mi_vivienda = filtrar_por_rut(Vivienda.objects.all(), request.user.rut, 'beneficiario__rut_normalizado').first()
         else:
             mi_vivienda = Vivienda.objects.filter(
                 Q(beneficiario__nombre__icontains=request.user.nombre) |
@@ -490,22 +494,6 @@ def crear_observacion_movil(request):
                 
                 observacion.estado = estado_abierta
                 
-                # Asignar fecha de vencimiento automática
-                try:
-                    from core.models import ConfiguracionObservacion
-                    config = ConfiguracionObservacion.get_configuracion()
-                    if observacion.es_urgente:
-                        dias_urgente = (config.horas_vencimiento_urgente + 23) // 24
-                        observacion.fecha_vencimiento = date.today() + timedelta(days=dias_urgente)
-                    else:
-                        observacion.fecha_vencimiento = date.today() + timedelta(days=config.dias_vencimiento_normal)
-                except:
-                    # Valores por defecto si no hay configuración
-                    if observacion.es_urgente:
-                        observacion.fecha_vencimiento = date.today() + timedelta(days=2)
-                    else:
-                        observacion.fecha_vencimiento = date.today() + timedelta(days=120)
-                
                 observacion.save()
                 
                 # Procesar archivos adjuntos
@@ -635,15 +623,6 @@ def crear_observacion_movil(request):
             
             observacion.estado = estado_abierta
             
-            # Asignar fecha de vencimiento automática según configuración
-            from core.models import ConfiguracionObservacion
-            config = ConfiguracionObservacion.get_configuracion()
-            if observacion.es_urgente:
-                dias_urgente = (config.horas_vencimiento_urgente + 23) // 24  # 48h = 2 días
-                observacion.fecha_vencimiento = date.today() + timedelta(days=dias_urgente)
-            else:
-                observacion.fecha_vencimiento = date.today() + timedelta(days=config.dias_vencimiento_normal)
-            
             observacion.save()
 
             # Procesar archivos adjuntos
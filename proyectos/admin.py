@@ -1,6 +1,6 @@
 
 from django.contrib import admin
-from .models import TipologiaVivienda, Proyecto, Recinto, Vivienda, Beneficiario, Telefono
+from .models import TipologiaVivienda, Proyecto, Recinto, Vivienda, Beneficiario, Telefono, UsuarioFamiliaPendiente
 
 @admin.register(TipologiaVivienda)
 class TipologiaViviendaAdmin(admin.ModelAdmin):
@@ -42,3 +42,13 @@ class BeneficiarioAdmin(admin.ModelAdmin):
     def telefonos_list(self, obj):
         return ", ".join(obj.telefonos.values_list('numero', flat=True))
     telefonos_list.short_description = 'Teléfonos'
+
+
+@admin.register(UsuarioFamiliaPendiente)
+class UsuarioFamiliaPendienteAdmin(admin.ModelAdmin):
+    list_display = ['beneficiario', 'fecha_creacion', 'error']
+    search_fields = ['beneficiario__nombre', 'beneficiario__rut']
+
+    def has_add_permission(self, request):
+        # Los encola el signal crear_usuario_familia
+        return False
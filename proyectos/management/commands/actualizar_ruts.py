@@ -4,6 +4,9 @@ from django.core.management.base import BaseCommand
 
 from proyectos.models import Beneficiario
 from core.models import Constructora
+from core.utils import ingesta_excel
+from core.utils.conciliacion import indice_beneficiarios, indice_constructoras
+from core.utils.usuarios_familia import diferir_usuarios_familia
 from core.validators import clean_rut
 
 
@@ -25,6 +28,7 @@ class Command(BaseCommand):
         parser.add_argument('--apply', action='store_true', help='Aplicar los cambios a la base de datos')
         parser.add_argument('--create-missing', action='store_true', help='Crear beneficiarios o constructoras que no existan (solo si --apply)')
         parser.add_argument('--dry-run-output', type=str, help='Ruta de archivo CSV para volcar el dry-run (propuestas)')
+        ingesta_excel.agregar_argumentos(parser)
 
     def handle(self, *args, **options):
         archivo = options['archivo']
@@ -33,28 +37,36 @@ class Command(BaseCommand):
         create_missing = options.get('create_missing', False)
         dry_run_output = options.get('dry_run_output')
 
+        # el avance solo se registra con --apply (en dry-run siempre se lee todo)
         try:
-            df = pd.read_excel(archivo, sheet_name=sheet)
+            ingesta = ingesta_excel.IngestaExcel.desde_opciones(
+                archivo, 'actualizar_ruts', options, hoja=sheet, registrar=apply_changes,
+            )
+            columnas = ingesta.columnas
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'Error leyendo Excel: {e}'))
             return
+        if ingesta.desde:
+            self.stdout.write(self.style.WARNING(f'Retomando desde la fila {ingesta.desde + 2} (use --reiniciar para partir de cero)'))
 
         # normalizar columnas
-        cols_map = {c: c.strip().lower() for c in df.columns}
-        df.rename(columns=cols_map, inplace=True)
+        cols_map = {c: c.strip().lower() for c in columnas}
 
         # detectar columnas heurísticamente
         col_ben_nom = None
         col_ben_rut = None
+        col_ben_tel = None
         col_cons_nom = None
         col_cons_rut = None
 
-        for c in df.columns:
+        for c in cols_map.values():
             lc = c.lower()
             if any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil')) and 'rut' not in lc and 'tel' not in lc:
                 col_ben_nom = col_ben_nom or c
             if 'rut' in lc and any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil')):
                 col_ben_rut = col_ben_rut or c
+            if 'tel' in lc and any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil')):
+                col_ben_tel = col_ben_tel or c
             if any(x in lc for x in ('construct', 'empresa', 'constructor')) and 'rut' not in lc:
                 col_cons_nom = col_cons_nom or c
             if 'rut' in lc and any(x in lc for x in ('construct', 'empresa', 'constructor')):
@@ -64,116 +76,115 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR('No se encontraron columnas reconocibles en el Excel.'))
             return
 
-        total_rows = len(df)
         updated_benef = 0
         updated_cons = 0
         skipped = 0
         all_actions = []
+        # tablas cargadas una vez: RUT, nombre y teléfono se buscan en memoria
+        beneficiarios = indice_beneficiarios()
+        constructoras = indice_constructoras()
 
         def norm(v):
             if pd.isna(v):
                 return ''
             return str(v).strip()
 
-        for idx, row in df.iterrows():
-            rownum = idx + 2
-            actions = []
-
-            ben_name = norm(row.get(col_ben_nom)) if col_ben_nom else ''
-            ben_rut_raw = norm(row.get(col_ben_rut)) if col_ben_rut else ''
-            cons_name = norm(row.get(col_cons_nom)) if col_cons_nom else ''
-            cons_rut_raw = norm(row.get(col_cons_rut)) if col_cons_rut else ''
-
-            ben_rut_clean = ''
-            if ben_rut_raw:
-                try:
-                    ben_rut_clean = clean_rut(ben_rut_raw)
-                except Exception:
-                    ben_rut_clean = ben_rut_raw
-
-            cons_rut_clean = ''
-            if cons_rut_raw:
-                try:
-                    cons_rut_clean = clean_rut(cons_rut_raw)
-                except Exception:
-                    cons_rut_clean = cons_rut_raw
-
-            # beneficiario: buscar por RUT primero
-            benef = None
-            if ben_rut_clean:
-                qs = Beneficiario.objects.filter(rut__iexact=ben_rut_clean)
-                if qs.exists():
-                    benef = qs.first()
-
-            if not benef and ben_name:
-                qs = Beneficiario.objects.filter(nombre__iexact=ben_name)
-                if qs.count() == 1:
-                    benef = qs.first()
-                elif qs.count() > 1:
-                    self.stdout.write(self.style.WARNING(f'Fila {rownum}: nombre beneficiario "{ben_name}" es ambiguo ({qs.count()} coincidencias).'))
+        def procesar_bloque(bloque):
+            nonlocal updated_benef, updated_cons, skipped
+            df = bloque.df.rename(columns=cols_map)
+            for idx, row in df.iterrows():
+                rownum = idx + 2
+                actions = []
+
+                ben_name = norm(row.get(col_ben_nom)) if col_ben_nom else ''
+                ben_rut_raw = norm(row.get(col_ben_rut)) if col_ben_rut else ''
+                ben_tel = norm(row.get(col_ben_tel)) if col_ben_tel else ''
+                cons_name = norm(row.get(col_cons_nom)) if col_cons_nom else ''
+                cons_rut_raw = norm(row.get(col_cons_rut)) if col_cons_rut else ''
+
+                ben_rut_clean = ''
+                if ben_rut_raw:
+                    try:
+                        ben_rut_clean = clean_rut(ben_rut_raw)
+                    except Exception:
+                        ben_rut_clean = ben_rut_raw
+
+                cons_rut_clean = ''
+                if cons_rut_raw:
+                    try:
+                        cons_rut_clean = clean_rut(cons_rut_raw)
+                    except Exception:
+                        cons_rut_clean = cons_rut_raw
+
+                # beneficiario: buscar por RUT primero, luego por nombre y teléfono
+                coincidencia = beneficiarios.buscar(rut=ben_rut_clean, nombre=ben_name, telefono=ben_tel)
+                benef = coincidencia.objeto
+                if coincidencia.ambigua:
+                    self.stdout.write(self.style.WARNING(f'Fila {rownum}: {coincidencia.campo} beneficiario "{ben_name or ben_tel}" es ambiguo ({len(coincidencia.candidatos)} coincidencias).'))
                     skipped += 1
 
-            if benef:
-                if ben_rut_clean and (not benef.rut or benef.rut.strip() != ben_rut_clean):
-                    actions.append({'action': 'update_benef', 'object': 'beneficiario', 'object_id': benef.id, 'old_rut': benef.rut, 'new_rut': ben_rut_clean, 'name': benef.nombre})
-                    if apply_changes:
-                        benef.rut = ben_rut_clean
-                        benef.save()
-                        updated_benef += 1
+                if benef:
+                    if ben_rut_clean and (not benef.rut or benef.rut.strip() != ben_rut_clean):
+                        actions.append({'action': 'update_benef', 'object': 'beneficiario', 'object_id': benef.id, 'old_rut': benef.rut, 'new_rut': ben_rut_clean, 'name': benef.nombre})
+                        if apply_changes:
+                            beneficiarios.actualizar(benef, rut=ben_rut_clean)
+                            updated_benef += 1
+                    else:
+                        actions.append({'action': 'no_change_benef', 'object': 'beneficiario', 'object_id': benef.id, 'old_rut': benef.rut, 'new_rut': ben_rut_clean, 'name': benef.nombre})
                 else:
-                    actions.append({'action': 'no_change_benef', 'object': 'beneficiario', 'object_id': benef.id, 'old_rut': benef.rut, 'new_rut': ben_rut_clean, 'name': benef.nombre})
-            else:
-                if ben_rut_clean and create_missing:
-                    actions.append({'action': 'create_benef', 'object': 'beneficiario', 'object_id': None, 'old_rut': None, 'new_rut': ben_rut_clean, 'name': ben_name})
-                    if apply_changes:
-                        Beneficiario.objects.create(nombre=ben_name or ben_rut_clean, rut=ben_rut_clean)
-                        updated_benef += 1
-                else:
-                    if ben_name or ben_rut_clean:
-                        actions.append({'action': 'benef_not_found', 'object': 'beneficiario', 'object_id': None, 'old_rut': None, 'new_rut': ben_rut_clean, 'name': ben_name})
-                        skipped += 1
-
-            # constructora: buscar por RUT primero
-            cons = None
-            if cons_rut_clean:
-                qs = Constructora.objects.filter(rut__iexact=cons_rut_clean)
-                if qs.exists():
-                    cons = qs.first()
-
-            if not cons and cons_name:
-                qs = Constructora.objects.filter(nombre__iexact=cons_name)
-                if qs.count() == 1:
-                    cons = qs.first()
-                elif qs.count() > 1:
-                    self.stdout.write(self.style.WARNING(f'Fila {rownum}: nombre constructora "{cons_name}" es ambiguo ({qs.count()} coincidencias).'))
+                    if ben_rut_clean and create_missing:
+                        actions.append({'action': 'create_benef', 'object': 'beneficiario', 'object_id': None, 'old_rut': None, 'new_rut': ben_rut_clean, 'name': ben_name})
+                        if apply_changes:
+                            beneficiarios.agregar(Beneficiario.objects.create(nombre=ben_name or ben_rut_clean, rut=ben_rut_clean))
+                            updated_benef += 1
+                    else:
+                        if ben_name or ben_rut_clean:
+                            actions.append({'action': 'benef_not_found', 'object': 'beneficiario', 'object_id': None, 'old_rut': None, 'new_rut': ben_rut_clean, 'name': ben_name})
+                            skipped += 1
+
+                # constructora: buscar por RUT primero
+                coincidencia = constructoras.buscar(rut=cons_rut_clean, nombre=cons_name)
+                cons = coincidencia.objeto
+                if coincidencia.ambigua:
+                    self.stdout.write(self.style.WARNING(f'Fila {rownum}: {coincidencia.campo} constructora "{cons_name or cons_rut_clean}" es ambiguo ({len(coincidencia.candidatos)} coincidencias).'))
                     skipped += 1
 
-            if cons:
-                if cons_rut_clean and (not cons.rut or cons.rut.strip() != cons_rut_clean):
-                    actions.append({'action': 'update_cons', 'object': 'constructora', 'object_id': cons.id, 'old_rut': cons.rut, 'new_rut': cons_rut_clean, 'name': cons.nombre})
-                    if apply_changes:
-                        cons.rut = cons_rut_clean
-                        cons.save()
-                        updated_cons += 1
-                else:
-                    actions.append({'action': 'no_change_cons', 'object': 'constructora', 'object_id': cons.id, 'old_rut': cons.rut, 'new_rut': cons_rut_clean, 'name': cons.nombre})
-            else:
-                if cons_rut_clean and create_missing:
-                    actions.append({'action': 'create_cons', 'object': 'constructora', 'object_id': None, 'old_rut': None, 'new_rut': cons_rut_clean, 'name': cons_name})
-                    if apply_changes:
-                        Constructora.objects.create(nombre=cons_name or cons_rut_clean, rut=cons_rut_clean)
-                        updated_cons += 1
+                if cons:
+                    if cons_rut_clean and (not cons.rut or cons.rut.strip() != cons_rut_clean):
+                        actions.append({'action': 'update_cons', 'object': 'constructora', 'object_id': cons.id, 'old_rut': cons.rut, 'new_rut': cons_rut_clean, 'name': cons.nombre})
+                        if apply_changes:
+                            constructoras.actualizar(cons, rut=cons_rut_clean)
+                            updated_cons += 1
+                    else:
+                        actions.append({'action': 'no_change_cons', 'object': 'constructora', 'object_id': cons.id, 'old_rut': cons.rut, 'new_rut': cons_rut_clean, 'name': cons.nombre})
                 else:
-                    if cons_name or cons_rut_clean:
-                        actions.append({'action': 'cons_not_found', 'object': 'constructora', 'object_id': None, 'old_rut': None, 'new_rut': cons_rut_clean, 'name': cons_name})
-                        skipped += 1
-
-            if actions:
-                self.stdout.write(self.style.SUCCESS(f'Fila {rownum} acciones:'))
-                for a in actions:
-                    msg = f"{a['action']}: {a['object']} id={a.get('object_id')} name={a.get('name')} old={a.get('old_rut')} new={a.get('new_rut')}"
-                    self.stdout.write(f'  - {msg}')
-                    all_actions.append({'row': rownum, 'action': a['action'], 'object': a['object'], 'object_id': a.get('object_id'), 'name': a.get('name'), 'old_rut': a.get('old_rut'), 'new_rut': a.get('new_rut'), 'message': msg})
+                    if cons_rut_clean and create_missing:
+                        actions.append({'action': 'create_cons', 'object': 'constructora', 'object_id': None, 'old_rut': None, 'new_rut': cons_rut_clean, 'name': cons_name})
+                        if apply_changes:
+                            constructoras.agregar(Constructora.objects.create(nombre=cons_name or cons_rut_clean, rut=cons_rut_clean))
+                            updated_cons += 1
+                    else:
+                        if cons_name or cons_rut_clean:
+                            actions.append({'action': 'cons_not_found', 'object': 'constructora', 'object_id': None, 'old_rut': None, 'new_rut': cons_rut_clean, 'name': cons_name})
+                            skipped += 1
+
+                if actions:
+                    self.stdout.write(self.style.SUCCESS(f'Fila {rownum} acciones:'))
+                    for a in actions:
+                        msg = f"{a['action']}: {a['object']} id={a.get('object_id')} name={a.get('name')} old={a.get('old_rut')} new={a.get('new_rut')}"
+                        self.stdout.write(f'  - {msg}')
+                        all_actions.append({'row': rownum, 'action': a['action'], 'object': a['object'], 'object_id': a.get('object_id'), 'name': a.get('name'), 'old_rut': a.get('old_rut'), 'new_rut': a.get('new_rut'), 'message': msg})
+
+            # cambios del bloque en bulk_update, dentro de la transacción del bloque
+            beneficiarios.guardar()
+            constructoras.guardar()
+
+        # los usuarios FAMILIA de los beneficiarios creados se crean juntos al final de cada bloque
+        def procesar_bloque_diferido(bloque):
+            with diferir_usuarios_familia():
+                procesar_bloque(bloque)
+
+        total_rows = ingesta.procesar(procesar_bloque_diferido)
 
         # volcar CSV
         if dry_run_output:
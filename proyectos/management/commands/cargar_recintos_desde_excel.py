@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from proyectos.models import Recinto, TipologiaVivienda
+from core.utils import ingesta_excel
 import pandas as pd
 import os
 
@@ -18,6 +19,8 @@ class Command(BaseCommand):
             action='store_true',
             help='Sobrescribir elementos existentes en lugar de agregar'
         )
+        # Los recintos se escriben al terminar de leer: no hay punto de control que retomar
+        ingesta_excel.agregar_argumentos(parser, punto_control=False)
 
     def handle(self, *args, **options):
         archivo = options['archivo']
@@ -48,9 +51,10 @@ class Command(BaseCommand):
         self.stdout.write(f'📂 Archivo encontrado: {ruta_archivo}')
         
         try:
-            # Leer el archivo Excel con codificación correcta
-            self.stdout.write('📖 Leyendo archivo Excel...')
-            df = pd.read_excel(ruta_archivo, engine='openpyxl')
+            ingesta = ingesta_excel.IngestaExcel.desde_opciones(
+                ruta_archivo, 'cargar_recintos_desde_excel', options, registrar=False,
+            )
+            columnas = ingesta.columnas
             
             # Función para limpiar caracteres mal codificados
             def limpiar_texto(texto):
@@ -70,13 +74,8 @@ class Command(BaseCommand):
                     texto = texto.replace(mal, bien)
                 return texto
             
-            # Limpiar todas las columnas de texto
-            for col in df.columns:
-                if df[col].dtype == 'object':  # Solo para columnas de texto
-                    df[col] = df[col].apply(limpiar_texto)
-            
             # Mostrar las columnas disponibles
-            self.stdout.write(f'\n📋 Columnas encontradas: {list(df.columns)}\n')
+            self.stdout.write(f'\n📋 Columnas encontradas: {columnas}\n')
             
             # Buscar columnas relevantes (ajustar según estructura real del Excel)
             columnas_necesarias = ['tipologia', 'nombre', 'descripcion', 'elementos_disponibles']
@@ -86,7 +85,7 @@ class Command(BaseCommand):
             col_nombre = None
             col_elementos = None
             
-            for col in df.columns:
+            for col in columnas:
                 col_lower = str(col).lower()
                 if 'vda_tipologia' in col_lower or col == 'VDA_TIPOLOGIA':
                     col_tipologia = col
@@ -108,7 +107,9 @@ class Command(BaseCommand):
                 
                 # Mostrar vista previa de los datos
                 self.stdout.write('\n📊 Vista previa de los datos:')
-                self.stdout.write(str(df.head()))
+                for bloque in ingesta.bloques():
+                    self.stdout.write(str(bloque.df.head()))
+                    break
                 return
             
             self.stdout.write(f'\n✅ Columnas identificadas:')
@@ -121,8 +122,21 @@ class Command(BaseCommand):
             recintos_creados = 0
             elementos_agregados = 0
             
+            # Leer el archivo por bloques juntando los elementos de cada (tipología, recinto);
+            # solo se guardan esas tres columnas, no la planilla completa
+            self.stdout.write('📖 Leyendo archivo Excel...')
+            elementos_por_recinto = {}
+            for bloque in ingesta.bloques():
+                df = bloque.df[[col_tipologia, col_nombre, col_elementos]].dropna(subset=[col_tipologia, col_nombre])
+                for col in df.columns:
+                    df[col] = df[col].apply(limpiar_texto)
+                for clave, elementos in df.groupby([col_tipologia, col_nombre])[col_elementos]:
+                    elementos_por_recinto.setdefault(clave, set()).update(
+                        str(elemento).strip() for elemento in elementos if pd.notna(elemento) and str(elemento).strip()
+                    )
+            
             # Agrupar por tipología y nombre de recinto
-            for (tipologia_nombre, recinto_nombre), grupo in df.groupby([col_tipologia, col_nombre]):
+            for (tipologia_nombre, recinto_nombre), elementos in sorted(elementos_por_recinto.items(), key=lambda item: tuple(map(str, item[0]))):
                 self.stdout.write(f'\n🔄 Procesando: {tipologia_nombre} - {recinto_nombre}')
                 
                 # Buscar la tipología - primero intentar por código exacto, luego por nombre
@@ -160,14 +174,6 @@ class Command(BaseCommand):
                     )
                     continue
                 
-                # Obtener todos los elementos únicos para este recinto
-                elementos = set()
-                for _, row in grupo.iterrows():
-                    if pd.notna(row[col_elementos]):
-                        elemento = str(row[col_elementos]).strip()
-                        if elemento:
-                            elementos.add(elemento)
-                
                 elementos_lista = sorted(list(elementos))
                 
                 # Buscar o crear el recinto
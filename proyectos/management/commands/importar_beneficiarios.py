@@ -3,6 +3,9 @@ import pandas as pd
 from django.core.management.base import BaseCommand
 
 from proyectos.models import Beneficiario
+from core.utils import ingesta_excel
+from core.utils.conciliacion import indice_beneficiarios
+from core.utils.usuarios_familia import diferir_usuarios_familia
 from core.validators import clean_rut
 
 
@@ -24,6 +27,7 @@ class Command(BaseCommand):
         parser.add_argument('--apply', action='store_true', help='Aplicar los cambios a la base de datos')
         parser.add_argument('--create-missing', action='store_true', help='Crear beneficiarios que no existan (solo si --apply)')
         parser.add_argument('--dry-run-output', type=str, help='Ruta de archivo CSV para volcar el dry-run (auditoría)')
+        ingesta_excel.agregar_argumentos(parser)
 
     def handle(self, *args, **options):
         archivo = options['archivo']
@@ -32,101 +36,112 @@ class Command(BaseCommand):
         create_missing = options.get('create_missing', False)
         dry_run_output = options.get('dry_run_output')
 
+        # el avance solo se registra con --apply (en dry-run siempre se lee todo)
         try:
-            df = pd.read_excel(archivo, sheet_name=sheet)
+            ingesta = ingesta_excel.IngestaExcel.desde_opciones(
+                archivo, 'importar_beneficiarios', options, hoja=sheet, registrar=apply_changes,
+            )
+            columnas = ingesta.columnas
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'Error leyendo Excel: {e}'))
             return
+        if ingesta.desde:
+            self.stdout.write(self.style.WARNING(f'Retomando desde la fila {ingesta.desde + 2} (use --reiniciar para partir de cero)'))
 
         # normalizar columnas
-        cols_map = {c: c.strip().lower() for c in df.columns}
-        df.rename(columns=cols_map, inplace=True)
+        cols_map = {c: c.strip().lower() for c in columnas}
 
         # detectar columnas heurísticamente (nombre y rut de beneficiario)
         col_ben_nom = None
         col_ben_rut = None
-        for c in df.columns:
+        col_ben_tel = None
+        for c in cols_map.values():
             lc = c.lower()
             if any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil', 'nombre')) and 'rut' not in lc and 'tel' not in lc:
                 col_ben_nom = col_ben_nom or c
             if 'rut' in lc and any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil')):
                 col_ben_rut = col_ben_rut or c
+            if 'tel' in lc and any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil')):
+                col_ben_tel = col_ben_tel or c
 
         if not any([col_ben_nom, col_ben_rut]):
             self.stderr.write(self.style.ERROR('No se encontraron columnas de beneficiario reconocibles en el Excel.'))
             return
 
-        total_rows = len(df)
         updated = 0
         created = 0
         skipped = 0
         all_actions = []
+        # beneficiarios cargados una vez: RUT, nombre y teléfono se buscan en memoria
+        indice = indice_beneficiarios()
 
         def norm(v):
             if pd.isna(v):
                 return ''
             return str(v).strip()
 
-        for idx, row in df.iterrows():
-            rownum = idx + 2
-            ben_name = norm(row.get(col_ben_nom)) if col_ben_nom else ''
-            ben_rut_raw = norm(row.get(col_ben_rut)) if col_ben_rut else ''
-
-            ben_rut_clean = ''
-            if ben_rut_raw:
-                try:
-                    ben_rut_clean = clean_rut(ben_rut_raw)
-                except Exception:
-                    ben_rut_clean = ben_rut_raw
-
-            benef = None
-            # buscar por RUT primero
-            if ben_rut_clean:
-                qs = Beneficiario.objects.filter(rut__iexact=ben_rut_clean)
-                if qs.exists():
-                    benef = qs.first()
-
-            # fallback por nombre (único)
-            if not benef and ben_name:
-                qs = Beneficiario.objects.filter(nombre__iexact=ben_name)
-                if qs.count() == 1:
-                    benef = qs.first()
-                elif qs.count() > 1:
-                    self.stdout.write(self.style.WARNING(f'Fila {rownum}: nombre beneficiario "{ben_name}" es ambiguo ({qs.count()} coincidencias).'))
+        def procesar_bloque(bloque):
+            nonlocal updated, created, skipped
+            df = bloque.df.rename(columns=cols_map)
+            for idx, row in df.iterrows():
+                rownum = idx + 2
+                ben_name = norm(row.get(col_ben_nom)) if col_ben_nom else ''
+                ben_rut_raw = norm(row.get(col_ben_rut)) if col_ben_rut else ''
+                ben_tel = norm(row.get(col_ben_tel)) if col_ben_tel else ''
+
+                ben_rut_clean = ''
+                if ben_rut_raw:
+                    try:
+                        ben_rut_clean = clean_rut(ben_rut_raw)
+                    except Exception:
+                        ben_rut_clean = ben_rut_raw
+
+                # buscar por RUT primero; fallback por nombre y por teléfono (únicos)
+                coincidencia = indice.buscar(rut=ben_rut_clean, nombre=ben_name, telefono=ben_tel)
+                benef = coincidencia.objeto
+                if coincidencia.ambigua:
+                    self.stdout.write(self.style.WARNING(f'Fila {rownum}: {coincidencia.campo} beneficiario "{ben_name or ben_tel}" es ambiguo ({len(coincidencia.candidatos)} coincidencias).'))
                     skipped += 1
 
-            if benef:
-                old_name = benef.nombre
-                old_rut = benef.rut
-                new_name = ben_name or old_name
-                new_rut = ben_rut_clean or old_rut
-                changed = False
-                if new_name and (not old_name or old_name.strip() != new_name.strip()):
-                    changed = True
-                if new_rut and (not old_rut or (old_rut and old_rut.strip().lower() != new_rut.strip().lower())):
-                    changed = True
-
-                if changed:
-                    all_actions.append({'row': rownum, 'action': 'update_benef', 'object': 'beneficiario', 'object_id': benef.id, 'old_name': old_name, 'old_rut': old_rut, 'new_name': new_name, 'new_rut': new_rut, 'message': f'update_benef id={benef.id} name "{old_name}"->{new_name} rut {old_rut}->{new_rut}'})
-                    if apply_changes:
-                        benef.nombre = new_name
-                        if new_rut:
-                            benef.rut = new_rut
-                        benef.save()
-                        updated += 1
+                if benef:
+                    old_name = benef.nombre
+                    old_rut = benef.rut
+                    new_name = ben_name or old_name
+                    new_rut = ben_rut_clean or old_rut
+                    changed = False
+                    if new_name and (not old_name or old_name.strip() != new_name.strip()):
+                        changed = True
+                    if new_rut and (not old_rut or (old_rut and old_rut.strip().lower() != new_rut.strip().lower())):
+                        changed = True
+
+                    if changed:
+                        all_actions.append({'row': rownum, 'action': 'update_benef', 'object': 'beneficiario', 'object_id': benef.id, 'old_name': old_name, 'old_rut': old_rut, 'new_name': new_name, 'new_rut': new_rut, 'message': f'update_benef id={benef.id} name "{old_name}"->{new_name} rut {old_rut}->{new_rut}'})
+                        if apply_changes:
+                            indice.actualizar(benef, nombre=new_name, **({'rut': new_rut} if new_rut else {}))
+                            updated += 1
+                    else:
+                        all_actions.append({'row': rownum, 'action': 'no_change_benef', 'object': 'beneficiario', 'object_id': benef.id, 'old_name': old_name, 'old_rut': old_rut, 'new_name': new_name, 'new_rut': new_rut, 'message': 'no_change_benef'})
                 else:
-                    all_actions.append({'row': rownum, 'action': 'no_change_benef', 'object': 'beneficiario', 'object_id': benef.id, 'old_name': old_name, 'old_rut': old_rut, 'new_name': new_name, 'new_rut': new_rut, 'message': 'no_change_benef'})
-            else:
-                # no existe
-                if ben_rut_clean and create_missing:
-                    all_actions.append({'row': rownum, 'action': 'create_benef', 'object': 'beneficiario', 'object_id': None, 'old_name': None, 'old_rut': None, 'new_name': ben_name, 'new_rut': ben_rut_clean, 'message': f'create_benef name="{ben_name}" rut={ben_rut_clean}'})
-                    if apply_changes:
-                        Beneficiario.objects.create(nombre=ben_name or ben_rut_clean, rut=ben_rut_clean)
-                        created += 1
-                else:
-                    if ben_name or ben_rut_clean:
-                        all_actions.append({'row': rownum, 'action': 'benef_not_found', 'object': 'beneficiario', 'object_id': None, 'old_name': None, 'old_rut': None, 'new_name': ben_name, 'new_rut': ben_rut_clean, 'message': 'benef_not_found'})
-                        skipped += 1
+                    # no existe
+                    if ben_rut_clean and create_missing:
+                        all_actions.append({'row': rownum, 'action': 'create_benef', 'object': 'beneficiario', 'object_id': None, 'old_name': None, 'old_rut': None, 'new_name': ben_name, 'new_rut': ben_rut_clean, 'message': f'create_benef name="{ben_name}" rut={ben_rut_clean}'})
+                        if apply_changes:
+                            indice.agregar(Beneficiario.objects.create(nombre=ben_name or ben_rut_clean, rut=ben_rut_clean))
+                            created += 1
+                    else:
+                        if ben_name or ben_rut_clean:
+                            all_actions.append({'row': rownum, 'action': 'benef_not_found', 'object': 'beneficiario', 'object_id': None, 'old_name': None, 'old_rut': None, 'new_name': ben_name, 'new_rut': ben_rut_clean, 'message': 'benef_not_found'})
+                            skipped += 1
+
+            # cambios del bloque en bulk_update, dentro de la transacción del bloque
+            indice.guardar()
+
+        # los usuarios FAMILIA de los beneficiarios creados se crean juntos al final de cada bloque
+        def procesar_bloque_diferido(bloque):
+            with diferir_usuarios_familia():
+                procesar_bloque(bloque)
+
+        total_rows = ingesta.procesar(procesar_bloque_diferido)
 
         # volcar CSV
         if dry_run_output:
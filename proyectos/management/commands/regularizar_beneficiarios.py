@@ -3,14 +3,7 @@ import pandas as pd
 from pathlib import Path
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from proyectos.models import Beneficiario
-from unidecode import unidecode
-
-def normalize_text(text):
-    """Normaliza el texto para comparación: sin tildes y en minúsculas."""
-    if not isinstance(text, str):
-        return ""
-    return unidecode(text).lower().strip()
+from core.utils.conciliacion import indice_beneficiarios
 
 class Command(BaseCommand):
     help = 'Regulariza la tabla de Beneficiarios usando un CSV como fuente de verdad.'
@@ -45,14 +38,8 @@ class Command(BaseCommand):
 
         summary = {'updated': 0, 'not_found': 0, 'ambiguous': 0, 'no_change': 0, 'errors': 0}
 
-        # Crear un mapa de nombres normalizados a beneficiarios de la DB
-        db_beneficiarios = list(Beneficiario.objects.all())
-        beneficiarios_map = {}
-        for b in db_beneficiarios:
-            normalized_name = normalize_text(b.nombre)
-            if normalized_name not in beneficiarios_map:
-                beneficiarios_map[normalized_name] = []
-            beneficiarios_map[normalized_name].append(b)
+        # Índice de beneficiarios por nombre normalizado (sin tildes ni mayúsculas)
+        indice = indice_beneficiarios()
 
         try:
             with transaction.atomic():
@@ -65,9 +52,7 @@ class Command(BaseCommand):
                         summary['errors'] += 1
                         continue
 
-                    normalized_csv_nombre = normalize_text(csv_nombre)
-                    
-                    matches = beneficiarios_map.get(normalized_csv_nombre, [])
+                    matches = indice.buscar_por_nombre(csv_nombre).candidatos
 
                     if len(matches) == 0:
                         self.stdout.write(f"NO ENCONTRADO: '{csv_nombre}' no se encontró en la base de datos.")
@@ -81,12 +66,11 @@ class Command(BaseCommand):
                             summary['no_change'] += 1
                         else:
                             self.stdout.write(f"ACTUALIZAR: '{beneficiario.nombre}' (ID: {beneficiario.id}) - RUT: '{beneficiario.rut}' -> '{csv_rut}'")
-                            beneficiario.rut = csv_rut
-                            if not is_dry_run:
-                                beneficiario.save()
+                            indice.actualizar(beneficiario, rut=csv_rut)
                             summary['updated'] += 1
                 
                 if not is_dry_run:
+                    indice.guardar()
                     self.stdout.write(self.style.SUCCESS("\nCambios aplicados a la base de datos."))
                 else:
                     # Si es dry-run, forzamos un rollback para no confirmar la transacción
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:53
+
+from django.db import migrations, models
+from core.validators import normalizar_rut
+
+
+def poblar_rut_normalizado(apps, schema_editor):
+    Beneficiario = apps.get_model('proyectos', 'Beneficiario')
+    registros = [
+        Beneficiario(pk=pk, rut_normalizado=normalizar_rut(rut))
+        for pk, rut in Beneficiario.objects.exclude(rut__isnull=True).exclude(rut='').values_list('pk', 'rut')
+    ]
+    Beneficiario.objects.bulk_update(registros, ['rut_normalizado'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0013_tipologiavivienda_metros_cuadrados_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beneficiario',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(poblar_rut_normalizado, migrations.RunPython.noop),
+    ]
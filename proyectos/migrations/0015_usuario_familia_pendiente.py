@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0014_rut_normalizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsuarioFamiliaPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('error', models.CharField(blank=True, help_text='Motivo por el que no se pudo crear (no se reintenta)', max_length=200)),
+                ('beneficiario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='proyectos.beneficiario')),
+            ],
+            options={
+                'verbose_name': 'Usuario FAMILIA pendiente',
+                'verbose_name_plural': 'Usuarios FAMILIA pendientes',
+                'ordering': ['fecha_creacion', 'id'],
+            },
+        ),
+    ]
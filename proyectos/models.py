@@ -3,7 +3,7 @@ from django.db import models
 from core.validators import validar_rut
 from django.conf import settings
 from datetime import timedelta, datetime
-from core.models import Region, Comuna
+from core.models import ConRutNormalizado, Region, Comuna
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -123,7 +123,7 @@ class Recinto(models.Model):
         ordering = ['tipologia__codigo', 'codigo']
 
 
-class Beneficiario(models.Model):
+class Beneficiario(ConRutNormalizado):
     nombre = models.CharField(max_length=100)
     apellido_paterno = models.CharField(max_length=100, verbose_name="Apellido Paterno", default="")
     apellido_materno = models.CharField(max_length=100, verbose_name="Apellido Materno", blank=True, null=True)
@@ -236,6 +236,24 @@ class Vivienda(models.Model):
         ordering = ['proyecto', 'codigo']
 
 
+class UsuarioFamiliaPendiente(models.Model):
+    """
+    Beneficiario cuyo usuario FAMILIA falta crear. Lo encola el signal
+    crear_usuario_familia y lo procesa en lote core/utils/usuarios_familia.py.
+    """
+    beneficiario = models.OneToOneField(Beneficiario, on_delete=models.CASCADE, related_name='+')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    error = models.CharField(max_length=200, blank=True, help_text="Motivo por el que no se pudo crear (no se reintenta)")
+
+    def __str__(self):
+        return f"Usuario FAMILIA pendiente: {self.beneficiario_id}"
+
+    class Meta:
+        verbose_name = "Usuario FAMILIA pendiente"
+        verbose_name_plural = "Usuarios FAMILIA pendientes"
+        ordering = ['fecha_creacion', 'id']
+
+
 # ============================================
 # SIGNALS - Creación automática de usuarios
 # ============================================
@@ -243,35 +261,17 @@ class Vivienda(models.Model):
 @receiver(post_save, sender=Beneficiario)
 def crear_usuario_familia(sender, instance, created, **kwargs):
     """
-    Signal que automáticamente crea un usuario FAMILIA cuando se crea un Beneficiario.
-    
-    - Username: RUT del beneficiario
-    - Email: Email del beneficiario
-    - Password: 'familia123' (por defecto)
+    Signal que encola la creación del usuario FAMILIA cuando se crea un
+    Beneficiario con RUT y email. El usuario se crea al confirmar la
+    transacción, o en una sola pasada al salir de un bloque
+    `diferir_usuarios_familia()` (importaciones masivas), o con
+    `manage.py provisionar_usuarios_familia`. Ver core/utils/usuarios_familia.py.
+
+    - Username: email del beneficiario (con su RUT)
+    - Password: 6 últimos dígitos del RUT
     - Rol: FAMILIA
     - Nombre: Nombre completo del beneficiario
     """
     if created and instance.rut and instance.email:
-        from core.models import Usuario, Rol
-        if not Usuario.objects.filter(rut=instance.rut).exists():
-            try:
-                rol_familia = Rol.objects.get(nombre='FAMILIA')
-                nombre_completo = f"{instance.nombre} {instance.apellido_paterno} {instance.apellido_materno or ''}".strip()
-                # Obtener los 6 últimos dígitos del RUT (sin puntos ni guion)
-                rut_limpio = instance.rut.replace('.', '').replace('-', '')
-                password = rut_limpio[-6:] if len(rut_limpio) >= 6 else rut_limpio
-                usuario = Usuario.objects.create_user(
-                    email=instance.email,
-                    password=password,
-                    nombre=nombre_completo,
-                    rut=instance.rut,
-                    rol=rol_familia
-                )
-                print(f"✓ Usuario FAMILIA creado automáticamente: {usuario.email} (RUT: {instance.rut})")
-                print(f"  Contraseña temporal: {password}")
-            except Rol.DoesNotExist:
-                print(f"⚠ Error: No existe el rol FAMILIA. No se pudo crear usuario para {instance.rut}")
-            except Exception as e:
-                print(f"⚠ Error al crear usuario para beneficiario {instance.rut}: {str(e)}")
-        else:
-            print(f"ℹ Ya existe un usuario con RUT {instance.rut}, no se creó uno nuevo")
+        from core.utils.usuarios_familia import encolar_usuario_familia
+        encolar_usuario_familia(instance)
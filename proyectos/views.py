@@ -225,7 +225,7 @@ def crear_beneficiario(request):
 def buscar_beneficiario_por_rut(request):
     """Vista AJAX para buscar beneficiario por RUT"""
     from django.http import JsonResponse
-    from .models import Beneficiario
+    from core.utils.rut import buscar_beneficiario
     
     if request.method == 'GET' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         rut_original = request.GET.get('rut', '').strip()
@@ -233,17 +233,9 @@ def buscar_beneficiario_por_rut(request):
         if not rut_original:
             return JsonResponse({'error': 'RUT no proporcionado'}, status=400)
         
-        numero, dv = rut_original.split("-")
-        numero_formateado = f"{int(numero):,}".replace(",", ".")
-        rut_formateado = f"{numero_formateado}-{dv}"
-        
         try:
-            # Buscar beneficiario por RUT (con o sin puntos)
-            beneficiario = Beneficiario.objects.filter(
-                rut=rut_formateado,
-                # Q(rut=rut_original) | Q(rut=rut_limpio),
-                activo=True
-            ).first()
+            # Buscar beneficiario por RUT (con o sin puntos, índice de rut_normalizado)
+            beneficiario = buscar_beneficiario(rut_original)
             
             if beneficiario:
                 return JsonResponse({
@@ -265,4 +257,4 @@ def buscar_beneficiario_por_rut(request):
         except Exception as e:
             return JsonResponse({'error': 'Error en la búsqueda'}, status=500)
     
-    return JsonResoponse({'error': 'Método no permitido'}, status=405)
+    return JsonResponse({'error': 'Método no permitido'}, status=405)
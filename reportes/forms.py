@@ -2,6 +2,7 @@ from django import forms
 from django.forms import ModelForm
 from .models import ActaRecepcion, FamiliarBeneficiario
 from proyectos.models import Proyecto, Vivienda, Beneficiario
+from core.utils.rut import buscar_beneficiario
 from core.validators import validar_rut
 from datetime import datetime
 
@@ -209,12 +210,8 @@ class ActaRecepcionForm(ModelForm):
     def clean_rut_beneficiario(self):
         """Validar el RUT del beneficiario para búsqueda"""
         rut = self.cleaned_data.get('rut_beneficiario')
-        if rut:
-            try:
-                beneficiario = Beneficiario.objects.get(rut=rut, activo=True)
-                return rut
-            except Beneficiario.DoesNotExist:
-                raise forms.ValidationError(f"No se encontró beneficiario con RUT {rut}")
+        if rut and buscar_beneficiario(rut) is None:
+            raise forms.ValidationError(f"No se encontró beneficiario con RUT {rut}")
         return rut
 
     def clean(self):
@@ -227,14 +224,12 @@ class ActaRecepcionForm(ModelForm):
         
         # Si se proporcionó RUT de búsqueda, validar coherencia
         if rut_beneficiario and beneficiario:
-            try:
-                beneficiario_por_rut = Beneficiario.objects.get(rut=rut_beneficiario)
-                if beneficiario_por_rut != beneficiario:
-                    raise forms.ValidationError(
-                        "El beneficiario seleccionado no coincide con el RUT ingresado para búsqueda."
-                    )
-            except Beneficiario.DoesNotExist:
-                pass  # Ya se validó en clean_rut_beneficiario
+            beneficiario_por_rut = buscar_beneficiario(rut_beneficiario, activo=None)
+            # Si no existe ya se informó en clean_rut_beneficiario
+            if beneficiario_por_rut and beneficiario_por_rut != beneficiario:
+                raise forms.ValidationError(
+                    "El beneficiario seleccionado no coincide con el RUT ingresado para búsqueda."
+                )
         
         # Verificar que no exista otra acta para la misma vivienda
         if vivienda:
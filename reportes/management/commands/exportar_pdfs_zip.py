@@ -0,0 +1,47 @@
+import itertools
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.utils.paquete_pdf import documentos_actas, documentos_fichas, escribir_zip
+from ficha_postventa.models import FichaPostventa
+from reportes.models import ActaRecepcion
+
+
+class Command(BaseCommand):
+    help = 'Exporta a un ZIP los PDFs de actas de recepción y/o fichas de postventa (p. ej. un proyecto completo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proyecto', type=int, help='ID del proyecto (por defecto, todos)')
+        parser.add_argument('--acta', type=int, action='append', dest='actas', help='ID de acta (se puede repetir)')
+        parser.add_argument(
+            '--tipo', choices=['actas', 'fichas', 'todos'], default='todos',
+            help='Documentos a incluir (por defecto, actas y fichas)',
+        )
+        parser.add_argument('--out', type=str, default='documentos.zip', help='Ruta del archivo ZIP de salida')
+
+    def handle(self, *args, **options):
+        actas = ActaRecepcion.objects.order_by('numero_acta')
+        fichas = FichaPostventa.objects.filter(activa=True).order_by('vivienda__codigo')
+        if options['proyecto']:
+            actas = actas.filter(proyecto_id=options['proyecto'])
+            fichas = fichas.filter(vivienda__proyecto_id=options['proyecto'])
+        if options['actas']:
+            actas = actas.filter(pk__in=options['actas'])
+            fichas = fichas.none()
+
+        documentos = []
+        if options['tipo'] in ('actas', 'todos'):
+            documentos.append(documentos_actas(actas))
+        if options['tipo'] in ('fichas', 'todos'):
+            documentos.append(documentos_fichas(fichas))
+
+        inicio = time.perf_counter()
+        try:
+            nombres = escribir_zip(itertools.chain(*documentos), options['out'])
+        except OSError as e:
+            raise CommandError(f'No se pudo escribir {options["out"]}: {e}')
+        if not nombres:
+            self.stdout.write(self.style.WARNING(f'No se generó ningún PDF en {options["out"]}'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(nombres)} PDF(s) en {options["out"]} ({time.perf_counter() - inicio:.1f}s)'
+        ))
@@ -9,8 +9,8 @@ class Migration(migrations.Migration):
     initial = True
 
     dependencies = [
-        ('proyectos', '__latest__'),
-        ('core', '__latest__'),
+        ('proyectos', '0013_tipologiavivienda_metros_cuadrados_and_more'),
+        ('core', '0008_usuario_apellido_materno_usuario_apellido_paterno_and_more'),
     ]
 
     operations = [
@@ -9,6 +9,10 @@ class ReporteGenerado(models.Model):
     ruta_archivo = models.CharField(max_length=255)
     fecha_generacion = models.DateTimeField(auto_now_add=True)
     filtros = models.JSONField(default=dict, blank=True)
+    # Caché por contenido (core/utils/cache_reportes.py)
+    clave = models.CharField(max_length=64, blank=True, db_index=True)
+    tamano = models.PositiveBigIntegerField(null=True, blank=True)
+    ultimo_acceso = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.nombre_archivo} ({self.fecha_generacion:%d/%m/%Y %H:%M})"
@@ -17,6 +21,49 @@ class ReporteGenerado(models.Model):
         verbose_name = "Reporte generado"
         verbose_name_plural = "Reportes generados"
         ordering = ['-fecha_generacion']
+
+
+class TrabajoReporte(models.Model):
+    """
+    Reporte pendiente de generar en segundo plano. La web lo encola y
+    consulta su estado; `manage.py procesar_reportes` lo ejecuta y deja el
+    archivo como ReporteGenerado.
+    """
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    LISTO = 'listo'
+    ERROR = 'error'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (LISTO, 'Listo'),
+        (ERROR, 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=50, default='dashboard_pdf')
+    usuario = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='trabajos_reporte')
+    filtros = models.JSONField(default=dict, blank=True)
+    clave = models.CharField(max_length=64, blank=True, db_index=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    progreso = models.PositiveSmallIntegerField(default=0)
+    mensaje = models.CharField(max_length=200, blank=True)
+    reporte = models.ForeignKey(ReporteGenerado, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.get_estado_display()})"
+
+    @property
+    def terminado(self):
+        return self.estado in (self.LISTO, self.ERROR)
+
+    class Meta:
+        verbose_name = "Trabajo de reporte"
+        verbose_name_plural = "Trabajos de reporte"
+        ordering = ['fecha_creacion']
+        indexes = [models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_estado_fecha_idx')]
 from django.db import models
 from django.conf import settings
 from proyectos.models import Proyecto, Vivienda, Beneficiario
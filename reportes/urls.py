@@ -12,18 +12,19 @@ urlpatterns = [
         path('observaciones/filtrar_excel/', views_filtrar_observaciones.reporte_observaciones_filtradas_excel, name='reporte_observaciones_filtradas_excel'),
         # Reportes Excel
         path('actas/entregas_excel/', views.reporte_entregas_excel, name='reporte_entregas_excel'),
-        path('observaciones/abiertas_excel/', views.reporte_observaciones_abiertas_excel, name='reporte_observaciones_abiertas_excel'),
-        path('observaciones/cerradas_excel/', views.reporte_observaciones_cerradas_excel, name='reporte_observaciones_cerradas_excel'),
-        path('observaciones/abiertas_urgentes_excel/', views.reporte_observaciones_abiertas_urgentes_excel, name='reporte_observaciones_abiertas_urgentes_excel'),
-        path('observaciones/cerradas_urgentes_excel/', views.reporte_observaciones_cerradas_urgentes_excel, name='reporte_observaciones_cerradas_urgentes_excel'),
+        path('observaciones/abiertas_excel/', views.exportar_reporte_observaciones, {'nombre': 'abiertas'}, name='reporte_observaciones_abiertas_excel'),
+        path('observaciones/cerradas_excel/', views.exportar_reporte_observaciones, {'nombre': 'cerradas'}, name='reporte_observaciones_cerradas_excel'),
+        path('observaciones/abiertas_urgentes_excel/', views.exportar_reporte_observaciones, {'nombre': 'abiertas_urgentes'}, name='reporte_observaciones_abiertas_urgentes_excel'),
+        path('observaciones/cerradas_urgentes_excel/', views.exportar_reporte_observaciones, {'nombre': 'cerradas_urgentes'}, name='reporte_observaciones_cerradas_urgentes_excel'),
         path('beneficiarios_por_proyecto_excel/', views.reporte_beneficiarios_por_proyecto_excel, name='reporte_beneficiarios_por_proyecto_excel'),
         path('viviendas_sin_beneficiario_excel/', views.reporte_viviendas_sin_beneficiario_excel, name='reporte_viviendas_sin_beneficiario_excel'),
         path('viviendas_sin_observaciones_excel/', views.reporte_viviendas_sin_observaciones_excel, name='reporte_viviendas_sin_observaciones_excel'),
         path('reporte_total_excel/', views.reporte_total_excel, name='reporte_total_excel'),
-        path('observaciones/en_ejecucion_excel/', views.reporte_observaciones_en_ejecucion_excel, name='reporte_observaciones_en_ejecucion_excel'),
-        path('observaciones/urgentes_pendientes_excel/', views.reporte_observaciones_urgentes_pendientes_excel, name='reporte_observaciones_urgentes_pendientes_excel'),
-        path('observaciones/urgentes_cerradas_excel/', views.reporte_observaciones_urgentes_cerradas_excel, name='reporte_observaciones_urgentes_cerradas_excel'),
-        path('observaciones/urgentes_abiertas_excel/', views.reporte_observaciones_urgentes_abiertas_excel, name='reporte_observaciones_urgentes_abiertas_excel'),
+        path('observaciones/en_ejecucion_excel/', views.exportar_reporte_observaciones, {'nombre': 'en_ejecucion'}, name='reporte_observaciones_en_ejecucion_excel'),
+        path('observaciones/urgentes_pendientes_excel/', views.exportar_reporte_observaciones, {'nombre': 'urgentes_pendientes'}, name='reporte_observaciones_urgentes_pendientes_excel'),
+        path('observaciones/urgentes_cerradas_excel/', views.exportar_reporte_observaciones, {'nombre': 'urgentes_cerradas'}, name='reporte_observaciones_urgentes_cerradas_excel'),
+        path('observaciones/urgentes_abiertas_excel/', views.exportar_reporte_observaciones, {'nombre': 'urgentes_abiertas'}, name='reporte_observaciones_urgentes_abiertas_excel'),
+        path('observaciones/exportar/<slug:nombre>/<str:formato>/', views.exportar_reporte_observaciones, name='exportar_reporte_observaciones'),
         path('estadisticas/region_excel/', views.reporte_estadisticas_region_excel, name='reporte_estadisticas_region_excel'),
         # Actas de recepción
         path('actas/', views.acta_list, name='acta_list'),
@@ -32,6 +33,7 @@ urlpatterns = [
         path('actas/<int:pk>/editar/', views.acta_edit, name='acta_edit'),
         path('actas/<int:pk>/eliminar/', views.acta_delete, name='acta_delete'),
         path('actas/<int:pk>/pdf/', views.acta_pdf, name='acta_pdf'),
+        path('actas/exportar-zip/', views.exportar_actas_zip, name='exportar_actas_zip'),
         # AJAX endpoints
         path('ajax/buscar-beneficiario/', views.buscar_beneficiario_ajax, name='buscar_beneficiario_ajax'),
         path('api/viviendas-por-proyecto/', views.get_viviendas_by_proyecto, name='viviendas_por_proyecto'),
@@ -1,8 +1,10 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from .models import ReporteGenerado
-from django.http import FileResponse, Http404
-import os
+from django.http import Http404
+from django.utils import timezone
+from core.utils.cache_reportes import ruta_absoluta
+from core.utils.descargas import servir_archivo
 
 # Vista para listar reportes generados
 @login_required
@@ -57,428 +59,151 @@ def listar_reportes_generados(request):
 @login_required
 def descargar_reporte_generado(request, reporte_id):
     reporte = get_object_or_404(ReporteGenerado, id=reporte_id)
-    ruta = os.path.join(os.path.dirname(os.path.dirname(__file__)), reporte.ruta_archivo)
-    if not os.path.exists(ruta):
+    try:
+        response = servir_archivo(request, ruta_absoluta(reporte), reporte.nombre_archivo)
+    except FileNotFoundError:
         raise Http404('Archivo no encontrado')
-    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=reporte.nombre_archivo)
-from django.http import HttpResponse
-import openpyxl
+    # Cuenta como uso para la limpieza de la caché de reportes
+    ReporteGenerado.objects.filter(pk=reporte.pk).update(ultimo_acceso=timezone.now())
+    return response
 from django.contrib.auth.decorators import login_required
+from core.utils.excel_streaming import (
+    agregar_hoja, exportar_excel, filas_queryset, nuevo_libro, respuesta_excel,
+)
+from core.utils.estadisticas_proyecto import estadisticas_por_proyecto
+from proyectos.models import Proyecto, Vivienda, Beneficiario
+from .registro import obtener_reporte
+
+CAMPOS_BENEFICIARIO = ('beneficiario__nombre', 'beneficiario__apellido_paterno', 'beneficiario__apellido_materno')
+
+
+def _nombre_completo(nombre, apellido_paterno, apellido_materno):
+    """Equivalente a Beneficiario.nombre_completo a partir de valores sueltos."""
+    if nombre is None:
+        return ""
+    return f"{nombre} {apellido_paterno} {apellido_materno or ''}".strip()
+
 
 @login_required
 def reporte_viviendas_sin_observaciones_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Viviendas sin Observaciones"
     headers = [
         "Proyecto", "Código Vivienda", "Tipología", "Estado", "Beneficiario", "RUT", "Email", "Constructora", "Región", "Comuna"
     ]
-    ws.append(headers)
-    from proyectos.models import Vivienda
-    viviendas = Vivienda.objects.select_related('proyecto', 'beneficiario', 'tipologia', 'proyecto__constructora', 'proyecto__region', 'proyecto__comuna')\
-        .filter(observaciones__isnull=True, activa=True)
-    for vivienda in viviendas:
-        beneficiario = vivienda.beneficiario
-        proyecto = vivienda.proyecto
-        ws.append([
-            proyecto.nombre if proyecto else "",
-            vivienda.codigo,
-            vivienda.tipologia.nombre if vivienda.tipologia else "",
-            vivienda.estado,
-            beneficiario.nombre_completo if beneficiario else "",
-            beneficiario.rut if beneficiario else "",
-            beneficiario.email if beneficiario else "",
-            proyecto.constructora.nombre if proyecto and proyecto.constructora else "",
-            proyecto.region.nombre if proyecto and proyecto.region else "",
-            proyecto.comuna.nombre if proyecto and proyecto.comuna else ""
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=viviendas_sin_observaciones.xlsx'
-    wb.save(response)
-    return response
+    viviendas = Vivienda.objects.filter(observaciones__isnull=True, activa=True)
+    filas = (
+        [
+            proyecto or "", codigo, tipologia or "", estado,
+            _nombre_completo(nombre, apellido_paterno, apellido_materno),
+            rut or "", email or "", constructora or "", region or "", comuna or ""
+        ]
+        for (proyecto, codigo, tipologia, estado, nombre, apellido_paterno, apellido_materno,
+             rut, email, constructora, region, comuna)
+        in filas_queryset(
+            viviendas, 'proyecto__nombre', 'codigo', 'tipologia__nombre', 'estado', *CAMPOS_BENEFICIARIO,
+            'beneficiario__rut', 'beneficiario__email', 'proyecto__constructora__nombre',
+            'proyecto__region__nombre', 'proyecto__comuna__nombre',
+        )
+    )
+    return exportar_excel('viviendas_sin_observaciones.xlsx', "Viviendas sin Observaciones", headers, filas)
 
 
 # Reporte Total: Viviendas y Beneficiarios
 
 @login_required
 def reporte_total_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Reporte Total"
     headers = ["Proyecto", "Vivienda", "Tipología", "Estado Vivienda", "Beneficiario", "RUT", "Email"]
-    ws.append(headers)
-    from proyectos.models import Proyecto, Vivienda
-    viviendas = Vivienda.objects.select_related('proyecto', 'beneficiario', 'tipologia').all()
-    for vivienda in viviendas:
-        beneficiario = vivienda.beneficiario
-        ws.append([
-            vivienda.proyecto.nombre if vivienda.proyecto else "",
-            vivienda.codigo,
-            vivienda.tipologia.nombre if hasattr(vivienda, 'tipologia') and vivienda.tipologia else "",
-            vivienda.estado,
-            beneficiario.nombre_completo if beneficiario else "",
-            beneficiario.rut if beneficiario else "",
-            beneficiario.email if beneficiario else ""
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=reporte_total.xlsx'
-    wb.save(response)
-    return response
+    filas = (
+        [
+            proyecto or "", codigo, tipologia or "", estado,
+            _nombre_completo(nombre, apellido_paterno, apellido_materno), rut or "", email or ""
+        ]
+        for proyecto, codigo, tipologia, estado, nombre, apellido_paterno, apellido_materno, rut, email
+        in filas_queryset(
+            Vivienda.objects.all(), 'proyecto__nombre', 'codigo', 'tipologia__nombre', 'estado',
+            *CAMPOS_BENEFICIARIO, 'beneficiario__rut', 'beneficiario__email',
+        )
+    )
+    return exportar_excel('reporte_total.xlsx', "Reporte Total", headers, filas)
 
-from django.contrib.auth.decorators import login_required
-from proyectos.models import Proyecto, Vivienda, Beneficiario
 
 @login_required
 def reporte_beneficiarios_por_proyecto_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Beneficiarios por Proyecto"
     headers = ["Proyecto", "Vivienda", "Beneficiario", "RUT", "Email"]
-    ws.append(headers)
-    proyectos = Proyecto.objects.filter(activo=True)
-    for proyecto in proyectos:
-        viviendas = Vivienda.objects.filter(proyecto=proyecto)
-        for vivienda in viviendas:
-            beneficiario = vivienda.beneficiario
-            if beneficiario:
-                ws.append([
-                    proyecto.nombre,
-                    vivienda.codigo,
-                    beneficiario.nombre_completo,
-                    beneficiario.rut,
-                    beneficiario.email
-                ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=beneficiarios_por_proyecto.xlsx'
-    wb.save(response)
-    return response
+    # Una sola consulta en el orden de antes: proyectos por fecha de creación, luego viviendas por código
+    viviendas = Vivienda.objects.filter(proyecto__activo=True, beneficiario__isnull=False)\
+        .order_by('-proyecto__fecha_creacion', 'proyecto_id', 'codigo')
+    filas = (
+        [proyecto, codigo, _nombre_completo(nombre, apellido_paterno, apellido_materno), rut, email]
+        for proyecto, codigo, nombre, apellido_paterno, apellido_materno, rut, email
+        in filas_queryset(
+            viviendas, 'proyecto__nombre', 'codigo', *CAMPOS_BENEFICIARIO, 'beneficiario__rut', 'beneficiario__email',
+        )
+    )
+    return exportar_excel('beneficiarios_por_proyecto.xlsx', "Beneficiarios por Proyecto", headers, filas)
 
 @login_required
 def reporte_viviendas_sin_beneficiario_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Viviendas sin Beneficiario"
     headers = ["Proyecto", "Vivienda", "Tipología", "Estado"]
-    ws.append(headers)
     viviendas = Vivienda.objects.filter(beneficiario__isnull=True, activa=True)
-    for vivienda in viviendas:
-        ws.append([
-            vivienda.proyecto.nombre,
-            vivienda.codigo,
-            vivienda.tipologia.nombre,
-            vivienda.estado
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=viviendas_sin_beneficiario.xlsx'
-    wb.save(response)
-    return response
-@login_required
-def reporte_observaciones_abiertas_urgentes_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones Abiertas Urgentes"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='Abierta', es_urgente=True)
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_abiertas_urgentes.xlsx'
-    wb.save(response)
-    return response
+    filas = filas_queryset(viviendas, 'proyecto__nombre', 'codigo', 'tipologia__nombre', 'estado')
+    return exportar_excel('viviendas_sin_beneficiario.xlsx', "Viviendas sin Beneficiario", headers, filas)
+
+
+# Reportes de observaciones por estado/urgencia: declarados en reportes/registro.py
 
 @login_required
-def reporte_observaciones_cerradas_urgentes_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones Cerradas Urgentes"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='Cerrada', es_urgente=True)
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_cerradas_urgentes.xlsx'
-    wb.save(response)
-    return response
+def exportar_reporte_observaciones(request, nombre, formato='xlsx'):
+    return obtener_reporte(nombre, formato).exportar(formato)
 
-from django.http import HttpResponse
-from django.contrib.auth.decorators import login_required
-from incidencias.models import Observacion
 
-import openpyxl
-from proyectos.models import Proyecto
 @login_required
 def reporte_estadisticas_region_excel(request):
-    import openpyxl
     from openpyxl.chart import BarChart, Reference
-    from openpyxl.styles import Font
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Estadísticas por Región"
     headers = [
         "Región", "Proyecto", "Constructora", "Total Casas", "Casas con Observaciones", "Observaciones Abiertas", "Observaciones Urgentes", "Observaciones Cerradas", "% Abiertas", "% Urgentes", "% Cerradas"
     ]
-    ws.append(headers)
 
-    from proyectos.models import Proyecto, Vivienda
-    from incidencias.models import Observacion
-    regiones = Proyecto.objects.values_list('region', flat=True).distinct()
-    for region_id in regiones:
-        region_obj = None
-        try:
-            from core.models import Region
-            region_obj = Region.objects.get(pk=region_id)
-            region_nombre = region_obj.nombre
-        except Exception:
-            region_nombre = str(region_id)
-        proyectos = Proyecto.objects.filter(region=region_id)
-        for proyecto in proyectos:
-            constructora = proyecto.constructora.nombre if proyecto.constructora else "-"
-            total_casas = Vivienda.objects.filter(proyecto=proyecto).count()
-            casas_con_obs = Vivienda.objects.filter(proyecto=proyecto, observaciones__isnull=False).distinct().count()
-            obs = Observacion.objects.filter(vivienda__proyecto=proyecto)
-            total_obs = obs.count()
-            abiertas = obs.filter(estado__nombre='Abierta').count()
-            urgentes = obs.filter(es_urgente=True, estado__nombre='Abierta').count()
-            cerradas = obs.filter(estado__nombre='Cerrada').count()
-            porc_abiertas = round((abiertas / total_obs) * 100, 1) if total_obs else 0
-            porc_urgentes = round((urgentes / total_obs) * 100, 1) if total_obs else 0
-            porc_cerradas = round((cerradas / total_obs) * 100, 1) if total_obs else 0
-            ws.append([
-                region_nombre,
-                proyecto.nombre,
-                constructora,
-                total_casas,
-                casas_con_obs,
-                abiertas,
-                urgentes,
-                cerradas,
-                porc_abiertas,
-                porc_urgentes,
-                porc_cerradas
-            ])
+    proyectos = Proyecto.objects.order_by('region__nombre', '-fecha_creacion')
+    filas = (
+        [
+            proyecto['region'],
+            proyecto['nombre'],
+            proyecto['constructora'] or "-",
+            proyecto['total_viviendas'],
+            proyecto['casas_con_observaciones'],
+            proyecto['abiertas'],
+            proyecto['urgentes'],
+            proyecto['cerradas'],
+            proyecto['porc_abiertas'],
+            proyecto['porc_urgentes'],
+            proyecto['porc_cerradas'],
+        ]
+        for proyecto in estadisticas_por_proyecto(proyectos)
+    )
+
+    libro = nuevo_libro()
+    ws, cantidad = agregar_hoja(libro, "Estadísticas por Región", headers, filas, encabezado_negrita=True)
 
     # Crear gráfico de barras para observaciones por región
     chart = BarChart()
     chart.title = "Observaciones por Región"
     chart.y_axis.title = "Cantidad"
     chart.x_axis.title = "Región"
-    data = Reference(ws, min_col=3, max_col=5, min_row=1, max_row=ws.max_row)
-    cats = Reference(ws, min_col=1, min_row=2, max_row=ws.max_row)
+    data = Reference(ws, min_col=3, max_col=5, min_row=1, max_row=cantidad + 1)
+    cats = Reference(ws, min_col=1, min_row=2, max_row=cantidad + 1)
     chart.add_data(data, titles_from_data=True)
     chart.set_categories(cats)
     ws.add_chart(chart, "N2")
 
-    # Mejorar formato de encabezados
-    for cell in ws[1]:
-        cell.font = Font(bold=True)
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=estadisticas_region_completo.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_cerradas_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones Cerradas"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='Cerrada', es_urgente=False)
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_cerradas.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_abiertas_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones Abiertas"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='Abierta', es_urgente=False)
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_abiertas.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_en_ejecucion_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones en Ejecución"
-    headers = ["ID", "Proyecto", "Vivienda", "Detalle", "Estado", "Urgente", "Fecha Creación", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='En Ejecución')
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_en_ejecucion.xlsx'
-    wb.save(response)
-    return response
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_abiertas.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_urgentes_pendientes_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Urgentes Pendientes"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(es_urgente=True, estado__nombre='Abierta')
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=urgentes_pendientes.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_urgentes_cerradas_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Urgentes Cerradas"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(es_urgente=True, estado__nombre='Cerrada')
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=urgentes_cerradas.xlsx'
-    wb.save(response)
-    return response
+    return respuesta_excel(libro, 'estadisticas_region_completo.xlsx')
 
-@login_required
-def reporte_observaciones_urgentes_abiertas_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Urgentes Abiertas"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(es_urgente=True, estado__nombre='Abierta')
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=urgentes_abiertas.xlsx'
-    wb.save(response)
-    return response
-import openpyxl
-from openpyxl.utils import get_column_letter
-from django.contrib.auth.decorators import login_required
 @login_required
 def reporte_entregas_excel(request):
     """Exporta todas las actas de entrega y estadísticas en formato Excel"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Entregas"
-
     # Encabezados
     headers = [
         "N° Acta", "Fecha Entrega", "Proyecto", "Código Proyecto", "Comuna", "Región", "Beneficiario", "RUT", "Email", "Código Vivienda", "Tipología", "Estado Vivienda", "Familia Beneficiaria"
     ]
-    ws.append(headers)
 
     # Datos
     # Filtros por proyecto y fechas
@@ -486,7 +211,7 @@ def reporte_entregas_excel(request):
     fecha_inicio = request.GET.get('fecha_inicio')
     fecha_fin = request.GET.get('fecha_fin')
 
-    actas = ActaRecepcion.objects.select_related('proyecto', 'vivienda', 'beneficiario')
+    actas = ActaRecepcion.objects.all()
     if proyecto_id:
         actas = actas.filter(proyecto_id=proyecto_id)
     if fecha_inicio:
@@ -502,65 +227,56 @@ def reporte_entregas_excel(request):
         except Exception:
             pass
 
-    for acta in actas:
-        ws.append([
-            acta.numero_acta,
-            acta.fecha_entrega.strftime('%d/%m/%Y') if acta.fecha_entrega else '',
-            acta.proyecto.nombre if acta.proyecto else '',
-            acta.proyecto.codigo if acta.proyecto else '',
-            acta.proyecto.comuna.nombre if acta.proyecto and acta.proyecto.comuna else '',
-            acta.proyecto.region.nombre if acta.proyecto and acta.proyecto.region else '',
-            acta.beneficiario.nombre_completo if acta.beneficiario else '',
-            acta.beneficiario.rut if acta.beneficiario else '',
-            acta.beneficiario.email if acta.beneficiario else '',
-            acta.vivienda.codigo if acta.vivienda else '',
-            acta.vivienda.tipologia.nombre if acta.vivienda and acta.vivienda.tipologia else '',
-            acta.vivienda.get_estado_display() if acta.vivienda else '',
-            acta.vivienda.familia_beneficiaria if acta.vivienda else '',
-        ])
+    estados_vivienda = dict(Vivienda.ESTADOS_CHOICES)
+    filas = (
+        [
+            numero_acta,
+            fecha_entrega.strftime('%d/%m/%Y') if fecha_entrega else '',
+            proyecto or '',
+            codigo_proyecto or '',
+            comuna or '',
+            region or '',
+            _nombre_completo(nombre, apellido_paterno, apellido_materno),
+            rut or '',
+            email or '',
+            codigo_vivienda or '',
+            tipologia or '',
+            estados_vivienda.get(estado_vivienda, estado_vivienda) if estado_vivienda else '',
+            familia_beneficiaria,
+        ]
+        for (numero_acta, fecha_entrega, proyecto, codigo_proyecto, comuna, region, nombre, apellido_paterno,
+             apellido_materno, rut, email, codigo_vivienda, tipologia, estado_vivienda, familia_beneficiaria)
+        in filas_queryset(
+            actas, 'numero_acta', 'fecha_entrega', 'proyecto__nombre', 'proyecto__codigo',
+            'proyecto__comuna__nombre', 'proyecto__region__nombre', *CAMPOS_BENEFICIARIO,
+            'beneficiario__rut', 'beneficiario__email', 'vivienda__codigo', 'vivienda__tipologia__nombre',
+            'vivienda__estado', 'vivienda__familia_beneficiaria',
+        )
+    )
 
     # Ajustar ancho de columnas
-    for i, col in enumerate(headers, 1):
-        ws.column_dimensions[get_column_letter(i)].width = max(12, len(col) + 2)
+    anchos = [max(12, len(col) + 2) for col in headers]
+    return exportar_excel('entregas_techo_chile.xlsx', "Entregas", headers, filas, anchos=anchos)
 
-    # Respuesta HTTP
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=entregas_techo_chile.xlsx'
-    wb.save(response)
-    return response
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
 from django.template.loader import render_to_string
-from django.utils import timezone
 from django.db import transaction
 from datetime import datetime
-import os
 from django.conf import settings
-from io import BytesIO
-
-# El sistema ahora usa xhtml2pdf en lugar de WeasyPrint para compatibilidad con Windows
-# WEASYPRINT_AVAILABLE = False  # deprecado - ahora se usa xhtml2pdf
+import logging
 
-# Fallback a ReportLab
-try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch, cm
-    from reportlab.lib import colors
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
-    # Definir valores por defecto si no está disponible
-    inch = 72
-    cm = 28.35
+# PDFs: core/utils/renderizador_pdf.py (xhtml2pdf, con ReportLab como respaldo)
+from core.utils.renderizador_pdf import ErrorRenderPdf, renderizar_html, renderizar_story, renderizar_texto
+from core.utils.cache_pdf import clave_acta, guardar_pdf, obtener_pdf
+from core.utils.paquete_pdf import bloques_acta, contexto_acta_pdf, documentos_actas, respuesta_zip
+from core.utils.rut import filtrar_por_rut
 
-# Usaremos xhtml2pdf para generar PDFs (compatible con Windows); si falla, usamos ReportLab
+logger = logging.getLogger(__name__)
 
 from .models import ActaRecepcion, FamiliarBeneficiario  # , ConstructorActa
-from proyectos.models import Vivienda, Proyecto, Beneficiario
 from core.decorators import rol_requerido
 
 
@@ -578,18 +294,25 @@ def index(request):
     return render(request, 'reportes/index.html', context)
 
 
+def _filtrar_actas(request):
+    """Actas según los filtros del listado (?proyecto=) y/o ids explícitos (?id=1&id=2)"""
+    actas = ActaRecepcion.objects.order_by('-fecha_creacion')
+    proyecto_id = request.GET.get('proyecto')
+    if proyecto_id:
+        actas = actas.filter(proyecto_id=proyecto_id)
+    ids = [valor for valor in request.GET.getlist('id') if valor.isdigit()]
+    if ids:
+        actas = actas.filter(pk__in=ids)
+    return actas
+
+
 @login_required
 @rol_requerido('ADMINISTRADOR', 'TECHO')
 def acta_list(request):
     """Lista de actas de recepción"""
-    actas = ActaRecepcion.objects.select_related(
+    actas = _filtrar_actas(request).select_related(
         'vivienda', 'proyecto', 'beneficiario'
-    ).order_by('-fecha_creacion')
-    
-    # Filtros
-    proyecto_id = request.GET.get('proyecto')
-    if proyecto_id:
-        actas = actas.filter(proyecto_id=proyecto_id)
+    )
     
     context = {
         'titulo': 'Actas de Recepción',
@@ -653,6 +376,26 @@ def acta_detail(request, pk):
     return render(request, 'reportes/acta_detail.html', context)
 
 
+def _respuesta_pdf_acta(pdf, nombre_archivo):
+    response = HttpResponse(pdf.contenido, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    response['X-PDF-Engine'] = pdf.motor
+    response['X-PDF-Tiempo'] = f'{pdf.segundos:.3f}'
+    return response
+
+
+@login_required
+@rol_requerido('ADMINISTRADOR', 'TECHO')
+def exportar_actas_zip(request):
+    """ZIP con el PDF de cada acta filtrada (p. ej. todas las de un proyecto)"""
+    actas = _filtrar_actas(request)
+    if not actas.exists():
+        messages.warning(request, 'No hay actas que exportar con esos filtros.')
+        return redirect('reportes:acta_list')
+    nombre = f"actas_{request.GET.get('proyecto') or 'todas'}_{timezone.now().strftime('%Y%m%d_%H%M')}.zip"
+    return respuesta_zip(documentos_actas(actas), nombre)
+
+
 @login_required  
 def acta_pdf(request, pk):
     """Generar PDF del acta - con opción de descarga"""
@@ -667,290 +410,55 @@ def acta_pdf(request, pk):
     
     # GENERAR PDF completo si download=1
     if es_descarga:
+        nombre_pdf = f"Acta de Recepción - {acta.numero_acta}.pdf"
         # Ruta mínima de diagnóstico: generar un PDF básico si ?mode=min
         if request.GET.get('mode') == 'min':
             try:
-                from reportlab.pdfgen import canvas  # type: ignore
-                buffer = BytesIO()
-                c = canvas.Canvas(buffer, pagesize=A4)
-                c.drawString(100, 800, f"Acta {acta.numero_acta} - PDF minimal")
-                c.drawString(100, 780, timezone.now().strftime('%d/%m/%Y %H:%M'))
-                c.showPage()
-                c.save()
-                buffer.seek(0)
-                response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="Acta_{acta.numero_acta}_minimal.pdf"'
-                response['X-PDF-Engine'] = 'reportlab-min'
-                return response
-            except Exception as e:
-                print(f"ERROR PDF minimal: {e}")
-        # 1) Usar xhtml2pdf para compatibilidad con Windows
+                pdf = renderizar_texto([
+                    f"Acta {acta.numero_acta} - PDF minimal", timezone.now().strftime('%d/%m/%Y %H:%M'),
+                ])
+                return _respuesta_pdf_acta(pdf, f"Acta_{acta.numero_acta}_minimal.pdf")
+            except ErrorRenderPdf as e:
+                logger.warning('PDF minimal del acta %s: %s', acta.pk, e)
+        # 0) PDF ya generado para esta versión del acta
+        clave = clave_acta(acta)
+        ruta = obtener_pdf(clave)
         try:
-            from xhtml2pdf import pisa
-            context = {
-                'acta': acta,
-                'proyecto': acta.proyecto,
-                'beneficiario': acta.beneficiario,
-                'vivienda': acta.vivienda,
-                'familiares': acta.familiares.all(),
-                'fecha_generacion': timezone.now(),
-                'es_descarga': True,
-                'para_pdf': True,
-            }
+            response = servir_archivo(request, ruta, nombre_pdf) if ruta else None
+        except FileNotFoundError:
+            response = None  # Borrado por la limpieza de la caché entre medio
+        if response is not None:
+            response['X-PDF-Engine'] = 'cache'
+            return response
+        # 1) HTML → PDF (xhtml2pdf)
+        try:
+            context = contexto_acta_pdf(acta, es_descarga=True, para_pdf=True)
             html_content = render_to_string('reportes/acta_template.html', context, request=request)
-            pdf_buffer = BytesIO()
-            pisa_status = pisa.CreatePDF(html_content, dest=pdf_buffer)
-            if not pisa_status.err:
-                pdf_file = pdf_buffer.getvalue()
-                pdf_buffer.close()
-                response = HttpResponse(pdf_file, content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="Acta de Recepción - {acta.numero_acta}.pdf"'
-                response['X-PDF-Engine'] = 'xhtml2pdf'
-                return response
-            pdf_buffer.close()
-        except Exception:
-            import traceback
-            print("ERROR PDF xhtml2pdf:\n" + traceback.format_exc())
-        # 2) Intentar con ReportLab (estable en Windows)
-        # Usar ReportLab si está disponible a nivel de módulo
-
-        if REPORTLAB_AVAILABLE:
-            try:
-                # Generar PDF usando ReportLab
-                buffer = BytesIO()
-                doc = SimpleDocTemplate(
-                    buffer,
-                    pagesize=A4,
-                    rightMargin=2*cm,
-                    leftMargin=2*cm,
-                    topMargin=2*cm,
-                    bottomMargin=2*cm,
-                )
-
-                # Estilos personalizados que coincidan con el HTML
-                styles = getSampleStyleSheet()
-
-                # Estilo para el encabezado principal
-                header_style = ParagraphStyle(
-                    'CustomHeader',
-                    parent=styles['Title'],
-                    fontSize=18,
-                    spaceAfter=10,
-                    alignment=1,  # Centrado
-                    textColor=colors.black,
-                    fontName='Helvetica-Bold'
-                )
-
-                # Estilo para subtítulo
-                subtitle_style = ParagraphStyle(
-                    'CustomSubtitle',
-                    parent=styles['Heading2'],
-                    fontSize=14,
-                    spaceAfter=20,
-                    alignment=1,
-                    textColor=colors.black,
-                    fontName='Helvetica-Bold'
-                )
-
-                # Estilo para secciones
-                section_style = ParagraphStyle(
-                    'SectionHeader',
-                    parent=styles['Heading3'],
-                    fontSize=12,
-                    spaceBefore=15,
-                    spaceAfter=10,
-                    textColor=colors.black,
-                    fontName='Helvetica-Bold'
-                )
-
-                # Estilo para texto normal
-                normal_style = ParagraphStyle(
-                    'CustomNormal',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    spaceAfter=4,
-                    fontName='Helvetica'
-                )
-
-                story = []
-
-                # === ENCABEZADO ===
-                story.append(Paragraph("ACTA DE RECEPCIÓN DE VIVIENDA", header_style))
-                story.append(Paragraph("TECHO CHILE", subtitle_style))
-                story.append(Paragraph(f"<b>Acta N°:</b> {acta.numero_acta} | <b>Generada:</b> {timezone.now().strftime('%d/%m/%Y %H:%M')}", normal_style))
-                story.append(Spacer(1, 20))
-
-                # === INFORMACIÓN DEL PROYECTO ===
-                story.append(Paragraph("INFORMACIÓN DEL PROYECTO", section_style))
-                proyecto_data = [
-                    ['Proyecto:', acta.proyecto.nombre if acta.proyecto else 'N/A'],
-                    ['Comuna:', acta.proyecto.comuna.nombre if (acta.proyecto and acta.proyecto.comuna) else 'N/A'],
-                    ['Región:', acta.proyecto.region.nombre if (acta.proyecto and acta.proyecto.region) else 'N/A'],
-                ]
-
-                for label, value in proyecto_data:
-                    story.append(Paragraph(f"<b>{label}</b> {value}", normal_style))
-                story.append(Spacer(1, 12))
-
-                # === INFORMACIÓN DEL BENEFICIARIO ===
-                story.append(Paragraph("INFORMACIÓN DEL BENEFICIARIO", section_style))
-                if acta.beneficiario:
-                    # Construir string de teléfonos activos
-                    telefonos_activos = list(acta.beneficiario.telefonos.filter(activo=True).values_list('numero', flat=True))
-                    if not telefonos_activos:
-                        telefonos_activos = list(acta.beneficiario.telefonos.values_list('numero', flat=True)[:1])
-                    telefonos_str = ', '.join(telefonos_activos) if telefonos_activos else 'N/A'
-
-                    beneficiario_data = [
-                        ['Nombre Completo:', f"{acta.beneficiario.nombre} {acta.beneficiario.apellido_paterno} {acta.beneficiario.apellido_materno or ''}".strip()],
-                        ['RUT:', acta.beneficiario.rut or 'N/A'],
-                        ['Teléfonos:', telefonos_str],
-                        ['Email:', acta.beneficiario.email or 'N/A'],
-                    ]
-
-                    for label, value in beneficiario_data:
-                        story.append(Paragraph(f"<b>{label}</b> {value}", normal_style))
-                else:
-                    story.append(Paragraph("<b>Beneficiario:</b> No asignado", normal_style))
-                story.append(Spacer(1, 12))
-
-                # === INFORMACIÓN DE LA VIVIENDA ===
-                story.append(Paragraph("INFORMACIÓN DE LA VIVIENDA", section_style))
-                if acta.vivienda:
-                    vivienda_data = [
-                        ['Código de Vivienda:', acta.vivienda.codigo],
-                        ['Tipología:', acta.vivienda.tipologia.nombre if acta.vivienda.tipologia else 'N/A'],
-                        ['Estado:', acta.vivienda.get_estado_display()],
-                        ['Familia Beneficiaria:', acta.vivienda.familia_beneficiaria or 'N/A'],
-                    ]
-
-                    for label, value in vivienda_data:
-                        story.append(Paragraph(f"<b>{label}</b> {value}", normal_style))
-                else:
-                    story.append(Paragraph("<b>Vivienda:</b> No asignada", normal_style))
-                story.append(Spacer(1, 12))
-
-                # === DETALLES DEL ACTA ===
-                story.append(Paragraph("DETALLES DEL ACTA", section_style))
-                acta_data = [
-                    ['Fecha de Entrega:', acta.fecha_entrega.strftime("%d/%m/%Y") if acta.fecha_entrega else 'N/A'],
-                    ['Entrega Conforme:', 'Sí' if acta.entregado_beneficiario else 'No'],
-                    ['Estructura:', 'Conforme' if getattr(acta, 'estado_estructura', True) else 'Con observaciones'],
-                    ['Instalaciones:', 'Conforme' if getattr(acta, 'estado_instalaciones', True) else 'Con observaciones'],
-                ]
-
-                for label, value in acta_data:
-                    story.append(Paragraph(f"<b>{label}</b> {value}", normal_style))
-                story.append(Spacer(1, 15))
-
-                # === FAMILIARES (si los hay) ===
-                familiares = acta.familiares.all()
-                if familiares.exists():
-                    story.append(Paragraph("FAMILIARES REGISTRADOS", section_style))
-
-                    # Crear tabla de familiares
-                    familiares_data = [['Nombre Completo', 'Parentesco', 'RUT', 'Edad']]
-                    for familiar in familiares:
-                        familiares_data.append([
-                            familiar.nombre_completo,
-                            familiar.parentesco,
-                            familiar.rut or 'N/A',
-                            str(familiar.edad) if familiar.edad else 'N/A'
-                        ])
-
-                    familiares_table = Table(familiares_data, colWidths=[8*cm, 3*cm, 3*cm, 2*cm])
-                    familiares_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, -1), 9),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ]))
-
-                    story.append(familiares_table)
-                    story.append(Spacer(1, 15))
-
-                # === OBSERVACIONES ===
-                if acta.observaciones:
-                    story.append(Paragraph("OBSERVACIONES", section_style))
-                    story.append(Paragraph(acta.observaciones, normal_style))
-                    story.append(Spacer(1, 20))
-
-                # === FIRMAS ===
-                story.append(Spacer(1, 30))
-                story.append(Paragraph("FIRMAS Y CONFORMIDAD", section_style))
-
-                # Tabla de firmas
-                firma_data = [
-                    ['', '', ''],
-                    ['_________________________', '_________________________', '_________________________'],
-                    ['Beneficiario', 'Representante TECHO', 'Supervisor'],
-                    ['', '', ''],
-                    ['Fecha: _______________', 'Fecha: _______________', 'Fecha: _______________']
-                ]
-
-                firma_table = Table(firma_data, colWidths=[5.5*cm, 5.5*cm, 5.5*cm])
-                firma_table.setStyle(TableStyle([
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 1), (-1, 1), 'Helvetica'),
-                    ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('TOPPADDING', (0, 0), (-1, -1), 8),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ]))
-
-                story.append(firma_table)
-
-                # Construir PDF
-                doc.build(story)
-
-                # Preparar respuesta PDF
-                buffer.seek(0)
-                response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="Acta de Recepción - {acta.numero_acta}.pdf"'
-                response['X-PDF-Engine'] = 'reportlab'
-
-                return response
-
-            except Exception as e:
-                # Log del error pero continuar con HTML
-                import traceback
-                print("ERROR PDF ReportLab:\n" + traceback.format_exc())
-
-        # (xhtml2pdf y ReportLab ya fueron intentados arriba)
-
+            pdf = renderizar_html(html_content)
+            guardar_pdf(clave, pdf.contenido)
+            return _respuesta_pdf_acta(pdf, nombre_pdf)
+        except ErrorRenderPdf:
+            logger.exception('PDF del acta %s con xhtml2pdf', acta.pk)
+        # 2) Documento ReportLab equivalente
+        try:
+            return _respuesta_pdf_acta(renderizar_story(bloques_acta(acta)), nombre_pdf)
+        except ErrorRenderPdf:
+            logger.exception('PDF del acta %s con ReportLab', acta.pk)
         # 3) Si ambos fallaron, generar un PDF mínimo como último recurso
         try:
-            from reportlab.pdfgen import canvas  # type: ignore
-            buffer = BytesIO()
-            c = canvas.Canvas(buffer, pagesize=A4)
-            c.setFont('Helvetica', 12)
-            c.drawString(72, 800, f"Acta {acta.numero_acta}")
-            c.drawString(72, 780, "No se pudo generar el PDF completo. Este es un PDF mínimo de respaldo.")
-            c.drawString(72, 760, timezone.now().strftime('%d/%m/%Y %H:%M'))
-            c.showPage()
-            c.save()
-            buffer.seek(0)
-            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="Acta de Recepción - {acta.numero_acta} (respaldo).pdf"'
+            pdf = renderizar_texto([
+                f"Acta {acta.numero_acta}",
+                "No se pudo generar el PDF completo. Este es un PDF mínimo de respaldo.",
+                timezone.now().strftime('%d/%m/%Y %H:%M'),
+            ])
+            response = _respuesta_pdf_acta(pdf, f"Acta de Recepción - {acta.numero_acta} (respaldo).pdf")
             response['X-PDF-Engine'] = 'reportlab-min-fallback'
             return response
-        except Exception:
+        except ErrorRenderPdf:
             return HttpResponse("No se pudo generar el PDF en este momento.", status=500, content_type='text/plain; charset=utf-8')
     
     # HTML por defecto (vista previa)
-    context = {
-        'acta': acta,
-        'proyecto': acta.proyecto,
-        'beneficiario': acta.beneficiario,
-        'vivienda': acta.vivienda,
-        'familiares': acta.familiares.all(),
-        'fecha_generacion': timezone.now(),
-        'es_descarga': es_descarga,
-    }
+    context = contexto_acta_pdf(acta, es_descarga=es_descarga)
     
     html_content = render_to_string('reportes/acta_template.html', context)
     
@@ -1100,7 +608,7 @@ def buscar_beneficiario_ajax(request):
     
     try:
         # Buscar beneficiario por RUT
-        beneficiario = Beneficiario.objects.select_related().get(rut=rut, activo=True)
+        beneficiario = filtrar_por_rut(Beneficiario.objects.filter(activo=True), rut).get()
         
         # Obtener datos de la vivienda asociada
         vivienda = None
@@ -2,7 +2,8 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from proyectos.models import Proyecto, Vivienda, Beneficiario
 from incidencias.models import Observacion
-from django.db.models import Func, F
+from core.utils.excel_streaming import exportar_excel, filas_queryset
+from core.utils.rut import filtrar_por_rut
 
 @login_required
 def reporte_observaciones_filtradas(request):
@@ -24,10 +25,7 @@ def reporte_observaciones_filtradas(request):
         if vivienda_id:
             obs_query = obs_query.filter(vivienda_id=vivienda_id)
         if rut:
-            rut_normalizado = rut.replace('.', '').replace('-', '')
-            obs_query = obs_query.annotate(
-                rut_normalizado=Func(F('vivienda__beneficiario__rut'), function='REPLACE', template="REPLACE(REPLACE(%(expressions)s, '.', ''), '-', '')")
-            ).filter(rut_normalizado=rut_normalizado)
+            obs_query = filtrar_por_rut(obs_query, rut, 'vivienda__beneficiario__rut_normalizado')
         observaciones = obs_query.all()
     
     context = {
@@ -41,58 +39,49 @@ def reporte_observaciones_filtradas(request):
 
 @login_required
 def reporte_observaciones_filtradas_excel(request):
-    import openpyxl
-    from django.http import HttpResponse
     proyecto_id = request.GET.get('proyecto')
     vivienda_id = request.GET.get('vivienda')
     rut = request.GET.get('rut', '').strip()
-    obs_query = Observacion.objects.select_related('vivienda', 'vivienda__proyecto', 'vivienda__beneficiario', 'estado').prefetch_related('seguimientos')
+    obs_query = Observacion.objects.all()
     if proyecto_id:
         obs_query = obs_query.filter(vivienda__proyecto_id=proyecto_id)
     if vivienda_id:
         obs_query = obs_query.filter(vivienda_id=vivienda_id)
     if rut:
-        rut_normalizado = rut.replace('.', '').replace('-', '')
-        obs_query = obs_query.annotate(
-            rut_normalizado=Func(F('vivienda__beneficiario__rut'), function='REPLACE', template="REPLACE(REPLACE(%(expressions)s, '.', ''), '-', '')")
-        ).filter(rut_normalizado=rut_normalizado)
-    observaciones = obs_query.all()
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones Filtradas"
+        obs_query = filtrar_por_rut(obs_query, rut, 'vivienda__beneficiario__rut_normalizado')
+    # Una fila por seguimiento (LEFT JOIN): observaciones sin historial quedan con columnas vacías
+    obs_query = obs_query.order_by('-fecha_creacion', 'id', '-seguimientos__fecha')
     headers = [
         "ID", "Proyecto", "Vivienda", "Beneficiario", "RUT", "Estado", "Detalle", "Notas Seguimiento", "Fecha Creación", "Urgente",
         "Historial - Fecha", "Historial - Acción", "Historial - Comentario", "Historial - Estado Anterior", "Historial - Estado Nuevo"
     ]
-    ws.append(headers)
-    for o in observaciones:
-        # Datos principales de la observación
-        base_row = [
-            o.id,
-            o.vivienda.proyecto.nombre if o.vivienda and o.vivienda.proyecto else "",
-            o.vivienda.codigo if o.vivienda else "",
-            o.vivienda.beneficiario.nombre_completo if o.vivienda and o.vivienda.beneficiario else "",
-            o.vivienda.beneficiario.rut if o.vivienda and o.vivienda.beneficiario else "",
-            o.estado.nombre if o.estado else "",
-            o.detalle,
-            o.observaciones_seguimiento if o.observaciones_seguimiento else "",
-            o.fecha_creacion.strftime('%d/%m/%Y') if o.fecha_creacion else "",
-            "Sí" if o.es_urgente else "No"
+    filas = (
+        [
+            id_obs,
+            proyecto or "",
+            vivienda or "",
+            f"{nombre} {apellido_paterno} {apellido_materno or ''}".strip() if nombre is not None else "",
+            rut_beneficiario or "",
+            estado or "",
+            detalle,
+            notas or "",
+            fecha_creacion.strftime('%d/%m/%Y') if fecha_creacion else "",
+            "Sí" if es_urgente else "No",
+            seg_fecha.strftime('%d/%m/%Y %H:%M') if seg_fecha else "",
+            seg_accion or "",
+            seg_comentario or "",
+            seg_estado_anterior or "",
+            seg_estado_nuevo or "",
         ]
-        seguimientos = list(o.seguimientos.all())
-        if seguimientos:
-            for s in seguimientos:
-                ws.append(base_row + [
-                    s.fecha.strftime('%d/%m/%Y %H:%M'),
-                    s.accion,
-                    s.comentario if s.comentario else "",
-                    getattr(s.estado_anterior, 'nombre', ''),
-                    getattr(s.estado_nuevo, 'nombre', '')
-                ])
-        else:
-            # Si no hay seguimientos, dejar columnas de historial vacías
-            ws.append(base_row + ["", "", "", "", ""])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_filtradas.xlsx'
-    wb.save(response)
-    return response
+        for (id_obs, proyecto, vivienda, nombre, apellido_paterno, apellido_materno, rut_beneficiario, estado,
+             detalle, notas, fecha_creacion, es_urgente, seg_fecha, seg_accion, seg_comentario,
+             seg_estado_anterior, seg_estado_nuevo)
+        in filas_queryset(
+            obs_query, 'id', 'vivienda__proyecto__nombre', 'vivienda__codigo', 'vivienda__beneficiario__nombre',
+            'vivienda__beneficiario__apellido_paterno', 'vivienda__beneficiario__apellido_materno',
+            'vivienda__beneficiario__rut', 'estado__nombre', 'detalle', 'observaciones_seguimiento',
+            'fecha_creacion', 'es_urgente', 'seguimientos__fecha', 'seguimientos__accion',
+            'seguimientos__comentario', 'seguimientos__estado_anterior__nombre', 'seguimientos__estado_nuevo__nombre',
+        )
+    )
+    return exportar_excel('observaciones_filtradas.xlsx', "Observaciones Filtradas", headers, filas)
@@ -1,4 +1,5 @@
 from core.models import Region
+from core.utils.estadisticas_proyecto import estadisticas_por_proyecto, totales_por_region
 from proyectos.models import Proyecto, Vivienda
 from django.db.models import Count
 
@@ -8,16 +9,15 @@ if not r:
     print('Región Valparaíso no encontrada')
 else:
     print('Región: {} (id={})'.format(r.nombre, r.id))
-    total = Vivienda.objects.filter(proyecto__region=r).count()
-    entregadas = Vivienda.objects.filter(proyecto__region=r, estado='entregada').count()
-    print('Total viviendas: {}'.format(total))
-    print('Entregadas: {}'.format(entregadas))
+    proyectos = estadisticas_por_proyecto(Proyecto.objects.filter(region=r))
+    totales = totales_por_region(proyectos)
+    print('Total viviendas: {}'.format(totales[0]['total_viviendas'] if totales else 0))
+    print('Entregadas: {}'.format(totales[0]['viviendas_entregadas'] if totales else 0))
     print('\nProyectos en la región:')
-    qs = Proyecto.objects.filter(region=r).annotate(viv_count=Count('viviendas'))
-    for p in qs:
-        constructora = p.constructora.nombre if getattr(p, 'constructora', None) else (p.constructora_legacy or '—')
-        comuna = p.comuna.nombre if getattr(p, 'comuna', None) else '—'
-        print('- {} | {} | Viviendas: {} | Comuna: {} | Constructora: {} | Entrega: {}'.format(p.codigo, p.nombre, p.viv_count, comuna, constructora, p.fecha_entrega))
+    for p in proyectos:
+        constructora = p['constructora'] or p['constructora_legacy'] or '—'
+        comuna = p['comuna'] or '—'
+        print('- {} | {} | Viviendas: {} | Comuna: {} | Constructora: {} | Entrega: {}'.format(p['codigo'], p['nombre'], p['total_viviendas'], comuna, constructora, p['fecha_entrega']))
     print('\nComunas con viviendas y totales:')
     com_qs = Vivienda.objects.filter(proyecto__region=r).values('proyecto__comuna__nombre').annotate(total=Count('id')).order_by('-total')
     for c in com_qs:
@@ -62,4 +62,132 @@ self.addEventListener('fetch', function(event) {
                 );
             })
     );
-});
\ No newline at end of file
+});
+
+// ============================================================
+// Réplica offline de observaciones (IndexedDB)
+// La página pide sincronizar con postMessage({tipo: 'sincronizar'}); el
+// Service Worker descarga solo los cambios desde la última marca
+// (/incidencias/movil/sincronizar/?desde=...) y los aplica a la réplica.
+// ============================================================
+const DB_REPLICA = 'techo-replica';
+const DB_REPLICA_VERSION = 1;
+const URL_SINCRONIZAR = '/incidencias/movil/sincronizar/';
+let sincronizacionEnCurso = null;
+
+function abrirReplica() {
+    return new Promise(function(resolve, reject) {
+        const solicitud = indexedDB.open(DB_REPLICA, DB_REPLICA_VERSION);
+        solicitud.onupgradeneeded = function() {
+            const db = solicitud.result;
+            db.createObjectStore('observaciones', { keyPath: 'id' });
+            db.createObjectStore('seguimientos', { keyPath: 'id' })
+                .createIndex('observacion_id', 'observacion_id');
+            db.createObjectStore('archivos', { keyPath: 'id' })
+                .createIndex('observacion_id', 'observacion_id');
+            db.createObjectStore('meta');
+        };
+        solicitud.onsuccess = function() { resolve(solicitud.result); };
+        solicitud.onerror = function() { reject(solicitud.error); };
+    });
+}
+
+function leerMarca(db) {
+    return new Promise(function(resolve, reject) {
+        const solicitud = db.transaction('meta').objectStore('meta').get('marca');
+        solicitud.onsuccess = function() { resolve(solicitud.result || ''); };
+        solicitud.onerror = function() { reject(solicitud.error); };
+    });
+}
+
+function borrarPorObservacion(almacen, observacionId) {
+    almacen.index('observacion_id').openKeyCursor(IDBKeyRange.only(observacionId)).onsuccess = function(event) {
+        const cursor = event.target.result;
+        if (cursor) {
+            almacen.delete(cursor.primaryKey);
+            cursor.continue();
+        }
+    };
+}
+
+function aplicarCambios(db, cambios) {
+    return new Promise(function(resolve, reject) {
+        const tx = db.transaction(['observaciones', 'seguimientos', 'archivos', 'meta'], 'readwrite');
+        const observaciones = tx.objectStore('observaciones');
+        const seguimientos = tx.objectStore('seguimientos');
+        const archivos = tx.objectStore('archivos');
+
+        if (cambios.completa) {
+            observaciones.clear();
+            seguimientos.clear();
+            archivos.clear();
+        }
+        cambios.observaciones.forEach(function(obs) { observaciones.put(obs); });
+        cambios.seguimientos.forEach(function(seg) { seguimientos.put(seg); });
+        cambios.archivos.forEach(function(archivo) { archivos.put(archivo); });
+        cambios.seguimientos_eliminados.forEach(function(id) { seguimientos.delete(id); });
+        (cambios.archivos_eliminados || []).forEach(function(id) { archivos.delete(id); });
+        cambios.observaciones_eliminadas.forEach(function(id) {
+            observaciones.delete(id);
+            borrarPorObservacion(seguimientos, id);
+            borrarPorObservacion(archivos, id);
+        });
+        // La marca se guarda en la misma transacción: si algo falla se reintenta desde la anterior
+        tx.objectStore('meta').put(cambios.marca, 'marca');
+
+        tx.oncomplete = function() { resolve(); };
+        tx.onerror = function() { reject(tx.error); };
+    });
+}
+
+function sincronizarReplica() {
+    // Evitar descargas duplicadas si llegan varias solicitudes seguidas
+    if (sincronizacionEnCurso) {
+        return sincronizacionEnCurso;
+    }
+    sincronizacionEnCurso = abrirReplica().then(function(db) {
+        return leerMarca(db).then(function(marca) {
+            const url = URL_SINCRONIZAR + (marca ? '?desde=' + encodeURIComponent(marca) : '');
+            return fetch(url, { credentials: 'same-origin', cache: 'no-store' });
+        }).then(function(response) {
+            if (!response.ok) {
+                throw new Error('Sincronización fallida: ' + response.status);
+            }
+            return response.json();
+        }).then(function(cambios) {
+            return aplicarCambios(db, cambios).then(function() {
+                return cambios.observaciones.length + cambios.observaciones_eliminadas.length;
+            });
+        });
+    }).finally(function() {
+        sincronizacionEnCurso = null;
+    });
+    return sincronizacionEnCurso;
+}
+
+function avisarClientes(mensaje) {
+    return self.clients.matchAll().then(function(clientes) {
+        clientes.forEach(function(cliente) { cliente.postMessage(mensaje); });
+    });
+}
+
+self.addEventListener('message', function(event) {
+    if (event.data && event.data.tipo === 'sincronizar') {
+        event.waitUntil(
+            sincronizarReplica()
+                .then(function(cambios) {
+                    return avisarClientes({ tipo: 'sincronizado', cambios: cambios });
+                })
+                .catch(function(error) {
+                    return avisarClientes({ tipo: 'sincronizacion-fallida', error: String(error) });
+                })
+        );
+    }
+});
+
+// Background Sync: reintentar al recuperar conexión (si el navegador lo soporta)
+self.addEventListener('sync', function(event) {
+    if (event.tag === 'sincronizar-observaciones') {
+        event.waitUntil(sincronizarReplica());
+    }
+});
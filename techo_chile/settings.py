@@ -121,6 +121,64 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# =============================
+#     CACHE
+# =============================
+# En producción con varios procesos conviene un backend compartido (Redis/Memcached)
+# para que la invalidación por signals llegue a todos los workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# Segundos que se reutilizan las estadísticas globales del encabezado
+GLOBAL_STATS_CACHE_TTL = 60
+# Segundos que se reutiliza el alcance (proyectos/viviendas visibles) de cada usuario
+ALCANCE_USUARIO_CACHE_TTL = 300
+
+# =============================
+#     REPORTES EN SEGUNDO PLANO
+# =============================
+# Procesos del pool de `manage.py procesar_reportes` (reportes PDF simultáneos)
+REPORTES_PROCESOS = int(os.getenv('REPORTES_PROCESOS', '2'))
+# Un trabajo "procesando" por más de esto se considera abandonado y se reintenta
+REPORTES_TIMEOUT_SEGUNDOS = 1800
+# Caché de reportes generados (reportes_generados/): antigüedad y tamaño máximos
+REPORTES_CACHE_MAX_DIAS = 30
+REPORTES_CACHE_MAX_MB = 500
+# Procesos precalentados que convierten HTML/ReportLab a PDF (0 = en el mismo proceso)
+PDF_PROCESOS = int(os.getenv('PDF_PROCESOS', '2'))
+PDF_TIMEOUT_SEGUNDOS = 120
+# PDFs individuales de actas y fichas ya generados (se borran los menos usados sobre el máximo)
+PDF_CACHE_DIR = BASE_DIR / 'cache_pdf'
+PDF_CACHE_MAX_MB = 200
+
+# =============================
+#     USUARIOS FAMILIA
+# =============================
+# Procesos que calculan en paralelo los hashes de contraseña al crear usuarios FAMILIA en lote
+USUARIOS_FAMILIA_PROCESOS = int(os.getenv('USUARIOS_FAMILIA_PROCESOS', '4'))
+# False: los beneficiarios nuevos solo se encolan y los procesa `manage.py provisionar_usuarios_familia`
+USUARIOS_FAMILIA_AL_CONFIRMAR = True
+
+# =============================
+#     BÚSQUEDA DE OBSERVACIONES
+# =============================
+# '' elige según el motor (FTS5 en SQLite, tsvector en PostgreSQL); o la ruta de un backend
+BUSQUEDA_BACKEND = os.getenv('BUSQUEDA_BACKEND', '')
+
+# =============================
+#     DESCARGAS DE ARCHIVOS
+# =============================
+# '' (Django envía el archivo), 'x-accel' (nginx) o 'x-sendfile' (Apache/lighttpd)
+DESCARGAS_OFFLOAD = os.getenv('DESCARGAS_OFFLOAD', '')
+# Con 'x-accel': carpeta -> location `internal` de nginx que la publica
+DESCARGAS_ACCEL_RUTAS = {
+    str(MEDIA_ROOT): '/interno/media/',
+    str(BASE_DIR / 'reportes_generados'): '/interno/reportes/',
+    str(PDF_CACHE_DIR): '/interno/cache_pdf/',
+}
+
 # =============================
 #     AUTH
 # =============================